@@ -16,8 +16,9 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'config'))
 
 from cadvisor_client import CAdvisorClient
 from metrics_processor import MetricsProcessor
+from metrics_sink import SegmentedMetricsSink
 from data_exporter import DataExporter
-from dashboard import MetricsDashboard
+from dashboard import MetricsDashboard, SegmentTailer
 
 def setup_logging():
     """Configura logging global"""
@@ -38,6 +39,18 @@ def main():
     parser.add_argument('--export-only', action='store_true', help='Apenas exportar dados sem dashboard')
     parser.add_argument('--dashboard-only', action='store_true', help='Apenas executar dashboard com dados existentes')
     parser.add_argument('--data-file', help='Arquivo CSV com dados para dashboard')
+    parser.add_argument('--async-collect', action='store_true',
+                        help='Coletar todos os cAdvisors de cadvisor.endpoints concorrentemente')
+    parser.add_argument('--sink-dir', help='Gravar a coleta em segmentos rotativos neste diretório '
+                                           '(memória constante em coletas longas)')
+    parser.add_argument('--live-dir', help='Com --dashboard-only: acompanhar ao vivo os segmentos '
+                                           'gravados pelo coletor neste diretório (com sink.format '
+                                           'jsonl cada flush aparece no refresh; em parquet, só a '
+                                           'cada rotação, sink.max_segment_minutes)')
+    parser.add_argument('--refresh-seconds', type=float, default=5,
+                        help='Intervalo de atualização do dashboard ao vivo')
+    parser.add_argument('--report-every', type=int, default=10,
+                        help='Logar resumo parcial e top consumidores a cada N lotes coletados')
     
     args = parser.parse_args()
     
@@ -46,15 +59,21 @@ def main():
     
     try:
         if args.dashboard_only:
-            if not args.data_file or not os.path.exists(args.data_file):
-                logger.error("Para modo dashboard-only, especifique um arquivo de dados válido com --data-file")
+            live_source = SegmentTailer(args.live_dir) if args.live_dir else None
+            if args.data_file and os.path.exists(args.data_file):
+                import pandas as pd
+                df = pd.read_csv(args.data_file)
+                df['timestamp'] = pd.to_datetime(df['timestamp'])
+            elif live_source is not None:
+                # Histórico já gravado entra de uma vez; o resto chega pelo refresh
+                df = live_source()
+            else:
+                logger.error("Para modo dashboard-only, especifique um arquivo de dados válido com --data-file "
+                             "ou um diretório de segmentos com --live-dir")
                 return 1
             
-            import pandas as pd
-            df = pd.read_csv(args.data_file)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            
-            dashboard = MetricsDashboard(df)
+            dashboard = MetricsDashboard(df, live_source=live_source,
+                                         refresh_seconds=args.refresh_seconds)
             logger.info("Iniciando dashboard em http://localhost:8050")
             dashboard.run()
             return 0
@@ -75,16 +94,46 @@ def main():
         
         # Coletar métricas
         logger.info(f"Iniciando coleta de métricas por {args.duration} minutos...")
-        raw_metrics = client.collect_metrics_continuously(args.duration)
-        
-        if not raw_metrics:
-            logger.error("Nenhuma métrica foi coletada")
-            return 1
+        sink = None
+        if args.sink_dir or client.config.get('sink', {}).get('enabled'):
+            sink = SegmentedMetricsSink.from_config(client.config, args.sink_dir)
+            logger.info(f"Gravando segmentos em {sink.output_dir} ({sink.format})")
         
-        # Processar métricas
-        logger.info("Processando métricas...")
+        # Cada lote vai para o sink (ou memória) e para as estatísticas ao vivo
         processor = MetricsProcessor()
-        df = processor.process_raw_metrics(raw_metrics)
+        raw_metrics = []
+        
+        def on_batch(batch):
+            if sink is not None:
+                sink.write(batch)
+            else:
+                raw_metrics.extend(batch)
+            processor.observe_batch(batch)
+            if processor.batches_observed % max(args.report_every, 1) == 0:
+                processor.log_live_report()
+        
+        if args.async_collect:
+            from async_collector import AsyncCAdvisorCollector
+            AsyncCAdvisorCollector(client, on_batch=on_batch).collect(args.duration)
+        else:
+            client.collect_metrics_continuously(args.duration, on_batch=on_batch)
+        
+        if sink is not None:
+            sink.close()
+            if sink.records_written == 0:
+                logger.error("Nenhuma métrica foi coletada")
+                return 1
+            logger.info("Processando segmentos...")
+            # Só os segmentos desta execução; o diretório é compartilhado entre execuções
+            processor.process_segments(sink.output_dir, sink.closed_segments)
+        else:
+            if not raw_metrics:
+                logger.error("Nenhuma métrica foi coletada")
+                return 1
+            
+            # Processar métricas
+            logger.info("Processando métricas...")
+            processor.process_raw_metrics(raw_metrics)
         df_with_cpu = processor.calculate_cpu_percentage(machine_info)
         
         # Gerar estatísticas
@@ -93,7 +142,7 @@ def main():
         
         # Exportar dados
         logger.info("Exportando dados...")
-        exporter = DataExporter()
+        exporter = DataExporter.from_config(client.config)
         
         # Exportar CSV
         csv_file = exporter.export_to_csv(df_with_cpu)
@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+Coletor assíncrono de métricas para múltiplos cAdvisors (um por nó).
+
+Cada endpoint roda seu próprio loop sobre deadlines alinhados ao relógio
+(t0 + k * intervalo), então a duração de uma coleta não desloca as
+seguintes. Coletas que estouram o tick pulam para o próximo deadline
+futuro e contam como ticks perdidos.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Union
+from urllib.parse import urlparse
+
+import aiohttp
+import numpy as np
+
+from cadvisor_client import CAdvisorClient, ContainerSpecCache
+
+
+class DurationHistogram:
+    """
+    Histograma fixo de durações (ms) em buckets logarítmicos.
+
+    Memória constante por endpoint em coletas de qualquer duração; os
+    percentis têm erro relativo de até (gamma - 1) / 2 e histogramas de
+    endpoints diferentes se somam para os percentis globais.
+    """
+
+    def __init__(self, min_ms: float = 0.01, max_ms: float = 3.6e6, gamma: float = 1.02):
+        self.min_ms = min_ms
+        self.log_gamma = np.log(gamma)
+        self.counts = np.zeros(int(np.ceil(np.log(max_ms / min_ms) / self.log_gamma)) + 2, dtype=np.int64)
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def _bucket(self, value: float) -> int:
+        # Bucket zero: valores <= min_ms (inclusive skews negativos do relógio)
+        if value <= self.min_ms:
+            return 0
+        return min(int(np.ceil(np.log(value / self.min_ms) / self.log_gamma)), len(self.counts) - 1)
+
+    def add(self, value: float):
+        self.counts[self._bucket(value)] += 1
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: 'DurationHistogram'):
+        self.counts += other.counts
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> float:
+        """Percentil q (0-100) pelo centro geométrico do bucket, limitado a [mínimo, máximo]"""
+        if self.count == 0:
+            return 0.0
+        rank = max(1, int(np.ceil(q / 100.0 * self.count)))
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        value = self.min_ms * np.exp((index - 0.5) * self.log_gamma) if index > 0 else self.min
+        return float(np.clip(value, self.min, self.max))
+
+
+class AsyncCAdvisorCollector:
+    """Coleta concorrente de vários cAdvisors com agendamento sem deriva"""
+
+    def __init__(self, client: CAdvisorClient,
+                 endpoints: Optional[List[Union[str, Dict]]] = None,
+                 interval_seconds: Optional[float] = None,
+                 timeout: Optional[float] = None,
+                 jitter_seconds: Optional[float] = None,
+                 max_connections: int = 100,
+                 on_batch: Optional[Callable[[List[Dict]], None]] = None):
+        """
+        Args:
+            client: CAdvisorClient usado para configuração e extração dos campos
+            endpoints: URLs base (ou dicts com url/name/timeout); default client.endpoints
+            interval_seconds: período entre ticks; default collection.interval_seconds
+            timeout: timeout por requisição; limitado a 90% do intervalo (a coleta
+                inteira de um tick também não passa do próximo deadline)
+            jitter_seconds: atraso aleatório máximo aplicado a cada requisição
+            max_connections: tamanho do pool de conexões compartilhado
+            on_batch: callback chamado com os registros de cada (endpoint, tick);
+                quando ausente os registros são acumulados em memória
+        """
+        self.client = client
+        self.logger = logging.getLogger(__name__)
+        collection = client.config.get('collection', {})
+
+        self.interval = float(interval_seconds or collection.get('interval_seconds', 60))
+        default_timeout = float(timeout or client.config['cadvisor'].get('timeout', 30))
+        self.jitter = float(jitter_seconds if jitter_seconds is not None
+                            else collection.get('jitter_seconds', 0.0))
+        self.max_connections = max_connections
+        self.on_batch = on_batch
+
+        self.endpoints = []
+        for endpoint in (endpoints or client.endpoints):
+            if isinstance(endpoint, str):
+                endpoint = {'url': endpoint}
+            url = endpoint['url'].rstrip('/')
+            self.endpoints.append({
+                'url': url,
+                'name': endpoint.get('name') or urlparse(url).hostname or url,
+                # O timeout nunca pode invadir o próximo tick
+                'timeout': min(float(endpoint.get('timeout', default_timeout)), self.interval * 0.9)
+            })
+
+        self.metrics_data: List[Dict] = []
+        self.stats = {e['name']: self._empty_stats() for e in self.endpoints}
+        spec_ttl = collection.get('spec_ttl_seconds', 300)
+        self.spec_caches = {e['name']: ContainerSpecCache(spec_ttl) for e in self.endpoints}
+        self.container_filter = client.container_filter
+
+    @staticmethod
+    def _empty_stats() -> Dict:
+        return {'samples': 0, 'containers': 0, 'timeouts': 0, 'errors': 0,
+                'missed_ticks': 0, 'skew_ms': DurationHistogram(), 'latency_ms': DurationHistogram()}
+
+    async def _get_json(self, session: aiohttp.ClientSession, endpoint: Dict,
+                        path: str, params: Dict) -> Optional[Dict]:
+        """GET com o timeout do endpoint; None quando o recurso não existe (404)"""
+        async with session.get(f"{endpoint['url']}{path}", params=params,
+                               timeout=aiohttp.ClientTimeout(total=endpoint['timeout'])) as response:
+            if response.status == 404:
+                return None
+            response.raise_for_status()
+            return await response.json(loads=json.loads, content_type=None)
+
+    async def _get_scoped(self, session: aiohttp.ClientSession, endpoint: Dict,
+                          api_path: str, params: Dict) -> Optional[Dict]:
+        """GET em cada subárvore monitorada; None se todas responderam 404"""
+        merged = None
+        for scoped_path in self.container_filter.api_paths(api_path):
+            data = await self._get_json(session, endpoint, scoped_path, params)
+            if data is not None:
+                merged = merged or {}
+                merged.update(data)
+        return merged
+
+    async def _fetch(self, session: aiohttp.ClientSession, endpoint: Dict) -> Dict:
+        """
+        Obtém o stat mais recente de cada container monitorado de um endpoint.
+
+        Usa /api/v2.0/stats (só stats, escopado por collection.roots) e completa
+        com o cache de specs do endpoint; recai na API v1.3 se a v2.0 não existir.
+        """
+        allows_path = self.container_filter.allows_path
+        if not endpoint.get('legacy_api'):
+            stats = await self._get_scoped(session, endpoint, '/api/v2.0/stats',
+                                           {'type': 'name', 'recursive': 'true', 'count': 1})
+            if stats is not None:
+                stats = {path: s for path, s in stats.items() if allows_path(path)}
+                cache = self.spec_caches[endpoint['name']]
+                if cache.needs_refresh(stats.keys()):
+                    specs = await self._get_scoped(session, endpoint, '/api/v2.0/spec',
+                                                   {'type': 'name', 'recursive': 'true'})
+                    specs = {path: spec for path, spec in (specs or {}).items() if allows_path(path)}
+                    cache.update(specs, self.client._extract_container_name,
+                                 self.container_filter if self.container_filter.needs_spec else None)
+                return cache.combine(stats)
+            self.logger.warning(f"⚠️ API v2.0 indisponível em {endpoint['name']}; usando a API v1.3")
+            endpoint['legacy_api'] = True
+
+        if self.container_filter.roots == ['/']:
+            containers_data = await self._get_json(session, endpoint, '/api/v1.3/containers', {'count': 1}) or {}
+        else:
+            containers_data = {}
+            for scoped_path in self.container_filter.api_paths('/api/v1.3/subcontainers'):
+                for info in await self._get_json(session, endpoint, scoped_path, {'count': 1}) or []:
+                    if isinstance(info, dict) and info.get('name'):
+                        containers_data[info['name']] = info
+
+        return {path: info for path, info in containers_data.items()
+                if isinstance(info, dict) and allows_path(path) and (
+                    not self.container_filter.needs_spec or self.container_filter.allows(
+                        path, info.get('spec', {}), self.client._extract_container_name(path, info)))}
+
+    async def _poll_endpoint(self, session: aiohttp.ClientSession, endpoint: Dict,
+                             t0: float, end_time: float):
+        """Loop de coleta de um endpoint sobre os deadlines t0 + k * intervalo"""
+        stats = self.stats[endpoint['name']]
+        k = 0
+        while True:
+            deadline = t0 + k * self.interval
+            if deadline >= end_time:
+                break
+
+            fire_at = deadline + (random.uniform(0, self.jitter) if self.jitter > 0 else 0.0)
+            delay = fire_at - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            started = time.time()
+            try:
+                # Stats, specs e subárvores compartilham um único prazo, com a
+                # mesma folga de 10% do timeout por requisição antes do próximo tick
+                containers_data = await asyncio.wait_for(self._fetch(session, endpoint),
+                                                         max(deadline + self.interval * 0.9 - started, 0.0))
+                received = time.time()
+                self._handle_response(endpoint, containers_data, deadline, started, received)
+            except asyncio.TimeoutError:
+                stats['timeouts'] += 1
+                self.logger.warning(f"⏱️ Timeout em {endpoint['name']} (tick {k})")
+            except Exception as e:
+                stats['errors'] += 1
+                self.logger.error(f"❌ Erro ao coletar {endpoint['name']}: {e}")
+
+            # Próximo deadline futuro; ticks que já passaram são perdidos
+            next_k = max(k + 1, int(np.floor((time.time() - t0) / self.interval)) + 1)
+            stats['missed_ticks'] += next_k - k - 1
+            k = next_k
+
+    def _handle_response(self, endpoint: Dict, containers_data: Dict, deadline: float,
+                         started: float, received: float):
+        """Converte a resposta em registros com timestamps reais e skew medido"""
+        stats = self.stats[endpoint['name']]
+        if not isinstance(containers_data, dict):
+            stats['errors'] += 1
+            return
+
+        skew_ms = (started - deadline) * 1000.0
+        latency_ms = (received - started) * 1000.0
+        collection_timestamp = datetime.fromtimestamp(received).isoformat()
+        scheduled_timestamp = datetime.fromtimestamp(deadline).isoformat()
+
+        names = self.spec_caches[endpoint['name']].names
+        batch = []
+        for container_path, container_info in containers_data.items():
+            try:
+                entry = self.client.build_metric_entry(container_path, container_info,
+                                                       collection_timestamp,
+                                                       names.get(container_path))
+            except Exception as e:
+                self.logger.error(f"Erro ao processar {container_path} em {endpoint['name']}: {e}")
+                continue
+            if entry is None:
+                continue
+            entry.update({
+                'node': endpoint['name'],
+                'endpoint': endpoint['url'],
+                'scheduled_timestamp': scheduled_timestamp,
+                'skew_ms': round(skew_ms, 3),
+                'latency_ms': round(latency_ms, 3)
+            })
+            batch.append(entry)
+
+        stats['samples'] += 1
+        stats['containers'] += len(batch)
+        stats['skew_ms'].add(skew_ms)
+        stats['latency_ms'].add(latency_ms)
+
+        if self.on_batch is not None:
+            self.on_batch(batch)
+        else:
+            self.metrics_data.extend(batch)
+
+    async def run(self, duration_seconds: float) -> List[Dict]:
+        """
+        Coleta todos os endpoints concorrentemente durante duration_seconds.
+
+        Returns:
+            Registros coletados (vazio quando on_batch está definido)
+        """
+        # Primeiro tick no próximo múltiplo do intervalo no relógio de parede
+        t0 = np.ceil(time.time() / self.interval) * self.interval
+        end_time = t0 + duration_seconds
+
+        self.logger.info(f"🚀 Coleta assíncrona de {len(self.endpoints)} endpoints "
+                         f"a cada {self.interval}s por {duration_seconds}s")
+
+        connector = aiohttp.TCPConnector(limit=self.max_connections,
+                                         keepalive_timeout=self.interval * 2)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await asyncio.gather(*(self._poll_endpoint(session, endpoint, t0, end_time)
+                                   for endpoint in self.endpoints))
+
+        report = self.get_stats()
+        self.logger.info(f"✅ Coleta concluída: {report['samples']} amostras, "
+                         f"skew p50={report['skew_ms_p50']:.1f}ms p99={report['skew_ms_p99']:.1f}ms, "
+                         f"{report['timeouts']} timeouts, {report['missed_ticks']} ticks perdidos")
+        return self.metrics_data
+
+    def collect(self, duration_minutes: Optional[float] = None) -> List[Dict]:
+        """Versão síncrona de run(), compatível com collect_metrics_continuously"""
+        if duration_minutes is None:
+            duration_minutes = self.client.config['collection']['duration_minutes']
+        return asyncio.run(self.run(duration_minutes * 60))
+
+    def get_stats(self) -> Dict:
+        """Resumo agregado e por endpoint de amostras, skew, latência e falhas"""
+        all_skew, all_latency = DurationHistogram(), DurationHistogram()
+        for s in self.stats.values():
+            all_skew.merge(s['skew_ms'])
+            all_latency.merge(s['latency_ms'])
+        per_endpoint = {
+            name: {
+                'samples': s['samples'],
+                'containers': s['containers'],
+                'timeouts': s['timeouts'],
+                'errors': s['errors'],
+                'missed_ticks': s['missed_ticks'],
+                'skew_ms_p50': s['skew_ms'].percentile(50),
+                'skew_ms_p99': s['skew_ms'].percentile(99),
+                'latency_ms_p50': s['latency_ms'].percentile(50)
+            }
+            for name, s in self.stats.items()
+        }
+        return {
+            'endpoints': len(self.endpoints),
+            'interval_seconds': self.interval,
+            'samples': sum(s['samples'] for s in self.stats.values()),
+            'containers': sum(s['containers'] for s in self.stats.values()),
+            'timeouts': sum(s['timeouts'] for s in self.stats.values()),
+            'errors': sum(s['errors'] for s in self.stats.values()),
+            'missed_ticks': sum(s['missed_ticks'] for s in self.stats.values()),
+            'skew_ms_p50': all_skew.percentile(50),
+            'skew_ms_p99': all_skew.percentile(99),
+            'skew_ms_max': float(all_skew.max) if all_skew.count else 0.0,
+            'latency_ms_p50': all_latency.percentile(50),
+            'latency_ms_p99': all_latency.percentile(99),
+            'per_endpoint': per_endpoint
+        }
+
+
+def _fake_node_containers(node: int, containers: int) -> Dict[str, Dict]:
+    """Containers sintéticos de um nó no formato de /api/v1.3/containers"""
+    now = datetime.now().isoformat() + 'Z'
+    payload = {}
+    for i in range(containers):
+        path = f"/kubepods/pod-{node}-{i}/container-{i}"
+        payload[path] = {
+            'name': path,
+            'aliases': [f"k8s_app-{i}_pod-{node}-{i}_default_{node:04d}{i:04d}", f"{node:08x}{i:056x}"],
+            'spec': {
+                'creation_time': '2025-01-01T00:00:00Z',
+                'labels': {'io.kubernetes.pod.name': f"pod-{node}-{i}",
+                           'io.kubernetes.pod.namespace': 'default',
+                           'io.kubernetes.container.name': f"app-{i}",
+                           'io.kubernetes.pod.uid': f"{node:08x}-{i:04x}-0000-0000-000000000000"},
+                'image': f"registry.local/app-{i}:1.0",
+                'has_cpu': True, 'cpu': {'limit': 1024, 'max_limit': 0, 'mask': '0-7', 'period': 100000},
+                'has_memory': True, 'memory': {'limit': 2**29, 'reservation': 2**28, 'swap_limit': 2**29},
+                'has_network': True, 'has_filesystem': True, 'has_diskio': True
+            },
+            'stats': [{
+                'timestamp': now,
+                'cpu': {'usage': {'total': 10**9 * (i + 1), 'user': 6 * 10**8, 'system': 4 * 10**8}},
+                'memory': {'usage': 2**27 + i, 'working_set': 2**27, 'rss': 2**26, 'cache': 2**25},
+                'network': {'interfaces': [{'rx_bytes': 1000, 'tx_bytes': 2000,
+                                            'rx_packets': 10, 'tx_packets': 20}]},
+                'filesystem': [{'usage': 2**30, 'capacity': 2**33, 'available': 2**32}]
+            }]
+        }
+    # cgroups de sistema que não interessam quando só /kubepods é monitorado
+    for i in range(containers):
+        path = f"/system.slice/service-{i}.service"
+        payload[path] = {'name': path, 'spec': {'labels': {}},
+                         'stats': [dict(payload[f"/kubepods/pod-{node}-{i}/container-{i}"]['stats'][0])]}
+    return payload
+
+
+async def _run_simulation(client: CAdvisorClient, nodes: int, containers: int,
+                          interval: float, duration: float, latency: float,
+                          jitter: float) -> Dict:
+    """Sobe um servidor cAdvisor falso com N nós (/node-i/...) e coleta dele"""
+    from aiohttp import web
+
+    served = {'bytes': 0}
+
+    def respond(payload) -> web.Response:
+        body = json.dumps(payload).encode()
+        served['bytes'] += len(body)
+        return web.Response(body=body, content_type='application/json')
+
+    async def handler(request):
+        node = int(request.match_info['node'])
+        if latency > 0:
+            await asyncio.sleep(random.uniform(0, 2 * latency))
+        data = _fake_node_containers(node, containers)
+        root = request.match_info.get('root') or '/'
+        data = {path: info for path, info in data.items()
+                if root == '/' or path == root or path.startswith(root + '/')}
+        kind = request.match_info['kind']
+        if kind == 'stats':
+            return respond({path: info['stats'] for path, info in data.items()})
+        if kind == 'spec':
+            return respond({path: info['spec'] for path, info in data.items()})
+        return respond(data)
+
+    app = web.Application()
+    app.router.add_get('/node-{node}/api/v2.0/{kind:stats|spec}{root:.*}', handler)
+    app.router.add_get('/node-{node}/api/v1.3/{kind:containers}', handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    try:
+        endpoints = [{'url': f"http://127.0.0.1:{port}/node-{i}", 'name': f"node-{i}"}
+                     for i in range(nodes)]
+        collector = AsyncCAdvisorCollector(client, endpoints=endpoints,
+                                           interval_seconds=interval,
+                                           jitter_seconds=jitter,
+                                           on_batch=lambda batch: None)
+        await collector.run(duration)
+        report = collector.get_stats()
+        report['simulated_bytes_served'] = served['bytes']
+        return report
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    """Função principal"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Coletor assíncrono multi-nó do cAdvisor')
+    parser.add_argument('--config', default='config/config.yaml', help='Arquivo de configuração')
+    parser.add_argument('--duration', type=float, default=None, help='Duração da coleta em minutos')
+    parser.add_argument('--interval', type=float, default=None, help='Intervalo entre ticks (s)')
+    parser.add_argument('--jitter', type=float, default=None, help='Jitter máximo por requisição (s)')
+    parser.add_argument('--output', help='Arquivo JSON para salvar as métricas coletadas')
+    parser.add_argument('--simulate-nodes', type=int, default=0,
+                        help='Benchmark contra N cAdvisors simulados localmente')
+    parser.add_argument('--simulate-containers', type=int, default=40, help='Containers por nó simulado')
+    parser.add_argument('--simulate-latency', type=float, default=0.05, help='Latência média simulada (s)')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    client = CAdvisorClient(args.config)
+
+    if args.simulate_nodes:
+        interval = args.interval or 5.0
+        duration = (args.duration or 0.5) * 60
+        report = asyncio.run(_run_simulation(client, args.simulate_nodes, args.simulate_containers,
+                                             interval, duration, args.simulate_latency,
+                                             args.jitter if args.jitter is not None else 0.2))
+        report.pop('per_endpoint')
+        print(json.dumps(report, indent=2))
+        return
+
+    collector = AsyncCAdvisorCollector(client, interval_seconds=args.interval,
+                                       jitter_seconds=args.jitter)
+    metrics = collector.collect(args.duration)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(metrics, f, default=str)
+        print(f"💾 {len(metrics)} registros salvos em {args.output}")
+    print(json.dumps({k: v for k, v in collector.get_stats().items() if k != 'per_endpoint'}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
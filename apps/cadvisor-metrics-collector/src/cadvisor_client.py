@@ -1,20 +1,154 @@
 import requests
 import json
 import time
+import re
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 import yaml
 
+class ContainerFilter:
+    """Subárvores de cgroup monitoradas e filtros de inclusão/exclusão de containers"""
+    
+    NAMESPACE_LABEL = 'io.kubernetes.pod.namespace'
+    
+    def __init__(self, roots: Optional[List[str]] = None,
+                 include_prefixes: Optional[List[str]] = None,
+                 exclude_prefixes: Optional[List[str]] = None,
+                 namespaces: Optional[List[str]] = None,
+                 exclude_namespaces: Optional[List[str]] = None,
+                 name_regex: Optional[str] = None,
+                 exclude_name_regex: Optional[str] = None):
+        """
+        Args:
+            roots: subárvores consultadas no cAdvisor (filtro no servidor); default ['/']
+            include_prefixes / exclude_prefixes: prefixos de path do cgroup
+            namespaces / exclude_namespaces: valores do label io.kubernetes.pod.namespace
+            name_regex / exclude_name_regex: regex aplicada ao nome do container
+        """
+        roots = sorted({self._normalize(r) for r in (roots or ['/'])})
+        # Raízes aninhadas em outra raiz seriam coletadas em duplicidade
+        self.roots = [r for r in roots if not any(
+            other != r and self._under(r, other) for other in roots)]
+        self.include_prefixes = [self._normalize(p) for p in (include_prefixes or [])]
+        self.exclude_prefixes = [self._normalize(p) for p in (exclude_prefixes or [])]
+        self.namespaces = set(namespaces or [])
+        self.exclude_namespaces = set(exclude_namespaces or [])
+        self.name_regex = re.compile(name_regex) if name_regex else None
+        self.exclude_name_regex = re.compile(exclude_name_regex) if exclude_name_regex else None
+    
+    @classmethod
+    def from_config(cls, collection_config: Dict) -> 'ContainerFilter':
+        """Cria o filtro a partir de collection.roots e collection.filters"""
+        filters = collection_config.get('filters', {}) or {}
+        return cls(roots=collection_config.get('roots'),
+                   include_prefixes=filters.get('include_path_prefixes'),
+                   exclude_prefixes=filters.get('exclude_path_prefixes'),
+                   namespaces=filters.get('namespaces'),
+                   exclude_namespaces=filters.get('exclude_namespaces'),
+                   name_regex=filters.get('name_regex'),
+                   exclude_name_regex=filters.get('exclude_name_regex'))
+    
+    @staticmethod
+    def _normalize(path: str) -> str:
+        return '/' + path.strip('/') if path.strip('/') else '/'
+    
+    @staticmethod
+    def _under(path: str, prefix: str) -> bool:
+        """Prefixo respeitando fronteiras de segmento (/kubepods não casa /kubepods2)"""
+        return prefix == '/' or path == prefix or path.startswith(prefix + '/')
+    
+    @property
+    def needs_spec(self) -> bool:
+        """True se algum filtro depende de labels ou do nome do container"""
+        return bool(self.namespaces or self.exclude_namespaces
+                    or self.name_regex or self.exclude_name_regex)
+    
+    def api_paths(self, api_path: str) -> List[str]:
+        """Caminhos da API escopados por raiz, ex.: /api/v2.0/stats/kubepods"""
+        return [api_path if root == '/' else f"{api_path}{root}" for root in self.roots]
+    
+    def allows_path(self, path: str) -> bool:
+        """Filtro barato por path, aplicado antes de qualquer parsing"""
+        if not any(self._under(path, root) for root in self.roots):
+            return False
+        if self.include_prefixes and not any(self._under(path, p) for p in self.include_prefixes):
+            return False
+        return not any(self._under(path, p) for p in self.exclude_prefixes)
+    
+    def allows(self, path: str, spec: Dict, name: str) -> bool:
+        """Filtro completo: path, namespace (label do spec) e regex de nome"""
+        if not self.allows_path(path):
+            return False
+        if self.namespaces or self.exclude_namespaces:
+            labels = spec.get('labels', {}) if isinstance(spec, dict) else {}
+            namespace = labels.get(self.NAMESPACE_LABEL) if isinstance(labels, dict) else None
+            if self.namespaces and namespace not in self.namespaces:
+                return False
+            if namespace in self.exclude_namespaces:
+                return False
+        if self.name_regex and not self.name_regex.search(name):
+            return False
+        if self.exclude_name_regex and self.exclude_name_regex.search(name):
+            return False
+        return True
+
+class ContainerSpecCache:
+    """Cache de specs e nomes de containers indexado pelo path do cgroup"""
+    
+    def __init__(self, ttl_seconds: float = 300):
+        self.ttl_seconds = ttl_seconds
+        self.specs: Dict[str, Dict] = {}
+        self.names: Dict[str, str] = {}
+        self.allowed: Optional[set] = None
+        self.refreshed_at = 0.0
+        self.refresh_count = 0
+    
+    def needs_refresh(self, paths) -> bool:
+        """True se o TTL expirou ou se apareceram paths desconhecidos"""
+        if time.time() - self.refreshed_at >= self.ttl_seconds:
+            return True
+        return any(path not in self.specs for path in paths)
+    
+    def update(self, specs: Dict[str, Dict], name_fn,
+               container_filter: Optional[ContainerFilter] = None):
+        """
+        Substitui o cache pelos specs recebidos (paths removidos são descartados).
+        
+        Com um filtro, o conjunto de paths permitidos é decidido aqui, uma vez
+        por refresh, e combine() descarta os demais sem parsear seus stats.
+        """
+        self.specs = {path: spec for path, spec in specs.items() if isinstance(spec, dict)}
+        self.names = {path: name_fn(path, {'name': path, 'spec': spec}) for path, spec in self.specs.items()}
+        if container_filter is not None:
+            self.allowed = {path for path, spec in self.specs.items()
+                            if container_filter.allows(path, spec, self.names[path])}
+        else:
+            self.allowed = None
+        self.refreshed_at = time.time()
+        self.refresh_count += 1
+    
+    def combine(self, stats: Dict[str, List]) -> Dict[str, Dict]:
+        """Monta {path: {'spec', 'stats'}} no formato de /api/v1.3/containers"""
+        allowed = self.allowed
+        return {path: {'name': path, 'spec': self.specs.get(path, {}), 'stats': stats_list}
+                for path, stats_list in stats.items() if allowed is None or path in allowed}
+
 class CAdvisorClient:
     """Cliente para conectar e coletar métricas do cAdvisor"""
     
     def __init__(self, config_path: str = "config/config.yaml"):
+        self.logger = self._setup_logger()
         self.config = self._load_config(config_path)
         self.base_url = f"{self.config['cadvisor']['protocol']}://{self.config['cadvisor']['host']}:{self.config['cadvisor']['port']}"
+        # Lista de cAdvisors (um por nó) para o coletor assíncrono; default: apenas base_url
+        self.endpoints = self.config['cadvisor'].get('endpoints') or [self.base_url]
         self.session = requests.Session()
-        self.logger = self._setup_logger()
         self.debug_mode = self.config.get('debug', False)
+        # Specs mudam só quando containers sobem/descem; cada tick busca apenas stats
+        self.spec_cache = ContainerSpecCache(self.config['collection'].get('spec_ttl_seconds', 300))
+        self.container_filter = ContainerFilter.from_config(self.config['collection'])
+        self._stats_api_available = None
         
     def _load_config(self, config_path: str) -> Dict:
         """Carrega configurações do arquivo YAML"""
@@ -152,8 +286,130 @@ class CAdvisorClient:
             self.logger.error(f"Erro ao decodificar JSON da resposta: {e}")
             return {}
     
-    def collect_metrics_continuously(self, duration_minutes: int = None) -> List[Dict]:
-        """Coleta métricas continuamente por um período especificado"""
+    def _get_scoped(self, api_path: str, params: Dict) -> Dict:
+        """GET em cada subárvore monitorada, unindo as respostas {path: ...}"""
+        merged = {}
+        not_found = None
+        found_any = False
+        for scoped_path in self.container_filter.api_paths(api_path):
+            response = self.session.get(
+                f"{self.base_url}{scoped_path}",
+                params=params,
+                timeout=self.config['cadvisor']['timeout']
+            )
+            if response.status_code == 404:
+                # Subárvore inexistente neste nó (ex.: /kubepods antes do primeiro pod)
+                not_found = response
+                continue
+            response.raise_for_status()
+            found_any = True
+            merged.update(response.json())
+        
+        # Todas as raízes com 404: a própria API não existe
+        if not found_any and not_found is not None:
+            not_found.raise_for_status()
+        return merged
+    
+    def get_container_specs(self) -> Dict:
+        """Obtém os specs (labels, aliases, imagem) dos containers monitorados via API v2.0"""
+        specs = self._get_scoped('/api/v2.0/spec', {'type': 'name', 'recursive': 'true'})
+        return {path: spec for path, spec in specs.items() if self.container_filter.allows_path(path)}
+    
+    def _get_legacy_containers(self, count: int = 1) -> Dict:
+        """Fallback v1.3: containers completos (com spec), escopados e filtrados"""
+        if self.container_filter.roots == ['/']:
+            containers_data = self.get_containers_info(count=count)
+        else:
+            # /api/v1.3/subcontainers/<raiz> devolve uma lista de ContainerInfo
+            containers_data = {}
+            try:
+                params = {'count': count} if count > 0 else {}
+                for scoped_path in self.container_filter.api_paths('/api/v1.3/subcontainers'):
+                    response = self.session.get(
+                        f"{self.base_url}{scoped_path}",
+                        params=params,
+                        timeout=self.config['cadvisor']['timeout']
+                    )
+                    response.raise_for_status()
+                    for info in response.json():
+                        if isinstance(info, dict) and info.get('name'):
+                            containers_data[info['name']] = info
+            except requests.exceptions.RequestException as e:
+                self.logger.error(f"Erro ao obter subcontainers: {e}")
+                return {}
+        
+        container_filter = self.container_filter
+        filtered = {}
+        for path, info in containers_data.items():
+            if not isinstance(info, dict) or not container_filter.allows_path(path):
+                continue
+            if container_filter.needs_spec and not container_filter.allows(
+                    path, info.get('spec', {}), self._extract_container_name(path, info)):
+                continue
+            filtered[path] = info
+        return filtered
+    
+    def get_containers_stats(self, count: int = 1) -> Dict:
+        """
+        Obtém apenas os stats recentes e completa com specs do cache.
+        
+        A consulta é escopada às subárvores de collection.roots no próprio
+        cAdvisor; paths excluídos são descartados antes de qualquer parsing.
+        Specs são buscados de novo só quando aparecem paths novos ou o TTL
+        expira. Se o cAdvisor não expõe a API v2.0, recai na API v1.3.
+        
+        Returns:
+            {container_path: {'name', 'spec', 'stats'}}, como get_containers_info
+        """
+        if self._stats_api_available is False:
+            return self._get_legacy_containers(count=count)
+        
+        try:
+            try:
+                stats = self._get_scoped('/api/v2.0/stats',
+                                         {'type': 'name', 'recursive': 'true', 'count': count})
+            except requests.exceptions.HTTPError as e:
+                if e.response is None or e.response.status_code != 404:
+                    raise
+                self.logger.warning("API v2.0 indisponível; usando a API v1.3")
+                self._stats_api_available = False
+                return self._get_legacy_containers(count=count)
+            self._stats_api_available = True
+            
+            allows_path = self.container_filter.allows_path
+            stats = {path: stats_list for path, stats_list in stats.items() if allows_path(path)}
+            
+            if self.spec_cache.needs_refresh(stats.keys()):
+                self.spec_cache.update(self.get_container_specs(), self._extract_container_name,
+                                       self.container_filter if self.container_filter.needs_spec else None)
+                self.logger.debug(f"Cache de specs atualizado: {len(self.spec_cache.specs)} containers")
+            
+            return self.spec_cache.combine(stats)
+            
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"Erro ao obter stats dos containers: {e}")
+            return {}
+        except json.JSONDecodeError as e:
+            self.logger.error(f"Erro ao decodificar JSON da resposta: {e}")
+            return {}
+    
+    def get_container_name(self, container_path: str, container_info: Dict) -> str:
+        """Nome do container a partir do cache de specs, derivando só em caso de miss"""
+        name = self.spec_cache.names.get(container_path)
+        if name is None:
+            name = self._extract_container_name(container_path, container_info)
+        return name
+    
+    def collect_metrics_continuously(self, duration_minutes: int = None, sink=None,
+                                     on_batch: Optional[Callable[[List[Dict]], None]] = None) -> List[Dict]:
+        """
+        Coleta métricas continuamente por um período especificado.
+        
+        Com um sink (ex.: SegmentedMetricsSink) cada coleta é entregue a
+        sink.write() e nada é acumulado em memória; o retorno fica vazio.
+        on_batch, como no AsyncCAdvisorCollector, recebe os registros de cada
+        coleta no lugar do sink e do acúmulo em memória.
+        """
         if duration_minutes is None:
             duration_minutes = self.config['collection']['duration_minutes']
         
@@ -168,13 +424,14 @@ class CAdvisorClient:
             self.debug_api_structure()
         
         collection_count = 0
+        total_records = 0
         while datetime.now() < end_time:
             collection_count += 1
             self.logger.info(f"Coleta #{collection_count} - {datetime.now().strftime('%H:%M:%S')}")
             
             try:
-                # Coleta métricas de todos os containers
-                containers_data = self.get_containers_info(count=1)
+                # Coleta stats de todos os containers (specs vêm do cache)
+                containers_data = self.get_containers_stats(count=1)
                 
                 if not containers_data:
                     self.logger.warning("Nenhum dado de container retornado pela API")
@@ -187,6 +444,7 @@ class CAdvisorClient:
                     time.sleep(interval)
                     continue
                 
+                collection_metrics = []
                 containers_processed = 0
                 containers_with_stats = 0
                 containers_with_errors = 0
@@ -237,7 +495,7 @@ class CAdvisorClient:
                         containers_with_stats += 1
                         
                         # Extrair nome do container
-                        container_name = self._extract_container_name(container_path, container_info)
+                        container_name = self.get_container_name(container_path, container_info)
                         
                         metric_entry = {
                             'collection_timestamp': datetime.now().isoformat(),
@@ -250,7 +508,7 @@ class CAdvisorClient:
                             'filesystem_stats': self._extract_filesystem_stats(latest_stat)
                         }
                         
-                        metrics_data.append(metric_entry)
+                        collection_metrics.append(metric_entry)
                         
                         # Debug para primeiro container válido
                         if containers_with_stats == 1 and collection_count == 1 and self.debug_mode:
@@ -261,6 +519,14 @@ class CAdvisorClient:
                         containers_with_errors += 1
                         continue
                 
+                total_records += len(collection_metrics)
+                if on_batch is not None:
+                    on_batch(collection_metrics)
+                elif sink is not None:
+                    sink.write(collection_metrics)
+                else:
+                    metrics_data.extend(collection_metrics)
+                
                 self.logger.info(f"Processados: {containers_processed} containers, "
                                f"Com stats válidos: {containers_with_stats}, "
                                f"Com erros: {containers_with_errors}")
@@ -272,7 +538,7 @@ class CAdvisorClient:
             if datetime.now() < end_time:
                 time.sleep(interval)
         
-        self.logger.info(f"Coleta finalizada. Total de {len(metrics_data)} registros coletados")
+        self.logger.info(f"Coleta finalizada. Total de {total_records} registros coletados")
         return metrics_data
     
     def _extract_container_name(self, container_path: str, container_info: Dict) -> str:
@@ -376,11 +642,12 @@ class CAdvisorClient:
         """Extrai métricas do sistema de arquivos com validação"""
         try:
             filesystem_stats = stats.get('filesystem', [])
+            totals = {'total_usage': 0, 'total_capacity': 0, 'total_available': 0, 'filesystems_count': 0}
+            
+            # v1.3 e /api/v2.0/stats (DeprecatedContainerStats): lista de FsStats
             if not isinstance(filesystem_stats, list):
                 filesystem_stats = []
             
-            totals = {'total_usage': 0, 'total_capacity': 0, 'total_available': 0, 'filesystems_count': 0}
-            
             for fs in filesystem_stats:
                 if isinstance(fs, dict):
                     totals['total_usage'] += fs.get('usage', 0)
@@ -395,6 +662,32 @@ class CAdvisorClient:
             self.logger.warning(f"Erro ao extrair filesystem stats: {e}")
             return {'total_usage': 0, 'total_capacity': 0, 'total_available': 0, 'filesystems_count': 0, 'usage_percentage': 0}
     
+    def build_metric_entry(self, container_path: str, container_info: Dict,
+                           collection_timestamp: Optional[str] = None,
+                           container_name: Optional[str] = None) -> Optional[Dict]:
+        """Monta o registro de métricas do stat mais recente de um container (None se inválido)"""
+        if not isinstance(container_info, dict):
+            return None
+        
+        stats_list = container_info.get('stats', [])
+        if not isinstance(stats_list, list) or not stats_list:
+            return None
+        
+        latest_stat = stats_list[-1]
+        if not isinstance(latest_stat, dict):
+            return None
+        
+        return {
+            'collection_timestamp': collection_timestamp or datetime.now().isoformat(),
+            'stat_timestamp': latest_stat.get('timestamp'),
+            'container_path': container_path,
+            'container_name': container_name or self.get_container_name(container_path, container_info),
+            'cpu_usage': self._extract_cpu_usage(latest_stat),
+            'memory_usage': self._extract_memory_usage(latest_stat),
+            'network_stats': self._extract_network_stats(latest_stat),
+            'filesystem_stats': self._extract_filesystem_stats(latest_stat)
+        }
+    
     def collect_single_snapshot(self) -> List[Dict]:
         """Coleta um snapshot único de métricas para teste"""
         self.logger.info("Coletando snapshot único de métricas")
@@ -403,7 +696,7 @@ class CAdvisorClient:
         if self.debug_mode:
             self.debug_api_structure()
         
-        containers_data = self.get_containers_info(count=1)
+        containers_data = self.get_containers_stats(count=1)
         if not containers_data:
             self.logger.warning("Nenhum dado disponível")
             return []
@@ -411,28 +704,9 @@ class CAdvisorClient:
         metrics_data = []
         for container_path, container_info in containers_data.items():
             try:
-                if not isinstance(container_info, dict):
-                    continue
-                    
-                stats_list = container_info.get('stats', [])
-                if not isinstance(stats_list, list) or not stats_list:
-                    continue
-                
-                latest_stat = stats_list[-1]
-                if not isinstance(latest_stat, dict):
-                    continue
-                
-                metric_entry = {
-                    'collection_timestamp': datetime.now().isoformat(),
-                    'stat_timestamp': latest_stat.get('timestamp'),
-                    'container_path': container_path,
-                    'container_name': self._extract_container_name(container_path, container_info),
-                    'cpu_usage': self._extract_cpu_usage(latest_stat),
-                    'memory_usage': self._extract_memory_usage(latest_stat),
-                    'network_stats': self._extract_network_stats(latest_stat),
-                    'filesystem_stats': self._extract_filesystem_stats(latest_stat)
-                }
-                metrics_data.append(metric_entry)
+                metric_entry = self.build_metric_entry(container_path, container_info)
+                if metric_entry is not None:
+                    metrics_data.append(metric_entry)
                 
             except Exception as e:
                 self.logger.error(f"Erro ao processar {container_path}: {e}")
@@ -5,30 +5,19 @@ import re
 from collections import defaultdict
 from typing import Dict, List, Set
 
+from prometheus_parser import PrometheusTextParser, stream_metrics
+
 def get_available_metrics(cadvisor_url: str = "http://localhost:8080") -> Dict[str, List[str]]:
     """Obtém todas as métricas disponíveis do cAdvisor"""
     
     try:
-        response = requests.get(f"{cadvisor_url}/metrics", timeout=30)
-        response.raise_for_status()
-        
-        metrics_text = response.text
+        # Só os nomes interessam: labels e valores nem são decodificados
+        metric_names = PrometheusTextParser().metric_names(
+            stream_metrics(requests, f"{cadvisor_url}/metrics", timeout=30))
         metrics_by_category = defaultdict(list)
         unique_metrics = set()
         
-        for line in metrics_text.split('\n'):
-            line = line.strip()
-            
-            # Ignorar comentários e linhas vazias
-            if not line or line.startswith('#'):
-                continue
-            
-            # Extrair nome da métrica
-            if '{' in line:
-                metric_name = line.split('{')[0]
-            else:
-                metric_name = line.split()[0]
-            
+        for metric_name in sorted(metric_names):
             if metric_name and metric_name not in unique_metrics:
                 unique_metrics.add(metric_name)
                 
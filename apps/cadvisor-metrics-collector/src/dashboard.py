@@ -1,73 +1,297 @@
 import dash
-from dash import dcc, html, Input, Output, dash_table
+from dash import dcc, html, Input, Output, State, dash_table, no_update
 import plotly.graph_objects as go
-import plotly.express as px
 import pandas as pd
-from datetime import datetime, timedelta
+import numpy as np
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from downsampling import downsample_indices
+
+# Métricas indexadas, na ordem das colunas dos buffers
+DASHBOARD_METRICS = ['cpu_total_usage', 'memory_usage_mb', 'network_rx_mb',
+                     'network_tx_mb', 'filesystem_usage_gb']
+
+GRAPH_IDS = ['cpu-graph', 'memory-graph', 'network-graph', 'filesystem-graph']
+
+# Métricas de cada gráfico, na ordem dos traces de cada container
+GRAPH_METRICS = [['cpu_total_usage'], ['memory_usage_mb'],
+                 ['network_rx_mb', 'network_tx_mb'], ['filesystem_usage_gb']]
+
+
+class _SeriesBuffer:
+    """Amostras de um container em arrays crescentes, ordenadas por tempo"""
+
+    __slots__ = ('times', 'values', 'size')
+
+    def __init__(self, n_metrics: int, capacity: int = 256):
+        self.times = np.empty(capacity, dtype=np.int64)
+        self.values = np.empty((capacity, n_metrics))
+        self.size = 0
+
+    def append(self, times: np.ndarray, values: np.ndarray):
+        needed = self.size + len(times)
+        if needed > len(self.times):
+            capacity = max(needed, 2 * len(self.times))
+            grown_times = np.empty(capacity, dtype=np.int64)
+            grown_values = np.empty((capacity, self.values.shape[1]))
+            grown_times[:self.size] = self.times[:self.size]
+            grown_values[:self.size] = self.values[:self.size]
+            self.times, self.values = grown_times, grown_values
+        self.times[self.size:needed] = times
+        self.values[self.size:needed] = values
+        self.size = needed
+
+    @property
+    def last_time(self) -> Optional[int]:
+        return int(self.times[self.size - 1]) if self.size else None
+
+
+class ContainerTimeIndex:
+    """
+    Índice temporal por container: arrays ordenados e fatiamento por busca binária.
+
+    Fatiar um intervalo custa O(log n) e devolve views, sem filtrar o
+    DataFrame inteiro. Novas amostras são anexadas em O(1) amortizado;
+    amostras não posteriores à última de um container são ignoradas.
+    """
+
+    def __init__(self, metrics: List[str], df: Optional[pd.DataFrame] = None):
+        self.metrics = list(metrics)
+        self._series: Dict[str, _SeriesBuffer] = {}
+        self.version = 0
+        self.total_points = 0
+        if df is not None:
+            self.append(df)
+
+    @property
+    def containers(self) -> List[str]:
+        return list(self._series)
+
+    def time_bounds(self) -> Tuple[Optional[int], Optional[int]]:
+        """(primeiro, último) timestamp em ns entre todos os containers"""
+        starts = [s.times[0] for s in self._series.values() if s.size]
+        ends = [s.times[s.size - 1] for s in self._series.values() if s.size]
+        return (int(min(starts)), int(max(ends))) if starts else (None, None)
+
+    def append(self, df: pd.DataFrame) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Anexa um lote de amostras.
+
+        Returns:
+            {container: (tempos em ns, valores)} apenas com as amostras aceitas
+        """
+        if df.empty:
+            return {}
+
+        times = df['timestamp'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        codes, uniques = pd.factorize(df['container_name'].astype(str), sort=False)
+        values = np.column_stack([
+            df[m].to_numpy(dtype=float) if m in df.columns else np.full(len(df), np.nan)
+            for m in self.metrics
+        ])
+
+        # Agrupa por container mantendo a ordem temporal dentro de cada grupo
+        order = np.lexsort((times, codes))
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+
+        appended = {}
+        for code, name in enumerate(uniques):
+            rows = order[bounds[code]:bounds[code + 1]]
+            series = self._series.get(name)
+            if series is None:
+                series = self._series[name] = _SeriesBuffer(len(self.metrics))
+            chunk_times, chunk_values = times[rows], values[rows]
+
+            # Descarta duplicatas e amostras anteriores à última indexada
+            keep = np.ones(len(rows), dtype=bool)
+            keep[1:] = chunk_times[1:] > chunk_times[:-1]
+            if series.last_time is not None:
+                keep &= chunk_times > series.last_time
+            if not keep.all():
+                chunk_times, chunk_values = chunk_times[keep], chunk_values[keep]
+            if len(chunk_times):
+                series.append(chunk_times, chunk_values)
+                appended[name] = (chunk_times, chunk_values)
+                self.total_points += len(chunk_times)
+
+        if appended:
+            self.version += 1
+        return appended
+
+    def slice(self, container: str, start_ns: Optional[int] = None,
+              end_ns: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Amostras de container em [start_ns, end_ns] (views dos buffers)"""
+        series = self._series.get(container)
+        if series is None:
+            return np.empty(0, dtype=np.int64), np.empty((0, len(self.metrics)))
+        times = series.times[:series.size]
+        lo = 0 if start_ns is None else int(np.searchsorted(times, start_ns, side='left'))
+        hi = series.size if end_ns is None else int(np.searchsorted(times, end_ns, side='right'))
+        return times[lo:hi], series.values[lo:hi]
+
+
+class FigureCache:
+    """Cache LRU das figuras renderizadas, chaveado pela seleção"""
+
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+class SegmentTailer:
+    """
+    Fonte para o modo ao vivo: lê as amostras novas gravadas pelo coletor.
+
+    Segmentos jsonl abertos (.partial) são acompanhados por offset, membro
+    gzip a membro gzip, então cada flush do sink aparece no próximo refresh.
+    Segmentos Parquet só ficam legíveis ao serem fechados (footer), ou seja,
+    a cada sink.max_segment_minutes.
+    """
+
+    def __init__(self, segment_dir: str):
+        self.segment_dir = segment_dir
+        self._seen = set()
+        # Bytes já lidos de segmentos jsonl, pelo path final (sem .partial)
+        self._offsets: Dict[str, int] = {}
+
+    def __call__(self) -> pd.DataFrame:
+        import pyarrow as pa
+        from metrics_sink import (PARTIAL_SUFFIX, RAW_METRICS_SCHEMA, list_open_segments,
+                                  list_segments, read_gzip_members, read_segment_table)
+        from metrics_processor import flatten_metrics_table
+
+        tables = []
+        for path in list_segments(self.segment_dir):
+            if path in self._seen:
+                continue
+            self._seen.add(path)
+            if path in self._offsets:
+                # Fechado depois de acompanhado aberto: só o restante
+                records, _ = read_gzip_members(path, self._offsets.pop(path))
+                tables.append(pa.Table.from_pylist(records, schema=RAW_METRICS_SCHEMA))
+            else:
+                tables.append(read_segment_table(path))
+
+        for partial in list_open_segments(self.segment_dir):
+            path = partial[:-len(PARTIAL_SUFFIX)]
+            try:
+                records, self._offsets[path] = read_gzip_members(partial, self._offsets.get(path, 0))
+            except FileNotFoundError:
+                continue  # fechado entre a listagem e a leitura; entra no próximo refresh
+            if records:
+                tables.append(pa.Table.from_pylist(records, schema=RAW_METRICS_SCHEMA))
+
+        frames = [flatten_metrics_table(table) for table in tables if table.num_rows]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
 
 class MetricsDashboard:
     """Dashboard interativo para visualização de métricas"""
-    
-    def __init__(self, df: pd.DataFrame):
-        self.df = df
+
+    def __init__(self, df: Optional[pd.DataFrame] = None,
+                 live_source: Optional[Callable[[], pd.DataFrame]] = None,
+                 refresh_seconds: float = 5, viewport_points: int = 1500,
+                 cache_size: int = 32):
+        """
+        Args:
+            df: métricas já coletadas (pode ser None no modo ao vivo)
+            live_source: função chamada a cada refresh que devolve as amostras
+                novas (ex.: SegmentTailer); None desativa o modo ao vivo
+            refresh_seconds: intervalo do modo ao vivo
+            viewport_points: pontos por trace após a redução (≈ 2x a largura
+                do gráfico em pixels: mínimo e máximo por pixel)
+            cache_size: figuras mantidas no cache LRU
+        """
+        self.logger = logging.getLogger(__name__)
+        self.index = ContainerTimeIndex(DASHBOARD_METRICS, df)
+        self.live_source = live_source
+        self.refresh_seconds = refresh_seconds
+        self.viewport_points = viewport_points
+        self.cache = FigureCache(cache_size)
+        # A fonte é lida uma vez para todos os clientes; cada aba guarda o
+        # próprio cursor (dcc.Store) do que já recebeu
+        self._source_lock = threading.Lock()
         self.app = dash.Dash(__name__)
         self.setup_layout()
         self.setup_callbacks()
-    
+
     def setup_layout(self):
         """Configura o layout do dashboard"""
+        containers = self.index.containers
+        first, last = self.index.time_bounds()
         self.app.layout = html.Div([
             html.H1("cAdvisor Metrics Dashboard", style={'textAlign': 'center'}),
-            
+
             # Controles
             html.Div([
                 html.Div([
                     html.Label("Selecionar Container:"),
                     dcc.Dropdown(
                         id='container-dropdown',
-                        options=[{'label': container, 'value': container} 
-                                for container in self.df['container_name'].unique()],
-                        value=self.df['container_name'].unique()[0],
+                        options=[{'label': container, 'value': container}
+                                for container in containers],
+                        value=containers[:1],
                         multi=True
                     )
                 ], style={'width': '48%', 'display': 'inline-block'}),
-                
+
                 html.Div([
                     html.Label("Período:"),
                     dcc.DatePickerRange(
                         id='date-picker-range',
-                        start_date=self.df['timestamp'].min(),
-                        end_date=self.df['timestamp'].max(),
+                        start_date=pd.Timestamp(first).date() if first is not None else None,
+                        # Ao vivo o período fica aberto para acompanhar a coleta
+                        end_date=(pd.Timestamp(last).date()
+                                  if last is not None and self.live_source is None else None),
                         display_format='DD/MM/YYYY'
                     )
                 ], style={'width': '48%', 'float': 'right', 'display': 'inline-block'})
             ], style={'margin': '20px'}),
-            
+
             # Métricas principais
             html.Div([
                 html.Div([
                     html.H3("CPU Usage"),
                     dcc.Graph(id='cpu-graph')
                 ], style={'width': '50%', 'display': 'inline-block'}),
-                
+
                 html.Div([
                     html.H3("Memory Usage"),
                     dcc.Graph(id='memory-graph')
                 ], style={'width': '50%', 'display': 'inline-block'})
             ]),
-            
+
             html.Div([
                 html.Div([
                     html.H3("Network Traffic"),
                     dcc.Graph(id='network-graph')
                 ], style={'width': '50%', 'display': 'inline-block'}),
-                
+
                 html.Div([
                     html.H3("Filesystem Usage"),
                     dcc.Graph(id='filesystem-graph')
                 ], style={'width': '50%', 'display': 'inline-block'})
             ]),
-            
+
             # Tabela de estatísticas
             html.Div([
                 html.H3("Container Statistics"),
@@ -88,72 +312,219 @@ class MetricsDashboard:
                         }
                     ]
                 )
-            ], style={'margin': '20px'})
+            ], style={'margin': '20px'}),
+
+            dcc.Interval(id='live-interval', interval=int(self.refresh_seconds * 1000),
+                         disabled=self.live_source is None),
+            dcc.Store(id='live-cursor')
         ])
-    
+
+    @staticmethod
+    def _selection(selected_containers) -> List[str]:
+        if not selected_containers:
+            return []
+        return selected_containers if isinstance(selected_containers, list) else [selected_containers]
+
+    @staticmethod
+    def _date_range(start_date, end_date) -> Tuple[Optional[int], Optional[int]]:
+        """Datas do DatePickerRange em ns; a data final inclui o dia inteiro"""
+        start_ns = pd.Timestamp(start_date).value if start_date else None
+        end_ns = ((pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)).value - 1
+                  if end_date else None)
+        return start_ns, end_ns
+
+    @staticmethod
+    def _zoom_range(relayout_data) -> Optional[Tuple[int, int]]:
+        """Intervalo visível após zoom num gráfico (None = autorange)"""
+        if not relayout_data or relayout_data.get('xaxis.autorange'):
+            return None
+        if 'xaxis.range[0]' in relayout_data:
+            return (pd.Timestamp(relayout_data['xaxis.range[0]']).value,
+                    pd.Timestamp(relayout_data['xaxis.range[1]']).value)
+        return None
+
+    def _reduce(self, times: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Reduz uma série à resolução do viewport (mín/máx por pixel)"""
+        return downsample_indices(times, values, self.viewport_points, method='minmax')
+
+    def render(self, containers: List[str], start_ns: Optional[int],
+               end_ns: Optional[int]) -> Tuple:
+        """
+        Monta as quatro figuras e a tabela para a seleção, usando o cache.
+
+        Cada container selecionado gera sempre os mesmos traces (mesmo vazio),
+        na ordem da seleção, para que o modo ao vivo possa estendê-los por índice.
+
+        Returns:
+            (4 figuras, estatísticas, cursor) — o cursor guarda a seleção e o
+            último timestamp desenhado de cada container, para o modo ao vivo
+        """
+        key = (tuple(containers), start_ns, end_ns, self.index.version)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        col = {metric: j for j, metric in enumerate(DASHBOARD_METRICS)}
+        cpu_fig, memory_fig, network_fig, fs_fig = (go.Figure() for _ in range(4))
+        stats = []
+        since = {}
+        for container in containers:
+            times, values = self.index.slice(container, start_ns, end_ns)
+            x = times.astype('datetime64[ns]')
+            # Em texto: ns passam de 2^53 e perderiam precisão no JSON do navegador
+            since[container] = str(times[-1]) if len(times) else (
+                str(start_ns - 1) if start_ns is not None else None)
+
+            def series(metric, **kwargs):
+                y = values[:, col[metric]]
+                index = self._reduce(times, y)
+                return go.Scattergl(x=x[index], y=y[index], mode='lines', **kwargs)
+
+            cpu_fig.add_trace(series('cpu_total_usage', name=container))
+            memory_fig.add_trace(series('memory_usage_mb', name=container))
+            network_fig.add_trace(series('network_rx_mb', name=f'{container} RX',
+                                         line=dict(dash='solid')))
+            network_fig.add_trace(series('network_tx_mb', name=f'{container} TX',
+                                         line=dict(dash='dash')))
+            fs_fig.add_trace(series('filesystem_usage_gb', name=container))
+
+            if len(times):
+                with np.errstate(invalid='ignore'):
+                    stats.append({
+                        'container_name': container,
+                        'avg_cpu': float(np.nanmean(values[:, col['cpu_total_usage']])),
+                        'avg_memory': float(np.nanmean(values[:, col['memory_usage_mb']])),
+                        'total_rx': float(np.nansum(values[:, col['network_rx_mb']])),
+                        'total_tx': float(np.nansum(values[:, col['network_tx_mb']]))
+                    })
+
+        cpu_fig.update_layout(title='CPU Usage Over Time')
+        memory_fig.update_layout(title='Memory Usage Over Time')
+        network_fig.update_layout(title='Network Traffic Over Time')
+        fs_fig.update_layout(title='Filesystem Usage Over Time')
+        for fig in (cpu_fig, memory_fig, network_fig, fs_fig):
+            # Mantém zoom e legenda entre renderizações da mesma seleção
+            fig.update_layout(uirevision=str(tuple(containers)))
+
+        cursor = {'containers': list(containers), 'since': since, 'points': 0,
+                  'known': len(self.index.containers)}
+        result = (cpu_fig, memory_fig, network_fig, fs_fig, stats, cursor)
+        self.cache.put(key, result)
+        return result
+
     def setup_callbacks(self):
         """Configura callbacks do dashboard"""
-        
+
         @self.app.callback(
             [Output('cpu-graph', 'figure'),
              Output('memory-graph', 'figure'),
              Output('network-graph', 'figure'),
              Output('filesystem-graph', 'figure'),
-             Output('stats-table', 'data')],
+             Output('stats-table', 'data'),
+             Output('live-cursor', 'data')],
             [Input('container-dropdown', 'value'),
              Input('date-picker-range', 'start_date'),
-             Input('date-picker-range', 'end_date')]
+             Input('date-picker-range', 'end_date')] +
+            [Input(graph_id, 'relayoutData') for graph_id in GRAPH_IDS]
         )
-        def update_dashboard(selected_containers, start_date, end_date):
-            # Filtrar dados
-            filtered_df = self.df[
-                (self.df['container_name'].isin(selected_containers if isinstance(selected_containers, list) else [selected_containers])) &
-                (self.df['timestamp'] >= start_date) &
-                (self.df['timestamp'] <= end_date)
-            ]
-            
-            # Gráfico de CPU
-            cpu_fig = px.line(filtered_df, x='timestamp', y='cpu_total_usage', 
-                             color='container_name', title='CPU Usage Over Time')
-            
-            # Gráfico de Memória
-            memory_fig = px.line(filtered_df, x='timestamp', y='memory_usage_mb', 
-                               color='container_name', title='Memory Usage Over Time')
-            
-            # Gráfico de Rede
-            network_fig = go.Figure()
-            for container in filtered_df['container_name'].unique():
-                container_data = filtered_df[filtered_df['container_name'] == container]
-                network_fig.add_trace(go.Scatter(
-                    x=container_data['timestamp'], 
-                    y=container_data['network_rx_mb'],
-                    name=f'{container} RX',
-                    line=dict(dash='solid')
-                ))
-                network_fig.add_trace(go.Scatter(
-                    x=container_data['timestamp'], 
-                    y=container_data['network_tx_mb'],
-                    name=f'{container} TX',
-                    line=dict(dash='dash')
-                ))
-            network_fig.update_layout(title='Network Traffic Over Time')
-            
-            # Gráfico de Sistema de Arquivos
-            fs_fig = px.line(filtered_df, x='timestamp', y='filesystem_usage_gb', 
-                           color='container_name', title='Filesystem Usage Over Time')
-            
-            # Tabela de estatísticas
-            stats_data = filtered_df.groupby('container_name').agg({
-                'cpu_total_usage': 'mean',
-                'memory_usage_mb': 'mean',
-                'network_rx_mb': 'sum',
-                'network_tx_mb': 'sum'
-            }).reset_index()
-            
-            stats_data.columns = ['container_name', 'avg_cpu', 'avg_memory', 'total_rx', 'total_tx']
-            
-            return cpu_fig, memory_fig, network_fig, fs_fig, stats_data.to_dict('records')
-    
+        def update_dashboard(selected_containers, start_date, end_date, *relayouts):
+            start_ns, end_ns = self._date_range(start_date, end_date)
+
+            # Zoom em qualquer gráfico re-fatia o intervalo visível em resolução total
+            triggered = dash.callback_context.triggered_id
+            if triggered in GRAPH_IDS:
+                zoom = self._zoom_range(relayouts[GRAPH_IDS.index(triggered)])
+                if zoom is not None:
+                    start_ns = max(zoom[0], start_ns) if start_ns is not None else zoom[0]
+                    end_ns = min(zoom[1], end_ns) if end_ns is not None else zoom[1]
+
+            return self.render(self._selection(selected_containers), start_ns, end_ns)
+
+        @self.app.callback(
+            [Output(graph_id, 'extendData') for graph_id in GRAPH_IDS] +
+            [Output('container-dropdown', 'options'),
+             Output('date-picker-range', 'end_date'),
+             Output('live-cursor', 'data', allow_duplicate=True)],
+            Input('live-interval', 'n_intervals'),
+            [State('date-picker-range', 'end_date'),
+             State('live-cursor', 'data')],
+            prevent_initial_call=True
+        )
+        def update_live(n_intervals, end_date, cursor):
+            return self.live_update(end_date, cursor)
+
+    def poll(self) -> int:
+        """
+        Lê a fonte ao vivo e indexa as amostras novas (uma vez para todos os clientes)
+
+        Returns:
+            Número de amostras aceitas no índice
+        """
+        if self.live_source is None:
+            return 0
+        with self._source_lock:
+            appended = self.index.append(self.live_source())
+        return sum(len(times) for times, _ in appended.values())
+
+    def live_update(self, end_date, cursor: Optional[Dict]) -> List:
+        """
+        Devolve os extendData com as amostras que este cliente ainda não recebeu.
+
+        O cursor (dcc.Store da aba) diz quais containers estão desenhados, em
+        que ordem, e até que timestamp; os pontos vêm do índice compartilhado
+        a partir dele, então abas com refreshes intercalados recebem todos os
+        pontos. Quando os traces acumulam mais que viewport_points pontos
+        crus, o período é reaberto (end_date) para forçar uma renderização
+        completa já reduzida.
+        """
+        no_change = [no_update] * (len(GRAPH_IDS) + 3)
+        self.poll()
+        if not cursor:
+            return no_change
+
+        containers = self.index.containers
+        options = no_update
+        if len(containers) != cursor['known']:
+            options = [{'label': c, 'value': c} for c in containers]
+            cursor = {**cursor, 'known': len(containers)}
+
+        _, end_ns = self._date_range(None, end_date)
+        last = self.index.time_bounds()[1]
+        if end_ns is not None and last is not None and end_ns < last:
+            # Usuário olhando um período histórico: não mexe nos gráficos
+            return [no_update] * len(GRAPH_IDS) + [options, no_update, cursor]
+
+        pending = {}
+        since = dict(cursor['since'])
+        for container in cursor['containers']:
+            start = since.get(container)
+            times, values = self.index.slice(container, None if start is None else int(start) + 1)
+            if len(times):
+                pending[container] = (times, values)
+                since[container] = str(times[-1])
+        if not pending:
+            return [no_update] * len(GRAPH_IDS) + [options, no_update, cursor]
+
+        col = {metric: j for j, metric in enumerate(DASHBOARD_METRICS)}
+        extends = []
+        for metrics in GRAPH_METRICS:
+            xs, ys, traces = [], [], []
+            for i, container in enumerate(cursor['containers']):
+                if container not in pending:
+                    continue
+                times, values = pending[container]
+                for k, metric in enumerate(metrics):
+                    xs.append(times.astype('datetime64[ns]').astype('datetime64[ms]').astype(str).tolist())
+                    ys.append(values[:, col[metric]].tolist())
+                    traces.append(i * len(metrics) + k)
+            extends.append((dict(x=xs, y=ys), traces) if traces else no_update)
+
+        points = cursor['points'] + max(len(times) for times, _ in pending.values())
+        if points > self.viewport_points:
+            # Re-renderização completa (reduzida) em vez de crescer sem limite
+            return [no_update] * len(GRAPH_IDS) + [options, None, no_update]
+        return extends + [options, no_update, {**cursor, 'since': since, 'points': points}]
+
     def run(self, host='0.0.0.0', port=8050, debug=False):
         """Executa o dashboard"""
-        self.app.run_server(host=host, port=port, debug=debug)
\ No newline at end of file
+        self.app.run_server(host=host, port=port, debug=debug)
@@ -1,25 +1,123 @@
 import pandas as pd
+import numpy as np
 import json
 import os
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Optional
 import matplotlib.pyplot as plt
 import seaborn as sns
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 
+from downsampling import downsample_indices
+
+# Carrega o payload compartilhado e preenche os traces marcados com meta.series
+PAYLOAD_LOADER = """
+(function() {
+    var gd = document.getElementById('{plot_id}');
+    var script = document.createElement('script');
+    script.src = '%s';
+    script.onload = function() {
+        var data = window.CADVISOR_REPORT_DATA || {};
+        var indices = [], xs = [], ys = [];
+        gd.data.forEach(function(trace, i) {
+            var series = trace.meta && data[trace.meta.series];
+            if (series) { indices.push(i); xs.push(series.x); ys.push(series.y); }
+        });
+        Plotly.restyle(gd, {x: xs, y: ys}, indices);
+    };
+    document.head.appendChild(script);
+})();
+"""
+
 class DataExporter:
     """Exporta dados e gera visualizações"""
     
-    def __init__(self, output_dir: str = "data/exports"):
+    def __init__(self, output_dir: str = "data/exports", max_points_per_trace: int = 2000,
+                 downsample_method: str = 'lttb', webgl_threshold: int = 1000,
+                 shared_payload: bool = True):
+        """
+        Args:
+            output_dir: diretório dos arquivos exportados
+            max_points_per_trace: orçamento de pontos por série temporal
+            downsample_method: 'lttb' ou 'minmax' (ver downsampling.py)
+            webgl_threshold: séries com pelo menos esse número de pontos usam Scattergl
+            shared_payload: grava os dados dos gráficos uma única vez em
+                report_data_<id>.js e o plotly.js uma vez no diretório; os HTML
+                só referenciam esses arquivos. False gera HTML autocontidos
+        """
         self.output_dir = output_dir
+        self.max_points_per_trace = max_points_per_trace
+        self.downsample_method = downsample_method
+        self.webgl_threshold = webgl_threshold
+        self.shared_payload = shared_payload
+        self.report_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self._payload: Dict[str, Dict] = {}
         os.makedirs(output_dir, exist_ok=True)
         
         # Configurar estilo dos gráficos
         plt.style.use('seaborn-v0_8')
         sns.set_palette("husl")
     
+    @classmethod
+    def from_config(cls, config: Dict, output_dir: Optional[str] = None) -> 'DataExporter':
+        """Cria o exportador a partir da seção 'export' do config.yaml"""
+        export_config = config.get('export', {}) or {}
+        return cls(output_dir=output_dir or export_config.get('directory', 'data/exports'),
+                   max_points_per_trace=export_config.get('max_points_per_trace', 2000),
+                   downsample_method=export_config.get('downsample_method', 'lttb'),
+                   webgl_threshold=export_config.get('webgl_threshold', 1000),
+                   shared_payload=export_config.get('shared_payload', True))
+    
+    @property
+    def payload_file(self) -> str:
+        return f"report_data_{self.report_id}.js"
+    
+    def _trace(self, trace_cls, key: str, x, y, **kwargs):
+        """
+        Cria um trace cujos dados vão para o payload compartilhado (ou inline).
+        
+        Args:
+            trace_cls: classe plotly (go.Bar, go.Scatter...)
+            key: identificador único da série no relatório
+        """
+        if not self.shared_payload:
+            return trace_cls(x=x, y=y, **kwargs)
+        
+        x = np.asarray(x)
+        if np.issubdtype(x.dtype, np.datetime64):
+            # epoch em ms: bem menor que strings ISO e lido como data pelo eixo 'date'
+            x = x.astype('datetime64[ms]').astype(np.int64)
+        # 6 dígitos significativos bastam para o gráfico e encurtam o JSON
+        y = [float(f'{v:.6g}') if np.isfinite(v) else None for v in np.asarray(y, dtype=float)]
+        self._payload[key] = {'x': x.tolist(), 'y': y}
+        return trace_cls(x=[], y=[], meta={'series': key}, **kwargs)
+    
+    def _series_trace(self, key: str, x: pd.Series, y: pd.Series, **kwargs):
+        """Série temporal reduzida ao orçamento de pontos; Scattergl se ainda densa"""
+        index = downsample_indices(x.to_numpy(), y.to_numpy(dtype=float),
+                                   self.max_points_per_trace, self.downsample_method)
+        trace_cls = go.Scattergl if len(index) >= self.webgl_threshold else go.Scatter
+        return self._trace(trace_cls, key, x.to_numpy()[index], y.to_numpy(dtype=float)[index],
+                           mode='lines', **kwargs)
+    
+    def _write_figure(self, fig: go.Figure, prefix: str) -> str:
+        """Grava o HTML; com payload compartilhado, dados e plotly.js ficam em arquivos à parte"""
+        filepath = os.path.join(self.output_dir, f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html")
+        if not self.shared_payload:
+            fig.write_html(filepath)
+            return filepath
+        
+        # Reescrito a cada gráfico: contém as séries de todos os gráficos do relatório
+        with open(os.path.join(self.output_dir, self.payload_file), 'w') as f:
+            f.write("window.CADVISOR_REPORT_DATA = ")
+            json.dump(self._payload, f, separators=(',', ':'))
+            f.write(";\n")
+        fig.write_html(filepath, include_plotlyjs='directory',
+                       post_script=PAYLOAD_LOADER % self.payload_file)
+        return filepath
+    
     def export_to_csv(self, df: pd.DataFrame, filename: str = None) -> str:
         """Exporta DataFrame para CSV"""
         if filename is None:
@@ -53,7 +151,7 @@ class DataExporter:
         )
         
         # Agrupar por container e calcular médias
-        container_summary = df.groupby('container_name').agg({
+        container_summary = df.groupby('container_name', observed=True).agg({
             'cpu_total_usage': 'mean',
             'memory_usage_mb': 'mean',
             'network_rx_mb': 'sum',
@@ -63,52 +161,61 @@ class DataExporter:
         
         # Gráfico de CPU
         fig.add_trace(
-            go.Bar(x=container_summary['container_name'], 
-                   y=container_summary['cpu_total_usage'],
-                   name='CPU Usage'),
+            self._trace(go.Bar, 'summary:cpu_total_usage',
+                        container_summary['container_name'],
+                        container_summary['cpu_total_usage'],
+                        name='CPU Usage'),
             row=1, col=1
         )
         
         # Gráfico de Memória
         fig.add_trace(
-            go.Bar(x=container_summary['container_name'], 
-                   y=container_summary['memory_usage_mb'],
-                   name='Memory (MB)'),
+            self._trace(go.Bar, 'summary:memory_usage_mb',
+                        container_summary['container_name'],
+                        container_summary['memory_usage_mb'],
+                        name='Memory (MB)'),
             row=1, col=2
         )
         
         # Gráfico de Rede
         fig.add_trace(
-            go.Bar(x=container_summary['container_name'], 
-                   y=container_summary['network_rx_mb'],
-                   name='RX (MB)'),
+            self._trace(go.Bar, 'summary:network_rx_mb',
+                        container_summary['container_name'],
+                        container_summary['network_rx_mb'],
+                        name='RX (MB)'),
             row=2, col=1
         )
         fig.add_trace(
-            go.Bar(x=container_summary['container_name'], 
-                   y=container_summary['network_tx_mb'],
-                   name='TX (MB)'),
+            self._trace(go.Bar, 'summary:network_tx_mb',
+                        container_summary['container_name'],
+                        container_summary['network_tx_mb'],
+                        name='TX (MB)'),
             row=2, col=1
         )
         
         # Gráfico de Disco
         fig.add_trace(
-            go.Bar(x=container_summary['container_name'], 
-                   y=container_summary['filesystem_usage_gb'],
-                   name='Disk Usage (GB)'),
+            self._trace(go.Bar, 'summary:filesystem_usage_gb',
+                        container_summary['container_name'],
+                        container_summary['filesystem_usage_gb'],
+                        name='Disk Usage (GB)'),
             row=2, col=2
         )
         
         fig.update_layout(height=800, title_text="Resumo de Uso de Recursos por Container")
         
         # Salvar gráfico
-        filepath = os.path.join(self.output_dir, f"resource_usage_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html")
-        fig.write_html(filepath)
+        filepath = self._write_figure(fig, "resource_usage")
         print(f"Gráfico de recursos salvo em: {filepath}")
         return filepath
     
     def create_timeline_charts(self, df: pd.DataFrame) -> str:
-        """Cria gráficos de linha temporal"""
+        """
+        Cria gráficos de linha temporal.
+        
+        Cada série é reduzida a max_points_per_trace pontos preservando picos,
+        então o tamanho do HTML não cresce com a duração da coleta.
+        """
         fig = make_subplots(
             rows=3, cols=1,
             subplot_titles=('CPU ao Longo do Tempo', 'Memória ao Longo do Tempo', 'Rede ao Longo do Tempo'),
@@ -116,7 +223,7 @@ class DataExporter:
         )
         
         # Selecionar containers principais (top 5 por uso de CPU)
-        top_containers = (df.groupby('container_name')['cpu_total_usage']
+        top_containers = (df.groupby('container_name', observed=True)['cpu_total_usage']
                          .mean().sort_values(ascending=False).head(5).index)
         
         colors = px.colors.qualitative.Set1
@@ -127,37 +234,40 @@ class DataExporter:
             
             # CPU
             fig.add_trace(
-                go.Scatter(x=container_data['timestamp'], 
-                          y=container_data['cpu_total_usage'],
-                          name=f'{container} - CPU',
-                          line=dict(color=color)),
+                self._series_trace(f'{container}:cpu_total_usage',
+                                  container_data['timestamp'],
+                                  container_data['cpu_total_usage'],
+                                  name=f'{container} - CPU',
+                                  line=dict(color=color)),
                 row=1, col=1
             )
             
             # Memória
             fig.add_trace(
-                go.Scatter(x=container_data['timestamp'], 
-                          y=container_data['memory_usage_mb'],
-                          name=f'{container} - Memory',
-                          line=dict(color=color),
-                          showlegend=False),
+                self._series_trace(f'{container}:memory_usage_mb',
+                                  container_data['timestamp'],
+                                  container_data['memory_usage_mb'],
+                                  name=f'{container} - Memory',
+                                  line=dict(color=color),
+                                  showlegend=False),
                 row=2, col=1
             )
             
             # Rede (RX)
             fig.add_trace(
-                go.Scatter(x=container_data['timestamp'], 
-                          y=container_data['network_rx_mb'],
-                          name=f'{container} - Network RX',
-                          line=dict(color=color),
-                          showlegend=False),
+                self._series_trace(f'{container}:network_rx_mb',
+                                  container_data['timestamp'],
+                                  container_data['network_rx_mb'],
+                                  name=f'{container} - Network RX',
+                                  line=dict(color=color),
+                                  showlegend=False),
                 row=3, col=1
             )
         
+        fig.update_xaxes(type='date')
         fig.update_layout(height=900, title_text="Métricas ao Longo do Tempo (Top 5 Containers)")
         
         # Salvar gráfico
-        filepath = os.path.join(self.output_dir, f"timeline_metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html")
-        fig.write_html(filepath)
+        filepath = self._write_figure(fig, "timeline_metrics")
         print(f"Gráfico temporal salvo em: {filepath}")
         return filepath
\ No newline at end of file
@@ -3,15 +3,19 @@
 import requests
 import json
 import re
-from typing import Dict, List, Optiona
+from typing import Dict, List, Optional
 from datetime import datetime
 
+from prometheus_parser import PrometheusTextParser, stream_metrics
+from pod_index import PodContainerIndex
+
 class cAdvisorPodDiscovery:
     """Descoberta e análise de pods no cAdvisor"""
     
-    def __init__(self, cadvisor_url: str = "http://localhost:8080"):
+    def __init__(self, cadvisor_url: str = "http://localhost:8080", index_ttl: float = 60):
         self.cadvisor_url = cadvisor_url.rstrip('/')
         self.session = requests.Session()
+        self.pod_index = PodContainerIndex(self.session, self.cadvisor_url, index_ttl)
     
     def list_all_containers(self) -> Dict:
         """Lista todos os containers conhecidos pelo cAdvisor"""
@@ -25,32 +29,22 @@ class cAdvisorPodDiscovery:
     
     def find_pod_containers(self, pod_name: str) -> List[Dict]:
         """Encontra todos os containers de um pod específico"""
-        containers = self.list_all_containers()
         pod_containers = []
         
-        for container_path, container_data in containers.items():
-            spec = container_data.get('spec', {})
-            labels = spec.get('labels', {})
-            
-            # Verificar se pertence ao pod
-            if self._is_pod_container(labels, pod_name):
-                pod_containers.append({
-                    'path': container_path,
-                    'data': container_data,
-                    'labels': labels
-                })
+        try:
+            # Uma requisição da subárvore por pod, não uma por container
+            for key in self.pod_index.find(pod_name):
+                for container_data in self.pod_index.pod_stats(key):
+                    pod_containers.append({
+                        'path': container_data['name'],
+                        'data': container_data,
+                        'labels': container_data.get('spec', {}).get('labels', {})
+                    })
+        except Exception as e:
+            print(f"Erro ao buscar containers do pod: {e}")
         
         return pod_containers
     
-    def _is_pod_container(self, labels: Dict, pod_name: str) -> bool:
-        """Verifica se o container pertence ao pod"""
-        pod_labels = [
-            labels.get('io.kubernetes.pod.name'),
-            labels.get('pod_name'),
-            labels.get('pod')
-        ]
-        return pod_name in pod_labels
-    
     def analyze_pod_structure(self, pod_name: str) -> None:
         """Analisa a estrutura completa de um pod"""
         print(f"🔍 Analisando estrutura do pod: {pod_name}")
@@ -100,18 +94,11 @@ class cAdvisorPodDiscovery:
     
     def list_available_pods(self) -> List[str]:
         """Lista todos os pods disponíveis"""
-        containers = self.list_all_containers()
-        pods = set()
-        
-        for container_path, container_data in containers.items():
-            spec = container_data.get('spec', {})
-            labels = spec.get('labels', {})
-            
-            pod_name = labels.get('io.kubernetes.pod.name')
-            if pod_name:
-                pods.add(pod_name)
-        
-        pods_list = sorted(list(pods))
+        try:
+            pods_list = sorted({pod for _, pod in self.pod_index.select(lambda pod: True)})
+        except Exception as e:
+            print(f"Erro ao listar pods: {e}")
+            return []
         
         for pod in pods_list:
             print(f"  - {pod}")
@@ -120,28 +107,17 @@ class cAdvisorPodDiscovery:
     
     def get_pod_metrics_paths(self, pod_name: str) -> List[str]:
         """Retorna os paths dos containers do pod para consultas diretas"""
-        pod_containers = self.find_pod_containers(pod_name)
-        return [container['path'] for container in pod_containers]
+        return [path for key in self.pod_index.find(pod_name) for path in self.pod_index.paths(key)]
     
     def check_prometheus_metrics(self, pod_name: str) -> None:
         """Verifica métricas Prometheus disponíveis para o pod"""
         try:
-            response = self.session.get(f"{self.cadvisor_url}/metrics")
-            response.raise_for_status()
-            
-            metrics_text = response.text
+            parser = PrometheusTextParser(match_labels=('pod', 'pod_name'), match_values={pod_name})
             pod_metrics = []
             
-            for line in metrics_text.split('\n'):
-                if f'pod="{pod_name}"' in line or f'pod_name="{pod_name}"' in line:
-                    # Extrair nome da métrica
-                    if '{' in line:
-                        metric_name = line.split('{')[0]
-                    else:
-                        metric_name = line.split()[0]
-                    
-                    if metric_name and metric_name not in pod_metrics:
-                        pod_metrics.append(metric_name)
+            for sample in parser.parse(stream_metrics(self.session, f"{self.cadvisor_url}/metrics")):
+                if sample.name not in pod_metrics:
+                    pod_metrics.append(sample.name)
             
             print(f"\n📊 Métricas Prometheus para pod '{pod_name}':")
             print(f"Total: {len(pod_metrics)} métricas")
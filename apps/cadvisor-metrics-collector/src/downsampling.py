@@ -0,0 +1,108 @@
+from typing import Tuple
+
+import numpy as np
+
+METHODS = ('lttb', 'minmax')
+
+
+def _as_float(x: np.ndarray) -> np.ndarray:
+    """Eixo x como float (datetime64 vira ns desde a época)"""
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(float)
+    return x.astype(float)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: escolhe em cada bucket o ponto que forma o
+    maior triângulo com o ponto escolhido no bucket anterior e a média do
+    próximo. Preserva picos e a forma visual da série.
+
+    Args:
+        x, y: série ordenada por x, sem NaN
+        n_out: pontos desejados (incluindo primeiro e último)
+
+    Returns:
+        Índices crescentes dos pontos mantidos
+    """
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])
+
+    x = _as_float(x)
+    y = np.asarray(y, dtype=float)
+
+    # Fronteiras dos n_out - 2 buckets internos (primeiro e último ponto fixos)
+    edges = np.floor(np.linspace(1, n - 1, n_out - 1)).astype(np.int64)
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    sizes = np.diff(edges)
+    avg_x = np.append(sums_x / sizes, x[-1])
+    avg_y = np.append(sums_y / sizes, y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Área (x2) do triângulo (a, candidato, média do próximo bucket)
+        area = np.abs((x[a] - avg_x[i + 1]) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (avg_y[i + 1] - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Mínimo e máximo de cada bucket (n_out // 2 buckets), mais as extremidades.
+
+    Totalmente vetorizado; garante que nenhum pico ou vale some do gráfico.
+    """
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    n_buckets = max(n_out // 2 - 1, 1)
+    y = np.asarray(y, dtype=float)
+
+    edges = np.floor(np.linspace(0, n, n_buckets + 1)).astype(np.int64)
+    starts = edges[:-1]
+    bucket = np.repeat(np.arange(n_buckets), np.diff(edges))
+    # argmin/argmax por bucket: primeira posição que atinge o extremo do bucket
+    position = np.arange(n)
+    lowest = np.minimum.reduceat(y, starts)
+    highest = np.maximum.reduceat(y, starts)
+    argmin = np.minimum.reduceat(np.where(y == lowest[bucket], position, n), starts)
+    argmax = np.minimum.reduceat(np.where(y == highest[bucket], position, n), starts)
+    selected = np.concatenate([[0, n - 1], argmin, argmax])
+    return np.unique(selected)
+
+
+def downsample_indices(x: np.ndarray, y: np.ndarray, max_points: int,
+                       method: str = 'lttb') -> np.ndarray:
+    """
+    Índices que reduzem a série a no máximo max_points preservando a forma.
+
+    Pontos não finitos são descartados antes da redução.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Método '{method}' inválido. Use: {', '.join(METHODS)}")
+    y = np.asarray(y, dtype=float)
+    finite = np.flatnonzero(np.isfinite(y))
+    if len(finite) <= max_points:
+        return finite
+    if method == 'lttb':
+        kept = lttb_indices(np.asarray(x)[finite], y[finite], max_points)
+    else:
+        kept = minmax_indices(y[finite], max_points)
+    return finite[kept]
+
+
+def downsample(x: np.ndarray, y: np.ndarray, max_points: int,
+               method: str = 'lttb') -> Tuple[np.ndarray, np.ndarray]:
+    """Versão de downsample_indices que devolve (x, y) reduzidos"""
+    index = downsample_indices(x, y, max_points, method)
+    return np.asarray(x)[index], np.asarray(y)[index]
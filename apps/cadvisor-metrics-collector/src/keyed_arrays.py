@@ -0,0 +1,71 @@
+from typing import Dict, Hashable, Iterable, List, Tuple
+
+import numpy as np
+
+
+class KeyedArrays:
+    """
+    Estado por chave (container, série...) em arrays numpy, uma linha por chave.
+
+    As chaves recebem ids estáveis na ordem de chegada e os arrays crescem
+    por duplicação, então registrar chaves novas custa O(1) amortizado. Cada
+    campo vira um atributo com a chave no primeiro eixo: `state.mean[ids]`.
+    """
+
+    def __init__(self, capacity: int = 64, **fields: Tuple[Tuple[int, ...], type, object]):
+        """
+        Args:
+            capacity: linhas pré-alocadas
+            **fields: nome=(forma por chave, dtype, valor inicial),
+                ex.: mean=((n_metrics,), float, 0.0)
+        """
+        self.ids: Dict[Hashable, int] = {}
+        self.keys: List[Hashable] = []
+        self.capacity = 0
+        for name in fields:
+            if hasattr(self, name):
+                raise ValueError(f"Nome de campo reservado: '{name}'")
+        self._fields = fields
+        self._allocate(capacity)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _allocate(self, capacity: int):
+        for name, (shape, dtype, fill) in self._fields.items():
+            setattr(self, name, np.full((capacity, *shape), fill, dtype=dtype))
+        self.capacity = capacity
+
+    def grow(self, needed: int):
+        """Garante ao menos `needed` linhas, preservando as existentes"""
+        if needed <= self.capacity:
+            return
+        capacity = self.capacity
+        old = {name: getattr(self, name) for name in self._fields}
+        self._allocate(max(needed, capacity * 2))
+        for name, values in old.items():
+            getattr(self, name)[:capacity] = values
+
+    def lookup(self, keys: Iterable[Hashable]) -> np.ndarray:
+        """Ids das chaves, registrando as novas (os arrays crescem se preciso)"""
+        index, names = self.ids, self.keys
+        ids = []
+        for key in keys:
+            kid = index.get(key)
+            if kid is None:
+                kid = index[key] = len(names)
+                names.append(key)
+            ids.append(kid)
+        self.grow(len(names))
+        return np.array(ids, dtype=np.int64)
+
+    def reset(self, ids: np.ndarray):
+        """Volta as linhas de ids aos valores iniciais (as chaves continuam registradas)"""
+        for name, (_, _, fill) in self._fields.items():
+            getattr(self, name)[ids] = fill
+
+    def clear(self, capacity: int = 64):
+        """Esquece todas as chaves e realoca os arrays"""
+        self.ids.clear()
+        self.keys.clear()
+        self._allocate(capacity)
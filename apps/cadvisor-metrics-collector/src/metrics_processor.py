@@ -1,144 +1,307 @@
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional
 import logging
 
+from metrics_sink import RAW_METRICS_SCHEMA, list_segments, read_segment_table
+from rate_engine import PROCESSOR_COUNTERS, counter_rates
+from streaming_stats import StreamingMetricsAggregator
+from anomaly_detection import OnlineAnomalyDetector, zscore_anomalies
+
+MB = 1024 * 1024
+GB = 1024 * 1024 * 1024
+
+# Mapeamento explícito coluna -> campo do registro bruto (seção.chave) e divisor
+FIELD_MAPPING = [
+    ('cpu_total_usage', 'cpu_usage.total_usage', 1),
+    ('cpu_system_usage', 'cpu_usage.system_usage', 1),
+    ('cpu_user_usage', 'cpu_usage.user_usage', 1),
+    ('memory_usage_mb', 'memory_usage.usage', MB),
+    ('memory_working_set_mb', 'memory_usage.working_set', MB),
+    ('memory_rss_mb', 'memory_usage.rss', MB),
+    ('memory_cache_mb', 'memory_usage.cache', MB),
+    ('network_rx_mb', 'network_stats.rx_bytes', MB),
+    ('network_tx_mb', 'network_stats.tx_bytes', MB),
+    ('network_rx_packets', 'network_stats.rx_packets', 1),
+    ('network_tx_packets', 'network_stats.tx_packets', 1),
+    ('filesystem_usage_gb', 'filesystem_stats.total_usage', GB),
+    ('filesystem_capacity_gb', 'filesystem_stats.total_capacity', GB),
+]
+
+# Métricas com quantis por container no agregador em streaming
+QUANTILE_METRICS = ['memory_usage_mb', 'memory_working_set_mb']
+
+# Métricas avaliadas amostra a amostra pelo detector online
+ONLINE_ANOMALY_METRICS = ['memory_usage_mb', 'memory_working_set_mb']
+
+# Colunas de identificação convertidas para category (muitas repetições)
+CATEGORICAL_FIELDS = ['container_path', 'container_name', 'node']
+
+
+def _validate_field_mapping(schema: pa.Schema):
+    """Garante que todo campo do mapeamento existe e é numérico no schema bruto"""
+    for column, source, scale in FIELD_MAPPING:
+        section, key = source.split('.')
+        if section not in schema.names:
+            raise ValueError(f"Campo '{source}' de '{column}': seção '{section}' inexistente")
+        struct_type = schema.field(section).type
+        if not pa.types.is_struct(struct_type) or struct_type.get_field_index(key) < 0:
+            raise ValueError(f"Campo '{source}' de '{column}': chave '{key}' inexistente")
+        field_type = struct_type.field(key).type
+        if not (pa.types.is_integer(field_type) or pa.types.is_floating(field_type)):
+            raise ValueError(f"Campo '{source}' de '{column}' não é numérico ({field_type})")
+        if scale <= 0:
+            raise ValueError(f"Divisor inválido para '{column}': {scale}")
+
+
+_validate_field_mapping(RAW_METRICS_SCHEMA)
+
+
+def flatten_metrics_table(table: pa.Table) -> pd.DataFrame:
+    """
+    Achata uma tabela Arrow no schema RAW_METRICS_SCHEMA em colunas tipadas.
+    
+    Cada coluna é convertida uma única vez: timestamps via parsing vetorizado,
+    nomes como category e contadores como float64 já na unidade final.
+    Registros sem stat_timestamp são descartados.
+    """
+    missing = [name for name in ('stat_timestamp', 'container_path', 'container_name')
+               if name not in table.column_names]
+    if missing:
+        raise ValueError(f"Campos obrigatórios ausentes: {missing}")
+    
+    valid = pc.is_valid(table.column('stat_timestamp'))
+    if pc.sum(valid).as_py() != table.num_rows:
+        table = table.filter(valid)
+    
+    timestamps = pd.to_datetime(table.column('stat_timestamp').to_numpy(zero_copy_only=False),
+                                utc=True, format='ISO8601').tz_convert(None)
+    data = {'timestamp': timestamps}
+    
+    for name in CATEGORICAL_FIELDS:
+        if name in table.column_names and table.column(name).null_count < table.num_rows:
+            data[name] = pd.Categorical(table.column(name).to_numpy(zero_copy_only=False))
+    
+    for column, source, scale in FIELD_MAPPING:
+        section, key = source.split('.')
+        values = pc.struct_field(table.column(section), key)
+        values = pc.fill_null(pc.cast(values, pa.float64()), 0.0).to_numpy()
+        data[column] = values / scale if scale != 1 else values
+    
+    return pd.DataFrame(data)
+
+
 class MetricsProcessor:
     """Processa e analisa métricas coletadas do cAdvisor"""
     
     def __init__(self):
         self.logger = logging.getLogger(__name__)
-        self.df = None
+        self._df = None
+        self._processed_segments = set()
+        # Segmentos já agregados e ainda fora do DataFrame (lidos só quando df é usado)
+        self._pending_segments: List[str] = []
+        self.aggregator = self._new_aggregator()
+        self.anomaly_detector = OnlineAnomalyDetector(ONLINE_ANOMALY_METRICS)
+        # Com observe_batch durante a coleta o agregador já está completo e o
+        # processamento final não o alimenta de novo
+        self.live = False
+        self.batches_observed = 0
+    
+    @property
+    def df(self) -> Optional[pd.DataFrame]:
+        """Histórico completo, montado sob demanda a partir dos segmentos pendentes"""
+        if self._pending_segments:
+            frames = [] if self._df is None else [self._df]
+            for path in self._pending_segments:
+                table = read_segment_table(path)
+                if table.num_rows:
+                    frames.append(flatten_metrics_table(table))
+            self._pending_segments = []
+            if frames:
+                self._df = self._concat(frames)
+        return self._df
+    
+    @df.setter
+    def df(self, value: Optional[pd.DataFrame]):
+        self._df = value
+    
+    @staticmethod
+    def _new_aggregator() -> StreamingMetricsAggregator:
+        return StreamingMetricsAggregator([column for column, _, _ in FIELD_MAPPING],
+                                          quantile_metrics=QUANTILE_METRICS)
     
     def process_raw_metrics(self, raw_metrics: List[Dict]) -> pd.DataFrame:
         """Converte métricas brutas em DataFrame pandas"""
-        processed_data = []
-        
-        for metric in raw_metrics:
-            # Flatten nested dictionaries
-            flattened = {
-                'timestamp': pd.to_datetime(metric['timestamp']),
-                'container_path': metric['container_path'],
-                'container_name': metric['container_name'],
-                
-                # CPU metrics
-                'cpu_total_usage': metric['cpu_usage']['total_usage'],
-                'cpu_system_usage': metric['cpu_usage']['system_usage'],
-                'cpu_user_usage': metric['cpu_usage']['user_usage'],
-                
-                # Memory metrics (convert to MB)
-                'memory_usage_mb': metric['memory_usage']['usage'] / (1024 * 1024),
-                'memory_working_set_mb': metric['memory_usage']['working_set'] / (1024 * 1024),
-                'memory_rss_mb': metric['memory_usage']['rss'] / (1024 * 1024),
-                'memory_cache_mb': metric['memory_usage']['cache'] / (1024 * 1024),
-                
-                # Network metrics (convert to MB)
-                'network_rx_mb': metric['network_stats']['rx_bytes'] / (1024 * 1024),
-                'network_tx_mb': metric['network_stats']['tx_bytes'] / (1024 * 1024),
-                'network_rx_packets': metric['network_stats']['rx_packets'],
-                'network_tx_packets': metric['network_stats']['tx_packets'],
-                
-                # Filesystem metrics (convert to GB)
-                'filesystem_usage_gb': metric['filesystem_stats']['total_usage'] / (1024 * 1024 * 1024),
-                'filesystem_capacity_gb': metric['filesystem_stats']['total_capacity'] / (1024 * 1024 * 1024)
-            }
-            
-            processed_data.append(flattened)
-        
-        self.df = pd.DataFrame(processed_data)
+        self.df = self._flatten_metrics(raw_metrics)
+        if not self.live:
+            self.aggregator = self._new_aggregator()
+            self.aggregator.update(self.df)
         self.logger.info(f"Processados {len(self.df)} registros de métricas")
         return self.df
     
+    def process_segments(self, segment_dir: str, segments: Optional[List[str]] = None) -> int:
+        """
+        Processa incrementalmente os segmentos gravados pelo SegmentedMetricsSink.
+        
+        Segmentos já lidos em chamadas anteriores são ignorados, então o método
+        pode ser chamado periodicamente durante uma coleta longa. Cada segmento
+        novo alimenta só o agregador; o DataFrame completo (df) é montado uma
+        vez, quando uma análise ou exportação precisa dele.
+        
+        Args:
+            segment_dir: diretório dos segmentos
+            segments: restringe a leitura a estes paths (ex.: sink.closed_segments,
+                para não misturar execuções anteriores no mesmo diretório)
+        
+        Returns:
+            Número de segmentos novos
+        """
+        new_segments = 0
+        for path in list_segments(segment_dir) if segments is None else segments:
+            if path in self._processed_segments:
+                continue
+            self._processed_segments.add(path)
+            self._pending_segments.append(path)
+            new_segments += 1
+            # Com observe_batch o agregador já viu estes registros
+            if self.live:
+                continue
+            table = read_segment_table(path)
+            if table.num_rows:
+                self.aggregator.update(flatten_metrics_table(table))
+        
+        self.logger.info(f"Processados {new_segments} novos segmentos "
+                         f"({self.aggregator.total_records} registros agregados)")
+        return new_segments
+    
+    def observe_batch(self, raw_batch: List[Dict]) -> pd.DataFrame:
+        """
+        Atualiza as estatísticas em streaming e o detector online com um lote do coletor.
+        
+        Chamado no on_batch dos coletores (ver main.py): o histórico bruto não
+        é guardado e get_summary_statistics/get_top_consumers ficam
+        disponíveis durante a coleta.
+        
+        Returns:
+            Anomalias detectadas no lote (ver OnlineAnomalyDetector.update)
+        """
+        self.live = True
+        self.batches_observed += 1
+        if not raw_batch:
+            return self.anomaly_detector.update(pd.DataFrame())
+        frame = self._flatten_metrics(raw_batch)
+        self.aggregator.update(frame)
+        anomalies = self.anomaly_detector.update(frame)
+        if not anomalies.empty:
+            self.logger.warning(f"⚠️ {len(anomalies)} anomalias no lote "
+                                f"({anomalies['container_name'].nunique()} containers)")
+        return anomalies
+    
+    def log_live_report(self, top_n: int = 3):
+        """Loga o resumo parcial do agregador e do detector durante a coleta"""
+        if self.aggregator.total_records == 0:
+            return
+        summary = self.aggregator.summary()
+        memory = summary['metrics_summary'].get('memory_usage_mb', {})
+        self.logger.info(f"📊 Parcial: {summary['total_records']} registros de "
+                         f"{summary['total_containers']} containers em "
+                         f"{summary['time_range']['duration_minutes']:.1f} min, "
+                         f"memória média {memory.get('mean', float('nan')):.1f} MB, "
+                         f"{self.anomaly_detector.anomalies_found} anomalias")
+        top = self.aggregator.top_consumers('memory_usage_mb', top_n)
+        self.logger.info("   Top memória: " + ", ".join(
+            f"{name} ({row['mean']:.1f} MB)" for name, row in top.iterrows()))
+    
+    @staticmethod
+    def _concat(frames: List[pd.DataFrame]) -> pd.DataFrame:
+        """Concatena preservando as colunas category (união das categorias)"""
+        if len(frames) == 1:
+            return frames[0]
+        categorical = [c for c in CATEGORICAL_FIELDS if all(c in f.columns for f in frames)]
+        df = pd.concat(frames, ignore_index=True)
+        for column in categorical:
+            if df[column].dtype != 'category':
+                df[column] = df[column].astype('category')
+        return df
+    
+    def _flatten_metrics(self, raw_metrics: List[Dict]) -> pd.DataFrame:
+        """Achata os registros aninhados de build_metric_entry em colunas"""
+        table = pa.Table.from_pylist(raw_metrics, schema=RAW_METRICS_SCHEMA)
+        return flatten_metrics_table(table)
+    
     def calculate_cpu_percentage(self, machine_info: Dict) -> pd.DataFrame:
-        """Calcula percentual de uso de CPU"""
+        """
+        Calcula taxas de todos os contadores cumulativos e o percentual de CPU.
+        
+        As séries são separadas por container_path, então um container
+        reiniciado (novo path com o mesmo nome) não gera um delta espúrio;
+        resets de contador e espaçamento irregular são tratados em counter_rates.
+        """
         if self.df is None:
             raise ValueError("Dados não processados. Execute process_raw_metrics primeiro.")
         
         # Número de CPUs da máquina
         num_cpus = machine_info.get('num_cores', 1)
         
-        # Calcular diferenças para obter taxa de uso
-        df_sorted = self.df.sort_values(['container_name', 'timestamp'])
-        df_sorted['cpu_usage_rate'] = df_sorted.groupby('container_name')['cpu_total_usage'].diff()
-        df_sorted['cpu_system_rate'] = df_sorted.groupby('container_name')['cpu_system_usage'].diff()
+        key = 'container_path' if 'container_path' in self.df.columns else 'container_name'
+        df_rates = counter_rates(self.df, PROCESSOR_COUNTERS, [key])
         
-        # Calcular percentual (assumindo nanosegundos)
-        df_sorted['cpu_usage_percent'] = (df_sorted['cpu_usage_rate'] / 1e9) * 100 / num_cpus
+        # Colunas históricas em ns/s, mantidas para compatibilidade
+        df_rates['cpu_usage_rate'] = df_rates['cpu_cores'] * 1e9
+        df_rates['cpu_system_rate'] = df_rates['cpu_system_cores'] * 1e9
+        df_rates['cpu_usage_percent'] = df_rates['cpu_cores'] * 100 / num_cpus
         
-        return df_sorted
+        return df_rates
     
     def get_summary_statistics(self) -> Dict:
-        """Gera estatísticas resumidas das métricas"""
-        if self.df is None:
+        """
+        Gera estatísticas resumidas das métricas.
+        
+        Vem do agregador em streaming (O(containers)); a mediana é aproximada
+        pelos buckets logarítmicos (erro relativo em torno de 2.5%).
+        """
+        if self.aggregator.total_records == 0:
             raise ValueError("Dados não processados. Execute process_raw_metrics primeiro.")
         
-        numeric_columns = self.df.select_dtypes(include=[np.number]).columns
-        
-        summary = {
-            'total_containers': self.df['container_name'].nunique(),
-            'total_records': len(self.df),
-            'time_range': {
-                'start': self.df['timestamp'].min().isoformat(),
-                'end': self.df['timestamp'].max().isoformat(),
-                'duration_minutes': (self.df['timestamp'].max() - self.df['timestamp'].min()).total_seconds() / 60
-            },
-            'metrics_summary': {}
-        }
-        
-        for col in numeric_columns:
-            if col != 'timestamp':
-                summary['metrics_summary'][col] = {
-                    'mean': float(self.df[col].mean()),
-                    'median': float(self.df[col].median()),
-                    'std': float(self.df[col].std()),
-                    'min': float(self.df[col].min()),
-                    'max': float(self.df[col].max())
-                }
-        
-        return summary
+        return self.aggregator.summary()
     
     def get_top_consumers(self, metric: str, top_n: int = 5) -> pd.DataFrame:
         """Identifica os maiores consumidores de um recurso específico"""
+        if metric in self.aggregator.metrics and self.aggregator.total_records:
+            return self.aggregator.top_consumers(metric, top_n)
+        
+        # Colunas derivadas (ex.: taxas) só existem no DataFrame
         if self.df is None:
             raise ValueError("Dados não processados. Execute process_raw_metrics primeiro.")
         
         if metric not in self.df.columns:
             raise ValueError(f"Métrica '{metric}' não encontrada nos dados")
         
-        top_consumers = (self.df.groupby('container_name')[metric]
+        top_consumers = (self.df.groupby('container_name', observed=True)[metric]
                         .agg(['mean', 'max', 'std'])
                         .sort_values('mean', ascending=False)
                         .head(top_n))
         
         return top_consumers
     
-    def detect_anomalies(self, metric: str, threshold_std: float = 2.0) -> pd.DataFrame:
-        """Detecta anomalias usando desvio padrão"""
+    def detect_anomalies(self, metric: str, threshold_std: float = 2.0,
+                         method: str = 'zscore') -> pd.DataFrame:
+        """
+        Detecta anomalias por container sobre todo o histórico processado.
+        
+        Args:
+            metric: coluna analisada
+            threshold_std: |z| acima do qual a amostra é anômala
+            method: 'zscore' (média/desvio padrão) ou 'mad' (mediana/MAD,
+                robusto a picos que inflariam o desvio padrão)
+        """
         if self.df is None:
             raise ValueError("Dados não processados. Execute process_raw_metrics primeiro.")
         
         if metric not in self.df.columns:
             raise ValueError(f"Métrica '{metric}' não encontrada nos dados")
         
-        # Calcular z-score para cada container
-        anomalies = []
-        
-        for container in self.df['container_name'].unique():
-            container_data = self.df[self.df['container_name'] == container]
-            mean_val = container_data[metric].mean()
-            std_val = container_data[metric].std()
-            
-            if std_val > 0:
-                z_scores = np.abs((container_data[metric] - mean_val) / std_val)
-                anomaly_mask = z_scores > threshold_std
-                
-                if anomaly_mask.any():
-                    anomaly_data = container_data[anomaly_mask].copy()
-                    anomaly_data['z_score'] = z_scores[anomaly_mask]
-                    anomalies.append(anomaly_data)
-        
-        if anomalies:
-            return pd.concat(anomalies, ignore_index=True)
-        else:
-            return pd.DataFrame()
\ No newline at end of file
+        return zscore_anomalies(self.df, metric, threshold_std, method=method)
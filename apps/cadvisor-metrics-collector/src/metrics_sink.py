@@ -0,0 +1,269 @@
+import gzip
+import json
+import logging
+import os
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.json as pajson
+import pyarrow.parquet as pq
+
+FORMATS = {'parquet': '.parquet', 'jsonl': '.jsonl.gz'}
+PARTIAL_SUFFIX = '.partial'
+
+_COUNTER = pa.int64()
+_GAUGE = pa.float64()
+
+# Schema explícito dos registros produzidos por CAdvisorClient.build_metric_entry
+# (mais os campos opcionais do coletor assíncrono). Tipos fixos evitam que
+# row groups diferentes do mesmo arquivo inferam tipos divergentes.
+RAW_METRICS_SCHEMA = pa.schema([
+    ('collection_timestamp', pa.string()),
+    ('stat_timestamp', pa.string()),
+    ('container_path', pa.string()),
+    ('container_name', pa.string()),
+    ('cpu_usage', pa.struct([
+        ('total_usage', _COUNTER), ('usage_per_cpu', pa.list_(_COUNTER)),
+        ('system_usage', _COUNTER), ('user_usage', _COUNTER), ('load_average', _GAUGE)
+    ])),
+    ('memory_usage', pa.struct([
+        ('usage', _COUNTER), ('working_set', _COUNTER), ('rss', _COUNTER), ('cache', _COUNTER),
+        ('swap', _COUNTER), ('mapped_file', _COUNTER), ('failcnt', _COUNTER)
+    ])),
+    ('network_stats', pa.struct([
+        ('rx_bytes', _COUNTER), ('tx_bytes', _COUNTER), ('rx_packets', _COUNTER),
+        ('tx_packets', _COUNTER), ('rx_errors', _COUNTER), ('tx_errors', _COUNTER),
+        ('interfaces_count', _COUNTER)
+    ])),
+    ('filesystem_stats', pa.struct([
+        ('total_usage', _COUNTER), ('total_capacity', _COUNTER), ('total_available', _COUNTER),
+        ('filesystems_count', _COUNTER), ('usage_percentage', _GAUGE)
+    ])),
+    ('node', pa.string()),
+    ('endpoint', pa.string()),
+    ('scheduled_timestamp', pa.string()),
+    ('skew_ms', _GAUGE),
+    ('latency_ms', _GAUGE)
+])
+
+
+class SegmentedMetricsSink:
+    """Grava lotes de métricas em segmentos rotativos em disco com memória limitada"""
+
+    def __init__(self, output_dir: str = "data/segments", format: str = "parquet",
+                 max_segment_mb: float = 64, max_segment_minutes: float = 10,
+                 flush_rows: int = 5000):
+        """
+        Args:
+            output_dir: diretório dos segmentos
+            format: 'parquet' ou 'jsonl' (JSON lines com gzip)
+            max_segment_mb: tamanho a partir do qual o segmento é fechado
+            max_segment_minutes: idade máxima de um segmento aberto. Em Parquet
+                o segmento aberto não tem footer e é perdido inteiro se o processo
+                cair, então este valor (e max_segment_mb) limita a perda; com
+                'jsonl' cada flush sobrevive a uma queda
+            flush_rows: registros mantidos em memória antes de gravar no segmento
+        """
+        if format not in FORMATS:
+            raise ValueError(f"Formato '{format}' inválido. Use: {', '.join(FORMATS)}")
+
+        self.logger = logging.getLogger(__name__)
+        self.output_dir = output_dir
+        self.format = format
+        self.max_segment_bytes = int(max_segment_mb * 1024 * 1024)
+        self.max_segment_seconds = max_segment_minutes * 60
+        self.flush_rows = flush_rows
+
+        self._buffer: List[Dict] = []
+        self._writer: Optional[pq.ParquetWriter] = None
+        self._segment_path: Optional[str] = None
+        self._segment_opened = 0.0
+        self._sequence = 0
+        self.segments_written = 0
+        self.records_written = 0
+        # Segmentos fechados por esta instância (o diretório pode ter execuções anteriores)
+        self.closed_segments: List[str] = []
+
+        os.makedirs(output_dir, exist_ok=True)
+        self._recover_partial_segments()
+
+    @classmethod
+    def from_config(cls, config: Dict, output_dir: Optional[str] = None) -> 'SegmentedMetricsSink':
+        """Cria o sink a partir da seção 'sink' do config.yaml"""
+        sink_config = config.get('sink', {}) or {}
+        return cls(output_dir=output_dir or sink_config.get('directory', 'data/segments'),
+                   format=sink_config.get('format', 'parquet'),
+                   max_segment_mb=sink_config.get('max_segment_mb', 64),
+                   max_segment_minutes=sink_config.get('max_segment_minutes', 10),
+                   flush_rows=sink_config.get('flush_rows', 5000))
+
+    def _recover_partial_segments(self):
+        """Finaliza segmentos deixados abertos por uma execução interrompida"""
+        for name in sorted(os.listdir(self.output_dir)):
+            if not name.endswith(PARTIAL_SUFFIX):
+                continue
+            path = os.path.join(self.output_dir, name)
+            if name.endswith(FORMATS['jsonl'] + PARTIAL_SUFFIX):
+                # Cada flush é um membro gzip completo; no máximo a cauda se perde
+                os.replace(path, path[:-len(PARTIAL_SUFFIX)])
+                self.logger.warning(f"⚠️ Segmento recuperado após interrupção: {name}")
+            else:
+                # Parquet sem footer não é legível; preservado para inspeção manual
+                self.logger.warning(f"⚠️ Segmento Parquet incompleto ignorado: {name}")
+
+    def write(self, batch: List[Dict]):
+        """Adiciona um lote de registros; grava e rotaciona quando necessário"""
+        self._buffer.extend(batch)
+        if len(self._buffer) >= self.flush_rows:
+            self.flush()
+        elif self._segment_path is not None and self._segment_expired():
+            self.flush()
+
+    def _segment_expired(self) -> bool:
+        return time.time() - self._segment_opened >= self.max_segment_seconds
+
+    def _open_segment(self):
+        self._sequence += 1
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        name = f"segment_{stamp}_{os.getpid()}_{self._sequence:05d}{FORMATS[self.format]}"
+        self._segment_path = os.path.join(self.output_dir, name + PARTIAL_SUFFIX)
+        self._segment_opened = time.time()
+        if self.format == 'parquet':
+            self._writer = pq.ParquetWriter(self._segment_path, RAW_METRICS_SCHEMA,
+                                            compression='zstd')
+
+    def flush(self):
+        """Grava o buffer no segmento corrente e rotaciona se o limite foi atingido"""
+        if self._buffer:
+            if self._segment_path is None:
+                self._open_segment()
+
+            if self.format == 'parquet':
+                table = pa.Table.from_pylist(self._buffer, schema=RAW_METRICS_SCHEMA)
+                self._writer.write_table(table)
+            else:
+                payload = ''.join(json.dumps(record, default=str) + '\n' for record in self._buffer)
+                with open(self._segment_path, 'ab') as f:
+                    f.write(gzip.compress(payload.encode('utf-8')))
+
+            self.records_written += len(self._buffer)
+            self._buffer = []
+
+        if self._segment_path is not None and (
+                os.path.getsize(self._segment_path) >= self.max_segment_bytes or self._segment_expired()):
+            self.rotate()
+
+    def rotate(self):
+        """Fecha o segmento corrente, tornando-o visível para os leitores"""
+        if self._segment_path is None:
+            return
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        final_path = self._segment_path[:-len(PARTIAL_SUFFIX)]
+        os.replace(self._segment_path, final_path)
+        self.closed_segments.append(final_path)
+        self.segments_written += 1
+        self.logger.info(f"💾 Segmento fechado: {os.path.basename(final_path)}")
+        self._segment_path = None
+
+    def close(self):
+        """Grava os registros pendentes e fecha o segmento aberto"""
+        self.flush()
+        self.rotate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def list_segments(segment_dir: str) -> List[str]:
+    """Segmentos fechados em ordem de criação (parciais são ignorados)"""
+    if not os.path.isdir(segment_dir):
+        return []
+    return [os.path.join(segment_dir, name) for name in sorted(os.listdir(segment_dir))
+            if name.startswith('segment_') and name.endswith(tuple(FORMATS.values()))]
+
+
+def list_open_segments(segment_dir: str) -> List[str]:
+    """Segmentos jsonl ainda abertos (.partial), legíveis por read_gzip_members"""
+    if not os.path.isdir(segment_dir):
+        return []
+    suffix = FORMATS['jsonl'] + PARTIAL_SUFFIX
+    return [os.path.join(segment_dir, name) for name in sorted(os.listdir(segment_dir))
+            if name.startswith('segment_') and name.endswith(suffix)]
+
+
+def read_gzip_members(path: str, offset: int = 0) -> Tuple[List[Dict], int]:
+    """
+    Lê os membros gzip completos de um segmento jsonl a partir de offset.
+
+    Cada flush do sink é um membro gzip completo, então um leitor pode
+    acompanhar um segmento aberto: um membro ainda sendo gravado no fim do
+    arquivo fica para a próxima leitura.
+
+    Returns:
+        (registros, offset logo após o último membro completo)
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+
+    records = []
+    while data:
+        decompressor = zlib.decompressobj(wbits=31)
+        try:
+            payload = decompressor.decompress(data)
+        except zlib.error:
+            break
+        if not decompressor.eof:
+            break  # membro incompleto
+        consumed = len(data) - len(decompressor.unused_data)
+        records.extend(json.loads(line) for line in payload.decode('utf-8').splitlines() if line.strip())
+        offset += consumed
+        data = decompressor.unused_data
+    return records, offset
+
+
+def read_segment(path: str) -> List[Dict]:
+    """Lê um segmento devolvendo os registros no formato de build_metric_entry"""
+    if path.endswith(FORMATS['parquet']):
+        return pq.read_table(path).to_pylist()
+
+    records = []
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    records.append(json.loads(line))
+    except (EOFError, json.JSONDecodeError):
+        # Cauda truncada de um segmento recuperado
+        logging.getLogger(__name__).warning(f"⚠️ Segmento truncado: {os.path.basename(path)}")
+    return records
+
+
+def read_segment_table(path: str) -> pa.Table:
+    """Lê um segmento como tabela Arrow no schema RAW_METRICS_SCHEMA"""
+    if path.endswith(FORMATS['parquet']):
+        return pq.read_table(path, schema=RAW_METRICS_SCHEMA)
+
+    try:
+        with gzip.open(path, 'rb') as f:
+            return pajson.read_json(f, parse_options=pajson.ParseOptions(
+                explicit_schema=RAW_METRICS_SCHEMA, unexpected_field_behavior='ignore'))
+    except (EOFError, OSError, pa.ArrowInvalid):
+        # Segmento recuperado com cauda truncada: leitura linha a linha
+        return pa.Table.from_pylist(read_segment(path), schema=RAW_METRICS_SCHEMA)
+
+
+def iter_segments(segment_dir: str, skip: Optional[set] = None) -> Iterator[tuple]:
+    """Itera (path, registros) sobre os segmentos fechados ainda não vistos"""
+    for path in list_segments(segment_dir):
+        if skip is not None and path in skip:
+            continue
+        yield path, read_segment(path)
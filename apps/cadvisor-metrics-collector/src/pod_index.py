@@ -0,0 +1,163 @@
+import logging
+import posixpath
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+# Labels de pod/namespace nos specs (versões antigas do cAdvisor usam pod_name/namespace)
+POD_NAME_LABELS = ('io.kubernetes.pod.name', 'pod_name', 'pod')
+NAMESPACE_LABELS = ('io.kubernetes.pod.namespace', 'namespace')
+
+PodKey = Tuple[str, str]
+
+
+def pod_labels(labels: Dict) -> Optional[PodKey]:
+    """(namespace, pod) a partir dos labels de um container; None fora de pods"""
+    if not isinstance(labels, dict):
+        return None
+    pod = next((labels[label] for label in POD_NAME_LABELS if labels.get(label)), None)
+    if not pod:
+        return None
+    namespace = next((labels[label] for label in NAMESPACE_LABELS if labels.get(label)), 'unknown')
+    return namespace, pod
+
+
+class PodContainerIndex:
+    """
+    Índice (namespace, pod) -> paths dos containers, montado com uma listagem.
+
+    A listagem usa /api/v2.0/spec (só specs, sem stats) e cai para
+    /api/v1.3/subcontainers quando a API v2.0 não existe. O índice é refeito
+    quando o TTL expira ou quando uma consulta não encontra o pod; misses
+    seguidos só forçam nova listagem após min_refresh_seconds. Os stats de
+    todos os containers de um pod vêm numa única requisição da subárvore do
+    cgroup do pod.
+    """
+
+    def __init__(self, session: requests.Session, cadvisor_url: str,
+                 ttl_seconds: float = 60, min_refresh_seconds: float = 5,
+                 timeout: float = 30):
+        """
+        Args:
+            session: sessão HTTP compartilhada com o coletor
+            cadvisor_url: URL base do cAdvisor
+            ttl_seconds: idade máxima do índice
+            min_refresh_seconds: intervalo mínimo entre listagens disparadas
+                por miss (evita relistar a cada tick por um pod inexistente)
+            timeout: timeout das requisições em segundos
+        """
+        self.logger = logging.getLogger(__name__)
+        self.session = session
+        self.cadvisor_url = cadvisor_url.rstrip('/')
+        self.ttl_seconds = ttl_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self.timeout = timeout
+
+        self.containers: Dict[PodKey, List[str]] = {}
+        self.specs: Dict[str, Dict] = {}
+        self.refreshed_at = 0.0
+        self.refresh_count = 0
+        self.requests_made = 0
+        self._spec_api_available = None
+
+    def __len__(self) -> int:
+        return len(self.containers)
+
+    def _get(self, path: str, params: Optional[Dict] = None):
+        self.requests_made += 1
+        response = self.session.get(f"{self.cadvisor_url}{path}", params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _list_specs(self) -> Dict[str, Dict]:
+        """{path: spec} de todos os containers, preferindo a API v2.0"""
+        if self._spec_api_available is not False:
+            try:
+                specs = self._get('/api/v2.0/spec', {'type': 'name', 'recursive': 'true'})
+                self._spec_api_available = True
+                return specs
+            except requests.exceptions.HTTPError as e:
+                if e.response is None or e.response.status_code != 404:
+                    raise
+                self.logger.warning("API v2.0 indisponível; usando a API v1.3")
+                self._spec_api_available = False
+
+        # /api/v1.3/subcontainers devolve uma lista de ContainerInfo
+        return {info['name']: info.get('spec', {})
+                for info in self._get('/api/v1.3/subcontainers', {'num_stats': 0})
+                if isinstance(info, dict) and info.get('name')}
+
+    def refresh(self) -> None:
+        """Refaz o índice com uma única listagem"""
+        specs = self._list_specs()
+        containers: Dict[PodKey, List[str]] = {}
+        for path, spec in specs.items():
+            key = pod_labels(spec.get('labels') if isinstance(spec, dict) else None)
+            if key is not None:
+                containers.setdefault(key, []).append(path)
+
+        self.specs = specs
+        self.containers = {key: sorted(paths) for key, paths in containers.items()}
+        self.refreshed_at = time.time()
+        self.refresh_count += 1
+        self.logger.debug(f"Índice de pods atualizado: {len(self.containers)} pods, {len(specs)} containers")
+
+    def _ensure_fresh(self, missed: bool = False) -> None:
+        age = time.time() - self.refreshed_at
+        if age >= self.ttl_seconds or (missed and age >= self.min_refresh_seconds):
+            self.refresh()
+
+    def invalidate(self) -> None:
+        """Força nova listagem na próxima consulta (ex.: pod removido)"""
+        self.refreshed_at = 0.0
+
+    def find(self, pod_name: str, namespace: Optional[str] = None) -> List[PodKey]:
+        """Chaves (namespace, pod) com esse nome; relista uma vez em caso de miss"""
+        keys = self.select(lambda pod: pod == pod_name, namespace)
+        if not keys:
+            self._ensure_fresh(missed=True)
+            keys = self.select(lambda pod: pod == pod_name, namespace, refresh=False)
+        return keys
+
+    def select(self, matches: Callable[[str], bool], namespace: Optional[str] = None,
+               refresh: bool = True) -> List[PodKey]:
+        """Chaves (namespace, pod) cujo nome satisfaz matches"""
+        if refresh:
+            self._ensure_fresh()
+        return [key for key in self.containers
+                if matches(key[1]) and (namespace is None or key[0] == namespace)]
+
+    def paths(self, key: PodKey) -> List[str]:
+        """Paths dos containers do pod (lista vazia se desconhecido)"""
+        return self.containers.get(key, [])
+
+    def pod_root(self, key: PodKey) -> Optional[str]:
+        """Cgroup do pod: pai comum dos cgroups dos seus containers"""
+        paths = self.containers.get(key)
+        if not paths:
+            return None
+        return posixpath.commonpath([posixpath.dirname(path) for path in paths])
+
+    def pod_stats(self, key: PodKey, num_stats: int = 1) -> List[Dict]:
+        """
+        ContainerInfo (spec + stats) dos containers do pod numa só requisição.
+
+        Returns:
+            Um ContainerInfo da API v1.3 por container do pod; lista vazia se o
+            pod sumiu (o índice é invalidado para a próxima consulta)
+        """
+        root = self.pod_root(key)
+        if root is None:
+            return []
+        try:
+            infos = self._get(f"/api/v1.3/subcontainers{root}", {'num_stats': num_stats})
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                self.invalidate()
+                return []
+            raise
+
+        # A subárvore inclui o cgroup do próprio pod, que não é um container
+        wanted = set(self.containers[key])
+        return [info for info in infos if isinstance(info, dict) and info.get('name') in wanted]
@@ -2,16 +2,50 @@
 
 import requests
 import json
+import numpy as np
 import pandas as pd
 import re
 from typing import Dict, List, Optional, Any
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import argparse
 import logging
 import sys
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields
 import time
 
+from rate_engine import CounterRateTracker, pod_metrics_counters
+from prometheus_parser import PrometheusTextParser, stream_metrics
+from pod_index import PodContainerIndex
+
+# Família Prometheus -> (campo de PodMetrics, conversão); só essas famílias são parseadas
+PROMETHEUS_FIELDS = {
+    'container_cpu_usage_seconds_total': ('cpu_usage_total', float),
+    'container_cpu_user_seconds_total': ('cpu_usage_user', float),
+    'container_cpu_system_seconds_total': ('cpu_usage_system', float),
+    'container_cpu_cfs_throttled_seconds_total': ('cpu_throttled_seconds', float),
+    'container_cpu_cfs_throttled_periods_total': ('cpu_throttled_periods', int),
+    'container_memory_usage_bytes': ('memory_usage', int),
+    'container_memory_working_set_bytes': ('memory_working_set', int),
+    'container_memory_rss': ('memory_rss', int),
+    'container_memory_cache': ('memory_cache', int),
+    'container_memory_swap': ('memory_swap', int),
+    'container_spec_memory_limit_bytes': ('memory_limit', int),
+    'container_network_receive_bytes_total': ('network_rx_bytes', int),
+    'container_network_transmit_bytes_total': ('network_tx_bytes', int),
+    'container_network_receive_packets_total': ('network_rx_packets', int),
+    'container_network_transmit_packets_total': ('network_tx_packets', int),
+    'container_fs_usage_bytes': ('fs_usage', int),
+    'container_fs_limit_bytes': ('fs_limit', int),
+    'container_fs_reads_total': ('fs_reads', int),
+    'container_fs_writes_total': ('fs_writes', int),
+    'container_processes': ('processes', int),
+    'container_threads': ('threads', int),
+    'container_file_descriptors': ('file_descriptors', int),
+}
+
+# Labels que identificam o pod (versões antigas do cAdvisor usam pod_name)
+POD_LABELS = ('pod', 'pod_name')
+
 @dataclass
 class PodMetrics:
     """Estrutura para armazenar métricas do pod"""
@@ -58,15 +92,175 @@ class PodMetrics:
     processes: int = 0
     threads: int = 0
     file_descriptors: int = 0
+    
+    # Taxas por segundo derivadas dos contadores cumulativos (vazio na primeira amostra)
+    rates: Dict[str, float] = field(default_factory=dict)
+
+# Campo de PodMetrics -> coluna de metrics_to_dataframe (os demais mantêm o nome)
+FIELD_COLUMNS = {
+    'memory_usage': 'memory_usage_bytes',
+    'memory_working_set': 'memory_working_set_bytes',
+    'memory_rss': 'memory_rss_bytes',
+    'memory_cache': 'memory_cache_bytes',
+    'memory_swap': 'memory_swap_bytes',
+    'memory_max_usage': 'memory_max_usage_bytes',
+    'memory_limit': 'memory_limit_bytes',
+    'fs_usage': 'fs_usage_bytes',
+    'fs_limit': 'fs_limit_bytes',
+}
+
+# Colunas de taxa vindas de PodMetrics.rates (cpu_usage_rate já é um campo)
+RATE_COLUMNS = tuple(rate for rate, _ in pod_metrics_counters(1.0).values() if rate != 'cpu_usage_rate')
+
+KEY_FIELDS = ('pod_name', 'container_name', 'namespace')
+
+# cAdvisor reporta 2^64-1 como limite de container sem limite; acima de
+# int64 o limite é tratado como 0 (ilimitado), como no resto do coletor
+UNLIMITED = 2 ** 63
+LIMIT_FIELDS = ('memory_limit', 'fs_limit')
+
+MB = 1024 * 1024
+
+class PodMetricsBuffer:
+    """
+    Armazenamento colunar das amostras de PodMetrics para a coleta contínua.
+    
+    Cada campo numérico é um array numpy pré-alocado que dobra de capacidade
+    quando enche; pod/container/namespace viram códigos int32 de categorias
+    internadas e o timestamp, int64 em ns UTC. Uma amostra custa só os seus
+    campos numéricos, e to_dataframe() devolve views dos arrays, sem cópia.
+    """
+    
+    def __init__(self, capacity: int = 1024):
+        self.numeric_fields = [f.name for f in fields(PodMetrics) if f.type in (int, float)]
+        self.field_types = {f.name: f.type for f in fields(PodMetrics)}
+        self.categories: Dict[str, List[str]] = {key: [] for key in KEY_FIELDS}
+        self.category_codes: Dict[str, Dict[str, int]] = {key: {} for key in KEY_FIELDS}
+        self.rates_seen = set()
+        self.size = 0
+        self._allocate(capacity)
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    def _allocate(self, capacity: int):
+        self.columns = {name: np.zeros(capacity, dtype=np.int64 if self.field_types[name] is int else np.float64)
+                        for name in self.numeric_fields}
+        self.columns.update({rate: np.full(capacity, np.nan) for rate in RATE_COLUMNS})
+        self.codes = {key: np.zeros(capacity, dtype=np.int32) for key in KEY_FIELDS}
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+    
+    def _grow(self, needed: int):
+        capacity = len(self.timestamps)
+        if needed <= capacity:
+            return
+        old_columns, old_codes, old_timestamps = self.columns, self.codes, self.timestamps
+        self._allocate(max(needed, capacity * 2))
+        for name, values in old_columns.items():
+            self.columns[name][:capacity] = values
+        for key, values in old_codes.items():
+            self.codes[key][:capacity] = values
+        self.timestamps[:capacity] = old_timestamps
+    
+    def _code(self, key: str, value: str) -> int:
+        codes = self.category_codes[key]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.categories[key])
+            self.categories[key].append(value)
+        return code
+    
+    @property
+    def nbytes(self) -> int:
+        """Bytes ocupados pelos arrays (capacidade alocada, não só as amostras)"""
+        return (sum(values.nbytes for values in self.columns.values())
+                + sum(values.nbytes for values in self.codes.values()) + self.timestamps.nbytes)
+    
+    def append(self, metric: PodMetrics) -> None:
+        """Copia a amostra para a próxima linha; o objeto pode ser descartado"""
+        row = self.size
+        self._grow(row + 1)
+        for name in self.numeric_fields:
+            value = getattr(metric, name)
+            if name in LIMIT_FIELDS and value >= UNLIMITED:
+                value = 0
+            self.columns[name][row] = value
+        for rate, value in metric.rates.items():
+            if rate in self.columns and rate != 'cpu_usage_rate':
+                self.columns[rate][row] = value
+                self.rates_seen.add(rate)
+        for key in KEY_FIELDS:
+            self.codes[key][row] = self._code(key, getattr(metric, key))
+        
+        # Gravado como ns UTC; timestamp sem fuso é interpretado como hora local
+        timestamp = pd.Timestamp(metric.timestamp)
+        if timestamp.tzinfo is None:
+            timestamp = pd.Timestamp(timestamp.to_pydatetime().astimezone(timezone.utc))
+        self.timestamps[row] = timestamp.value
+        self.size = row + 1
+    
+    def extend(self, metrics: List[PodMetrics]) -> None:
+        """Acrescenta as amostras de uma coleta"""
+        self._grow(self.size + len(metrics))
+        for metric in metrics:
+            self.append(metric)
+    
+    def clear(self) -> None:
+        """Descarta as amostras (DataFrames já exportados continuam válidos)"""
+        self.size = 0
+        self.rates_seen.clear()
+        self._allocate(len(self.timestamps))
+    
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        DataFrame no formato de metrics_to_dataframe.
+        
+        Colunas armazenadas são views (sem cópia) dos arrays do buffer; só as
+        derivadas (MB, utilização) são calculadas aqui.
+        """
+        n = self.size
+        if not n:
+            return pd.DataFrame()
+        
+        view = {name: values[:n] for name, values in self.columns.items()}
+        timestamps = pd.Series(self.timestamps[:n].view('datetime64[ns]'), copy=False).dt.tz_localize('UTC')
+        
+        def ratio(part: str, total: str) -> np.ndarray:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.where(view[total] > 0, view[part] / view[total] * 100, 0.0)
+        
+        data = {key: pd.Categorical.from_codes(self.codes[key][:n], categories=self.categories[key])
+                for key in KEY_FIELDS}
+        data['timestamp'] = timestamps
+        for name in self.numeric_fields:
+            column = FIELD_COLUMNS.get(name, name)
+            data[column] = view[name]
+            if name in ('memory_usage', 'memory_working_set', 'fs_usage'):
+                data[column.replace('_bytes', '_mb')] = view[name] / MB
+            if name == 'network_tx_bytes':
+                data['network_rx_mb'] = view['network_rx_bytes'] / MB
+                data['network_tx_mb'] = view['network_tx_bytes'] / MB
+            if name == 'memory_limit':
+                data['memory_utilization_pct'] = ratio('memory_usage', 'memory_limit')
+            if name == 'fs_limit':
+                data['fs_utilization_pct'] = ratio('fs_usage', 'fs_limit')
+        for rate in RATE_COLUMNS:
+            if rate in self.rates_seen:
+                data[rate] = view[rate]
+        
+        return pd.DataFrame(data, copy=False)
 
 class PodMetricsCollector:
     """Coletor de métricas específicas para um pod"""
     
-    def __init__(self, cadvisor_url: str = "http://localhost:8080", timeout: int = 30):
+    def __init__(self, cadvisor_url: str = "http://localhost:8080", timeout: int = 30,
+                 index_ttl: float = 60):
         self.cadvisor_url = cadvisor_url.rstrip('/')
         self.timeout = timeout
         self.session = requests.Session()
         self.session.timeout = timeout
+        # (namespace, pod) -> paths dos containers, relistado por TTL ou miss
+        self.pod_index = PodContainerIndex(self.session, self.cadvisor_url, index_ttl, timeout=timeout)
         
         # Configurar logging
         logging.basicConfig(
@@ -74,6 +268,23 @@ class PodMetricsCollector:
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
         self.logger = logging.getLogger(__name__)
+        
+        # Estado incremental dos contadores, um por fonte (unidades de CPU diferem)
+        series_key = ('namespace', 'pod_name', 'container_name')
+        self.rate_trackers = {
+            'api': CounterRateTracker(pod_metrics_counters(1e-9), series_key),
+            'prometheus': CounterRateTracker(pod_metrics_counters(1.0), series_key)
+        }
+    
+    def _apply_rates(self, source: str, pod_metric: PodMetrics) -> None:
+        """Converte os contadores cumulativos da amostra em taxas usando a amostra anterior"""
+        tracker = self.rate_trackers[source]
+        values = {name: getattr(pod_metric, name) for name in tracker.counters}
+        key = (pod_metric.namespace, pod_metric.pod_name, pod_metric.container_name)
+        rates = tracker.update_sample(key, pod_metric.timestamp, values)
+        
+        pod_metric.rates = {name: value for name, value in rates.items() if value is not None}
+        pod_metric.cpu_usage_rate = pod_metric.rates.get('cpu_usage_rate', float('nan'))
     
     def test_connection(self) -> bool:
         """Testa conexão com cAdvisor"""
@@ -86,26 +297,33 @@ class PodMetricsCollector:
     
     def get_pod_metrics_from_prometheus(self, pod_name: str) -> List[PodMetrics]:
         """Coleta métricas do pod via endpoint Prometheus"""
+        return self.get_pods_metrics_from_prometheus(pods=[pod_name])
+    
+    def get_pods_metrics_from_prometheus(self, pods: Optional[List[str]] = None,
+                                         pod_regex: Optional[str] = None) -> List[PodMetrics]:
+        """
+        Coleta métricas de vários pods com um único download de /metrics.
+        
+        As amostras são filtradas durante o download e roteadas para
+        (pod, container) numa só passada, então o custo por coleta não cresce
+        com o número de pods observados. Sem pods nem pod_regex, coleta todos.
+        
+        Args:
+            pods: nomes exatos dos pods
+            pod_regex: regex (fullmatch) aplicada ao nome do pod
+        """
         try:
-            response = self.session.get(f"{self.cadvisor_url}/metrics")
-            response.raise_for_status()
+            parser = PrometheusTextParser(PROMETHEUS_FIELDS, POD_LABELS, pods or None, pod_regex)
+            # Corpo lido em pedaços e filtrado durante o download
+            chunks = stream_metrics(self.session, f"{self.cadvisor_url}/metrics", self.timeout)
             
-            metrics_text = response.text
             pod_metrics = []
-            
-            # Parse das métricas Prometheus
-            metrics_data = self._parse_prometheus_metrics(metrics_text, pod_name)
-            
-            if metrics_data:
-                # Agrupar por container
-                containers = self._group_metrics_by_container(metrics_data, pod_name)
-                
-                for container_path, container_metrics in containers.items():
-                    pod_metric = self._create_pod_metrics_from_prometheus(
-                        container_metrics, pod_name, container_path
-                    )
-                    if pod_metric:
-                        pod_metrics.append(pod_metric)
+            for (pod_name, container_id), container_metrics in self._route_samples(parser.parse(chunks)).items():
+                pod_metric = self._create_pod_metrics_from_prometheus(
+                    container_metrics, pod_name, container_id
+                )
+                if pod_metric:
+                    pod_metrics.append(pod_metric)
             
             return pod_metrics
             
@@ -115,35 +333,35 @@ class PodMetricsCollector:
     
     def get_pod_metrics_from_api(self, pod_name: str) -> List[PodMetrics]:
         """Coleta métricas do pod via API REST"""
+        return self.get_pods_metrics_from_api(pods=[pod_name])
+    
+    def get_pods_metrics_from_api(self, pods: Optional[List[str]] = None,
+                                  pod_regex: Optional[str] = None) -> List[PodMetrics]:
+        """
+        Coleta métricas de vários pods via API REST.
+        
+        Os pods são localizados no índice compartilhado e os stats de todos os
+        containers de cada pod vêm numa única requisição da subárvore do pod:
+        em regime, uma requisição por pod, não por container.
+        """
         try:
-            # Primeiro, obter lista de containers
-            containers_response = self.session.get(f"{self.cadvisor_url}/api/v1.3/containers")
-            containers_response.raise_for_status()
-            containers_data = containers_response.json()
+            matches = self._pod_matcher(pods, pod_regex)
+            keys = self.pod_index.select(matches)
+            # Pod pedido pelo nome e ausente do índice: pode ter acabado de subir
+            missing = set(pods or []) - {pod for _, pod in keys}
+            if missing:
+                for pod in missing:
+                    self.pod_index.find(pod)
+                keys = self.pod_index.select(matches, refresh=False)
             
             pod_metrics = []
-            
-            # Procurar containers que pertencem ao pod
-            for container_path, container_info in containers_data.items():
-                if self._is_pod_container(container_info, pod_name):
-                    # Obter estatísticas detalhadas do container
-                    stats_response = self.session.get(
-                        f"{self.cadvisor_url}/api/v1.3/containers{container_path}",
-                        params={"num_stats": 1}
-                    )
-                    stats_response.raise_for_status()
-                    stats_data = stats_response.json()
-                    
-                    # Processar estatísticas
-                    for path, data in stats_data.items():
-                        if 'stats' in data and data['stats']:
-                            latest_stat = data['stats'][-1]  # Estatística mais recente
-                            
-                            pod_metric = self._create_pod_metrics_from_api(
-                                data, latest_stat, pod_name
-                            )
-                            if pod_metric:
-                                pod_metrics.append(pod_metric)
+            for key in keys:
+                for data in self.pod_index.pod_stats(key):
+                    if not data.get('stats'):
+                        continue
+                    pod_metric = self._create_pod_metrics_from_api(data, data['stats'][-1], key[1])
+                    if pod_metric:
+                        pod_metrics.append(pod_metric)
             
             return pod_metrics
             
@@ -151,105 +369,67 @@ class PodMetricsCollector:
             self.logger.error(f"Erro ao obter métricas via API: {e}")
             return []
     
-    def _parse_prometheus_metrics(self, metrics_text: str, pod_name: str) -> Dict[str, Any]:
-        """Parse das métricas Prometheus filtradas por pod"""
-        metrics_data = {}
-        
-        for line in metrics_text.split('\n'):
-            line = line.strip()
-            
-            if not line or line.startswith('#'):
-                continue
-            
-            # Verificar se a linha contém o nome do pod
-            if f'pod="{pod_name}"' not in line and f'pod_name="{pod_name}"' not in line:
-                continue
-            
-            # Parse da métrica
-            metric_info = self._parse_metric_line(line)
-            if metric_info:
-                metric_name = metric_info['metric_name']
-                if metric_name not in metrics_data:
-                    metrics_data[metric_name] = []
-                metrics_data[metric_name].append(metric_info)
-        
-        return metrics_data
+    @staticmethod
+    def _pod_matcher(pods: Optional[List[str]], pod_regex: Optional[str]):
+        """Predicado nome_do_pod -> bool para a lista e/ou regex (nenhum = todos)"""
+        names = set(pods or [])
+        pattern = re.compile(pod_regex) if pod_regex else None
+        if not names and pattern is None:
+            return lambda pod: True
+        return lambda pod: pod in names or (pattern is not None and pattern.fullmatch(pod) is not None)
+    
+    @staticmethod
+    def _sample_to_dict(sample) -> Dict:
+        """Converte uma Sample do parser no formato histórico de métrica"""
+        if sample.timestamp_ms is not None:
+            timestamp = datetime.fromtimestamp(sample.timestamp_ms / 1000, tz=timezone.utc)
+        else:
+            timestamp = datetime.now(timezone.utc)
+        return {
+            'metric_name': sample.name,
+            'value': sample.value,
+            'timestamp': timestamp,
+            'labels': sample.labels
+        }
     
     def _parse_metric_line(self, line: str) -> Optional[Dict]:
         """Parse de uma linha de métrica Prometheus"""
-        try:
-            # Regex para métricas com labels
-            pattern = r'^([a-zA-Z_:][a-zA-Z0-9_:]*)\{([^}]*)\}\s+([^\s]+)(?:\s+(\d+))?$'
-            match = re.match(pattern, line)
-            
-            if not match:
-                # Métrica sem labels
-                simple_pattern = r'^([a-zA-Z_:][a-zA-Z0-9_:]*)\s+([^\s]+)(?:\s+(\d+))?$'
-                simple_match = re.match(simple_pattern, line)
-                if simple_match:
-                    metric_name, value, timestamp = simple_match.groups()
-                    labels = {}
-                else:
-                    return None
-            else:
-                metric_name, labels_str, value, timestamp = match.groups()
-                labels = self._parse_labels(labels_str)
-            
-            # Converter valor
-            try:
-                value = float(value)
-            except ValueError:
-                return None
-            
-            # Timestamp
-            if timestamp:
-                timestamp = datetime.fromtimestamp(int(timestamp) / 1000)
-            else:
-                timestamp = datetime.now()
-            
-            return {
-                'metric_name': metric_name,
-                'value': value,
-                'timestamp': timestamp,
-                'labels': labels
-            }
-            
-        except Exception as e:
-            self.logger.debug(f"Erro ao fazer parse da linha: {line} - {e}")
-            return None
+        sample = PrometheusTextParser().parse_line(line.strip())
+        return self._sample_to_dict(sample) if sample is not None else None
     
     def _parse_labels(self, labels_str: str) -> Dict[str, str]:
         """Parse dos labels de uma métrica"""
-        labels = {}
-        label_pattern = r'([a-zA-Z_][a-zA-Z0-9_]*)="([^"]*)"'
-        matches = re.findall(label_pattern, labels_str)
-        
-        for key, value in matches:
-            labels[key] = value
-        
-        return labels
+        return dict(PrometheusTextParser().parse_labels(labels_str))
     
-    def _group_metrics_by_container(self, metrics_data: Dict, pod_name: str) -> Dict[str, Dict]:
-        """Agrupa métricas por container"""
+    def _route_samples(self, samples) -> Dict[tuple, Dict]:
+        """Agrupa as amostras do parser por (pod, container) numa única passada"""
         containers = {}
         
-        for metric_name, metric_list in metrics_data.items():
-            for metric in metric_list:
-                labels = metric.get('labels', {})
-                
-                # Identificar container
-                container_name = labels.get('name', labels.get('container', 'unknown'))
-                container_id = labels.get('id', container_name)
-                
-                if container_id not in containers:
-                    containers[container_id] = {
-                        'container_name': container_name,
-                        'pod_name': pod_name,
-                        'namespace': labels.get('namespace', 'unknown'),
-                        'metrics': {}
-                    }
-                
-                containers[container_id]['metrics'][metric_name] = metric
+        for sample in samples:
+            labels = sample.labels
+            pod_name = labels.get('pod') or labels.get('pod_name')
+            if not pod_name:
+                continue  # cgroup fora de pod (sistema, raiz)
+            
+            # Identificar container
+            container_name = labels.get('name', labels.get('container', 'unknown'))
+            key = (pod_name, labels.get('id', container_name))
+            
+            container = containers.get(key)
+            if container is None:
+                container = containers[key] = {
+                    'container_name': container_name,
+                    'pod_name': pod_name,
+                    'namespace': labels.get('namespace', 'unknown'),
+                    'metrics': {},
+                    'timestamp_ms': None
+                }
+            
+            container['metrics'][sample.name] = self._sample_to_dict(sample)
+            # Instante da leitura no cAdvisor (a mais recente entre as amostras)
+            if sample.timestamp_ms is not None and (container['timestamp_ms'] is None
+                                                    or sample.timestamp_ms > container['timestamp_ms']):
+                container['timestamp_ms'] = sample.timestamp_ms
         
         return containers
     
@@ -259,104 +439,33 @@ class PodMetricsCollector:
         try:
             metrics = container_data.get('metrics', {})
             
+            # As taxas usam o timestamp da amostra do cAdvisor quando exposto: os
+            # valores só mudam a cada housekeeping, e dividir pelo relógio do
+            # coletor gera taxas zero seguidas de picos
+            timestamp_ms = container_data.get('timestamp_ms')
+            if timestamp_ms is not None:
+                timestamp = datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc)
+            else:
+                timestamp = datetime.now(timezone.utc)
+            
             pod_metric = PodMetrics(
                 pod_name=pod_name,
                 container_name=container_data.get('container_name', 'unknown'),
                 namespace=container_data.get('namespace', 'unknown'),
-                timestamp=datetime.now()
+                timestamp=timestamp
             )
             
-            # CPU Metrics
-            if 'container_cpu_usage_seconds_total' in metrics:
-                pod_metric.cpu_usage_total = metrics['container_cpu_usage_seconds_total']['value']
-            
-            if 'container_cpu_user_seconds_total' in metrics:
-                pod_metric.cpu_usage_user = metrics['container_cpu_user_seconds_total']['value']
-            
-            if 'container_cpu_system_seconds_total' in metrics:
-                pod_metric.cpu_usage_system = metrics['container_cpu_system_seconds_total']['value']
-            
-            if 'container_cpu_cfs_throttled_seconds_total' in metrics:
-                pod_metric.cpu_throttled_seconds = metrics['container_cpu_cfs_throttled_seconds_total']['value']
-            
-            if 'container_cpu_cfs_throttled_periods_total' in metrics:
-                pod_metric.cpu_throttled_periods = int(metrics['container_cpu_cfs_throttled_periods_total']['value'])
-            
-            # Memory Metrics
-            if 'container_memory_usage_bytes' in metrics:
-                pod_metric.memory_usage = int(metrics['container_memory_usage_bytes']['value'])
-            
-            if 'container_memory_working_set_bytes' in metrics:
-                pod_metric.memory_working_set = int(metrics['container_memory_working_set_bytes']['value'])
-            
-            if 'container_memory_rss' in metrics:
-                pod_metric.memory_rss = int(metrics['container_memory_rss']['value'])
-            
-            if 'container_memory_cache' in metrics:
-                pod_metric.memory_cache = int(metrics['container_memory_cache']['value'])
-            
-            if 'container_memory_swap' in metrics:
-                pod_metric.memory_swap = int(metrics['container_memory_swap']['value'])
-            
-            if 'container_spec_memory_limit_bytes' in metrics:
-                pod_metric.memory_limit = int(metrics['container_spec_memory_limit_bytes']['value'])
-            
-            # Network Metrics
-            if 'container_network_receive_bytes_total' in metrics:
-                pod_metric.network_rx_bytes = int(metrics['container_network_receive_bytes_total']['value'])
-            
-            if 'container_network_transmit_bytes_total' in metrics:
-                pod_metric.network_tx_bytes = int(metrics['container_network_transmit_bytes_total']['value'])
-            
-            if 'container_network_receive_packets_total' in metrics:
-                pod_metric.network_rx_packets = int(metrics['container_network_receive_packets_total']['value'])
-            
-            if 'container_network_transmit_packets_total' in metrics:
-                pod_metric.network_tx_packets = int(metrics['container_network_transmit_packets_total']['value'])
-            
-            # Filesystem Metrics
-            if 'container_fs_usage_bytes' in metrics:
-                pod_metric.fs_usage = int(metrics['container_fs_usage_bytes']['value'])
-            
-            if 'container_fs_limit_bytes' in metrics:
-                pod_metric.fs_limit = int(metrics['container_fs_limit_bytes']['value'])
-            
-            if 'container_fs_reads_total' in metrics:
-                pod_metric.fs_reads = int(metrics['container_fs_reads_total']['value'])
-            
-            if 'container_fs_writes_total' in metrics:
-                pod_metric.fs_writes = int(metrics['container_fs_writes_total']['value'])
-            
-            # Process Metrics
-            if 'container_processes' in metrics:
-                pod_metric.processes = int(metrics['container_processes']['value'])
-            
-            if 'container_threads' in metrics:
-                pod_metric.threads = int(metrics['container_threads']['value'])
-            
-            if 'container_file_descriptors' in metrics:
-                pod_metric.file_descriptors = int(metrics['container_file_descriptors']['value'])
+            for metric_name, (field_name, cast) in PROMETHEUS_FIELDS.items():
+                if metric_name in metrics:
+                    setattr(pod_metric, field_name, cast(metrics[metric_name]['value']))
             
+            self._apply_rates('prometheus', pod_metric)
             return pod_metric
             
         except Exception as e:
             self.logger.error(f"Erro ao criar PodMetrics: {e}")
             return None
     
-    def _is_pod_container(self, container_info: Dict, pod_name: str) -> bool:
-        """Verifica se o container pertence ao pod especificado"""
-        spec = container_info.get('spec', {})
-        labels = spec.get('labels', {})
-        
-        # Verificar diferentes formas de identificação do pod
-        pod_labels = [
-            labels.get('io.kubernetes.pod.name'),
-            labels.get('pod_name'),
-            labels.get('pod')
-        ]
-        
-        return pod_name in pod_labels
-    
     def _create_pod_metrics_from_api(self, container_data: Dict, 
                                    latest_stat: Dict, pod_name: str) -> Optional[PodMetrics]:
         """Cria objeto PodMetrics a partir de dados da API"""
@@ -368,7 +477,7 @@ class PodMetricsCollector:
                 pod_name=pod_name,
                 container_name=labels.get('io.kubernetes.container.name', 'unknown'),
                 namespace=labels.get('io.kubernetes.pod.namespace', 'unknown'),
-                timestamp=pd.to_datetime(latest_stat.get('timestamp', datetime.now()))
+                timestamp=pd.to_datetime(latest_stat.get('timestamp') or datetime.now(timezone.utc))
             )
             
             # CPU Metrics
@@ -379,10 +488,6 @@ class PodMetricsCollector:
                 pod_metric.cpu_usage_user = usage.get('user', 0)
                 pod_metric.cpu_usage_system = usage.get('system', 0)
                 pod_metric.cpu_load_average = cpu.get('load_average', 0)
-                
-                # Calcular taxa de CPU (aproximada)
-                if pod_metric.cpu_usage_total > 0:
-                    pod_metric.cpu_usage_rate = pod_metric.cpu_usage_total / 1e9  # Converter para cores
             
             # Memory Metrics
             memory = latest_stat.get('memory', {})
@@ -394,9 +499,9 @@ class PodMetricsCollector:
                 pod_metric.memory_swap = memory.get('swap', 0)
                 pod_metric.memory_max_usage = memory.get('max_usage', 0)
             
-            # Memory limit do spec
+            # Memory limit do spec (2^64-1 = sem limite)
             memory_limit = spec.get('memory', {}).get('limit', 0)
-            if memory_limit:
+            if memory_limit and memory_limit < UNLIMITED:
                 pod_metric.memory_limit = memory_limit
             
             # Network Metrics
@@ -428,6 +533,8 @@ class PodMetricsCollector:
                 pod_metric.threads = processes.get('thread_count', 0)
                 pod_metric.file_descriptors = processes.get('fd_count', 0)
             
+            # Taxa de CPU (cores) e demais contadores a partir da amostra anterior
+            self._apply_rates('api', pod_metric)
             return pod_metric
             
         except Exception as e:
@@ -436,75 +543,42 @@ class PodMetricsCollector:
     
     def collect_pod_metrics(self, pod_name: str, method: str = "both") -> List[PodMetrics]:
         """Coleta métricas do pod usando método especificado"""
+        return self.collect_pods_metrics([pod_name], method=method)
+    
+    def collect_pods_metrics(self, pods: Optional[List[str]] = None, pod_regex: Optional[str] = None,
+                             method: str = "both") -> List[PodMetrics]:
+        """
+        Coleta vários pods (lista e/ou regex) com uma requisição por método.
+        
+        O resultado de todos os pods vai num único metrics_to_dataframe.
+        """
         metrics = []
+        selection = ', '.join((pods or []) + ([f"regex {pod_regex}"] if pod_regex else [])) or "todos"
         
         if method in ["both", "prometheus"]:
-            self.logger.info(f"Coletando métricas via Prometheus para pod: {pod_name}")
-            prometheus_metrics = self.get_pod_metrics_from_prometheus(pod_name)
-            metrics.extend(prometheus_metrics)
+            self.logger.info(f"Coletando métricas via Prometheus para pods: {selection}")
+            metrics.extend(self.get_pods_metrics_from_prometheus(pods, pod_regex))
         
         if method in ["both", "api"]:
-            self.logger.info(f"Coletando métricas via API para pod: {pod_name}")
-            api_metrics = self.get_pod_metrics_from_api(pod_name)
-            metrics.extend(api_metrics)
+            self.logger.info(f"Coletando métricas via API para pods: {selection}")
+            metrics.extend(self.get_pods_metrics_from_api(pods, pod_regex))
         
         return metrics
     
-    def metrics_to_dataframe(self, metrics: List[PodMetrics]) -> pd.DataFrame:
-        """Converte lista de métricas para DataFrame"""
-        if not metrics:
-            return pd.DataFrame()
+    def metrics_to_dataframe(self, metrics) -> pd.DataFrame:
+        """
+        Converte métricas para DataFrame.
         
-        data = []
-        for metric in metrics:
-            data.append({
-                'pod_name': metric.pod_name,
-                'container_name': metric.container_name,
-                'namespace': metric.namespace,
-                'timestamp': metric.timestamp,
-                'cpu_usage_total': metric.cpu_usage_total,
-                'cpu_usage_user': metric.cpu_usage_user,
-                'cpu_usage_system': metric.cpu_usage_system,
-                'cpu_usage_rate': metric.cpu_usage_rate,
-                'cpu_load_average': metric.cpu_load_average,
-                'cpu_throttled_seconds': metric.cpu_throttled_seconds,
-                'cpu_throttled_periods': metric.cpu_throttled_periods,
-                'memory_usage_bytes': metric.memory_usage,
-                'memory_usage_mb': metric.memory_usage / (1024 * 1024) if metric.memory_usage else 0,
-                'memory_working_set_bytes': metric.memory_working_set,
-                'memory_working_set_mb': metric.memory_working_set / (1024 * 1024) if metric.memory_working_set else 0,
-                'memory_rss_bytes': metric.memory_rss,
-                'memory_cache_bytes': metric.memory_cache,
-                'memory_swap_bytes': metric.memory_swap,
-                'memory_max_usage_bytes': metric.memory_max_usage,
-                'memory_limit_bytes': metric.memory_limit,
-                'memory_utilization_pct': (metric.memory_usage / metric.memory_limit * 100) if metric.memory_limit else 0,
-                'network_rx_bytes': metric.network_rx_bytes,
-                'network_tx_bytes': metric.network_tx_bytes,
-                'network_rx_mb': metric.network_rx_bytes / (1024 * 1024) if metric.network_rx_bytes else 0,
-                'network_tx_mb': metric.network_tx_bytes / (1024 * 1024) if metric.network_tx_bytes else 0,
-                'network_rx_packets': metric.network_rx_packets,
-                'network_tx_packets': metric.network_tx_packets,
-                'network_rx_errors': metric.network_rx_errors,
-                'network_tx_errors': metric.network_tx_errors,
-                'fs_usage_bytes': metric.fs_usage,
-                'fs_usage_mb': metric.fs_usage / (1024 * 1024) if metric.fs_usage else 0,
-                'fs_limit_bytes': metric.fs_limit,
-                'fs_utilization_pct': (metric.fs_usage / metric.fs_limit * 100) if metric.fs_limit else 0,
-                'fs_reads': metric.fs_reads,
-                'fs_writes': metric.fs_writes,
-                'fs_read_bytes': metric.fs_read_bytes,
-                'fs_write_bytes': metric.fs_write_bytes,
-                'processes': metric.processes,
-                'threads': metric.threads,
-                'file_descriptors': metric.file_descriptors
-            })
-        
-        df = pd.DataFrame(data)
-        if not df.empty:
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
+        Args:
+            metrics: lista de PodMetrics ou PodMetricsBuffer; o buffer é
+                convertido sem cópia das colunas armazenadas
+        """
+        if isinstance(metrics, PodMetricsBuffer):
+            return metrics.to_dataframe()
         
-        return df
+        buffer = PodMetricsBuffer(capacity=max(len(metrics), 1))
+        buffer.extend(metrics)
+        return buffer.to_dataframe()
     
     def print_metrics_summary(self, metrics: List[PodMetrics]) -> None:
         """Imprime resumo das métricas coletadas"""
@@ -512,50 +586,68 @@ class PodMetricsCollector:
             print("❌ Nenhuma métrica encontrada")
             return
         
-        print(f"\n📊 Resumo das Métricas - Pod: {metrics[0].pod_name}")
+        # Uma seleção (lista ou regex) traz vários pods: containers agrupados por pod
+        by_pod: Dict[tuple, List[PodMetrics]] = {}
+        for metric in metrics:
+            by_pod.setdefault((metric.namespace, metric.pod_name), []).append(metric)
+        
+        if len(by_pod) == 1:
+            print(f"\n📊 Resumo das Métricas - Pod: {metrics[0].pod_name}")
+        else:
+            print(f"\n📊 Resumo das Métricas - {len(by_pod)} pods, {len(metrics)} containers")
+            print(f"   Pods: {', '.join(pod for _, pod in by_pod)}")
         print("=" * 60)
         
-        for i, metric in enumerate(metrics):
-            print(f"\n🔹 Container {i+1}: {metric.container_name}")
-            print(f"   Namespace: {metric.namespace}")
-            print(f"   Timestamp: {metric.timestamp}")
-            
-            print(f"\n   💻 CPU:")
-            print(f"     - Uso Total: {metric.cpu_usage_total/1e9:.4f} cores")
-            print(f"     - Uso User: {metric.cpu_usage_user/1e9:.4f} cores")
-            print(f"     - Uso System: {metric.cpu_usage_system/1e9:.4f} cores")
-            print(f"     - Load Average: {metric.cpu_load_average:.2f}")
-            if metric.cpu_throttled_seconds > 0:
-                print(f"     - Throttled: {metric.cpu_throttled_seconds:.2f}s ({metric.cpu_throttled_periods} períodos)")
-            
-            print(f"\n   🧠 Memória:")
-            print(f"     - Uso: {metric.memory_usage / (1024*1024):.2f} MB")
-            print(f"     - Working Set: {metric.memory_working_set / (1024*1024):.2f} MB")
-            print(f"     - RSS: {metric.memory_rss / (1024*1024):.2f} MB")
-            print(f"     - Cache: {metric.memory_cache / (1024*1024):.2f} MB")
-            if metric.memory_limit > 0:
-                utilization = (metric.memory_usage / metric.memory_limit) * 100
-                print(f"     - Limite: {metric.memory_limit / (1024*1024):.2f} MB")
-                print(f"     - Utilização: {utilization:.2f}%")
-            
-            print(f"\n   🌐 Rede:")
-            print(f"     - RX: {metric.network_rx_bytes / (1024*1024):.2f} MB ({metric.network_rx_packets} pacotes)")
-            print(f"     - TX: {metric.network_tx_bytes / (1024*1024):.2f} MB ({metric.network_tx_packets} pacotes)")
-            if metric.network_rx_errors > 0 or metric.network_tx_errors > 0:
-                print(f"     - Erros: RX={metric.network_rx_errors}, TX={metric.network_tx_errors}")
-            
-            print(f"\n   💾 Filesystem:")
-            print(f"     - Uso: {metric.fs_usage / (1024*1024):.2f} MB")
-            if metric.fs_limit > 0:
-                fs_utilization = (metric.fs_usage / metric.fs_limit) * 100
-                print(f"     - Limite: {metric.fs_limit / (1024*1024):.2f} MB")
-                print(f"     - Utilização: {fs_utilization:.2f}%")
-            print(f"     - Operações: {metric.fs_reads} leituras, {metric.fs_writes} escritas")
-            
-            print(f"\n   🔧 Processos:")
-            print(f"     - Processos: {metric.processes}")
-            print(f"     - Threads: {metric.threads}")
-            print(f"     - File Descriptors: {metric.file_descriptors}")
+        for (namespace, pod_name), pod_metrics in by_pod.items():
+            if len(by_pod) > 1:
+                print(f"\n📦 Pod: {pod_name} ({namespace})")
+                print("-" * 60)
+            for i, metric in enumerate(pod_metrics):
+                self._print_container_summary(i + 1, metric)
+    
+    @staticmethod
+    def _print_container_summary(position: int, metric: PodMetrics) -> None:
+        """Imprime as métricas de um container"""
+        print(f"\n🔹 Container {position}: {metric.container_name}")
+        print(f"   Namespace: {metric.namespace}")
+        print(f"   Timestamp: {metric.timestamp}")
+        
+        print(f"\n   💻 CPU:")
+        print(f"     - Uso Total: {metric.cpu_usage_total/1e9:.4f} cores")
+        print(f"     - Uso User: {metric.cpu_usage_user/1e9:.4f} cores")
+        print(f"     - Uso System: {metric.cpu_usage_system/1e9:.4f} cores")
+        print(f"     - Load Average: {metric.cpu_load_average:.2f}")
+        if metric.cpu_throttled_seconds > 0:
+            print(f"     - Throttled: {metric.cpu_throttled_seconds:.2f}s ({metric.cpu_throttled_periods} períodos)")
+        
+        print(f"\n   🧠 Memória:")
+        print(f"     - Uso: {metric.memory_usage / (1024*1024):.2f} MB")
+        print(f"     - Working Set: {metric.memory_working_set / (1024*1024):.2f} MB")
+        print(f"     - RSS: {metric.memory_rss / (1024*1024):.2f} MB")
+        print(f"     - Cache: {metric.memory_cache / (1024*1024):.2f} MB")
+        if metric.memory_limit > 0:
+            utilization = (metric.memory_usage / metric.memory_limit) * 100
+            print(f"     - Limite: {metric.memory_limit / (1024*1024):.2f} MB")
+            print(f"     - Utilização: {utilization:.2f}%")
+        
+        print(f"\n   🌐 Rede:")
+        print(f"     - RX: {metric.network_rx_bytes / (1024*1024):.2f} MB ({metric.network_rx_packets} pacotes)")
+        print(f"     - TX: {metric.network_tx_bytes / (1024*1024):.2f} MB ({metric.network_tx_packets} pacotes)")
+        if metric.network_rx_errors > 0 or metric.network_tx_errors > 0:
+            print(f"     - Erros: RX={metric.network_rx_errors}, TX={metric.network_tx_errors}")
+        
+        print(f"\n   💾 Filesystem:")
+        print(f"     - Uso: {metric.fs_usage / (1024*1024):.2f} MB")
+        if metric.fs_limit > 0:
+            fs_utilization = (metric.fs_usage / metric.fs_limit) * 100
+            print(f"     - Limite: {metric.fs_limit / (1024*1024):.2f} MB")
+            print(f"     - Utilização: {fs_utilization:.2f}%")
+        print(f"     - Operações: {metric.fs_reads} leituras, {metric.fs_writes} escritas")
+        
+        print(f"\n   🔧 Processos:")
+        print(f"     - Processos: {metric.processes}")
+        print(f"     - Threads: {metric.threads}")
+        print(f"     - File Descriptors: {metric.file_descriptors}")
 
 def main():
     parser = argparse.ArgumentParser(
@@ -564,9 +656,20 @@ def main():
     
     parser.add_argument(
         "pod_name",
+        nargs="?",
         help="Nome do pod para coletar métricas"
     )
     
+    parser.add_argument(
+        "--pods",
+        help="Lista de pods separada por vírgula (um único scrape por coleta)"
+    )
+    
+    parser.add_argument(
+        "--pod-regex",
+        help="Regex (match completo) dos nomes de pod a coletar"
+    )
+    
     parser.add_argument(
         "--cadvisor-url",
         default="http://localhost:8080",
@@ -613,6 +716,13 @@ def main():
     
     args = parser.parse_args()
     
+    pods = [pod for pod in (args.pods or '').split(',') if pod]
+    if args.pod_name:
+        pods.insert(0, args.pod_name)
+    if not pods and not args.pod_regex:
+        parser.error("informe pod_name, --pods ou --pod-regex")
+    selection = ', '.join(pods + ([f"regex {args.pod_regex}"] if args.pod_regex else []))
+    
     # Configurar logging
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
@@ -631,50 +741,53 @@ def main():
     
     try:
         if args.continuous:
-            print(f"🔄 Iniciando coleta contínua para pod '{args.pod_name}' (intervalo: {args.interval}s)")
+            print(f"🔄 Iniciando coleta contínua para pods '{selection}' (intervalo: {args.interval}s)")
             print("Pressione Ctrl+C para parar...")
             
-            all_metrics = []
+            # Amostras vão para o buffer colunar; os objetos de cada coleta são descartados
+            all_metrics = PodMetricsBuffer()
+            last_metrics = []
             
             while True:
                 print(f"\n📊 Coletando métricas... ({datetime.now().strftime('%H:%M:%S')})")
                 
-                metrics = collector.collect_pod_metrics(args.pod_name, args.method)
+                metrics = collector.collect_pods_metrics(pods, args.pod_regex, args.method)
                 
                 if metrics:
                     all_metrics.extend(metrics)
+                    last_metrics = metrics
                     collector.print_metrics_summary(metrics)
                 else:
-                    print(f"⚠️  Nenhuma métrica encontrada para o pod '{args.pod_name}'")
+                    print(f"⚠️  Nenhuma métrica encontrada para os pods '{selection}'")
                 
                 time.sleep(args.interval)
         
         else:
-            print(f"📊 Coletando métricas do pod '{args.pod_name}'...")
+            print(f"📊 Coletando métricas dos pods '{selection}'...")
             
-            metrics = collector.collect_pod_metrics(args.pod_name, args.method)
+            metrics = collector.collect_pods_metrics(pods, args.pod_regex, args.method)
             
             if not metrics:
-                print(f"❌ Nenhuma métrica encontrada para o pod '{args.pod_name}'")
+                print(f"❌ Nenhuma métrica encontrada para os pods '{selection}'")
                 print("\nVerifique se:")
                 print("- O nome do pod está correto")
                 print("- O pod está rodando")
                 print("- O cAdvisor tem acesso ao pod")
                 sys.exit(1)
             
-            all_metrics = metrics
+            all_metrics = last_metrics = metrics
     
     except KeyboardInterrupt:
         print("\n⏹️  Coleta interrompida pelo usuário")
         if 'all_metrics' not in locals():
-            all_metrics = []
+            all_metrics = last_metrics = []
     
     # Processar e salvar resultados
     if all_metrics:
         print(f"\n📈 Processando {len(all_metrics)} métricas coletadas...")
         
         # Mostrar resumo
-        collector.print_metrics_summary(all_metrics[-len(metrics):] if args.continuous else all_metrics)
+        collector.print_metrics_summary(last_metrics)
         
         # Converter para DataFrame
         df = collector.metrics_to_dataframe(all_metrics)
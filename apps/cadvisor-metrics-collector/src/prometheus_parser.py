@@ -0,0 +1,356 @@
+import codecs
+import logging
+import re
+import sys
+import time
+from collections import namedtuple
+from typing import Collection, Dict, Iterable, Iterator, Optional, Pattern, Sequence, Set, Union
+
+# Uma amostra do formato de exposição; labels é compartilhado entre amostras
+# com o mesmo conjunto de labels e não deve ser alterado
+Sample = namedtuple('Sample', ['name', 'labels', 'value', 'timestamp_ms'])
+
+# Sufixos de séries de histogramas/summaries que pertencem à família base
+FAMILY_SUFFIXES = ('_bucket', '_sum', '_count')
+
+# Acima disso o filtro por str.find no bloco perde para o teste linha a linha
+MAX_SCAN_NEEDLES = 32
+
+# Caminho lento: valores com escapes (\" \\ \n)
+_LABEL_PATTERN = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)\s*=\s*"((?:[^"\\]|\\.)*)"')
+_UNESCAPE = {'\\\\': '\\', '\\"': '"', '\\n': '\n'}
+
+Chunks = Union[str, bytes, Iterable[Union[str, bytes]]]
+
+
+class PrometheusTextParser:
+    """
+    Parser em streaming do formato texto do Prometheus (/metrics do cAdvisor).
+
+    O custo por linha é dominado por dois testes baratos feitos antes do parse
+    completo: o nome da métrica (prefixo da linha, com resultado em cache) e o
+    valor de um label de filtro, localizado com str.find. Só as linhas aceitas
+    têm os labels decodificados; nomes e valores de labels são internados e
+    conjuntos de labels repetidos reutilizam o mesmo dict.
+    """
+
+    def __init__(self, families: Optional[Iterable[str]] = None,
+                 match_labels: Sequence[str] = (),
+                 match_values: Optional[Collection[str]] = None,
+                 match_pattern: Optional[Union[str, Pattern]] = None,
+                 label_cache_size: int = 100_000):
+        """
+        Args:
+            families: nomes das famílias de métricas a manter; None = todas
+            match_labels: labels consultados pelo filtro (ex.: ('pod', 'pod_name'));
+                a amostra passa se qualquer um deles tiver valor em match_values
+            match_values: valores aceitos; None desativa o filtro de labels
+            match_pattern: regex (fullmatch) alternativa/adicional a match_values
+            label_cache_size: conjuntos de labels distintos mantidos em cache
+        """
+        self.logger = logging.getLogger(__name__)
+        self.families = set(families) if families is not None else None
+        self.match_labels = tuple(match_labels)
+        self.match_values = set(match_values) if match_values is not None else None
+        self.match_pattern = re.compile(match_pattern) if isinstance(match_pattern, str) else match_pattern
+        self._filter_labels = self.match_values is not None or self.match_pattern is not None
+        if self._filter_labels and not self.match_labels:
+            raise ValueError("match_values/match_pattern exigem ao menos um label em match_labels")
+        self._label_needles = tuple(f'{label}="' for label in self.match_labels)
+        self.label_cache_size = label_cache_size
+
+        self._name_cache: Dict[str, Optional[str]] = {}
+        self._label_cache: Dict[str, Dict[str, str]] = {}
+        self._value_cache: Dict[str, bool] = {}
+        self.lines_read = 0
+        self.samples_parsed = 0
+
+    def _accept_name(self, name: str) -> Optional[str]:
+        """Nome internado se a família foi pedida, senão None (memorizado)"""
+        try:
+            return self._name_cache[name]
+        except KeyError:
+            pass
+        accepted = self.families is None or name in self.families or any(
+            name.endswith(suffix) and name[:-len(suffix)] in self.families
+            for suffix in FAMILY_SUFFIXES)
+        result = sys.intern(name) if accepted else None
+        self._name_cache[name] = result
+        return result
+
+    def _accept_labels(self, line: str, start: int) -> bool:
+        """Filtro de labels direto no texto, sem decodificar o conjunto"""
+        for needle in self._label_needles:
+            position = line.find(needle, start)
+            # O label precisa começar após '{' ou ',' (evita casar 'xpod="')
+            while position != -1 and line[position - 1] not in '{, ':
+                position = line.find(needle, position + 1)
+            if position == -1:
+                continue
+            value_start = position + len(needle)
+            value_end = line.find('"', value_start)
+            if self._value_matches(line[value_start:value_end]):
+                return True
+        return False
+
+    def _value_matches(self, value: str) -> bool:
+        """Valor de label aceito por match_values ou match_pattern (memorizado)"""
+        if self.match_values is not None and value in self.match_values:
+            return True
+        if self.match_pattern is None:
+            return False
+        matched = self._value_cache.get(value)
+        if matched is None:
+            matched = self._value_cache[value] = bool(value) and \
+                self.match_pattern.fullmatch(value) is not None
+        return matched
+
+    def parse_labels(self, labels_str: str) -> Dict[str, str]:
+        """Decodifica o conteúdo entre chaves; resultado compartilhado via cache"""
+        labels = self._label_cache.get(labels_str)
+        if labels is not None:
+            return labels
+
+        intern = sys.intern
+        if '\\' not in labels_str:
+            # Sem escapes, '",' só ocorre entre pares
+            labels = {}
+            for pair in labels_str.rstrip(',').split('",'):
+                key, _, value = pair.partition('="')
+                if value.endswith('"'):
+                    value = value[:-1]
+                labels[intern(key.strip(' ,'))] = intern(value)
+        else:
+            labels = {intern(key): intern(re.sub(r'\\[\\"n]', lambda m: _UNESCAPE[m.group(0)], value))
+                      for key, value in _LABEL_PATTERN.findall(labels_str)}
+
+        if len(self._label_cache) >= self.label_cache_size:
+            self._label_cache.clear()
+        self._label_cache[labels_str] = labels
+        return labels
+
+    def parse_line(self, line: str) -> Optional[Sample]:
+        """Faz o parse de uma linha; None para comentários, filtradas ou inválidas"""
+        if not line or line[0] == '#':
+            return None
+
+        brace = line.find('{')
+        if brace != -1:
+            name = self._accept_name(line[:brace])
+            if name is None:
+                return None
+            if self._filter_labels and not self._accept_labels(line, brace):
+                return None
+            close = line.rfind('}')
+            if close < brace:
+                return None
+            labels = self.parse_labels(line[brace + 1:close])
+            rest = line[close + 1:].split()
+        else:
+            if self._filter_labels:
+                return None
+            parts = line.split()
+            if len(parts) < 2:
+                return None
+            name = self._accept_name(parts[0])
+            if name is None:
+                return None
+            labels = {}
+            rest = parts[1:]
+
+        if not rest:
+            return None
+        try:
+            value = float(rest[0])
+            timestamp_ms = int(rest[1]) if len(rest) > 1 else None
+        except ValueError:
+            return None
+        self.samples_parsed += 1
+        return Sample(name, labels, value, timestamp_ms)
+
+    def parse_lines(self, lines: Iterable[str]) -> Iterator[Sample]:
+        """Amostras aceitas de um iterável de linhas"""
+        parse_line = self.parse_line
+        for line in lines:
+            self.lines_read += 1
+            sample = parse_line(line.strip())
+            if sample is not None:
+                yield sample
+
+    def _candidate_lines(self, block: str) -> Iterator[str]:
+        """
+        Linhas de um bloco que podem passar pelos filtros.
+
+        Com poucos valores de label (ou poucas famílias), as ocorrências são
+        localizadas com str.find sobre o bloco inteiro e as demais linhas nunca
+        chegam a ser percorridas em Python. O teste exato fica com parse_line.
+        """
+        if self.match_pattern is None and self.match_values is not None and \
+                len(self.match_values) <= MAX_SCAN_NEEDLES:
+            needles = [f'="{value}"' for value in self.match_values]
+        elif self.families is not None and len(self.families) <= MAX_SCAN_NEEDLES:
+            needles = [f'\n{family}' for family in self.families]
+            block = '\n' + block
+        else:
+            yield from block.split('\n')
+            return
+
+        starts = set()
+        for needle in needles:
+            position = block.find(needle)
+            while position != -1:
+                start = block.rfind('\n', 0, position + 1) + 1
+                end = block.find('\n', position + len(needle))
+                if end == -1:
+                    end = len(block)
+                starts.add((start, end))
+                position = block.find(needle, end)
+        for start, end in sorted(starts):
+            yield block[start:end]
+
+    def parse(self, chunks: Chunks) -> Iterator[Sample]:
+        """
+        Parse de um texto completo ou de pedaços (bytes ou str) em streaming.
+
+        Bytes são decodificados incrementalmente (UTF-8), então um caractere
+        ou uma linha partidos entre pedaços não se perdem e o corpo nunca é
+        materializado inteiro.
+        """
+        parse_line = self.parse_line
+        for block in iter_blocks(chunks):
+            self.lines_read += block.count('\n') + 1
+            for line in self._candidate_lines(block):
+                sample = parse_line(line.strip())
+                if sample is not None:
+                    yield sample
+
+    def metric_names(self, chunks: Chunks) -> Set[str]:
+        """Nomes das métricas presentes, sem decodificar labels nem valores"""
+        names = set()
+        for line in iter_lines(chunks):
+            self.lines_read += 1
+            if not line or line[0] == '#':
+                continue
+            end = line.find('{')
+            if end == -1:
+                end = line.find(' ')
+            name = line[:end].strip() if end != -1 else line.strip()
+            if name and (self.families is None or self._accept_name(name) is not None):
+                names.add(name)
+        return names
+
+
+def iter_blocks(chunks: Chunks) -> Iterator[str]:
+    """Blocos de linhas completas (sem a quebra final), decodificando bytes incrementalmente"""
+    if isinstance(chunks, bytes):
+        chunks = [chunks]
+    elif isinstance(chunks, str):
+        chunks = [chunks]
+
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    pending = ''
+    for chunk in chunks:
+        text = decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+        cut = text.rfind('\n')
+        if cut == -1:
+            pending += text
+            continue
+        block = pending + text[:cut]
+        pending = text[cut + 1:]
+        if block:
+            yield block
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def iter_lines(chunks: Chunks) -> Iterator[str]:
+    """Linhas de um texto ou de pedaços, com decodificação incremental de bytes"""
+    for block in iter_blocks(chunks):
+        yield from block.split('\n')
+
+
+def stream_metrics(session, url: str, timeout: Optional[float] = None,
+                   chunk_size: int = 256 * 1024) -> Iterator[bytes]:
+    """Corpo de /metrics em pedaços, sem montar o texto inteiro em memória"""
+    with session.get(url, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        yield from response.iter_content(chunk_size=chunk_size)
+
+
+def _legacy_parse(text: str, pod_name: str) -> int:
+    """Parse anterior (regex por linha), mantido só como referência do benchmark"""
+    pattern = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)\{([^}]*)\}\s+([^\s]+)(?:\s+(\d+))?$')
+    label_pattern = r'([a-zA-Z_][a-zA-Z0-9_]*)="([^"]*)"'
+    matched = 0
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if f'pod="{pod_name}"' not in line and f'pod_name="{pod_name}"' not in line:
+            continue
+        match = pattern.match(line)
+        if match:
+            dict(re.findall(label_pattern, match.group(2)))
+            float(match.group(3))
+            matched += 1
+    return matched
+
+
+def benchmark(path: str, pod_names: Sequence[str] = (), families: Optional[Iterable[str]] = None,
+              repeat: int = 1, chunk_size: int = 256 * 1024,
+              pod_regex: Optional[str] = None) -> Dict:
+    """
+    Mede o parser sobre um /metrics gravado (opcionalmente repetido para
+    simular um nó maior), lido em pedaços como viria da rede.
+
+    Returns:
+        Linhas/s e amostras aceitas do parser novo e do parse por regex anterior
+    """
+    with open(path, 'rb') as f:
+        body = f.read() * repeat
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+    match_values = set(pod_names) if pod_names else None
+
+    filtered = match_values is not None or pod_regex is not None
+    parser = PrometheusTextParser(families, ('pod', 'pod_name') if filtered else (),
+                                  match_values, pod_regex)
+    began = time.perf_counter()
+    samples = sum(1 for _ in parser.parse(chunks))
+    elapsed = time.perf_counter() - began
+
+    result = {
+        'bytes': len(body),
+        'lines': parser.lines_read,
+        'samples': samples,
+        'seconds': elapsed,
+        'lines_per_second': parser.lines_read / elapsed
+    }
+    if pod_names:
+        text = body.decode('utf-8')
+        began = time.perf_counter()
+        result['legacy_samples'] = sum(_legacy_parse(text, pod) for pod in pod_names)
+        result['legacy_seconds'] = time.perf_counter() - began
+        result['legacy_lines_per_second'] = parser.lines_read * len(pod_names) / result['legacy_seconds']
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description='Benchmark do parser de /metrics do Prometheus')
+    arg_parser.add_argument('metrics_file', help='Saída de /metrics gravada (ex.: curl -s host:8080/metrics > m.txt)')
+    arg_parser.add_argument('--pod', action='append', default=[], help='Filtrar por pod (repetível)')
+    arg_parser.add_argument('--pod-regex', help='Filtrar pods por regex')
+    arg_parser.add_argument('--family', action='append', help='Família de métricas a manter (repetível)')
+    arg_parser.add_argument('--repeat', type=int, default=1, help='Repetir o arquivo N vezes')
+    args = arg_parser.parse_args()
+
+    result = benchmark(args.metrics_file, args.pod, args.family, args.repeat,
+                       pod_regex=args.pod_regex)
+    print(f"📊 {result['bytes'] / 1024 / 1024:.1f} MB, {result['lines']:,} linhas, "
+          f"{result['samples']:,} amostras aceitas")
+    print(f"⏱️ Parser em streaming: {result['lines_per_second']:,.0f} linhas/s ({result['seconds']:.3f}s)")
+    if 'legacy_seconds' in result:
+        print(f"⏱️ Parser anterior (regex): {result['legacy_lines_per_second']:,.0f} linhas/s "
+              f"({result['legacy_seconds']:.3f}s, {result['legacy_samples']:,} amostras)")
@@ -4,15 +4,23 @@ from pod_metrics_collector import PodMetricsCollector
 import sys
 
 def main():
-  #  if len(sys.argv) < 2:
-  #      print("Uso: python quick_pod_metrics.py <nome_do_pod>")
-  #      print("Exemplo: python quick_pod_metrics.py cpu-stress-job-l9rxd")
-  #      sys.exit(1)
+    if len(sys.argv) < 2:
+        print("Uso: python quick_pod_metrics.py <pod> [<pod> ...] | --regex <padrão>")
+        print("Exemplo: python quick_pod_metrics.py cpu-stress-job-l9rxd")
+        print("Exemplo: python quick_pod_metrics.py --regex 'cpu-stress-job-.*'")
+        sys.exit(1)
     
-    # pod_name = sys.argv[1]
-    pod_name = 'cpu-stress-job-l9rxd'
+    if sys.argv[1] == '--regex':
+        pods, pod_regex = [], sys.argv[2] if len(sys.argv) > 2 else None
+        if not pod_regex:
+            print("❌ Informe o padrão após --regex")
+            sys.exit(1)
+        label = pod_regex
+    else:
+        pods, pod_regex = sys.argv[1:], None
+        label = ', '.join(pods)
     
-    print(f"🚀 Coletando métricas do pod: {pod_name}")
+    print(f"🚀 Coletando métricas dos pods: {label}")
     print("=" * 50)
     
     # Criar coletor
@@ -24,19 +32,19 @@ def main():
         print("Execute: microk8s kubectl port-forward -n monitoring svc/cadvisor 8080:8080")
         sys.exit(1)
     
-    # Coletar métricas
-    metrics = collector.collect_pod_metrics(pod_name)
+    # Coletar métricas (um único scrape para todos os pods)
+    metrics = collector.collect_pods_metrics(pods, pod_regex)
     
     if metrics:
         collector.print_metrics_summary(metrics)
         
         # Salvar em CSV
         df = collector.metrics_to_dataframe(metrics)
-        filename = f"{pod_name}_metrics.csv"
+        filename = f"{pods[0]}_metrics.csv" if len(pods) == 1 else "pods_metrics.csv"
         df.to_csv(filename, index=False)
-        print(f"\n💾 Métricas salvas em: {filename}")
+        print(f"\n💾 Métricas de {df['pod_name'].nunique()} pods salvas em: {filename}")
     else:
-        print(f"❌ Pod '{pod_name}' não encontrado")
+        print(f"❌ Nenhum pod encontrado para: {label}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
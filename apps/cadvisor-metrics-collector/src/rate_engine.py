@@ -0,0 +1,228 @@
+import logging
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+MB = 1024 * 1024
+
+# contador -> (coluna de taxa, fator aplicado ao incremento por segundo)
+PROCESSOR_COUNTERS: Dict[str, Tuple[str, float]] = {
+    'cpu_total_usage': ('cpu_cores', 1e-9),          # ns -> cores
+    'cpu_system_usage': ('cpu_system_cores', 1e-9),
+    'cpu_user_usage': ('cpu_user_cores', 1e-9),
+    'network_rx_mb': ('network_rx_bytes_per_s', MB),
+    'network_tx_mb': ('network_tx_bytes_per_s', MB),
+    'network_rx_packets': ('network_rx_packets_per_s', 1.0),
+    'network_tx_packets': ('network_tx_packets_per_s', 1.0),
+}
+
+# Colunas de PodMetricsCollector.metrics_to_dataframe
+POD_METRICS_COUNTERS: Dict[str, Tuple[str, float]] = {
+    'cpu_throttled_seconds': ('cpu_throttled_cores', 1.0),
+    'cpu_throttled_periods': ('cpu_throttled_periods_per_s', 1.0),
+    'network_rx_bytes': ('network_rx_bytes_per_s', 1.0),
+    'network_tx_bytes': ('network_tx_bytes_per_s', 1.0),
+    'network_rx_packets': ('network_rx_packets_per_s', 1.0),
+    'network_tx_packets': ('network_tx_packets_per_s', 1.0),
+    'network_rx_errors': ('network_rx_errors_per_s', 1.0),
+    'network_tx_errors': ('network_tx_errors_per_s', 1.0),
+    'fs_reads': ('fs_reads_per_s', 1.0),
+    'fs_writes': ('fs_writes_per_s', 1.0),
+    'fs_read_bytes': ('fs_read_bytes_per_s', 1.0),
+    'fs_write_bytes': ('fs_write_bytes_per_s', 1.0),
+}
+
+
+def pod_metrics_counters(cpu_scale: float) -> Dict[str, Tuple[str, float]]:
+    """
+    Contadores de PodMetrics com o fator de CPU da fonte.
+
+    Args:
+        cpu_scale: converte a unidade do contador de CPU em segundos
+            (1e-9 para os ns da API REST, 1.0 para *_seconds_total do Prometheus)
+    """
+    return {
+        'cpu_usage_total': ('cpu_usage_rate', cpu_scale),
+        'cpu_usage_user': ('cpu_user_rate', cpu_scale),
+        'cpu_usage_system': ('cpu_system_rate', cpu_scale),
+        **POD_METRICS_COUNTERS
+    }
+
+
+def _counter_increase(values: np.ndarray, seconds: np.ndarray,
+                        same_series: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Incremento entre amostras consecutivas da mesma série.
+
+    Um valor menor que o anterior é um reset (restart ou overflow): o
+    incremento passa a ser o próprio valor novo, como no rate() do Prometheus.
+
+    Returns:
+        (incremento, intervalo em segundos, máscara de reset), alinhados à
+        amostra posterior de cada par
+    """
+    delta = np.diff(values)
+    dt = np.diff(seconds)
+    reset = same_series & (delta < 0)
+    increase = np.where(reset, values[1:], delta)
+    return increase, dt, reset
+
+
+def counter_rates(df: pd.DataFrame, counters: Dict[str, Tuple[str, float]],
+                  key_columns: Sequence[str], time_column: str = 'timestamp') -> pd.DataFrame:
+    """
+    Converte contadores cumulativos em taxas por segundo, vetorizado.
+
+    Amostras são ordenadas por série e tempo; duplicatas (janelas de stats
+    sobrepostas, count > 1) são descartadas. O intervalo real entre amostras
+    é usado em cada par, então espaçamento irregular não distorce a taxa. A
+    primeira amostra de cada série (ex.: container reiniciado com novo path)
+    fica com NaN.
+
+    Args:
+        df: DataFrame com key_columns, time_column e os contadores
+        counters: {coluna contador: (coluna taxa, fator)}
+        key_columns: colunas que identificam a série
+        time_column: coluna datetime64
+
+    Returns:
+        Cópia ordenada de df com as colunas de taxa e 'counter_reset'
+    """
+    key_columns = list(key_columns)
+    present = {c: spec for c, spec in counters.items() if c in df.columns}
+    out = (df.sort_values(key_columns + [time_column], kind='stable')
+             .drop_duplicates(key_columns + [time_column], keep='last'))
+
+    n = len(out)
+    reset_any = np.zeros(n, dtype=bool)
+    if n == 0:
+        for column, (rate_column, _) in present.items():
+            out[rate_column] = pd.Series(dtype=float)
+        out['counter_reset'] = reset_any
+        return out
+
+    codes = out.groupby(key_columns, sort=False, observed=True).ngroup().to_numpy()
+    same_series = codes[1:] == codes[:-1]
+    ns = out[time_column].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    seconds = (ns - ns.min()) / 1e9  # relativo ao início preserva precisão sub-µs
+    valid = same_series & (np.diff(seconds) > 0)
+
+    for column, (rate_column, factor) in present.items():
+        values = out[column].to_numpy(dtype=float)
+        increase, dt, reset = _counter_increase(values, seconds, same_series)
+        rate = np.full(n, np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate[1:] = np.where(valid, increase / dt * factor, np.nan)
+        out[rate_column] = rate
+        reset_any[1:] |= reset
+
+    out['counter_reset'] = reset_any
+    return out
+
+
+class CounterRateTracker:
+    """Versão incremental de counter_rates: guarda só a última amostra por série"""
+
+    def __init__(self, counters: Dict[str, Tuple[str, float]], key_columns: Sequence[str],
+                 time_column: str = 'timestamp', stale_after_seconds: float = 600):
+        """
+        Args:
+            counters: {coluna contador: (coluna taxa, fator)}
+            key_columns: colunas que identificam a série
+            time_column: coluna datetime64
+            stale_after_seconds: séries sem amostras há mais tempo são esquecidas
+        """
+        self.counters = counters
+        self.key_columns = list(key_columns)
+        self.time_column = time_column
+        self.stale_after_seconds = stale_after_seconds
+        self.logger = logging.getLogger(__name__)
+        # chave -> (timestamp em ns, {contador: valor})
+        self._last: Dict[Tuple, Tuple[int, Dict[str, float]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._last)
+
+    def update(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Calcula as taxas de um lote usando a última amostra de cada série já vista.
+
+        O lote pode conter várias amostras por série e chegar fora de ordem
+        dentro de si; amostras anteriores à última já vista são ignoradas.
+        """
+        if df.empty:
+            return counter_rates(df, self.counters, self.key_columns, self.time_column)
+
+        present = [c for c in self.counters if c in df.columns]
+        keys = df[self.key_columns].drop_duplicates().itertuples(index=False, name=None)
+        prefix_rows = []
+        for key in keys:
+            last = self._last.get(key)
+            if last is not None:
+                row = dict(zip(self.key_columns, key))
+                row['_last_ns'] = last[0]
+                row.update(last[1])
+                prefix_rows.append(row)
+
+        combined = df.assign(_prefix=False)
+        if prefix_rows:
+            prefix = pd.DataFrame(prefix_rows)
+            for column in self.key_columns:
+                if isinstance(df[column].dtype, pd.CategoricalDtype):
+                    prefix[column] = pd.Categorical(prefix[column], dtype=df[column].dtype)
+
+            # Amostras não posteriores à última já vista não geram taxa nova
+            last_ns = combined[self.key_columns].merge(
+                prefix[self.key_columns + ['_last_ns']], on=self.key_columns, how='left'
+            )['_last_ns'].to_numpy(dtype=float)
+            sample_ns = combined[self.time_column].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+            combined = combined[~(sample_ns <= last_ns)]
+
+            prefix[self.time_column] = pd.to_datetime(prefix.pop('_last_ns'), unit='ns')
+            combined = pd.concat([prefix.assign(_prefix=True), combined], ignore_index=True)
+
+        rated = counter_rates(combined, self.counters, self.key_columns, self.time_column)
+
+        # Atualiza o estado com a amostra mais recente de cada série
+        tail = rated.groupby(self.key_columns, sort=False, observed=True).tail(1)
+        tail_ns = tail[self.time_column].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        values = tail[present].to_numpy(dtype=float)
+        for i, key in enumerate(tail[self.key_columns].itertuples(index=False, name=None)):
+            self._last[key] = (int(tail_ns[i]), dict(zip(present, values[i])))
+        if len(tail_ns):
+            self._evict(int(tail_ns.max()))
+
+        return rated[~rated['_prefix'].astype(bool)].drop(columns='_prefix')
+
+    def update_sample(self, key: Tuple, timestamp, values: Dict[str, float]) -> Dict[str, Optional[float]]:
+        """
+        Versão por amostra de update(), para coletores que produzem um objeto por vez.
+
+        Returns:
+            {coluna taxa: valor ou None na primeira amostra da série}
+        """
+        now = pd.Timestamp(timestamp).value
+        last = self._last.get(key)
+        rates: Dict[str, Optional[float]] = {}
+        for column, (rate_column, factor) in self.counters.items():
+            if column not in values:
+                continue
+            rates[rate_column] = None
+            if last is None or column not in last[1] or now <= last[0]:
+                continue
+            previous = last[1][column]
+            value = float(values[column])
+            increase = value if value < previous else value - previous
+            rates[rate_column] = increase / ((now - last[0]) / 1e9) * factor
+
+        if last is None or now > last[0]:
+            self._last[key] = (now, {c: float(v) for c, v in values.items() if c in self.counters})
+        return rates
+
+    def _evict(self, now_ns: int):
+        """Remove séries sem amostras recentes para manter o estado O(séries ativas)"""
+        cutoff = now_ns - int(self.stale_after_seconds * 1e9)
+        stale = [key for key, (seen, _) in self._last.items() if seen < cutoff]
+        for key in stale:
+            del self._last[key]
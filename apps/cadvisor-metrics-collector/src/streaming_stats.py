@@ -0,0 +1,254 @@
+import logging
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from keyed_arrays import KeyedArrays
+
+
+class StreamingMetricsAggregator:
+    """
+    Estatísticas por container atualizadas em passagem única.
+
+    Para cada (container, métrica) mantém contagem, média e M2 (Welford,
+    combinados por lote com a fórmula de Chan), mínimo, máximo e último valor.
+    Quantis aproximados vêm de histogramas em buckets logarítmicos com erro
+    relativo limitado. Nada do histórico bruto é guardado: resumo e top-N
+    custam O(containers).
+    """
+
+    def __init__(self, metrics: Sequence[str],
+                 quantile_metrics: Optional[Sequence[str]] = None,
+                 key_column: str = 'container_name',
+                 time_column: str = 'timestamp',
+                 relative_accuracy: float = 0.025,
+                 min_value: float = 1e-3,
+                 max_value: float = 1e18):
+        """
+        Args:
+            metrics: colunas numéricas agregadas
+            quantile_metrics: métricas com quantis por container (as demais só
+                têm quantis globais); default: todas
+            key_column: coluna que identifica o container
+            time_column: coluna datetime usada para o intervalo de tempo
+            relative_accuracy: erro relativo máximo dos quantis
+            min_value / max_value: faixa coberta pelos buckets; valores <= min_value
+                caem no bucket zero
+        """
+        self.logger = logging.getLogger(__name__)
+        self.metrics = list(metrics)
+        self.quantile_metrics = list(quantile_metrics) if quantile_metrics is not None else list(self.metrics)
+        unknown = set(self.quantile_metrics) - set(self.metrics)
+        if unknown:
+            raise ValueError(f"quantile_metrics fora de metrics: {sorted(unknown)}")
+        self.key_column = key_column
+        self.time_column = time_column
+
+        # Buckets geométricos de razão gamma: representante no centro tem erro <= alpha
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.min_value = min_value
+        self.n_buckets = int(np.ceil(np.log(max_value / min_value) / np.log(self.gamma))) + 2
+        self._log_gamma = np.log(self.gamma)
+
+        self.total_records = 0
+        self.first_timestamp: Optional[pd.Timestamp] = None
+        self.last_timestamp: Optional[pd.Timestamp] = None
+
+        m = len(self.metrics)
+        self._quantile_index = [self.metrics.index(q) for q in self.quantile_metrics]
+        self.global_hist = np.zeros((m, self.n_buckets), dtype=np.int64)
+        self.state = KeyedArrays(
+            count=((m,), np.int64, 0), mean=((m,), float, 0.0), m2=((m,), float, 0.0),
+            min=((m,), float, np.inf), max=((m,), float, -np.inf), last=((m,), float, np.nan),
+            hist=((len(self.quantile_metrics), self.n_buckets), np.uint32, 0))
+
+    @property
+    def container_ids(self) -> Dict[str, int]:
+        return self.state.ids
+
+    @property
+    def container_names(self) -> List[str]:
+        return self.state.keys
+
+    def _bucket(self, values: np.ndarray) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            index = np.floor(np.log(values / self.min_value) / self._log_gamma) + 1
+        index = np.where(values > self.min_value, index, 0)
+        return np.clip(index, 0, self.n_buckets - 1).astype(np.int64)
+
+    def update(self, df: pd.DataFrame):
+        """Incorpora um lote (qualquer número de amostras e containers)"""
+        if df.empty:
+            return
+        if self.time_column in df.columns:
+            df = df.sort_values(self.time_column, kind='stable')
+            times = df[self.time_column]
+            first, last = times.min(), times.max()
+            if self.first_timestamp is None or first < self.first_timestamp:
+                self.first_timestamp = first
+            if self.last_timestamp is None or last > self.last_timestamp:
+                self.last_timestamp = last
+
+        codes, uniques = pd.factorize(df[self.key_column].astype(str), sort=False)
+        ids = self.state.lookup(np.asarray(uniques))
+        self.total_records += len(df)
+
+        values = np.column_stack([
+            df[m].to_numpy(dtype=float) if m in df.columns else np.full(len(df), np.nan)
+            for m in self.metrics
+        ])
+        k = len(uniques)
+
+        # Agrupa as linhas por container (ordem estável preserva a ordem temporal)
+        order = np.argsort(codes, kind='stable')
+        codes_sorted = codes[order]
+        values = values[order]
+        finite = np.isfinite(values)
+        starts = np.searchsorted(codes_sorted, np.arange(k))
+
+        # Estatísticas do lote por container, ignorando NaN
+        n_b = np.add.reduceat(finite.astype(np.int64), starts, axis=0)
+        sums = np.add.reduceat(np.where(finite, values, 0.0), starts, axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_b = np.where(n_b > 0, sums / n_b, 0.0)
+        dev = np.where(finite, values - mean_b[codes_sorted], 0.0)
+        m2_b = np.add.reduceat(dev * dev, starts, axis=0)
+        min_b = np.minimum.reduceat(np.where(finite, values, np.inf), starts, axis=0)
+        max_b = np.maximum.reduceat(np.where(finite, values, -np.inf), starts, axis=0)
+
+        # Último valor finito de cada (container, métrica) no lote
+        row = np.where(finite, np.arange(len(values))[:, None], -1)
+        last_row = np.maximum.reduceat(row, starts, axis=0)
+        has_last = last_row >= 0
+        last_b = np.where(has_last, values[np.maximum(last_row, 0), np.arange(values.shape[1])], np.nan)
+
+        # Combinação de Chan: (n_a, mean_a, M2_a) + (n_b, mean_b, M2_b)
+        n_a = self.state.count[ids]
+        mean_a = self.state.mean[ids]
+        n = n_a + n_b
+        delta = mean_b - mean_a
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = np.where(n > 0, n_b / n, 0.0)
+            correction = np.where(n > 0, delta * delta * n_a * n_b / n, 0.0)
+        self.state.mean[ids] = np.where(n_b > 0, mean_a + delta * weight, mean_a)
+        self.state.m2[ids] = self.state.m2[ids] + m2_b + correction
+        self.state.count[ids] = n
+        self.state.min[ids] = np.minimum(self.state.min[ids], min_b)
+        self.state.max[ids] = np.maximum(self.state.max[ids], max_b)
+        self.state.last[ids] = np.where(has_last, last_b, self.state.last[ids])
+
+        # Histogramas: globais para todas as métricas, por container só nas selecionadas
+        row_ids = ids[codes_sorted]
+        buckets = self._bucket(np.where(finite, values, 0.0))
+        for j in range(len(self.metrics)):
+            self.global_hist[j] += np.bincount(buckets[finite[:, j], j], minlength=self.n_buckets)
+        for h, j in enumerate(self._quantile_index):
+            mask = finite[:, j]
+            np.add.at(self.state.hist, (row_ids[mask], h, buckets[mask, j]), 1)
+
+    def update_many(self, frames):
+        """Atualiza a partir de um iterável de lotes"""
+        for frame in frames:
+            self.update(frame)
+
+    def _bucket_values(self) -> np.ndarray:
+        """Valor representativo de cada bucket (centro geométrico)"""
+        i = np.arange(self.n_buckets)
+        values = self.min_value * self.gamma ** (i - 1) * (1 + self.gamma) / 2
+        values[0] = 0.0
+        return values
+
+    def _quantiles_from_hist(self, hist: np.ndarray, qs: Sequence[float],
+                             lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
+        """Quantis de histogramas (..., buckets) limitados a [mínimo, máximo] observados"""
+        cumulative = np.cumsum(hist, axis=-1)
+        total = cumulative[..., -1:]
+        representative = self._bucket_values()
+        result = []
+        for q in qs:
+            rank = np.ceil(q * total).clip(min=1)
+            index = (cumulative < rank).sum(axis=-1).clip(max=self.n_buckets - 1)
+            value = representative[index]
+            with np.errstate(invalid='ignore'):
+                value = np.clip(value, lower, upper)
+            result.append(np.where(total[..., 0] > 0, value, np.nan))
+        return np.stack(result, axis=-1)
+
+    def _active(self) -> int:
+        return len(self.container_names)
+
+    def container_summary(self, metric: str, quantiles: Sequence[float] = (0.5, 0.9, 0.99)) -> pd.DataFrame:
+        """Resumo por container de uma métrica: contagem, média, std, min, max, último e quantis"""
+        if metric not in self.metrics:
+            raise ValueError(f"Métrica '{metric}' não agregada")
+        j = self.metrics.index(metric)
+        c = self._active()
+        count = self.state.count[:c, j]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std = np.sqrt(np.where(count > 1, self.state.m2[:c, j] / (count - 1), np.nan))
+        has = count > 0
+        summary = pd.DataFrame({
+            'count': count,
+            'mean': np.where(has, self.state.mean[:c, j], np.nan),
+            'std': std,
+            'min': np.where(has, self.state.min[:c, j], np.nan),
+            'max': np.where(has, self.state.max[:c, j], np.nan),
+            'last': self.state.last[:c, j]
+        }, index=pd.Index(self.container_names, name=self.key_column))
+
+        if metric in self.quantile_metrics and len(quantiles):
+            h = self.quantile_metrics.index(metric)
+            values = self._quantiles_from_hist(self.state.hist[:c, h], quantiles,
+                                               summary['min'].to_numpy(), summary['max'].to_numpy())
+            for i, q in enumerate(quantiles):
+                summary[f"p{int(round(q * 100))}"] = values[:, i]
+        return summary
+
+    def top_consumers(self, metric: str, top_n: int = 5, by: str = 'mean') -> pd.DataFrame:
+        """Top-N containers por média (ou 'max'/'last') de uma métrica, em O(containers)"""
+        summary = self.container_summary(metric, quantiles=())
+        score = summary[by].to_numpy()
+        valid = np.flatnonzero(np.isfinite(score))
+        if len(valid) > top_n:
+            valid = valid[np.argpartition(-score[valid], top_n - 1)[:top_n]]
+        order = valid[np.argsort(-score[valid], kind='stable')]
+        return summary.iloc[order][['mean', 'max', 'std']]
+
+    def summary(self) -> Dict:
+        """Resumo global no formato de MetricsProcessor.get_summary_statistics"""
+        c = self._active()
+        start, end = self.first_timestamp, self.last_timestamp
+        summary = {
+            'total_containers': c,
+            'total_records': self.total_records,
+            'time_range': {
+                'start': start.isoformat() if start is not None else None,
+                'end': end.isoformat() if end is not None else None,
+                'duration_minutes': (end - start).total_seconds() / 60 if start is not None else 0.0
+            },
+            'metrics_summary': {}
+        }
+
+        count = self.state.count[:c]
+        total = count.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = (self.state.mean[:c] * count).sum(axis=0) / total
+            # Variância global = dentro dos containers + entre containers
+            m2 = self.state.m2[:c].sum(axis=0) + (count * (self.state.mean[:c] - mean) ** 2).sum(axis=0)
+            std = np.sqrt(m2 / (total - 1))
+        minimum = self.state.min[:c].min(axis=0) if c else np.full(len(self.metrics), np.nan)
+        maximum = self.state.max[:c].max(axis=0) if c else np.full(len(self.metrics), np.nan)
+        median = self._quantiles_from_hist(self.global_hist, [0.5], minimum, maximum)[:, 0]
+
+        for j, metric in enumerate(self.metrics):
+            if total[j] == 0:
+                continue
+            summary['metrics_summary'][metric] = {
+                'mean': float(mean[j]),
+                'median': float(median[j]),
+                'std': float(std[j]) if total[j] > 1 else float('nan'),
+                'min': float(minimum[j]),
+                'max': float(maximum[j])
+            }
+        return summary
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Testes do armazenamento colunar de PodMetrics (PodMetricsBuffer)
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from pod_metrics_collector import (FIELD_COLUMNS, KEY_FIELDS, MB, PodMetrics, PodMetricsBuffer,
+                                   PodMetricsCollector)
+
+class TestPodMetricsBuffer(unittest.TestCase):
+    def _metric(self, **values):
+        return PodMetrics(pod_name='app-0', container_name='app', namespace='default',
+                          timestamp=datetime(2025, 1, 1), **values)
+    
+    def test_unlimited_memory_container(self):
+        # cAdvisor reporta spec.memory.limit = 2^64-1 para container sem limite
+        metric = self._metric(memory_usage=512 * 1024 * 1024, memory_limit=2 ** 64 - 1)
+        
+        df = PodMetricsCollector.metrics_to_dataframe(None, [metric])
+        
+        self.assertEqual(df['memory_limit_bytes'].iloc[0], 0)
+        self.assertEqual(df['memory_utilization_pct'].iloc[0], 0)
+        self.assertEqual(df['memory_usage_mb'].iloc[0], 512)
+    
+    def test_unlimited_memory_from_api(self):
+        collector = PodMetricsCollector()
+        container = {'spec': {'memory': {'limit': 2 ** 64 - 1}, 'labels': {}}}
+        stat = {'timestamp': '2025-01-01T00:00:00Z', 'memory': {'usage': 1024}}
+        
+        metric = collector._create_pod_metrics_from_api(container, stat, 'app-0')
+        buffer = PodMetricsBuffer()
+        buffer.extend([metric, metric])
+        
+        self.assertEqual(metric.memory_limit, 0)
+        self.assertEqual(len(buffer.to_dataframe()), 2)
+    
+    def test_dataframe_columns_are_views(self):
+        buffer = PodMetricsBuffer(capacity=2)
+        for i in range(5):
+            metric = self._metric(memory_usage=i * MB, cpu_usage_total=float(i))
+            metric.rates = {'network_rx_bytes_per_s': 10.0 * i}
+            buffer.append(metric)
+        
+        df = buffer.to_dataframe()
+        for name in buffer.numeric_fields:
+            column = df[FIELD_COLUMNS.get(name, name)].to_numpy()
+            self.assertTrue(np.shares_memory(column, buffer.columns[name]), name)
+        self.assertTrue(np.shares_memory(df['network_rx_bytes_per_s'].to_numpy(),
+                                         buffer.columns['network_rx_bytes_per_s']))
+        self.assertEqual(df['cpu_usage_total'].tolist(), [0.0, 1.0, 2.0, 3.0, 4.0])
+    
+    def test_bytes_per_sample_after_growth(self):
+        buffer = PodMetricsBuffer(capacity=4)
+        start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        for i in range(1000):
+            buffer.append(PodMetrics(f'app-{i % 10}', 'app', 'default', start + timedelta(seconds=i)))
+        
+        # Só os campos numéricos: 8 bytes por coluna, códigos int32 e timestamp int64
+        row_bytes = 8 * len(buffer.columns) + 4 * len(KEY_FIELDS) + 8
+        capacity = len(buffer.timestamps)
+        self.assertEqual(buffer.nbytes, capacity * row_bytes)
+        self.assertLess(capacity, 2 * len(buffer))
+        self.assertEqual(buffer.categories['pod_name'], [f'app-{i}' for i in range(10)])
+    
+    def test_mixed_timestamps_are_utc(self):
+        # --method both: API com fuso e Prometheus/chamadores com hora local sem fuso
+        aware = PodMetrics('app-0', 'app', 'default', datetime.now(timezone.utc))
+        naive = PodMetrics('app-0', 'app', 'default', datetime.now())
+        
+        timestamps = PodMetricsCollector.metrics_to_dataframe(None, [aware, naive])['timestamp']
+        
+        self.assertEqual(str(timestamps.dt.tz), 'UTC')
+        self.assertLess(abs((timestamps.iloc[1] - timestamps.iloc[0]).total_seconds()), 5)
+
+if __name__ == '__main__':
+    unittest.main()
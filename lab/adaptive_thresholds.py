@@ -0,0 +1,309 @@
+"""
+Thresholds Adaptativos por Série - Sketches de Quantis em Streaming
+Descrição: Mantém um sketch de quantis mesclável (estilo KLL) por
+          (pod, container, métrica) numa janela deslizante e rotula amostras
+          em relação aos p95/p99 da própria série, em vez de percentuais globais.
+          O estado é incremental e persistido em JSON entre execuções.
+"""
+
+import json
+import math
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class KLLSketch:
+    """Sketch de quantis mesclável (KLL) com memória O(k log(n/k))"""
+
+    def __init__(self, k: int = 200, c: float = 2.0 / 3.0):
+        """
+        Inicializa sketch vazio
+
+        Args:
+            k: Capacidade do compactador de nível mais alto (precisão)
+            c: Fator de decaimento da capacidade entre níveis
+        """
+        self.k = k
+        self.c = c
+        self.n = 0
+        self.compactors: List[List[float]] = [[]]
+        # Alterna o offset de compactação de forma determinística
+        self._offset = 0
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return max(2, int(math.ceil(self.k * (self.c ** depth))))
+
+    def _compress(self):
+        """Compacta níveis acima da capacidade até o sketch ficar dentro do limite"""
+        level = 0
+        while level < len(self.compactors):
+            if len(self.compactors[level]) >= self._capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append([])
+                items = sorted(self.compactors[level])
+                # Em tamanho ímpar, o último item permanece no nível atual
+                keep = [items.pop()] if len(items) % 2 == 1 else []
+                self.compactors[level + 1].extend(items[self._offset::2])
+                self.compactors[level] = keep
+                self._offset ^= 1
+                # Novo nível altera capacidades: recomeça a varredura
+                level = 0
+                continue
+            level += 1
+
+    def update(self, value: float):
+        """Adiciona um valor ao sketch"""
+        self.update_many([value])
+
+    def update_many(self, values) -> None:
+        """Adiciona vários valores de uma vez (ignora NaN)"""
+        values = [float(v) for v in values if v == v]
+        if not values:
+            return
+        self.compactors[0].extend(values)
+        self.n += len(values)
+        self._compress()
+
+    def merge(self, other: 'KLLSketch') -> 'KLLSketch':
+        """Mescla outro sketch neste (in-place) e retorna self"""
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.n += other.n
+        self._compress()
+        return self
+
+    def quantiles(self, qs: List[float]) -> List[float]:
+        """Retorna os quantis aproximados solicitados (NaN se vazio)"""
+        weighted = [(v, 1 << level)
+                    for level, items in enumerate(self.compactors) for v in items]
+        if not weighted:
+            return [np.nan] * len(qs)
+
+        weighted.sort(key=lambda x: x[0])
+        values = np.fromiter((v for v, _ in weighted), dtype=float, count=len(weighted))
+        cum_weights = np.cumsum([w for _, w in weighted], dtype=float)
+        total = cum_weights[-1]
+
+        idx = np.searchsorted(cum_weights, np.asarray(qs, dtype=float) * total, side='left')
+        idx = np.clip(idx, 0, len(values) - 1)
+        return [float(values[i]) for i in idx]
+
+    def size(self) -> int:
+        """Número de itens retidos (memória efetiva do sketch)"""
+        return sum(len(items) for items in self.compactors)
+
+    def to_dict(self) -> Dict:
+        return {'k': self.k, 'c': self.c, 'n': self.n,
+                'offset': self._offset, 'compactors': self.compactors}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'KLLSketch':
+        sketch = cls(k=data['k'], c=data['c'])
+        sketch.n = data['n']
+        sketch._offset = data.get('offset', 0)
+        sketch.compactors = [list(items) for items in data['compactors']] or [[]]
+        return sketch
+
+
+class WindowedSketch:
+    """Janela deslizante de sketches agrupados em buckets de tempo"""
+
+    def __init__(self, bucket_seconds: int = 3600, window_buckets: int = 24, k: int = 200):
+        """
+        Args:
+            bucket_seconds: Largura de cada bucket de tempo em segundos
+            window_buckets: Número de buckets mantidos na janela
+            k: Precisão de cada sketch
+        """
+        self.bucket_seconds = bucket_seconds
+        self.window_buckets = window_buckets
+        self.k = k
+        self.buckets: Dict[int, KLLSketch] = {}
+
+    def _evict(self, newest_bucket: int):
+        oldest_allowed = newest_bucket - self.window_buckets + 1
+        for bucket in [b for b in self.buckets if b < oldest_allowed]:
+            del self.buckets[bucket]
+
+    def update_bucket(self, bucket: int, values):
+        """Adiciona valores ao bucket indicado e descarta buckets fora da janela"""
+        if bucket not in self.buckets:
+            self.buckets[bucket] = KLLSketch(k=self.k)
+        self.buckets[bucket].update_many(values)
+        self._evict(max(self.buckets))
+
+    def merged(self, until_bucket: Optional[int] = None) -> KLLSketch:
+        """Retorna um sketch com todos os buckets da janela (opcionalmente até um bucket)"""
+        result = KLLSketch(k=self.k)
+        for bucket, sketch in self.buckets.items():
+            if until_bucket is None or (until_bucket - self.window_buckets < bucket <= until_bucket):
+                result.merge(sketch)
+        return result
+
+    def count(self) -> int:
+        return sum(s.n for s in self.buckets.values())
+
+    def to_dict(self) -> Dict:
+        return {str(b): s.to_dict() for b, s in self.buckets.items()}
+
+    def load_buckets(self, data: Dict):
+        self.buckets = {int(b): KLLSketch.from_dict(s) for b, s in data.items()}
+        # A janela pode ter sido reduzida desde o salvamento
+        if self.buckets:
+            self._evict(max(self.buckets))
+
+
+class AdaptiveThresholdLabeler:
+    """Rotula amostras em relação aos quantis da própria série (pod, container, métrica)"""
+
+    DEFAULT_METRICS = ['memory_usage_percent', 'cpu_usage_percent', 'disk_usage_percent']
+
+    def __init__(self,
+                 metrics: Optional[List[str]] = None,
+                 warning_quantile: float = 0.95,
+                 critical_quantile: float = 0.99,
+                 bucket_seconds: int = 3600,
+                 window_buckets: int = 24,
+                 min_samples: int = 30,
+                 k: int = 200):
+        """
+        Inicializa labeler adaptativo
+
+        Args:
+            metrics: Colunas a monitorar (default: uso percentual de memória/CPU/disco)
+            warning_quantile: Quantil que define o nível de warning (default: p95)
+            critical_quantile: Quantil que define o nível crítico (default: p99)
+            bucket_seconds: Largura do bucket de tempo dos sketches
+            window_buckets: Buckets mantidos na janela deslizante
+            min_samples: Amostras mínimas no histórico antes de rotular a série
+            k: Precisão dos sketches KLL
+        """
+        if not (0 < warning_quantile < critical_quantile < 1):
+            raise ValueError(
+                f"Quantis inválidos! Devem estar em (0, 1) e em ordem: warning < critical. "
+                f"Valores fornecidos: warning={warning_quantile}, critical={critical_quantile}"
+            )
+
+        self.metrics = metrics or list(self.DEFAULT_METRICS)
+        self.warning_quantile = warning_quantile
+        self.critical_quantile = critical_quantile
+        self.bucket_seconds = bucket_seconds
+        self.window_buckets = window_buckets
+        self.min_samples = min_samples
+        self.k = k
+        self.series: Dict[Tuple[str, str, str], WindowedSketch] = {}
+
+    def _get_series(self, key: Tuple[str, str, str]) -> WindowedSketch:
+        if key not in self.series:
+            self.series[key] = WindowedSketch(self.bucket_seconds, self.window_buckets, self.k)
+        return self.series[key]
+
+    def label(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Adiciona labels adaptativos ao DataFrame e atualiza os sketches
+
+        Cada bucket de tempo é rotulado com os quantis do histórico anterior a ele
+        (buckets já vistos nesta ou em execuções passadas) e só depois incorporado
+        ao sketch, para que uma regressão não eleve o próprio limiar.
+
+        Colunas criadas por métrica:
+        - {metrica}_adaptive_p95 / {metrica}_adaptive_p99: limiares da série
+        - {metrica}_above_p95 / {metrica}_above_p99: 1 se a amostra excede o limiar
+        E no total:
+        - adaptive_severity: 0 (normal), 1 (acima do p95), 2 (acima do p99)
+        """
+        metrics = [m for m in self.metrics if m in df.columns]
+        if not metrics:
+            logger.warning("Nenhuma métrica disponível para thresholds adaptativos")
+            df['adaptive_severity'] = 0
+            return df
+
+        logger.info(f"Aplicando thresholds adaptativos em: {metrics}")
+
+        epoch_seconds = (df['timestamp'] - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+        buckets = (epoch_seconds // self.bucket_seconds).to_numpy()
+        qs = [self.warning_quantile, self.critical_quantile]
+
+        df['adaptive_severity'] = 0
+        for metric in metrics:
+            p_warn = np.full(len(df), np.nan)
+            p_crit = np.full(len(df), np.nan)
+            values = df[metric].to_numpy(dtype=float)
+
+            positions = pd.Series(np.arange(len(df)), index=df.index)
+            for (pod, container), group_pos in positions.groupby([df['pod'], df['container']], sort=False):
+                series = self._get_series((str(pod), str(container), metric))
+                idx = group_pos.to_numpy()
+                group_buckets = buckets[idx]
+
+                for bucket in np.unique(group_buckets):
+                    in_bucket = idx[group_buckets == bucket]
+                    history = series.merged(until_bucket=int(bucket) - 1)
+                    if history.n >= self.min_samples:
+                        p_warn[in_bucket], p_crit[in_bucket] = history.quantiles(qs)
+                    series.update_bucket(int(bucket), values[in_bucket])
+
+            df[f'{metric}_adaptive_p95'] = p_warn
+            df[f'{metric}_adaptive_p99'] = p_crit
+            df[f'{metric}_above_p95'] = (values > p_warn).astype(int)
+            df[f'{metric}_above_p99'] = (values > p_crit).astype(int)
+
+            df['adaptive_severity'] = np.maximum(df['adaptive_severity'], df[f'{metric}_above_p95'])
+            df.loc[df[f'{metric}_above_p99'] == 1, 'adaptive_severity'] = 2
+
+        logger.info(f"📊 Séries com sketch: {len(self.series)} "
+                    f"(itens retidos: {self.retained_items():,})")
+        logger.info(f"   Severidade adaptativa: {df['adaptive_severity'].value_counts().sort_index().to_dict()}")
+        return df
+
+    def retained_items(self) -> int:
+        """Total de itens retidos em todos os sketches (proxy de memória)"""
+        return sum(sketch.size() for series in self.series.values()
+                   for sketch in series.buckets.values())
+
+    def to_dict(self) -> Dict:
+        """Retorna configuração e estado como dicionário"""
+        return {
+            'config': {
+                'metrics': self.metrics,
+                'warning_quantile': self.warning_quantile,
+                'critical_quantile': self.critical_quantile,
+                'bucket_seconds': self.bucket_seconds,
+                'window_buckets': self.window_buckets,
+                'min_samples': self.min_samples,
+                'k': self.k,
+            },
+            'series': [
+                {'pod': pod, 'container': container, 'metric': metric, 'buckets': series.to_dict()}
+                for (pod, container, metric), series in self.series.items()
+            ]
+        }
+
+    def save_to_file(self, filepath: str = 'adaptive_sketches.json'):
+        """Salva sketches em arquivo JSON"""
+        with open(filepath, 'w') as f:
+            json.dump(self.to_dict(), f)
+        logger.info(f"💾 Sketches adaptativos salvos em: {filepath} ({len(self.series)} séries)")
+
+    @classmethod
+    def load_from_file(cls, filepath: str = 'adaptive_sketches.json',
+                       **overrides) -> 'AdaptiveThresholdLabeler':
+        """Carrega configuração e sketches de arquivo JSON; `overrides` substituem a configuração salva"""
+        with open(filepath, 'r') as f:
+            data = json.load(f)
+
+        labeler = cls(**{**data['config'], **overrides})
+        for entry in data['series']:
+            series = labeler._get_series((entry['pod'], entry['container'], entry['metric']))
+            series.load_buckets(entry['buckets'])
+
+        logger.info(f"📂 Sketches adaptativos carregados de: {filepath} ({len(labeler.series)} séries)")
+        return labeler
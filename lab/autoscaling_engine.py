@@ -0,0 +1,502 @@
+"""
+Motor de Decisão de Autoscaling Preditivo
+Descrição: Lê streams de features por pod (colunas do dataset gerado por
+          ml_dataset_generator.py), agrega por workload, prevê a utilização
+          num horizonte configurável (Holt: nível + tendência) e emite
+          recomendações de réplicas ou de recursos com histerese e cooldowns.
+          A atuação é plugável (API Kubernetes fake em memória para testes ou
+          kubectl) e o modo replay compara a política preditiva com uma
+          política reativa estilo HPA (k8s/flex-stressor/test-hpa.yaml).
+
+Uso:
+  # Comparar preditivo vs reativo reproduzindo um dataset
+  python autoscaling_engine.py replay --dataset kubernetes_ml_dataset.parquet
+
+  # Benchmark de latência/throughput de decisão com milhares de pods
+  python autoscaling_engine.py benchmark --pods 5000
+"""
+
+import re
+import math
+import time
+import logging
+import argparse
+import subprocess
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Sufixos de ReplicaSet/Pod gerados pelo Kubernetes
+_DEPLOYMENT_POD = re.compile(r'^(?P<workload>.+)-[a-z0-9]{6,10}-[a-z0-9]{5}$')
+_CONTROLLER_POD = re.compile(r'^(?P<workload>.+)-[a-z0-9]{5}$')
+
+
+def workload_from_pod(pod_name: str) -> str:
+    """Nome do workload (Deployment/Job) a partir do nome do pod"""
+    for pattern in (_DEPLOYMENT_POD, _CONTROLLER_POD):
+        match = pattern.match(pod_name)
+        if match:
+            return match.group('workload')
+    return pod_name
+
+
+@dataclass
+class ScalingDecision:
+    """Recomendação emitida pelo motor"""
+    namespace: str
+    workload: str
+    timestamp: pd.Timestamp
+    kind: str                      # 'replicas' ou 'resources'
+    current_replicas: int
+    desired_replicas: int
+    utilization: Dict[str, float] = field(default_factory=dict)
+    forecast: Dict[str, float] = field(default_factory=dict)
+    resources: Dict[str, float] = field(default_factory=dict)
+    reason: str = ''
+
+
+class HoltForecaster:
+    """Suavização exponencial dupla (nível + tendência) com estado O(1)"""
+
+    def __init__(self, alpha: float = 0.5, beta: float = 0.3):
+        self.alpha = alpha
+        self.beta = beta
+        self.level: Optional[float] = None
+        self.trend = 0.0
+
+    def update(self, value: float):
+        if value != value:
+            return
+        if self.level is None:
+            self.level = value
+            return
+        previous = self.level
+        self.level = self.alpha * value + (1 - self.alpha) * (self.level + self.trend)
+        self.trend = self.beta * (self.level - previous) + (1 - self.beta) * self.trend
+
+    def forecast(self, steps: float) -> float:
+        if self.level is None:
+            return np.nan
+        return max(0.0, self.level + steps * self.trend)
+
+
+class ScalingActuator:
+    """Interface de atuação no cluster"""
+
+    def get_replicas(self, namespace: str, workload: str) -> Optional[int]:
+        raise NotImplementedError
+
+    def scale(self, namespace: str, workload: str, replicas: int):
+        raise NotImplementedError
+
+    def set_resources(self, namespace: str, workload: str, resources: Dict[str, float]):
+        raise NotImplementedError
+
+
+class FakeKubernetesAPI(ScalingActuator):
+    """API Kubernetes em memória: guarda réplicas/recursos e registra as chamadas"""
+
+    def __init__(self, initial_replicas: Optional[Dict[Tuple[str, str], int]] = None):
+        self.replicas: Dict[Tuple[str, str], int] = dict(initial_replicas or {})
+        self.resources: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self.calls: List[Tuple] = []
+
+    def get_replicas(self, namespace: str, workload: str) -> Optional[int]:
+        return self.replicas.get((namespace, workload))
+
+    def scale(self, namespace: str, workload: str, replicas: int):
+        self.calls.append(('scale', namespace, workload, replicas))
+        self.replicas[(namespace, workload)] = replicas
+
+    def set_resources(self, namespace: str, workload: str, resources: Dict[str, float]):
+        self.calls.append(('set_resources', namespace, workload, dict(resources)))
+        self.resources[(namespace, workload)] = dict(resources)
+
+
+class KubectlActuator(ScalingActuator):
+    """Atuação via kubectl (ex: kubectl_cmd='microk8s kubectl')"""
+
+    def __init__(self, kubectl_cmd: str = 'kubectl', dry_run: bool = False):
+        self.kubectl = kubectl_cmd.split()
+        self.dry_run = dry_run
+
+    def _run(self, args: List[str]) -> str:
+        cmd = self.kubectl + args + (['--dry-run=server'] if self.dry_run else [])
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        if result.returncode != 0:
+            raise RuntimeError(f"kubectl falhou ({' '.join(cmd)}): {result.stderr.strip()}")
+        return result.stdout
+
+    def get_replicas(self, namespace: str, workload: str) -> Optional[int]:
+        try:
+            out = self._run(['get', 'deployment', workload, '-n', namespace,
+                             '-o', 'jsonpath={.spec.replicas}'])
+            return int(out) if out.strip() else None
+        except (RuntimeError, ValueError) as e:
+            logger.warning(f"Não foi possível obter réplicas de {namespace}/{workload}: {e}")
+            return None
+
+    def scale(self, namespace: str, workload: str, replicas: int):
+        self._run(['scale', f'deployment/{workload}', '-n', namespace, f'--replicas={replicas}'])
+
+    def set_resources(self, namespace: str, workload: str, resources: Dict[str, float]):
+        limits = []
+        if 'memory_limit_bytes' in resources:
+            limits.append(f"memory={int(resources['memory_limit_bytes'])}")
+        if 'cpu_limit_cores' in resources:
+            limits.append(f"cpu={int(resources['cpu_limit_cores'] * 1000)}m")
+        if limits:
+            self._run(['set', 'resources', f'deployment/{workload}', '-n', namespace,
+                       f"--limits={','.join(limits)}"])
+
+
+@dataclass
+class _WorkloadState:
+    forecasters: Dict[str, HoltForecaster]
+    last_scale_up: Optional[pd.Timestamp] = None
+    last_scale_down: Optional[pd.Timestamp] = None
+    last_resources: Optional[pd.Timestamp] = None
+    # (timestamp, desired) recentes para estabilização de scale-down
+    recommendations: List[Tuple[pd.Timestamp, int]] = field(default_factory=list)
+
+
+class ReactiveScalingPolicy:
+    """
+    Política reativa estilo HPA: desejado = ceil(réplicas * utilização / alvo),
+    com tolerância e janela de estabilização para scale-down
+    """
+
+    def __init__(self,
+                 targets: Optional[Dict[str, float]] = None,
+                 min_replicas: int = 1,
+                 max_replicas: int = 10,
+                 tolerance: float = 0.1,
+                 scale_up_cooldown: int = 60,
+                 scale_down_cooldown: int = 300):
+        """
+        Args:
+            targets: Utilização alvo (%) por coluna (default: CPU 70, memória 80 como test-hpa.yaml)
+            min_replicas: Mínimo de réplicas
+            max_replicas: Máximo de réplicas
+            tolerance: Banda de histerese em torno do alvo (0.1 = ±10%)
+            scale_up_cooldown: Segundos mínimos entre scale-ups
+            scale_down_cooldown: Segundos de estabilização/cooldown de scale-down
+        """
+        self.targets = targets or {'cpu_usage_percent': 70.0, 'memory_usage_percent': 80.0}
+        self.min_replicas = min_replicas
+        self.max_replicas = max_replicas
+        self.tolerance = tolerance
+        self.scale_up_cooldown = pd.Timedelta(seconds=scale_up_cooldown)
+        self.scale_down_cooldown = pd.Timedelta(seconds=scale_down_cooldown)
+        self.states: Dict[Tuple[str, str], _WorkloadState] = {}
+
+    def _state(self, key: Tuple[str, str]) -> _WorkloadState:
+        if key not in self.states:
+            self.states[key] = _WorkloadState({m: self._new_forecaster() for m in self.targets})
+        return self.states[key]
+
+    def _new_forecaster(self) -> HoltForecaster:
+        return HoltForecaster()
+
+    def _effective_utilization(self, state: _WorkloadState, utilization: Dict[str, float]) -> Dict[str, float]:
+        return dict(utilization)
+
+    def decide(self, key: Tuple[str, str], timestamp: pd.Timestamp,
+               utilization: Dict[str, float], current_replicas: int) -> Tuple[int, Dict[str, float], str]:
+        """
+        Calcula réplicas desejadas para um workload num instante
+
+        Returns:
+            (réplicas desejadas, utilização usada na decisão, motivo)
+        """
+        state = self._state(key)
+        for metric, forecaster in state.forecasters.items():
+            forecaster.update(utilization.get(metric, np.nan))
+        effective = self._effective_utilization(state, utilization)
+
+        # Como no HPA: cada métrica recomenda um valor (o atual se dentro da
+        # tolerância) e vale o maior entre elas
+        candidates = []
+        for metric, target in self.targets.items():
+            value = effective.get(metric, np.nan)
+            if value != value:
+                continue
+            ratio = value / target
+            if abs(ratio - 1) <= self.tolerance:
+                candidates.append((current_replicas, 'dentro da tolerância'))
+            else:
+                candidates.append((math.ceil(current_replicas * ratio),
+                                   f'{metric}={value:.1f}% (alvo {target:.0f}%)'))
+        desired, reason = max(candidates, key=lambda c: c[0]) if candidates \
+            else (current_replicas, 'sem dados')
+        desired = int(min(self.max_replicas, max(self.min_replicas, desired)))
+
+        # Estabilização: scale-down usa o maior desejado da janela recente
+        state.recommendations.append((timestamp, desired))
+        state.recommendations = [(t, d) for t, d in state.recommendations
+                                 if timestamp - t <= self.scale_down_cooldown]
+        if desired < current_replicas:
+            desired = min(current_replicas, max(d for _, d in state.recommendations))
+
+        # Cooldowns
+        if desired > current_replicas and state.last_scale_up is not None \
+                and timestamp - state.last_scale_up < self.scale_up_cooldown:
+            return current_replicas, effective, 'cooldown de scale-up'
+        if desired < current_replicas and state.last_scale_down is not None \
+                and timestamp - state.last_scale_down < self.scale_down_cooldown:
+            return current_replicas, effective, 'cooldown de scale-down'
+
+        if desired > current_replicas:
+            state.last_scale_up = timestamp
+        elif desired < current_replicas:
+            state.last_scale_down = timestamp
+        return desired, effective, reason
+
+
+class PredictiveScalingEngine(ReactiveScalingPolicy):
+    """Política preditiva: decide pela utilização prevista no horizonte"""
+
+    def __init__(self, horizon_seconds: int = 120, step_seconds: int = 30,
+                 actuator: Optional[ScalingActuator] = None,
+                 resource_headroom: float = 0.2, **kwargs):
+        """
+        Args:
+            horizon_seconds: Horizonte de previsão (cobrir o tempo de subida de um pod)
+            step_seconds: Intervalo entre amostras do stream
+            actuator: Backend de atuação (default: FakeKubernetesAPI)
+            resource_headroom: Folga sobre o uso previsto ao recomendar limites
+            **kwargs: Parâmetros de ReactiveScalingPolicy
+        """
+        super().__init__(**kwargs)
+        self.horizon_steps = horizon_seconds / step_seconds
+        self.actuator = actuator or FakeKubernetesAPI()
+        self.resource_headroom = resource_headroom
+        self.decision_latencies_ms: List[float] = []
+
+    def _effective_utilization(self, state: _WorkloadState, utilization: Dict[str, float]) -> Dict[str, float]:
+        # Sobe pelo maior entre atual e previsto; desce apenas se a previsão também cair
+        effective = {}
+        for metric, forecaster in state.forecasters.items():
+            current = utilization.get(metric, np.nan)
+            forecast = forecaster.forecast(self.horizon_steps)
+            effective[metric] = np.nanmax([current, forecast]) if current == current or forecast == forecast else np.nan
+        return effective
+
+    def _resource_recommendation(self, state: _WorkloadState, timestamp: pd.Timestamp,
+                                 workload_df: pd.DataFrame, effective: Dict[str, float]) -> Dict[str, float]:
+        """Recomenda limite de memória quando o workload já está no máximo de réplicas"""
+        if 'memory_limit' not in workload_df.columns or 'memory_usage_percent' not in effective:
+            return {}
+        if state.last_resources is not None and timestamp - state.last_resources < self.scale_down_cooldown:
+            return {}
+        target = self.targets.get('memory_usage_percent', 80.0)
+        forecast_pct = effective['memory_usage_percent']
+        if not forecast_pct > target * (1 + self.tolerance):
+            return {}
+        current_limit = float(workload_df['memory_limit'].max())
+        if not current_limit > 0:
+            return {}
+        state.last_resources = timestamp
+        new_limit = current_limit * (forecast_pct / 100) * (1 + self.resource_headroom) / (target / 100)
+        return {'memory_limit_bytes': new_limit}
+
+    def observe(self, df: pd.DataFrame) -> List[ScalingDecision]:
+        """
+        Processa um lote do stream de features por pod e atua quando necessário
+
+        Args:
+            df: Linhas com timestamp, pod, namespace e colunas de utilização (%)
+
+        Returns:
+            Decisões que alteraram réplicas ou recursos
+        """
+        start = time.perf_counter()
+        metrics = [m for m in self.targets if m in df.columns]
+        df = df.assign(workload=df['pod'].map(workload_from_pod))
+
+        agg = {m: 'mean' for m in metrics}
+        agg['pod'] = 'nunique'
+        grouped = df.groupby(['timestamp', 'namespace', 'workload'], sort=True).agg(agg).reset_index()
+
+        decisions = []
+        for row in grouped.itertuples(index=False):
+            key = (row.namespace, row.workload)
+            current = self.actuator.get_replicas(*key)
+            if current is None:
+                current = int(row.pod)
+                if isinstance(self.actuator, FakeKubernetesAPI):
+                    self.actuator.replicas[key] = current
+
+            utilization = {m: getattr(row, m) for m in metrics}
+            desired, effective, reason = self.decide(key, row.timestamp, utilization, current)
+            forecast = {m: f.forecast(self.horizon_steps) for m, f in self.states[key].forecasters.items()}
+
+            if desired != current:
+                self.actuator.scale(*key, desired)
+                decisions.append(ScalingDecision(row.namespace, row.workload, row.timestamp, 'replicas',
+                                                 current, desired, utilization, forecast, reason=reason))
+            elif current >= self.max_replicas:
+                workload_df = df[(df['namespace'] == row.namespace) & (df['workload'] == row.workload)
+                                 & (df['timestamp'] == row.timestamp)]
+                resources = self._resource_recommendation(self.states[key], row.timestamp, workload_df, effective)
+                if resources:
+                    self.actuator.set_resources(*key, resources)
+                    decisions.append(ScalingDecision(row.namespace, row.workload, row.timestamp, 'resources',
+                                                     current, current, utilization, forecast, resources,
+                                                     reason='máximo de réplicas atingido'))
+
+        self.decision_latencies_ms.append((time.perf_counter() - start) * 1000)
+        return decisions
+
+
+def replay_compare(df: pd.DataFrame, predictive: PredictiveScalingEngine,
+                   reactive: ReactiveScalingPolicy, provision_delay_steps: int = 2,
+                   overload_threshold: float = 90.0) -> pd.DataFrame:
+    """
+    Compara políticas reproduzindo a demanda observada no dataset
+
+    A demanda de cada workload em cada instante é a soma da utilização dos
+    seus pods (em "pods a 100%"). Cada política vê a utilização por réplica
+    resultante das próprias réplicas simuladas; aumentos de réplicas só passam
+    a valer após provision_delay_steps (tempo de subida do pod).
+
+    Returns:
+        DataFrame com uma linha por política: fração de passos sobrecarregados,
+        réplicas médias (custo) e número de ações
+    """
+    metrics = [m for m in reactive.targets if m in df.columns]
+    df = df.assign(workload=df['pod'].map(workload_from_pod))
+    demand = (df.groupby(['namespace', 'workload', 'timestamp'])[metrics].sum() / 100).reset_index()
+
+    results = []
+    for name, policy in [('preditiva', predictive), ('reativa (HPA)', reactive)]:
+        overloaded = steps = actions = 0
+        replica_sum = 0.0
+        for (namespace, workload), series in demand.groupby(['namespace', 'workload']):
+            key = (namespace, workload)
+            replicas = max(policy.min_replicas, 1)
+            pending: List[Tuple[int, int]] = []
+            for i, row in enumerate(series.sort_values('timestamp').itertuples(index=False)):
+                ready = [r for step, r in pending if step <= i]
+                if ready:
+                    replicas = ready[-1]
+                    pending = [(step, r) for step, r in pending if step > i]
+
+                utilization = {m: getattr(row, m) * 100 / replicas for m in metrics}
+                steps += 1
+                replica_sum += replicas
+                overloaded += int(any(u > overload_threshold for u in utilization.values()))
+
+                target = pending[-1][1] if pending else replicas
+                desired, _, _ = policy.decide(key, row.timestamp, utilization, target)
+                if desired != target:
+                    actions += 1
+                    if desired > replicas:
+                        pending.append((i + provision_delay_steps, desired))
+                    else:
+                        replicas = desired
+                        pending = []
+        results.append({
+            'policy': name,
+            'steps': steps,
+            'overloaded_fraction': overloaded / steps if steps else 0.0,
+            'mean_replicas': replica_sum / steps if steps else 0.0,
+            'scaling_actions': actions,
+        })
+    return pd.DataFrame(results)
+
+
+def synthetic_stream(num_pods: int, steps: int, pods_per_workload: int = 4, seed: int = 42):
+    """Streams sintéticos de utilização com rampas e picos por workload"""
+    rng = np.random.default_rng(seed)
+    num_workloads = max(1, num_pods // pods_per_workload)
+    phase = rng.uniform(0, 2 * np.pi, num_workloads)
+    start = pd.Timestamp.now().floor('s')
+    for step in range(steps):
+        level = 60 + 30 * np.sin(phase + step / 10)
+        cpu = np.repeat(level, pods_per_workload)[:num_pods] + rng.normal(0, 5, num_pods)
+        mem = np.repeat(level * 0.8, pods_per_workload)[:num_pods] + rng.normal(0, 3, num_pods)
+        pods = [f'wl{i // pods_per_workload}-7d9f8c6b5d-{i:05d}' for i in range(num_pods)]
+        yield pd.DataFrame({
+            'timestamp': start + pd.Timedelta(seconds=30 * step),
+            'pod': pods,
+            'namespace': 'bench',
+            'cpu_usage_percent': np.clip(cpu, 0, 200),
+            'memory_usage_percent': np.clip(mem, 0, 100),
+            'memory_limit': 512 * 1024 * 1024,
+        })
+
+
+def run_benchmark(num_pods: int = 5000, steps: int = 20) -> Dict:
+    """Mede latência por tick e throughput de decisão para num_pods pods"""
+    engine = PredictiveScalingEngine(max_replicas=50)
+    total_decisions = 0
+    for batch in synthetic_stream(num_pods, steps):
+        total_decisions += len(engine.observe(batch))
+
+    latencies = np.array(engine.decision_latencies_ms)
+    workloads = len(engine.states)
+    return {
+        'pods': num_pods,
+        'workloads': workloads,
+        'ticks': steps,
+        'p50_tick_ms': float(np.percentile(latencies, 50)),
+        'p99_tick_ms': float(np.percentile(latencies, 99)),
+        'pods_per_second': num_pods * steps / (latencies.sum() / 1000),
+        'workload_decisions_per_second': workloads * steps / (latencies.sum() / 1000),
+        'actions': total_decisions,
+    }
+
+
+def parse_arguments():
+    """Parse argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(description='Motor de autoscaling preditivo')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    replay = subparsers.add_parser('replay', help='Comparar preditivo vs reativo num dataset')
+    replay.add_argument('--dataset', type=str, default='kubernetes_ml_dataset.parquet')
+    replay.add_argument('--horizon', type=int, default=120, help='Horizonte de previsão em segundos')
+    replay.add_argument('--step', type=int, default=30, help='Intervalo entre amostras em segundos')
+    replay.add_argument('--provision-delay', type=int, default=2,
+                        help='Passos até uma réplica nova ficar pronta (default: 2)')
+    replay.add_argument('--max-replicas', type=int, default=10)
+
+    bench = subparsers.add_parser('benchmark', help='Benchmark de decisão com stream sintético')
+    bench.add_argument('--pods', type=int, default=5000)
+    bench.add_argument('--steps', type=int, default=20)
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    if args.command == 'benchmark':
+        result = run_benchmark(args.pods, args.steps)
+        print("\n📈 Benchmark do motor de decisão:")
+        for key, value in result.items():
+            print(f"   • {key}: {value:,.2f}" if isinstance(value, float) else f"   • {key}: {value}")
+        exit(0)
+
+    if args.dataset.endswith('.csv'):
+        dataset = pd.read_csv(args.dataset, parse_dates=['timestamp'])
+    else:
+        dataset = pd.read_parquet(args.dataset)
+
+    comparison = replay_compare(
+        dataset,
+        PredictiveScalingEngine(horizon_seconds=args.horizon, step_seconds=args.step,
+                                max_replicas=args.max_replicas),
+        ReactiveScalingPolicy(max_replicas=args.max_replicas),
+        provision_delay_steps=args.provision_delay,
+    )
+    print("\n⚖️  Preditiva vs Reativa (replay):")
+    print(comparison.to_string(index=False))
@@ -0,0 +1,415 @@
+"""
+Detecção de Change-Points em Séries de Uso
+Descrição: Detecta mudanças de regime (cenários gradual, spike, leak e
+          oscillating do StressScenarioExecutor) por (pod, container, métrica)
+          antes que um threshold fixo seja cruzado. Detectores online CUSUM e
+          Page-Hinkley com estado O(1) por série, vetorizados entre séries, e
+          um passe offline PELT para datasets em lote. Os eventos formam uma
+          tabela de labels adicional ao dataset.
+
+Uso:
+  # Eventos de change-point de um dataset já gerado
+  python change_point_detection.py detect --dataset kubernetes_ml_dataset.csv --method cusum
+
+  # Benchmark de throughput (amostras/s/core) com 1000 séries
+  python change_point_detection.py benchmark --series 1000 --steps 500
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# KeyedArrays é compartilhado com o coletor (apps/cadvisor-metrics-collector/src)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'apps',
+                             'cadvisor-metrics-collector', 'src'))
+from keyed_arrays import KeyedArrays
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_METRICS = ['memory_working_set_bytes', 'cpu_usage_total', 'network_total_bytes']
+METHODS = ['cusum', 'page-hinkley', 'pelt']
+
+EVENT_COLUMNS = ['pod', 'container', 'metric', 'detector', 'change_timestamp',
+                 'detected_timestamp', 'direction', 'shift', 'score']
+
+
+def _epoch_seconds(timestamps: pd.Series) -> np.ndarray:
+    return ((pd.to_datetime(timestamps) - pd.Timestamp(0)) / pd.Timedelta(seconds=1)).to_numpy(dtype=float)
+
+
+class StreamingChangePointDetector:
+    """
+    CUSUM / Page-Hinkley online por (pod, container, métrica)
+
+    Cada série estima média e desvio de referência nas primeiras
+    `warmup` amostras (Welford) e passa a acumular o desvio padronizado
+    z = (x - média) / desvio. Ao disparar, o evento é emitido e a série
+    reinicia o aquecimento, adotando o novo regime como referência.
+    """
+
+    def __init__(self, metrics: Optional[List[str]] = None, method: str = 'cusum',
+                 warmup: int = 20, drift: float = 0.5, threshold: float = 8.0,
+                 min_relative_std: float = 0.01, initial_capacity: int = 1024):
+        """
+        Args:
+            metrics: Colunas monitoradas (default: DEFAULT_METRICS)
+            method: 'cusum' ou 'page-hinkley'
+            warmup: Amostras para estimar a referência após cada (re)início
+            drift: Folga k (CUSUM) ou delta (Page-Hinkley), em desvios padrão
+            threshold: Limiar h (CUSUM) ou lambda (Page-Hinkley), em desvios padrão
+            min_relative_std: Piso do desvio relativo à média (séries quase constantes)
+            initial_capacity: Séries pré-alocadas
+        """
+        if method not in ('cusum', 'page-hinkley'):
+            raise ValueError(f"Método online inválido: {method}")
+        self.metrics = metrics or list(DEFAULT_METRICS)
+        self.method = method
+        self.warmup = warmup
+        self.drift = drift
+        self.threshold = threshold
+        self.min_relative_std = min_relative_std
+        self.samples_processed = 0
+        m = (len(self.metrics),)
+        self.series = KeyedArrays(
+            initial_capacity,
+            n=(m, np.int64, 0), mean=(m, float, 0.0), m2=(m, float, 0.0),
+            ref_mean=(m, float, 0.0), ref_std=(m, float, 1.0),
+            pos=(m, float, 0.0),           # CUSUM g+ / Page-Hinkley m_up
+            neg=(m, float, 0.0),           # CUSUM g- / Page-Hinkley m_down
+            pos_extreme=(m, float, 0.0),   # Page-Hinkley min(m_up)
+            neg_extreme=(m, float, 0.0),   # Page-Hinkley max(m_down)
+            z_mean=(m, float, 0.0),        # Page-Hinkley média de z desde o aquecimento
+            pos_start=(m, float, np.nan), neg_start=(m, float, np.nan))
+
+    def _reset(self, sid: np.ndarray, mid: np.ndarray):
+        for name in ('n', 'mean', 'm2', 'pos', 'neg', 'pos_extreme', 'neg_extreme', 'z_mean'):
+            getattr(self.series, name)[sid, mid] = 0
+        self.series.pos_start[sid, mid] = np.nan
+        self.series.neg_start[sid, mid] = np.nan
+
+    @property
+    def num_series(self) -> int:
+        return len(self.series)
+
+    def series_ids(self, df: pd.DataFrame) -> np.ndarray:
+        """Mapeia (pod, container) para ids internos, criando séries novas"""
+        return self.series.lookup(zip(df['pod'].astype(str), df['container'].astype(str)))
+
+    def _step(self, sid: np.ndarray, x: np.ndarray, t: np.ndarray) -> Optional[Tuple]:
+        """Aplica uma amostra por série (rodada); retorna eventos disparados"""
+        sid_b = np.broadcast_to(sid[:, None], x.shape)
+        mid_b = np.broadcast_to(np.arange(x.shape[1])[None, :], x.shape)
+        valid = ~np.isnan(x)
+        n = self.series.n[sid]
+
+        # Aquecimento: Welford até fixar a referência
+        warming = valid & (n < self.warmup)
+        if warming.any():
+            s, m, v = sid_b[warming], mid_b[warming], x[warming]
+            self.series.n[s, m] += 1
+            delta = v - self.series.mean[s, m]
+            self.series.mean[s, m] += delta / self.series.n[s, m]
+            self.series.m2[s, m] += delta * (v - self.series.mean[s, m])
+            ready = self.series.n[s, m] == self.warmup
+            if ready.any():
+                s, m = s[ready], m[ready]
+                std = np.sqrt(self.series.m2[s, m] / max(self.warmup - 1, 1))
+                self.series.ref_mean[s, m] = self.series.mean[s, m]
+                self.series.ref_std[s, m] = np.maximum(std, np.maximum(
+                    self.min_relative_std * np.abs(self.series.mean[s, m]), 1e-12))
+
+        active = valid & (n >= self.warmup)
+        if not active.any():
+            return None
+
+        s, m, v = sid_b[active], mid_b[active], x[active]
+        ts = np.broadcast_to(t[:, None], x.shape)[active]
+        z = (v - self.series.ref_mean[s, m]) / self.series.ref_std[s, m]
+
+        if self.method == 'cusum':
+            pos = np.maximum(0.0, self.series.pos[s, m] + z - self.drift)
+            neg = np.maximum(0.0, self.series.neg[s, m] - z - self.drift)
+            # Estimativa do início da mudança: último instante em que a soma saiu de zero
+            self.series.pos_start[s, m] = np.where((self.series.pos[s, m] == 0) & (pos > 0), ts, self.series.pos_start[s, m])
+            self.series.neg_start[s, m] = np.where((self.series.neg[s, m] == 0) & (neg > 0), ts, self.series.neg_start[s, m])
+            self.series.pos[s, m], self.series.neg[s, m] = pos, neg
+            up, down = pos > self.threshold, neg > self.threshold
+            score = np.where(up, pos, neg)
+        else:
+            count = self.series.n[s, m] - self.warmup + 1
+            self.series.n[s, m] += 1
+            self.series.z_mean[s, m] += (z - self.series.z_mean[s, m]) / count
+            pos = self.series.pos[s, m] + z - self.series.z_mean[s, m] - self.drift
+            neg = self.series.neg[s, m] + z - self.series.z_mean[s, m] + self.drift
+            self.series.pos_start[s, m] = np.where(pos < self.series.pos_extreme[s, m], ts, self.series.pos_start[s, m])
+            self.series.neg_start[s, m] = np.where(neg > self.series.neg_extreme[s, m], ts, self.series.neg_start[s, m])
+            self.series.pos_extreme[s, m] = np.minimum(self.series.pos_extreme[s, m], pos)
+            self.series.neg_extreme[s, m] = np.maximum(self.series.neg_extreme[s, m], neg)
+            self.series.pos[s, m], self.series.neg[s, m] = pos, neg
+            up = pos - self.series.pos_extreme[s, m] > self.threshold
+            down = self.series.neg_extreme[s, m] - neg > self.threshold
+            score = np.where(up, pos - self.series.pos_extreme[s, m], self.series.neg_extreme[s, m] - neg)
+
+        fired = up | down
+        if not fired.any():
+            return None
+
+        s, m = s[fired], m[fired]
+        up = up[fired]
+        start = np.where(up, self.series.pos_start[s, m], self.series.neg_start[s, m])
+        event = (s, m, np.where(np.isnan(start), ts[fired], start), ts[fired], up,
+                 v[fired] - self.series.ref_mean[s, m], score[fired])
+        self._reset(s, m)
+        return event
+
+    def update(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Processa um lote (batch ou coleta ao vivo) e retorna os eventos disparados
+
+        Amostras da mesma série são aplicadas em ordem de timestamp, em
+        rodadas onde cada série aparece no máximo uma vez.
+        """
+        present = [metric for metric in self.metrics if metric in df.columns]
+        if df.empty or not present:
+            return pd.DataFrame(columns=EVENT_COLUMNS)
+
+        df = df.sort_values('timestamp', kind='stable')
+        ids = self.series_ids(df)
+        times = _epoch_seconds(df['timestamp'])
+        values = np.full((len(df), len(self.metrics)), np.nan)
+        for metric in present:
+            values[:, self.metrics.index(metric)] = df[metric].to_numpy(dtype=float)
+
+        occurrence = pd.Series(ids).groupby(ids).cumcount().to_numpy()
+        order = np.argsort(occurrence, kind='stable')
+        bounds = np.searchsorted(occurrence[order], np.arange(occurrence.max() + 2))
+
+        events = []
+        for rnd in range(len(bounds) - 1):
+            rows = order[bounds[rnd]:bounds[rnd + 1]]
+            event = self._step(ids[rows], values[rows], times[rows])
+            if event is not None:
+                events.append(event)
+
+        self.samples_processed += int((~np.isnan(values)).sum())
+        return self._events_frame(events)
+
+    def _events_frame(self, events: List[Tuple]) -> pd.DataFrame:
+        if not events:
+            return pd.DataFrame(columns=EVENT_COLUMNS)
+        sid, mid, start, detected, up, shift, score = (np.concatenate(part) for part in zip(*events))
+        keys = self.series.keys
+        return pd.DataFrame({
+            'pod': [keys[i][0] for i in sid],
+            'container': [keys[i][1] for i in sid],
+            'metric': np.array(self.metrics, dtype=object)[mid],
+            'detector': self.method,
+            'change_timestamp': pd.to_datetime(start, unit='s'),
+            'detected_timestamp': pd.to_datetime(detected, unit='s'),
+            'direction': np.where(up, 'up', 'down'),
+            'shift': shift,
+            'score': score,
+        })
+
+
+def pelt_mean_shift(x: np.ndarray, penalty: Optional[float] = None, min_size: int = 3,
+                    penalty_scale: float = 1.0) -> List[int]:
+    """
+    PELT (Killick et al., 2012) para mudanças de média com custo quadrático
+
+    Args:
+        x: Série sem NaN
+        penalty: Penalidade por change-point (default: 2·σ²·log n, σ estimado
+                 de forma robusta pelas diferenças consecutivas)
+        min_size: Tamanho mínimo de segmento
+        penalty_scale: Multiplicador da penalidade (maior = menos change-points)
+
+    Returns:
+        Índices onde novos segmentos começam
+    """
+    n = len(x)
+    if n < 2 * min_size:
+        return []
+    if penalty is None:
+        sigma = np.median(np.abs(np.diff(x))) / (0.6745 * np.sqrt(2))
+        sigma = max(sigma, 1e-12, 1e-3 * np.abs(x).mean())
+        penalty = 2 * sigma ** 2 * np.log(n)
+    penalty *= penalty_scale
+
+    s1 = np.concatenate([[0.0], np.cumsum(x)])
+    s2 = np.concatenate([[0.0], np.cumsum(x * x)])
+
+    def cost(starts: np.ndarray, end: int) -> np.ndarray:
+        length = end - starts
+        total = s1[end] - s1[starts]
+        return (s2[end] - s2[starts]) - total * total / length
+
+    best = np.full(n + 1, np.inf)
+    best[0] = -penalty
+    last = np.zeros(n + 1, dtype=np.int64)
+    candidates = np.array([0], dtype=np.int64)
+
+    for end in range(min_size, n + 1):
+        is_eligible = end - candidates >= min_size
+        eligible = candidates[is_eligible]
+        if len(eligible):
+            segment_cost = cost(eligible, end)
+            values = best[eligible] + segment_cost + penalty
+            i = int(values.argmin())
+            best[end], last[end] = values[i], eligible[i]
+            # Poda: candidatos que nunca mais serão ótimos
+            keep = best[eligible] + segment_cost <= best[end]
+            candidates = np.concatenate([eligible[keep], candidates[~is_eligible]])
+        candidates = np.append(candidates, end)
+
+    changes, end = [], n
+    while end > 0:
+        start = int(last[end])
+        if start > 0:
+            changes.append(start)
+        end = start
+    return sorted(changes)
+
+
+def detect_offline(df: pd.DataFrame, metrics: Optional[List[str]] = None,
+                   penalty_scale: float = 1.0, min_size: int = 3) -> pd.DataFrame:
+    """PELT por (pod, container, métrica); retorna a tabela de eventos"""
+    metrics = [m for m in (metrics or DEFAULT_METRICS) if m in df.columns]
+    rows = []
+    for (pod, container), group in df.sort_values('timestamp').groupby(['pod', 'container'], sort=False):
+        timestamps = pd.to_datetime(group['timestamp']).to_numpy()
+        for metric in metrics:
+            values = group[metric].to_numpy(dtype=float)
+            mask = ~np.isnan(values)
+            x, ts = values[mask], timestamps[mask]
+            changes = pelt_mean_shift(x, min_size=min_size, penalty_scale=penalty_scale)
+            bounds = [0] + changes + [len(x)]
+            for i, change in enumerate(changes):
+                before = x[bounds[i]:change].mean()
+                after = x[change:bounds[i + 2]].mean()
+                rows.append({
+                    'pod': pod, 'container': container, 'metric': metric, 'detector': 'pelt',
+                    'change_timestamp': ts[change], 'detected_timestamp': ts[change],
+                    'direction': 'up' if after > before else 'down',
+                    'shift': after - before, 'score': np.nan,
+                })
+    return pd.DataFrame(rows, columns=EVENT_COLUMNS)
+
+
+class ChangePointDetector:
+    """Fachada usada pelo gerador de dataset: online (lote inteiro) ou PELT"""
+
+    def __init__(self, method: str = 'cusum', metrics: Optional[List[str]] = None, **params):
+        if method not in METHODS:
+            raise ValueError(f"Método inválido: {method} (use {METHODS})")
+        self.method = method
+        self.metrics = metrics
+        self.params = params
+
+    def detect(self, df: pd.DataFrame) -> pd.DataFrame:
+        started = time.perf_counter()
+        if self.method == 'pelt':
+            events = detect_offline(df, self.metrics, **self.params)
+        else:
+            events = StreamingChangePointDetector(self.metrics, self.method, **self.params).update(df)
+        elapsed = time.perf_counter() - started
+        logger.info(f"📈 {len(events)} change-points ({self.method}) em {elapsed:.2f}s")
+        return events
+
+
+def synthetic_series(n_series: int, steps: int, seed: int = 42) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Séries com um degrau de nível em instante aleatório; retorna (dados, mudanças injetadas)"""
+    rng = np.random.default_rng(seed)
+    base = rng.uniform(100, 500, n_series) * 1024 ** 2
+    change_at = rng.integers(steps // 4, 3 * steps // 4, n_series)
+    shift = base * rng.choice([-1, 1], n_series) * rng.uniform(0.1, 0.3, n_series)
+
+    step_idx = np.arange(steps)
+    level = base[:, None] + shift[:, None] * (step_idx[None, :] >= change_at[:, None])
+    values = level + rng.normal(0, 1, (n_series, steps)) * base[:, None] * 0.02
+
+    timestamps = pd.Timestamp('2025-10-08') + pd.to_timedelta(step_idx * 30, unit='s')
+    data = pd.DataFrame({
+        'timestamp': np.tile(timestamps, n_series),
+        'pod': np.repeat([f'pod-{i}' for i in range(n_series)], steps),
+        'container': 'app',
+        'memory_working_set_bytes': values.ravel(),
+    })
+    truth = pd.DataFrame({'pod': [f'pod-{i}' for i in range(n_series)],
+                          'change_timestamp': timestamps[change_at]})
+    return data.sort_values('timestamp', kind='stable'), truth
+
+
+def run_benchmark(n_series: int = 1000, steps: int = 500, tolerance_steps: int = 10) -> pd.DataFrame:
+    """Throughput (amostras/s/core) e detecção das mudanças injetadas por método"""
+    data, truth = synthetic_series(n_series, steps)
+    metrics = ['memory_working_set_bytes']
+    rows = []
+    for method in METHODS:
+        started = time.perf_counter()
+        events = ChangePointDetector(method, metrics).detect(data)
+        elapsed = time.perf_counter() - started
+
+        merged = truth.merge(events, on='pod', how='left', suffixes=('_true', ''))
+        error = (merged['change_timestamp'] - merged['change_timestamp_true']).abs()
+        hit = error <= pd.Timedelta(seconds=30 * tolerance_steps)
+        detected = merged[hit]['pod'].nunique()
+        rows.append({
+            'method': method,
+            'samples': len(data),
+            'seconds': elapsed,
+            'samples_per_second_core': len(data) / elapsed,
+            'recall': detected / n_series,
+            'events': len(events),
+            'false_alarms': int(len(events) - hit.sum()),
+        })
+    return pd.DataFrame(rows)
+
+
+def parse_arguments():
+    """Parse argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(description='Detecção de change-points em séries de uso')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    detect = subparsers.add_parser('detect', help='Gerar tabela de change-points de um dataset')
+    detect.add_argument('--dataset', type=str, required=True, help='Dataset (.parquet ou .csv)')
+    detect.add_argument('--method', choices=METHODS, default='cusum', help='Detector (default: cusum)')
+    detect.add_argument('--metrics', type=str, nargs='+', default=None,
+                        help=f'Colunas monitoradas (default: {" ".join(DEFAULT_METRICS)})')
+    detect.add_argument('--output', type=str, default='kubernetes_ml_dataset_change_points.csv',
+                        help='CSV de saída (default: kubernetes_ml_dataset_change_points.csv)')
+
+    benchmark = subparsers.add_parser('benchmark', help='Benchmark de throughput e detecção')
+    benchmark.add_argument('--series', type=int, default=1000, help='Número de séries (default: 1000)')
+    benchmark.add_argument('--steps', type=int, default=500, help='Amostras por série (default: 500)')
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    if args.command == 'benchmark':
+        print(run_benchmark(args.series, args.steps).to_string(index=False))
+        exit(0)
+
+    if args.dataset.endswith('.csv'):
+        dataset = pd.read_csv(args.dataset, parse_dates=['timestamp'])
+    else:
+        dataset = pd.read_parquet(args.dataset)
+
+    events = ChangePointDetector(args.method, args.metrics).detect(dataset)
+    events.to_csv(args.output, index=False)
+    logger.info(f"💾 {len(events)} eventos salvos em: {args.output}")
+    if not events.empty:
+        print(events.to_string(index=False))
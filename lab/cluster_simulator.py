@@ -0,0 +1,409 @@
+"""
+Simulador de Cluster por Eventos Discretos
+Descrição: Reproduz traces de uso por pod no formato de kubernetes_ml_dataset.parquet
+          sobre um cluster modelado (capacidade dos nós, requests/limits, regra
+          de OOM kill e throttling de CPU). Políticas de escalonamento/ajuste
+          entram como callbacks, permitindo avaliar uma semana de cluster em
+          segundos sem rodar pods de stress no microk8s.
+
+Uso:
+  # Replay do dataset em 3 nós de 4 cores / 8 GiB
+  python cluster_simulator.py --dataset kubernetes_ml_dataset.parquet --nodes 3
+
+  # Uma semana de cluster (traces repetidos) com 200 cópias dos pods
+  python cluster_simulator.py --dataset kubernetes_ml_dataset.csv --days 7 --replicas 200
+"""
+
+import heapq
+import time
+import logging
+import argparse
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+GIB = 1024 ** 3
+
+# Tipos de evento (ordem de desempate no mesmo instante)
+POD_ARRIVAL, USAGE_SAMPLE, POD_RESTART, POLICY_TICK, POD_END = range(5)
+
+
+@dataclass
+class PodTrace:
+    """Trace de uso de um pod (tempos em segundos desde o início da simulação)"""
+    name: str
+    namespace: str
+    times: np.ndarray
+    cpu_cores: np.ndarray
+    memory_bytes: np.ndarray
+    cpu_request: float = 0.1
+    cpu_limit: float = 0.0          # 0 = sem limite
+    memory_request: float = 128 * 1024 ** 2
+    memory_limit: float = 0.0       # 0 = sem limite
+
+
+@dataclass
+class SimNode:
+    name: str
+    cpu_capacity: float
+    memory_capacity: float
+    pods: Dict[str, 'SimPod'] = field(default_factory=dict)
+    cpu_requested: float = 0.0
+    memory_requested: float = 0.0
+    cpu_demand: float = 0.0
+    memory_used: float = 0.0
+
+
+@dataclass
+class SimPod:
+    trace: PodTrace
+    node: Optional[str] = None
+    sample_index: int = 0
+    cpu_demand: float = 0.0
+    memory_used: float = 0.0
+    running: bool = False
+    restarts: int = 0
+    oom_kills: int = 0
+    epoch: int = 0                  # incrementado a cada kill; invalida eventos antigos
+    throttled_core_seconds: float = 0.0
+
+
+class SimulationPolicy:
+    """Callbacks de política; sobrescreva os métodos desejados"""
+
+    tick_seconds: Optional[float] = None
+
+    def schedule(self, sim: 'ClusterSimulator', pod: SimPod) -> Optional[str]:
+        """Escolhe o nó de um pod novo (default: first-fit por requests, como o kube-scheduler)"""
+        for node in sim.nodes.values():
+            if (node.cpu_requested + pod.trace.cpu_request <= node.cpu_capacity and
+                    node.memory_requested + pod.trace.memory_request <= node.memory_capacity):
+                return node.name
+        return None
+
+    def on_tick(self, sim: 'ClusterSimulator', now: float):
+        """Chamado a cada tick_seconds (ex: autoscaler, VPA)"""
+
+    def on_oom(self, sim: 'ClusterSimulator', pod: SimPod, now: float):
+        """Chamado após um OOM kill (ex: aumentar limite de memória)"""
+
+
+class ClusterSimulator:
+    """Simulador de eventos discretos para traces de pods"""
+
+    def __init__(self, nodes: List[SimNode], policy: Optional[SimulationPolicy] = None,
+                 restart_backoff: float = 10.0):
+        """
+        Args:
+            nodes: Nós do cluster modelado
+            policy: Callbacks de política (default: first-fit sem ações periódicas)
+            restart_backoff: Segundos até reiniciar um container após OOM kill
+        """
+        self.nodes: Dict[str, SimNode] = {n.name: n for n in nodes}
+        self.policy = policy or SimulationPolicy()
+        self.restart_backoff = restart_backoff
+        self.pods: Dict[str, SimPod] = {}
+        self.pending: List[str] = []
+        self.now = 0.0
+        self._events: List[Tuple[float, int, int, str, int]] = []
+        self._seq = 0
+        self.events_processed = 0
+        self.stats = {'oom_kills': 0, 'node_pressure_kills': 0, 'restarts': 0,
+                      'throttled_core_seconds': 0.0, 'unschedulable': 0}
+
+    def _push(self, when: float, kind: int, pod_name: str = ''):
+        assert when >= self.now, f'evento no passado: {when} < {self.now}'
+        self._seq += 1
+        epoch = self.pods[pod_name].epoch if pod_name else 0
+        heapq.heappush(self._events, (when, kind, self._seq, pod_name, epoch))
+
+    def add_trace(self, trace: PodTrace):
+        key = f'{trace.namespace}/{trace.name}'
+        self.pods[key] = SimPod(trace)
+        if len(trace.times):
+            self._push(float(trace.times[0]), POD_ARRIVAL, key)
+
+    # ----- alocação -----
+
+    def _bind(self, pod: SimPod, node_name: str):
+        node = self.nodes[node_name]
+        key = f'{pod.trace.namespace}/{pod.trace.name}'
+        node.pods[key] = pod
+        node.cpu_requested += pod.trace.cpu_request
+        node.memory_requested += pod.trace.memory_request
+        pod.node = node_name
+        pod.running = True
+
+    def _release(self, pod: SimPod):
+        node = self.nodes[pod.node]
+        node.pods.pop(f'{pod.trace.namespace}/{pod.trace.name}', None)
+        node.cpu_requested -= pod.trace.cpu_request
+        node.memory_requested -= pod.trace.memory_request
+        node.cpu_demand -= pod.cpu_demand
+        node.memory_used -= pod.memory_used
+        pod.cpu_demand = pod.memory_used = 0.0
+        pod.running = False
+        pod.node = None
+
+    def _fits(self, pod: SimPod, node_name: str) -> bool:
+        node = self.nodes[node_name]
+        return (node.cpu_requested + pod.trace.cpu_request <= node.cpu_capacity and
+                node.memory_requested + pod.trace.memory_request <= node.memory_capacity)
+
+    def _try_schedule(self, key: str) -> bool:
+        pod = self.pods[key]
+        # Agendamento tardio (pendente) retoma na amostra atual do trace,
+        # nunca numa amostra já passada
+        pod.sample_index = int(np.searchsorted(pod.trace.times, self.now))
+        if pod.sample_index >= len(pod.trace.times):
+            return True  # trace acabou enquanto pendente
+        node_name = self.policy.schedule(self, pod)
+        if node_name is None:
+            return False
+        self._bind(pod, node_name)
+        self._push(float(pod.trace.times[pod.sample_index]), USAGE_SAMPLE, key)
+        return True
+
+    # ----- regras de recursos -----
+
+    def _kill(self, pod: SimPod, node_pressure: bool = False):
+        pod.oom_kills += 1
+        pod.epoch += 1
+        self.stats['node_pressure_kills' if node_pressure else 'oom_kills'] += 1
+        key = f'{pod.trace.namespace}/{pod.trace.name}'
+        node_name = pod.node
+        self._release(pod)
+        # Reinicia no mesmo nó após backoff, se ainda couber; eventos já
+        # enfileirados do pod ficam obsoletos pelo novo epoch
+        pod.node = node_name
+        self._push(self.now + self.restart_backoff, POD_RESTART, key)
+        self.policy.on_oom(self, pod, self.now)
+
+    def _apply_sample(self, pod: SimPod):
+        trace, node = pod.trace, self.nodes[pod.node]
+        i = pod.sample_index
+        cpu, mem = float(trace.cpu_cores[i]), float(trace.memory_bytes[i])
+
+        node.cpu_demand += cpu - pod.cpu_demand
+        node.memory_used += mem - pod.memory_used
+        pod.cpu_demand, pod.memory_used = cpu, mem
+
+        # OOM kill: working set acima do limite do container
+        if trace.memory_limit and mem > trace.memory_limit:
+            self._kill(pod)
+            return False
+
+        # Pressão de memória no nó: mata o pod mais acima do request
+        if node.memory_used > node.memory_capacity:
+            victim = max(node.pods.values(), key=lambda p: p.memory_used - p.trace.memory_request)
+            self._kill(victim, node_pressure=True)
+            if victim is pod:
+                return False
+
+        # Throttling até a próxima amostra: limite do container e contenção do nó
+        dt = float(trace.times[i + 1] - trace.times[i]) if i + 1 < len(trace.times) else 0.0
+        allowed = min(cpu, trace.cpu_limit) if trace.cpu_limit else cpu
+        if node.cpu_demand > node.cpu_capacity and node.cpu_demand > 0:
+            allowed = min(allowed, cpu * node.cpu_capacity / node.cpu_demand)
+        throttled = (cpu - allowed) * dt
+        pod.throttled_core_seconds += throttled
+        self.stats['throttled_core_seconds'] += throttled
+        return True
+
+    # ----- laço principal -----
+
+    def run(self, until: Optional[float] = None) -> Dict:
+        """Processa eventos até esvaziar a fila (ou até `until` segundos)"""
+        if self.policy.tick_seconds:
+            self._push(0.0, POLICY_TICK)
+
+        started = time.perf_counter()
+        while self._events:
+            when, kind, _, key, epoch = heapq.heappop(self._events)
+            if until is not None and when > until:
+                break
+            if key and epoch != self.pods[key].epoch:
+                continue  # evento anterior a um kill
+            self.now = when
+            self.events_processed += 1
+
+            if kind == POD_ARRIVAL:
+                if not self._try_schedule(key):
+                    self.stats['unschedulable'] += 1
+                    self.pending.append(key)
+
+            elif kind == USAGE_SAMPLE:
+                pod = self.pods[key]
+                if not pod.running:
+                    continue
+                if self._apply_sample(pod):
+                    pod.sample_index += 1
+                    if pod.sample_index < len(pod.trace.times):
+                        self._push(float(pod.trace.times[pod.sample_index]), USAGE_SAMPLE, key)
+                    else:
+                        self._push(self.now, POD_END, key)
+
+            elif kind == POD_RESTART:
+                pod = self.pods[key]
+                pod.restarts += 1
+                self.stats['restarts'] += 1
+                node_name, pod.node = pod.node, None
+                # Pula as amostras perdidas durante o backoff
+                pod.sample_index = int(np.searchsorted(pod.trace.times, self.now))
+                if pod.sample_index >= len(pod.trace.times):
+                    # Trace acabou durante o backoff: encerra e libera os pendentes
+                    self._push(self.now, POD_END, key)
+                    continue
+                # O nó pode ter sido ocupado por pendentes durante o backoff
+                if not self._fits(pod, node_name):
+                    node_name = self.policy.schedule(self, pod)
+                if node_name is None:
+                    self.stats['unschedulable'] += 1
+                    self.pending.append(key)
+                    continue
+                self._bind(pod, node_name)
+                self._push(float(pod.trace.times[pod.sample_index]), USAGE_SAMPLE, key)
+
+            elif kind == POD_END:
+                pod = self.pods[key]
+                if pod.running:
+                    self._release(pod)
+                # Recursos liberados: tenta pods pendentes
+                self.pending = [k for k in self.pending if not self._try_schedule(k)]
+
+            elif kind == POLICY_TICK:
+                self.policy.on_tick(self, self.now)
+                if self._events:
+                    self._push(self.now + self.policy.tick_seconds, POLICY_TICK)
+
+        elapsed = time.perf_counter() - started
+        return self.report(elapsed)
+
+    def report(self, elapsed: float) -> Dict:
+        return {
+            'simulated_seconds': self.now,
+            'simulated_days': self.now / 86400,
+            'events': self.events_processed,
+            'wall_seconds': elapsed,
+            'events_per_second': self.events_processed / max(elapsed, 1e-9),
+            'pods': len(self.pods),
+            'pending_pods': len(self.pending),
+            **self.stats,
+        }
+
+
+def load_traces(df: pd.DataFrame) -> List[PodTrace]:
+    """
+    Converte o dataset (uma linha por timestamp/pod/container) em traces por pod
+
+    Usa cpu_usage_total (cores) e memory_working_set_bytes somados por pod;
+    limites vêm de cpu_quota/cpu_period e memory_limit quando disponíveis.
+    """
+    df = df.copy()
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    t0 = df['timestamp'].min()
+    df['t'] = (df['timestamp'] - t0).dt.total_seconds()
+
+    if 'cpu_quota' in df.columns and 'cpu_period' in df.columns:
+        df['cpu_limit_cores'] = (df['cpu_quota'] / df['cpu_period']).where(df['cpu_quota'] > 0, 0)
+    elif 'cpu_limits' in df.columns:
+        df['cpu_limit_cores'] = df['cpu_limits']
+    else:
+        df['cpu_limit_cores'] = 0.0
+    for col in ['cpu_usage_total', 'memory_working_set_bytes', 'memory_limit', 'cpu_requests']:
+        if col not in df.columns:
+            df[col] = 0.0
+
+    per_pod = df.groupby(['namespace', 'pod', 't']).agg(
+        cpu=('cpu_usage_total', 'sum'),
+        mem=('memory_working_set_bytes', 'sum'),
+        mem_limit=('memory_limit', 'sum'),
+        cpu_limit=('cpu_limit_cores', 'sum'),
+        cpu_request=('cpu_requests', 'sum'),
+    ).reset_index()
+
+    traces = []
+    for (namespace, pod), g in per_pod.groupby(['namespace', 'pod'], sort=False):
+        mem = g['mem'].fillna(0).to_numpy()
+        mem_limit = float(g['mem_limit'].max() or 0)
+        cpu_request = float(g['cpu_request'].max() or 0)
+        traces.append(PodTrace(
+            name=str(pod), namespace=str(namespace),
+            times=g['t'].to_numpy(dtype=float),
+            cpu_cores=g['cpu'].fillna(0).to_numpy(),
+            memory_bytes=mem,
+            cpu_request=cpu_request if 0 < cpu_request < 64 else 0.1,
+            cpu_limit=float(g['cpu_limit'].max() or 0),
+            memory_request=float(np.percentile(mem, 50)) if len(mem) else 0.0,
+            memory_limit=mem_limit,
+        ))
+    return traces
+
+
+def expand_traces(traces: List[PodTrace], days: float = 0, replicas: int = 1) -> List[PodTrace]:
+    """Repete os traces no tempo até `days` e cria `replicas` cópias de cada pod"""
+    expanded = []
+    for trace in traces:
+        times, cpu, mem = trace.times, trace.cpu_cores, trace.memory_bytes
+        if days and len(times) > 1:
+            period = times[-1] - times[0] + (times[1] - times[0])
+            repeats = int(np.ceil(days * 86400 / period))
+            times = np.concatenate([trace.times + r * period for r in range(repeats)])
+            cpu = np.tile(trace.cpu_cores, repeats)
+            mem = np.tile(trace.memory_bytes, repeats)
+        for r in range(replicas):
+            expanded.append(PodTrace(
+                name=f'{trace.name}-{r}' if replicas > 1 else trace.name,
+                namespace=trace.namespace, times=times, cpu_cores=cpu, memory_bytes=mem,
+                cpu_request=trace.cpu_request, cpu_limit=trace.cpu_limit,
+                memory_request=trace.memory_request, memory_limit=trace.memory_limit,
+            ))
+    return expanded
+
+
+def parse_arguments():
+    """Parse argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(description='Simulador de cluster por eventos discretos')
+    parser.add_argument('--dataset', type=str, default='kubernetes_ml_dataset.parquet',
+                        help='Dataset gerado por ml_dataset_generator.py (.parquet ou .csv)')
+    parser.add_argument('--nodes', type=int, default=3, help='Número de nós (default: 3)')
+    parser.add_argument('--node-cpu', type=float, default=4.0, help='Cores por nó (default: 4)')
+    parser.add_argument('--node-memory-gb', type=float, default=8.0, help='Memória por nó em GiB (default: 8)')
+    parser.add_argument('--days', type=float, default=0,
+                        help='Repetir traces até cobrir N dias (default: duração original)')
+    parser.add_argument('--replicas', type=int, default=1,
+                        help='Cópias de cada pod do dataset (default: 1)')
+    parser.add_argument('--restart-backoff', type=float, default=10.0,
+                        help='Segundos até reiniciar após OOM kill (default: 10)')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    if args.dataset.endswith('.csv'):
+        dataset = pd.read_csv(args.dataset, parse_dates=['timestamp'])
+    else:
+        dataset = pd.read_parquet(args.dataset)
+
+    traces = expand_traces(load_traces(dataset), args.days, args.replicas)
+    nodes = [SimNode(f'node-{i}', args.node_cpu, args.node_memory_gb * GIB) for i in range(args.nodes)]
+
+    simulator = ClusterSimulator(nodes, restart_backoff=args.restart_backoff)
+    for trace in traces:
+        simulator.add_trace(trace)
+
+    logger.info(f"🚀 Simulando {len(traces)} pods em {len(nodes)} nós...")
+    report = simulator.run()
+
+    print("\n📊 Resultado da simulação:")
+    for key, value in report.items():
+        print(f"   • {key}: {value:,.2f}" if isinstance(value, float) else f"   • {key}: {value}")
@@ -0,0 +1,515 @@
+"""
+Executor de Matriz de Experimentos de Stress + Captura de Dataset
+Descrição: Expande uma matriz declarativa (cenário x intensidade x duração x
+          réplicas) em células, executa as células em paralelo dentro de um
+          orçamento de recursos e captura a janela de cada célula em uma
+          partição própria com metadados do experimento. Backends plugáveis:
+          processos locais (memory_stress_generator.py, amostrado via psutil)
+          ou Jobs no Kubernetes com captura via Prometheus
+          (MLDatasetGenerator).
+
+Uso:
+  # Ver o plano (células e demanda de recursos) sem executar
+  python experiment_runner.py --matrix experiment_matrix.yaml --dry-run
+
+  # Laptop: processos locais
+  python experiment_runner.py --matrix experiment_matrix.yaml --backend local
+
+  # Laboratório: Jobs no microk8s e captura pelo Prometheus
+  python experiment_runner.py --matrix experiment_matrix.yaml --backend kubernetes \\
+    --kubectl "microk8s kubectl" --prometheus-url http://192.168.242.134:30090/
+"""
+
+import os
+import json
+import time
+import socket
+import hashlib
+import logging
+import argparse
+import itertools
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import yaml
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SCENARIOS = ['gradual', 'spike', 'random', 'stress', 'leak', 'oscillating']
+STRESS_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             '..', 'apps', 'kube-stress', 'stress', 'memory_stress_generator.py')
+
+DEFAULT_SPEC = {
+    'namespace': 'flex-experiments',
+    'image': 'memory-stress:latest',
+    'repeats': 1,
+    'budget': {'cpu': 4.0, 'memory_mb': 4096, 'max_concurrent': 4},
+    'resources': {'cpu_request': 0.5, 'cpu_threads': 1, 'memory_limit_factor': 1.2},
+    'capture': {'step': '30s', 'grace_seconds': 60, 'poll_seconds': 10},
+}
+
+
+@dataclass
+class ExperimentCell:
+    """Uma combinação da matriz (uma execução do cenário)"""
+    experiment: str
+    scenario: str
+    intensity_mb: int
+    duration_minutes: int
+    replicas: int
+    repeat: int = 0
+
+    @property
+    def cell_id(self) -> str:
+        """Id estável: mesmo cenário/parâmetros geram o mesmo id (permite retomar)"""
+        key = f"{self.experiment}|{self.scenario}|{self.intensity_mb}|{self.duration_minutes}|" \
+              f"{self.replicas}|{self.repeat}"
+        digest = hashlib.sha1(key.encode()).hexdigest()[:8]
+        return f"{self.scenario}-{self.intensity_mb}mb-{self.duration_minutes}m-{self.replicas}r-{digest}"
+
+    def demand(self, resources: Dict) -> Dict[str, float]:
+        """Recursos reservados enquanto a célula roda"""
+        return {
+            'cpu': self.replicas * resources['cpu_request'],
+            'memory_mb': self.replicas * self.intensity_mb * resources['memory_limit_factor'],
+        }
+
+
+def load_matrix(path: str) -> Dict:
+    """Carrega a matriz (YAML ou JSON) aplicando defaults"""
+    with open(path, 'r') as f:
+        spec = yaml.safe_load(f)
+
+    merged = {**DEFAULT_SPEC, **spec}
+    for section in ('budget', 'resources', 'capture'):
+        merged[section] = {**DEFAULT_SPEC[section], **spec.get(section, {})}
+
+    matrix = merged.get('matrix', {})
+    for axis in ('scenario', 'intensity', 'duration', 'replicas'):
+        if not matrix.get(axis):
+            raise ValueError(f"Eixo '{axis}' ausente ou vazio na matriz")
+    invalid = set(matrix['scenario']) - set(SCENARIOS)
+    if invalid:
+        raise ValueError(f"Cenários inválidos: {sorted(invalid)} (use {SCENARIOS})")
+    merged.setdefault('name', os.path.splitext(os.path.basename(path))[0])
+    return merged
+
+
+def expand_matrix(spec: Dict) -> List[ExperimentCell]:
+    """Produto cartesiano dos eixos x repetições"""
+    matrix = spec['matrix']
+    return [
+        ExperimentCell(spec['name'], scenario, int(intensity), int(duration), int(replicas), repeat)
+        for repeat in range(spec['repeats'])
+        for scenario, intensity, duration, replicas in itertools.product(
+            matrix['scenario'], matrix['intensity'], matrix['duration'], matrix['replicas'])
+    ]
+
+
+class ExperimentBackend:
+    """Interface de execução de células"""
+
+    namespace = 'local'
+
+    def start(self, cell: ExperimentCell):
+        raise NotImplementedError
+
+    def is_running(self, handle) -> bool:
+        raise NotImplementedError
+
+    def stop(self, handle):
+        raise NotImplementedError
+
+    def capture(self, handle, cell: ExperimentCell, start: datetime, end: datetime) -> pd.DataFrame:
+        """Dataset da janela [start, end] da célula (mesmas colunas do ml_dataset_generator)"""
+        raise NotImplementedError
+
+
+class LocalProcessBackend(ExperimentBackend):
+    """Executa memory_stress_generator.py como processos locais e amostra via psutil"""
+
+    def __init__(self, resources: Dict, step_seconds: float = 30.0,
+                 script_path: str = STRESS_SCRIPT, python: str = 'python'):
+        self.resources = resources
+        self.step_seconds = step_seconds
+        self.script_path = script_path
+        self.python = python
+        self.node = socket.gethostname()
+
+    def start(self, cell: ExperimentCell) -> Dict:
+        import psutil
+
+        processes = []
+        for replica in range(cell.replicas):
+            cmd = [self.python, self.script_path, '--scenario', cell.scenario,
+                   '--max-memory', str(cell.intensity_mb), '--duration', str(cell.duration_minutes),
+                   '--cpu-threads', str(self.resources['cpu_threads'])]
+            processes.append(subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+
+        handle = {'processes': processes, 'samples': [], 'stop': threading.Event()}
+
+        def sample():
+            tracked = []
+            for p in processes:
+                try:
+                    tracked.append(psutil.Process(p.pid))
+                except psutil.Error:
+                    continue
+            last_cpu = {}
+            while not handle['stop'].is_set():
+                now = datetime.now()
+                for replica, proc in enumerate(tracked):
+                    try:
+                        cpu_seconds = sum(proc.cpu_times()[:2])
+                        rss = proc.memory_info().rss
+                    except psutil.Error:
+                        continue
+                    prev = last_cpu.get(replica)
+                    last_cpu[replica] = (now, cpu_seconds)
+                    rate = (cpu_seconds - prev[1]) / max((now - prev[0]).total_seconds(), 1e-6) if prev else np.nan
+                    handle['samples'].append((now, replica, rss, rate))
+                handle['stop'].wait(self.step_seconds)
+
+        handle['sampler'] = threading.Thread(target=sample, daemon=True)
+        handle['sampler'].start()
+        return handle
+
+    def is_running(self, handle: Dict) -> bool:
+        return any(p.poll() is None for p in handle['processes'])
+
+    def stop(self, handle: Dict):
+        for p in handle['processes']:
+            if p.poll() is None:
+                p.terminate()
+        for p in handle['processes']:
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+        handle['stop'].set()
+        handle['sampler'].join(timeout=5)
+
+    def capture(self, handle: Dict, cell: ExperimentCell, start: datetime, end: datetime) -> pd.DataFrame:
+        from ml_dataset_generator import FeatureEngineer, ThresholdConfig
+
+        limit = cell.intensity_mb * self.resources['memory_limit_factor'] * 1024 * 1024
+        records = []
+        for timestamp, replica, rss, cpu_rate in handle['samples']:
+            base = {'timestamp': timestamp, 'pod': f"{cell.cell_id}-{replica}", 'container': 'stress',
+                    'namespace': self.namespace, 'node': self.node}
+            for name, value in (('memory_working_set_bytes', rss), ('memory_usage_bytes', rss),
+                                ('memory_limit', limit), ('cpu_usage_total', cpu_rate)):
+                records.append({**base, 'metric_name': name, 'value': value})
+        if not records:
+            return pd.DataFrame()
+
+        df = FeatureEngineer(ThresholdConfig()).create_ml_features(pd.DataFrame(records))
+        numeric_columns = df.select_dtypes(include=[np.number]).columns
+        df[numeric_columns] = df[numeric_columns].fillna(0)
+        return df
+
+
+class KubernetesBackend(ExperimentBackend):
+    """Cria um Job por célula (parallelism = réplicas) e captura via Prometheus"""
+
+    def __init__(self, resources: Dict, namespace: str, image: str, generator_factory: Callable,
+                 step: str = '30s', kubectl_cmd: str = 'kubectl'):
+        """
+        Args:
+            resources: Seção 'resources' da matriz
+            namespace: Namespace onde os Jobs são criados
+            image: Imagem com memory_stress_generator.py como ENTRYPOINT
+            generator_factory: Função sem argumentos que retorna um MLDatasetGenerator
+            step: Resolução da captura
+            kubectl_cmd: Comando kubectl (ex: 'microk8s kubectl')
+        """
+        self.resources = resources
+        self.namespace = namespace
+        self.image = image
+        self.generator_factory = generator_factory
+        self.step = step
+        self.kubectl = kubectl_cmd.split()
+
+    def _run(self, args: List[str], stdin: Optional[str] = None) -> str:
+        cmd = self.kubectl + args
+        result = subprocess.run(cmd, input=stdin, capture_output=True, text=True, timeout=60)
+        if result.returncode != 0:
+            raise RuntimeError(f"kubectl falhou ({' '.join(cmd)}): {result.stderr.strip()}")
+        return result.stdout
+
+    def job_manifest(self, cell: ExperimentCell) -> Dict:
+        limit_mb = int(cell.intensity_mb * self.resources['memory_limit_factor'])
+        labels = {'app': 'flex-experiment', 'experiment': cell.experiment, 'cell': cell.cell_id}
+        return {
+            'apiVersion': 'batch/v1',
+            'kind': 'Job',
+            'metadata': {'name': cell.cell_id, 'namespace': self.namespace, 'labels': labels},
+            'spec': {
+                'parallelism': cell.replicas,
+                'completions': cell.replicas,
+                'backoffLimit': 0,
+                'activeDeadlineSeconds': cell.duration_minutes * 60 + 300,
+                'template': {
+                    'metadata': {'labels': labels},
+                    'spec': {
+                        'restartPolicy': 'Never',
+                        'containers': [{
+                            'name': 'stress',
+                            'image': self.image,
+                            'args': ['--scenario', cell.scenario, '--max-memory', str(cell.intensity_mb),
+                                     '--duration', str(cell.duration_minutes),
+                                     '--cpu-threads', str(self.resources['cpu_threads'])],
+                            'resources': {
+                                'requests': {'cpu': f"{int(self.resources['cpu_request'] * 1000)}m",
+                                             'memory': f"{cell.intensity_mb}Mi"},
+                                'limits': {'memory': f"{limit_mb}Mi"},
+                            },
+                        }],
+                    },
+                },
+            },
+        }
+
+    def start(self, cell: ExperimentCell) -> str:
+        self._run(['apply', '-f', '-'], stdin=yaml.safe_dump(self.job_manifest(cell)))
+        return cell.cell_id
+
+    def is_running(self, handle: str) -> bool:
+        try:
+            out = self._run(['get', 'job', handle, '-n', self.namespace, '-o',
+                             'jsonpath={.status.active}'])
+        except RuntimeError:
+            return False
+        return bool(out.strip()) and int(out) > 0
+
+    def stop(self, handle: str):
+        try:
+            self._run(['delete', 'job', handle, '-n', self.namespace, '--wait=false'])
+        except RuntimeError as e:
+            logger.warning(f"⚠️ Falha ao remover job {handle}: {e}")
+
+    def capture(self, handle: str, cell: ExperimentCell, start: datetime, end: datetime) -> pd.DataFrame:
+        generator = self.generator_factory()
+        minutes = max(1, int(np.ceil((end - start).total_seconds() / 60)))
+        return generator.generate_dataset(duration_minutes=minutes, step=self.step,
+                                          pod_filter=f"{handle}-.*", namespace=self.namespace,
+                                          end_time=end)
+
+
+class ExperimentRunner:
+    """Agenda células dentro do orçamento e grava cada janela em sua partição"""
+
+    def __init__(self, spec: Dict, backend: ExperimentBackend, output_dir: str = 'experiments'):
+        self.spec = spec
+        self.backend = backend
+        self.output_dir = output_dir
+        self.budget = spec['budget']
+        self.resources = spec['resources']
+        self.capture_cfg = spec['capture']
+        self._captures = ThreadPoolExecutor(max_workers=max(1, int(self.budget['max_concurrent'])))
+        self._lock = threading.Lock()
+        self.results: List[Dict] = []
+
+    def partition_path(self, cell: ExperimentCell) -> str:
+        """Partição hive da célula; arquivos com prefixo '_' são ignorados pelo pyarrow"""
+        return os.path.join(self.output_dir, f"experiment={cell.experiment}", f"cell_id={cell.cell_id}")
+
+    def is_done(self, cell: ExperimentCell) -> bool:
+        metadata_path = os.path.join(self.partition_path(cell), '_experiment.json')
+        if not os.path.exists(metadata_path):
+            return False
+        with open(metadata_path, 'r') as f:
+            return json.load(f).get('status') == 'captured'
+
+    def validate(self, cells: List[ExperimentCell]):
+        for cell in cells:
+            demand = cell.demand(self.resources)
+            if demand['cpu'] > self.budget['cpu'] or demand['memory_mb'] > self.budget['memory_mb']:
+                raise ValueError(f"Célula {cell.cell_id} excede o orçamento sozinha: {demand}")
+
+    def plan(self, cells: List[ExperimentCell]) -> pd.DataFrame:
+        rows = []
+        for cell in cells:
+            demand = cell.demand(self.resources)
+            rows.append({**asdict(cell), 'cell_id': cell.cell_id, **demand, 'done': self.is_done(cell)})
+        return pd.DataFrame(rows)
+
+    def _fits(self, used: Dict[str, float], running: int, demand: Dict[str, float]) -> bool:
+        return (running < self.budget['max_concurrent'] and
+                used['cpu'] + demand['cpu'] <= self.budget['cpu'] + 1e-9 and
+                used['memory_mb'] + demand['memory_mb'] <= self.budget['memory_mb'] + 1e-9)
+
+    def _finish(self, cell: ExperimentCell, handle, start: datetime, end: datetime):
+        """Captura a janela da célula e grava partição + metadados"""
+        path = self.partition_path(cell)
+        os.makedirs(path, exist_ok=True)
+        metadata = {**asdict(cell), 'cell_id': cell.cell_id, 'backend': type(self.backend).__name__,
+                    'namespace': self.backend.namespace, 'start': start.isoformat(),
+                    'end': end.isoformat(), 'resources': self.resources, 'rows': 0}
+        try:
+            df = self.backend.capture(handle, cell, start, end)
+            if df is None or df.empty:
+                metadata['status'] = 'empty'
+            else:
+                for key in ('scenario', 'intensity_mb', 'duration_minutes', 'replicas', 'repeat'):
+                    df[key] = getattr(cell, key)
+                # experiment/cell_id vêm das partições hive
+                df.to_parquet(os.path.join(path, 'part-0.parquet'), index=False)
+                metadata.update(status='captured', rows=len(df))
+        except Exception as e:
+            logger.error(f"❌ Falha na captura de {cell.cell_id}: {e}")
+            metadata.update(status='failed', error=str(e))
+
+        with open(os.path.join(path, '_experiment.json'), 'w') as f:
+            json.dump(metadata, f, indent=2)
+        with self._lock:
+            self.results.append(metadata)
+            with open(os.path.join(self.output_dir, '_experiments.jsonl'), 'a') as f:
+                f.write(json.dumps(metadata) + '\n')
+        logger.info(f"💾 {cell.cell_id}: {metadata['status']} ({metadata['rows']} linhas)")
+
+    def run(self, cells: List[ExperimentCell]) -> Dict:
+        """Executa as células pendentes respeitando orçamento e concorrência"""
+        self.validate(cells)
+        os.makedirs(self.output_dir, exist_ok=True)
+        pending = [cell for cell in cells if not self.is_done(cell)]
+        skipped = len(cells) - len(pending)
+        if skipped:
+            logger.info(f"⏭️ {skipped} células já capturadas, retomando as {len(pending)} restantes")
+
+        running: Dict[str, Dict] = {}
+        used = {'cpu': 0.0, 'memory_mb': 0.0}
+        started_at = time.perf_counter()
+        peak_concurrency = 0
+        grace = self.capture_cfg['grace_seconds']
+        futures = []
+
+        try:
+            while pending or running:
+                # Admite células na ordem da matriz enquanto houver orçamento
+                for cell in list(pending):
+                    demand = cell.demand(self.resources)
+                    if not self._fits(used, len(running), demand):
+                        continue
+                    handle = self.backend.start(cell)
+                    running[cell.cell_id] = {'cell': cell, 'handle': handle, 'demand': demand,
+                                             'start': datetime.now()}
+                    for key in used:
+                        used[key] += demand[key]
+                    pending.remove(cell)
+                    logger.info(f"🚀 {cell.cell_id} iniciada ({len(running)} em execução, "
+                                f"cpu={used['cpu']:.1f}/{self.budget['cpu']}, "
+                                f"mem={used['memory_mb']:.0f}/{self.budget['memory_mb']} MB)")
+                peak_concurrency = max(peak_concurrency, len(running))
+
+                time.sleep(self.capture_cfg['poll_seconds'])
+
+                for cell_id, entry in list(running.items()):
+                    cell = entry['cell']
+                    elapsed = (datetime.now() - entry['start']).total_seconds()
+                    if self.backend.is_running(entry['handle']) and elapsed < cell.duration_minutes * 60 + grace:
+                        continue
+                    self.backend.stop(entry['handle'])
+                    end = datetime.now()
+                    for key in used:
+                        used[key] -= entry['demand'][key]
+                    del running[cell_id]
+                    futures.append(self._captures.submit(self._finish, cell, entry['handle'],
+                                                         entry['start'], end))
+        except KeyboardInterrupt:
+            logger.info("⏹️ Interrompido: encerrando células em execução...")
+            for entry in running.values():
+                self.backend.stop(entry['handle'])
+            raise
+        finally:
+            for future in futures:
+                future.result()
+            self._captures.shutdown(wait=True)
+
+        elapsed = time.perf_counter() - started_at
+        captured = sum(1 for r in self.results if r['status'] == 'captured')
+        return {
+            'cells': len(cells), 'skipped': skipped, 'captured': captured,
+            'failed': sum(1 for r in self.results if r['status'] != 'captured'),
+            'rows': sum(r['rows'] for r in self.results),
+            'wall_seconds': elapsed,
+            'cells_per_hour': len(self.results) / max(elapsed, 1e-9) * 3600,
+            'peak_concurrency': peak_concurrency,
+        }
+
+
+def parse_arguments():
+    """Parse argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(description='Executor de matriz de experimentos de stress')
+    parser.add_argument('--matrix', type=str, default='experiment_matrix.yaml',
+                        help='Arquivo YAML/JSON com a matriz (default: experiment_matrix.yaml)')
+    parser.add_argument('--backend', choices=['local', 'kubernetes'], default='local',
+                        help='Backend de execução (default: local)')
+    parser.add_argument('--output', type=str, default='experiments',
+                        help='Diretório particionado de saída (default: experiments)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Apenas mostrar as células e a demanda de recursos')
+    parser.add_argument('--kubectl', type=str, default='kubectl',
+                        help='Comando kubectl (ex: "microk8s kubectl")')
+    parser.add_argument('--prometheus-url', type=str, default='http://localhost:9090',
+                        help='URL do Prometheus para captura no backend kubernetes')
+    parser.add_argument('--username', type=str, default=None, help='Usuário para Basic Authentication')
+    parser.add_argument('--password', type=str, default=None, help='Senha para Basic Authentication')
+    parser.add_argument('--no-verify-ssl', action='store_true', help='Desabilitar verificação SSL')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    try:
+        spec = load_matrix(args.matrix)
+    except (OSError, ValueError) as e:
+        logger.error(f"❌ Matriz inválida: {e}")
+        exit(1)
+
+    cells = expand_matrix(spec)
+    step_seconds = pd.Timedelta(spec['capture']['step']).total_seconds()
+
+    if args.backend == 'local':
+        backend = LocalProcessBackend(spec['resources'], step_seconds)
+    else:
+        from ml_dataset_generator import MLDatasetGenerator
+
+        backend = KubernetesBackend(
+            spec['resources'], spec['namespace'], spec['image'],
+            generator_factory=lambda: MLDatasetGenerator(
+                args.prometheus_url, username=args.username, password=args.password,
+                verify_ssl=not args.no_verify_ssl),
+            step=spec['capture']['step'], kubectl_cmd=args.kubectl,
+        )
+
+    runner = ExperimentRunner(spec, backend, args.output)
+    plan = runner.plan(cells)
+    logger.info(f"📋 Experimento '{spec['name']}': {len(cells)} células "
+                f"(orçamento: {spec['budget']})")
+
+    if args.dry_run:
+        print(plan.to_string(index=False))
+        exit(0)
+
+    try:
+        report = runner.run(cells)
+    except ValueError as e:
+        logger.error(f"❌ {e}")
+        exit(1)
+
+    print("\n📊 Resumo do experimento:")
+    for key, value in report.items():
+        print(f"   • {key}: {value:,.2f}" if isinstance(value, float) else f"   • {key}: {value}")
+    logger.info(f"Próximo passo: python sistema_treinamento_ml.py --dataset {args.output}")
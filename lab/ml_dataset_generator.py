@@ -14,8 +14,14 @@ from datetime import datetime, timedelta
 import json
 import logging
 import argparse
+import os
 from typing import Dict, List, Optional, Tuple
 import warnings
+
+from adaptive_thresholds import AdaptiveThresholdLabeler
+from change_point_detection import ChangePointDetector, METHODS as CHANGE_POINT_METHODS
+from leak_estimator import LeakEstimator
+from recording_rules import BASE_FILTERS, recording_rule_name
 warnings.filterwarnings('ignore')
 
 # Configuração de logging
@@ -243,13 +249,17 @@ class PrometheusConnector:
 class MetricsExtractor:
     """Classe para extração de métricas do cAdvisor"""
     
-    def __init__(self, connector: PrometheusConnector):
+    def __init__(self, connector: PrometheusConnector, use_recording_rules: bool = False):
+        """
+        Args:
+            connector: Connector do Prometheus
+            use_recording_rules: Ler séries gravadas pelas recording rules
+                                 (recording_rules.py) em vez de reavaliar rate()
+        """
         self.connector = connector
+        self.use_recording_rules = use_recording_rules
         self.raw_metrics = []
 
-
-
-
     def get_metrics_config(self) -> Dict[str, str]:
         """Retorna configuração de métricas a serem coletadas"""
         return {
@@ -368,6 +378,47 @@ class MetricsExtractor:
             'node_ready': 'kube_node_status_condition',
         }
     
+    def build_query(self, metric_name: str, metric_query: str,
+                    pod_filter: Optional[str] = None,
+                    namespace: Optional[str] = None) -> str:
+        """
+        Monta a query PromQL de uma métrica com os filtros de pod/namespace
+        
+        Com use_recording_rules, expressões rate() são substituídas pela série
+        gravada correspondente, que já carrega os filtros base.
+        """
+        # Adiciona filtros
+        filters = list(BASE_FILTERS)
+        if metric_name == 'memory_limit':
+            filters.append(f'resource="memory"')
+        if pod_filter:
+            filters.append(f'pod=~"{pod_filter}"')
+        if namespace:
+            filters.append(f'namespace="{namespace}"')
+        
+        # Monta query corretamente baseado no tipo de métrica
+        filters_str = ','.join(filters)
+        
+        record = recording_rule_name(metric_query) if self.use_recording_rules else None
+        if record:
+            # Série gravada: filtros base já aplicados na regra
+            extra_filters = ','.join(filters[len(BASE_FILTERS):])
+            return f'{record}{{{extra_filters}}}' if extra_filters else record
+        
+        # Se a métrica usa rate(), os filtros vão DENTRO do rate()
+        if metric_query.startswith('rate('):
+            # Extrai o nome da métrica e o intervalo
+            # Ex: rate(container_cpu_usage_seconds_total[5m])
+            metric_base = metric_query.replace('rate(', '').replace(')', '')
+            metric_name_part = metric_base.split('[')[0]
+            interval_part = '[' + metric_base.split('[')[1]
+            
+            # Reconstroi com filtros corretos
+            return f'rate({metric_name_part}{{{filters_str}}}{interval_part})'
+        
+        # Métricas sem rate() mantém sintaxe original
+        return f'{metric_query}{{{filters_str}}}'
+    
     def extract_metrics(self, start_time: datetime, end_time: datetime, 
                        step: str = '30s', pod_filter: Optional[str] = None,
                        namespace: Optional[str] = None) -> pd.DataFrame:
@@ -396,33 +447,9 @@ class MetricsExtractor:
 
         metricas = []
         for metric_name, metric_query in metrics_config.items():
-            # Adiciona filtros
-            filters = ['container!="POD"', 'container!=""']
-            if metric_name == 'memory_limit':
-                filters.append(f'resource="memory"')
-            if pod_filter:
-                filters.append(f'pod=~"{pod_filter}"')
-            if namespace:
-                filters.append(f'namespace="{namespace}"')
-            
-            # Monta query corretamente baseado no tipo de métrica
-            filters_str = ','.join(filters)
-            
-            # Se a métrica usa rate(), os filtros vão DENTRO do rate()
-            if metric_query.startswith('rate('):
-                # Extrai o nome da métrica e o intervalo
-                # Ex: rate(container_cpu_usage_seconds_total[5m])
-                metric_base = metric_query.replace('rate(', '').replace(')', '')
-                metric_name_part = metric_base.split('[')[0]
-                interval_part = '[' + metric_base.split('[')[1]
-                
-                # Reconstroi com filtros corretos
-                query = f'rate({metric_name_part}{{{filters_str}}}{interval_part})'
-            else:
-                # Métricas sem rate() mantém sintaxe original
-                query = f'{metric_query}{{{filters_str}}}'
+            query = self.build_query(metric_name, metric_query, pod_filter, namespace)
             
-               # Armazena no dicionário
+            # Armazena no dicionário
             metricas.append({'metric_name':metric_name, 'metric_query':query})
  
 
@@ -457,8 +484,12 @@ class MetricsExtractor:
 class FeatureEngineer:
     """Classe para engenharia de features para ML"""
     
-    def __init__(self, thresholds: ThresholdConfig):
+    def __init__(self, thresholds: ThresholdConfig,
+                 adaptive_labeler: Optional[AdaptiveThresholdLabeler] = None,
+                 leak_estimator: Optional[LeakEstimator] = None):
         self.thresholds = thresholds
+        self.adaptive_labeler = adaptive_labeler
+        self.leak_estimator = leak_estimator
         self.feature_columns = []
     
     def create_ml_features(self, df_raw: pd.DataFrame) -> pd.DataFrame:
@@ -495,9 +526,17 @@ class FeatureEngineer:
         # Adiciona features estatísticas (rolling)
         df_features = self._add_statistical_features(df_features)
         
+        # Inclinação de vazamento de memória e time-to-OOM (Repeated Median por série)
+        if self.leak_estimator is not None:
+            df_features = self.leak_estimator.update(df_features)
+        
         # Cria labels para ML (target) - USA THRESHOLDS CONFIGURÁVEIS
         df_features = self._create_target_labels(df_features)
         
+        # Labels adaptativos por série (p95/p99 do histórico de cada pod/container)
+        if self.adaptive_labeler is not None:
+            df_features = self.adaptive_labeler.label(df_features)
+        
         logger.info(f"✅ Features finais: {df_features.shape}")
         logger.info(f"Colunas: {list(df_features.columns)}")
         
@@ -788,7 +827,11 @@ class MLDatasetGenerator:
     
     def __init__(self, prometheus_url: str, thresholds: Optional[ThresholdConfig] = None,
                  username: Optional[str] = None, password: Optional[str] = None,
-                 verify_ssl: bool = True):
+                 verify_ssl: bool = True,
+                 adaptive_labeler: Optional[AdaptiveThresholdLabeler] = None,
+                 use_recording_rules: bool = False,
+                 change_point_detector: Optional[ChangePointDetector] = None,
+                 leak_estimator: Optional[LeakEstimator] = None):
         """
         Inicializa gerador de dataset
         
@@ -798,22 +841,30 @@ class MLDatasetGenerator:
             username: Usuário para Basic Auth (opcional)
             password: Senha para Basic Auth (opcional)
             verify_ssl: Verificar certificado SSL (default: True)
+            adaptive_labeler: Labeler de thresholds adaptativos por série (opcional)
+            use_recording_rules: Extrair das séries gravadas por recording rules
+            change_point_detector: Detector de mudanças de regime (tabela de eventos opcional)
+            leak_estimator: Estimador de vazamento/time-to-OOM (features opcionais)
         """
         self.connector = PrometheusConnector(prometheus_url, username=username, 
                                              password=password, verify_ssl=verify_ssl)
-        self.extractor = MetricsExtractor(self.connector)
+        self.extractor = MetricsExtractor(self.connector, use_recording_rules)
         
         # Usa thresholds padrão se não fornecido
         if thresholds is None:
             thresholds = ThresholdConfig()
         
         self.thresholds = thresholds
-        self.engineer = FeatureEngineer(thresholds)
+        self.adaptive_labeler = adaptive_labeler
+        self.engineer = FeatureEngineer(thresholds, adaptive_labeler, leak_estimator)
+        self.change_point_detector = change_point_detector
         self.dataset = None
+        self.change_points = None
     
     def generate_dataset(self, duration_minutes: int = 60, step: str = '30s',
                         pod_filter: Optional[str] = None, 
-                        namespace: Optional[str] = None) -> pd.DataFrame:
+                        namespace: Optional[str] = None,
+                        end_time: Optional[datetime] = None) -> pd.DataFrame:
         """
         Gera dataset completo para ML
         
@@ -822,6 +873,7 @@ class MLDatasetGenerator:
             step: Intervalo entre medições
             pod_filter: Filtro regex para pods
             namespace: Namespace específico
+            end_time: Fim da janela coletada (default: agora)
         
         Returns:
             DataFrame pronto para ML
@@ -835,7 +887,7 @@ class MLDatasetGenerator:
             raise ConnectionError("Não foi possível conectar ao Prometheus")
         
         # Calcula período
-        end_time = datetime.now()
+        end_time = end_time or datetime.now()
         start_time = end_time - timedelta(minutes=duration_minutes)
         
         logger.info(f"\nPeríodo: {start_time} até {end_time}")
@@ -867,6 +919,10 @@ class MLDatasetGenerator:
         
         self.dataset = df_ml
         
+        # Tabela de change-points (labels adicionais, uma linha por evento)
+        if self.change_point_detector is not None:
+            self.change_points = self.change_point_detector.detect(df_ml)
+        
         logger.info("\n" + "="*70)
         logger.info("✅ DATASET GERADO COM SUCESSO!")
         logger.info("="*70)
@@ -874,13 +930,19 @@ class MLDatasetGenerator:
         return df_ml
     
     def save_dataset(self, output_path: str = 'kubernetes_ml_dataset', 
-                    formats: List[str] = ['csv', 'parquet']):
+                    formats: List[str] = ['csv', 'parquet'],
+                    row_group_size: int = 50_000):
         """
         Salva dataset em múltiplos formatos
         
         Args:
             output_path: Caminho base para salvar arquivos
-            formats: Lista de formatos ('csv', 'parquet', 'json')
+            formats: Lista de formatos ('csv', 'parquet', 'json', 'partitioned')
+            row_group_size: Linhas por row group nos formatos Parquet
+        
+        O formato 'partitioned' grava um diretório Parquet particionado por data
+        ({output_path}_partitioned/date=AAAA-MM-DD/), lido em lotes por
+        sistema_treinamento_ml.py.
         """
         if self.dataset is None or self.dataset.empty:
             logger.error("Dataset vazio, nada para salvar")
@@ -894,16 +956,34 @@ class MLDatasetGenerator:
             if fmt == 'csv':
                 self.dataset.to_csv(file_path, index=False)
             elif fmt == 'parquet':
-                self.dataset.to_parquet(file_path, index=False)
+                self.dataset.to_parquet(file_path, index=False, row_group_size=row_group_size)
             elif fmt == 'json':
                 self.dataset.to_json(file_path, orient='records', date_format='iso')
+            elif fmt == 'partitioned':
+                file_path = f"{output_path}_partitioned"
+                partitioned = self.dataset.assign(date=self.dataset['timestamp'].dt.strftime('%Y-%m-%d'))
+                partitioned.to_parquet(file_path, index=False, partition_cols=['date'],
+                                       row_group_size=row_group_size)
             
-            import os
-            size_mb = os.path.getsize(file_path) / 1024 / 1024
+            if os.path.isdir(file_path):
+                size_bytes = sum(os.path.getsize(os.path.join(root, name))
+                                 for root, _, names in os.walk(file_path) for name in names)
+            else:
+                size_bytes = os.path.getsize(file_path)
+            size_mb = size_bytes / 1024 / 1024
             logger.info(f"   ✅ {file_path} ({size_mb:.2f} MB)")
         
         # Salva também a configuração de thresholds
         self.thresholds.save_to_file(f"{output_path}_thresholds.json")
+        
+        # Salva o estado dos sketches adaptativos para a próxima execução
+        if self.adaptive_labeler is not None:
+            self.adaptive_labeler.save_to_file(f"{output_path}_adaptive_sketches.json")
+        
+        if self.change_points is not None:
+            change_points_path = f"{output_path}_change_points.csv"
+            self.change_points.to_csv(change_points_path, index=False)
+            logger.info(f"   ✅ {change_points_path} ({len(self.change_points)} eventos)")
     
     def get_dataset_info(self) -> Dict:
         """Retorna informações do dataset gerado"""
@@ -1070,9 +1150,12 @@ Exemplos de uso:
     parser.add_argument('--output', type=str, default='kubernetes_ml_dataset',
                        help='Nome base do arquivo de saída (default: kubernetes_ml_dataset)')
     
+    parser.add_argument('--use-recording-rules', action='store_true',
+                       help='Ler séries gravadas pelas recording rules (gere com: python recording_rules.py generate)')
+    
     parser.add_argument('--formats', nargs='+', default=['csv', 'parquet'],
-                       choices=['csv', 'parquet', 'json'],
-                       help='Formatos de saída (default: csv parquet)')
+                       choices=['csv', 'parquet', 'json', 'partitioned'],
+                       help='Formatos de saída (default: csv parquet; partitioned = diretório Parquet por data)')
     
     # Thresholds de Memória
     memory_group = parser.add_argument_group('Thresholds de Memória')
@@ -1110,6 +1193,29 @@ Exemplos de uso:
     config_group.add_argument('--save-thresholds-only', action='store_true',
                              help='Apenas salvar thresholds e sair (não coletar dados)')
     
+    # Thresholds adaptativos por série
+    adaptive_group = parser.add_argument_group('Thresholds Adaptativos (por pod/container)')
+    adaptive_group.add_argument('--adaptive-thresholds', action='store_true',
+                               help='Rotular amostras também pelos p95/p99 do histórico de cada série')
+    adaptive_group.add_argument('--adaptive-state', type=str, default=None,
+                               help='Arquivo JSON com sketches de execuções anteriores (default: <output>_adaptive_sketches.json)')
+    adaptive_group.add_argument('--adaptive-window-hours', type=int, default=24,
+                               help='Tamanho da janela deslizante em horas (default: 24)')
+    adaptive_group.add_argument('--adaptive-min-samples', type=int, default=30,
+                               help='Amostras mínimas de histórico antes de rotular uma série (default: 30)')
+    
+    # Change-points
+    change_point_group = parser.add_argument_group('Change-Points (mudanças de regime)')
+    change_point_group.add_argument('--change-points', type=str, default=None, choices=CHANGE_POINT_METHODS,
+                                    help='Gerar tabela <output>_change_points.csv com o detector escolhido')
+    
+    # Vazamento de memória
+    leak_group = parser.add_argument_group('Vazamento de Memória (time-to-OOM)')
+    leak_group.add_argument('--leak-features', action='store_true',
+                            help='Adicionar inclinação de vazamento, time-to-OOM e leak_alert por série')
+    leak_group.add_argument('--leak-window', type=int, default=20,
+                            help='Amostras na janela do estimador de vazamento (default: 20)')
+    
     return parser.parse_args()
 
 
@@ -1165,6 +1271,22 @@ if __name__ == "__main__":
             logger.info("✅ Thresholds salvos com sucesso!")
             exit(0)
 
+        # Carrega ou cria labeler adaptativo
+        adaptive_labeler = None
+        if args.adaptive_thresholds:
+            state_file = args.adaptive_state or f"{args.output}_adaptive_sketches.json"
+            if os.path.exists(state_file):
+                adaptive_labeler = AdaptiveThresholdLabeler.load_from_file(
+                    state_file,
+                    window_buckets=args.adaptive_window_hours,
+                    min_samples=args.adaptive_min_samples
+                )
+            else:
+                adaptive_labeler = AdaptiveThresholdLabeler(
+                    window_buckets=args.adaptive_window_hours,
+                    min_samples=args.adaptive_min_samples
+                )
+
         args.pod_filter = "app-degradacao-.*"
         args.prometheus_url = "http://192.168.242.134:30090/"
 
@@ -1174,7 +1296,11 @@ if __name__ == "__main__":
             thresholds=thresholds,
             username=args.username,
             password=password,
-            verify_ssl=not args.no_verify_ssl
+            verify_ssl=not args.no_verify_ssl,
+            adaptive_labeler=adaptive_labeler,
+            use_recording_rules=args.use_recording_rules,
+            change_point_detector=ChangePointDetector(args.change_points) if args.change_points else None,
+            leak_estimator=LeakEstimator(window=args.leak_window) if args.leak_features else None
         )
         
 
@@ -1205,7 +1331,7 @@ if __name__ == "__main__":
         
         logger.info("\n✨ Coleta de dados concluída com sucesso!")
         logger.info("\nPróximos passos:")
-        logger.info("  1. Treinar modelo: python sistema_treinamento_ml.py")
+        logger.info(f"  1. Treinar modelo: python sistema_treinamento_ml.py --dataset {args.output}_partitioned")
         logger.info(f"  2. Verificar thresholds: cat {args.output}_thresholds.json")
         logger.info("  3. Ajustar thresholds se necessário e re-executar")
         
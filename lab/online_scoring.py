@@ -0,0 +1,533 @@
+"""
+Serviço de Score Online - Predição de Sobrecarga em Tempo Real
+Descrição: Mantém em memória o estado rolling por série (pod, container) usado
+          por FeatureEngineer._add_statistical_features e
+          _calculate_derived_features, recebe amostras novas (polling do
+          Prometheus ou JSON enviado via HTTP), pontua em micro-lotes com o
+          modelo treinado por sistema_treinamento_ml.py e expõe o risco por pod.
+
+Uso:
+  # Polling do Prometheus a cada 30s + API HTTP na porta 8090
+  python online_scoring.py serve --model modelos_sobrecarga.joblib \\
+    --prometheus-url http://localhost:9090 --pod-filter "app-.*"
+
+  # Apenas receber amostras via POST /samples
+  python online_scoring.py serve --model modelos_sobrecarga.joblib
+
+  # Benchmark com feed sintético (latência p99 por lote e capacidade por core)
+  python online_scoring.py benchmark --series 5000 --batch-size 500
+
+Endpoints:
+  POST /samples  - lista de {"pod", "container", "namespace", "node",
+                   "timestamp" (epoch s), "metrics": {metric_name: valor}}
+  GET  /risk     - risco atual por pod
+  GET  /healthz  - estado do serviço e latências
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import argparse
+import threading
+import warnings
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import joblib
+
+# KeyedArrays é compartilhado com o coletor (apps/cadvisor-metrics-collector/src)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'apps',
+                             'cadvisor-metrics-collector', 'src'))
+from keyed_arrays import KeyedArrays
+from ml_dataset_generator import (FeatureEngineer, MetricsExtractor,
+                                  PrometheusConnector, ThresholdConfig)
+from leak_estimator import LEAK_COLUMNS, LeakEstimator
+
+logger = logging.getLogger(__name__)
+
+# Mesmas métricas e janela de FeatureEngineer._add_statistical_features
+ROLLING_METRICS = ['memory_usage_percent', 'cpu_usage_percent',
+                   'disk_usage_percent', 'network_total_bytes']
+ROLLING_WINDOW = 5
+
+
+class RollingFeatureState:
+    """Estado rolling por série em arrays numpy (ring buffer de ROLLING_WINDOW amostras)"""
+
+    def __init__(self, metrics: List[str] = None, window: int = ROLLING_WINDOW,
+                 initial_capacity: int = 1024):
+        self.metrics = metrics or list(ROLLING_METRICS)
+        self.window = window
+        m = len(self.metrics)
+        self.series = KeyedArrays(initial_capacity, ring=((m, window), float, np.nan),
+                                  count=((), np.int64, 0), pos=((), np.int64, 0),
+                                  last=((m,), float, np.nan), last_restarts=((), float, np.nan))
+
+    @property
+    def num_series(self) -> int:
+        return len(self.series)
+
+    def series_ids(self, df: pd.DataFrame) -> np.ndarray:
+        """Mapeia (pod, container) para ids internos, criando séries novas"""
+        return self.series.lookup(zip(df['pod'].astype(str), df['container'].astype(str)))
+
+    def update(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Atualiza o estado com um lote (já com features derivadas) e adiciona
+        as colunas rolling/diff/pct_change equivalentes às do batch offline
+
+        Amostras da mesma série no mesmo lote são aplicadas em ordem de
+        timestamp, em rodadas onde cada série aparece no máximo uma vez.
+        """
+        df = df.sort_values('timestamp', kind='stable').reset_index(drop=True)
+        ids = self.series_ids(df)
+        present = [m for m in self.metrics if m in df.columns]
+        metric_idx = np.array([self.metrics.index(m) for m in present], dtype=np.int64)
+        values = df[present].to_numpy(dtype=float) if present else np.empty((len(df), 0))
+
+        n, k = len(df), len(present)
+        roll_mean = np.full((n, k), np.nan)
+        roll_std = np.full((n, k), np.nan)
+        diff = np.full((n, k), np.nan)
+        pct = np.full((n, k), np.nan)
+        restart_rate = np.zeros(n)
+        restarts = df['container_restarts'].to_numpy(dtype=float) if 'container_restarts' in df.columns else None
+
+        occurrence = pd.Series(ids).groupby(ids).cumcount().to_numpy()
+        slots = np.arange(self.window)
+        for rnd in range(occurrence.max() + 1 if n else 0):
+            rows = np.nonzero(occurrence == rnd)[0]
+            sid = ids[rows]
+
+            if k:
+                v = values[rows]
+                prev = self.series.last[sid[:, None], metric_idx[None, :]]
+                diff[rows] = v - prev
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    pct[rows] = (v - prev) / prev
+
+                self.series.ring[sid[:, None], metric_idx[None, :], self.series.pos[sid][:, None]] = v
+                self.series.last[sid[:, None], metric_idx[None, :]] = v
+
+            self.series.pos[sid] = (self.series.pos[sid] + 1) % self.window
+            self.series.count[sid] = np.minimum(self.series.count[sid] + 1, self.window)
+
+            if k:
+                window = self.series.ring[sid][:, metric_idx, :]
+                window = np.where(slots[None, None, :] < self.series.count[sid][:, None, None], window, np.nan)
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore', category=RuntimeWarning)
+                    roll_mean[rows] = np.nanmean(window, axis=2)
+                    roll_std[rows] = np.nanstd(window, axis=2, ddof=1)
+
+            if restarts is not None:
+                r = restarts[rows]
+                restart_rate[rows] = np.nan_to_num(r - self.series.last_restarts[sid])
+                self.series.last_restarts[sid] = r
+
+        for j, metric in enumerate(present):
+            df[f'{metric}_rolling_mean_5'] = roll_mean[:, j]
+            df[f'{metric}_rolling_std_5'] = roll_std[:, j]
+            df[f'{metric}_diff'] = diff[:, j]
+            df[f'{metric}_pct_change'] = np.nan_to_num(pct[:, j], nan=0.0)
+        if restarts is not None:
+            df['restart_rate'] = restart_rate
+        return df
+
+
+class OnlineScorer:
+    """Pontua micro-lotes de amostras e mantém o risco atual por pod"""
+
+    def __init__(self, model_bundle: Dict, thresholds: Optional[ThresholdConfig] = None):
+        """
+        Args:
+            model_bundle: Dicionário salvo por IncrementalTrainer.save_models
+            thresholds: Thresholds usados no FeatureEngineer (apenas para labels auxiliares)
+        """
+        self.models = model_bundle['models']
+        self.scaler = model_bundle['scaler']
+        self.feature_columns = model_bundle['feature_columns']
+        self.engineer = FeatureEngineer(thresholds or ThresholdConfig())
+        self.state = RollingFeatureState()
+        # Features de vazamento só quando o modelo foi treinado com elas
+        self.leak_estimator = LeakEstimator() \
+            if any(column in self.feature_columns for column in LEAK_COLUMNS) else None
+        self.pod_risk: Dict[str, Dict] = {}
+        self.latencies_ms: List[float] = []
+        self._lock = threading.Lock()
+
+        # Risco = probabilidade de critical_overload, ou o maior entre os classificadores
+        classifiers = [t for t, m in self.models.items() if hasattr(m, 'predict_proba')]
+        self.risk_targets = ['critical_overload'] if 'critical_overload' in classifiers else classifiers
+        self.severity_target = 'overload_severity' if 'overload_severity' in self.models else None
+
+    @classmethod
+    def load(cls, model_path: str) -> 'OnlineScorer':
+        logger.info(f"📂 Carregando modelos de: {model_path}")
+        return cls(joblib.load(model_path))
+
+    def build_features(self, samples: List[Dict]) -> pd.DataFrame:
+        """Transforma amostras brutas em linhas de features (mesmas colunas do dataset)"""
+        rows = []
+        for sample in samples:
+            row = {
+                'timestamp': sample['timestamp'],
+                'pod': sample.get('pod', ''),
+                'container': sample.get('container', ''),
+                'namespace': sample.get('namespace', ''),
+                'node': sample.get('node', ''),
+            }
+            row.update(sample.get('metrics', {}))
+            rows.append(row)
+
+        df = pd.DataFrame(rows)
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s') \
+            if pd.api.types.is_numeric_dtype(df['timestamp']) else pd.to_datetime(df['timestamp'])
+
+        df = self.engineer._calculate_derived_features(df)
+        df = self.engineer._add_temporal_features(df)
+        df = self.state.update(df)
+        if self.leak_estimator is not None:
+            df = self.leak_estimator.update(df)
+        return df
+
+    def score_batch(self, samples: List[Dict]) -> pd.DataFrame:
+        """Pontua um micro-lote e atualiza o risco por pod"""
+        start = time.perf_counter()
+        df = self.build_features(samples)
+
+        # Cópia explícita: com copy-on-write to_numpy() pode devolver view somente leitura
+        X = df.reindex(columns=self.feature_columns).to_numpy(dtype=float, copy=True)
+        X = np.nan_to_num(X, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+        X = self.scaler.transform(X)
+
+        result = df[['timestamp', 'pod', 'container']].copy()
+        risk = np.zeros(len(df))
+        for target in self.risk_targets:
+            risk = np.maximum(risk, self.models[target].predict_proba(X)[:, 1])
+        result['risk'] = risk
+        if self.severity_target:
+            result['predicted_severity'] = np.clip(self.models[self.severity_target].predict(X), 0, 3)
+
+        # Último valor de cada container; risco do pod = pior container
+        latest = result.drop_duplicates(['pod', 'container'], keep='last')
+        with self._lock:
+            for record in latest.to_dict('records'):
+                current = self.pod_risk.get(record['pod'])
+                same_container = current is not None and current['container'] == record['container']
+                if current is None or same_container or record['risk'] >= current['risk']:
+                    self.pod_risk[record['pod']] = {
+                        'risk': float(record['risk']),
+                        'predicted_severity': float(record.get('predicted_severity', np.nan)),
+                        'container': record['container'],
+                        'timestamp': str(record['timestamp']),
+                    }
+            self.latencies_ms.append((time.perf_counter() - start) * 1000)
+            self.latencies_ms = self.latencies_ms[-10_000:]
+        return result
+
+    def latency_summary(self) -> Dict:
+        with self._lock:
+            latencies = np.array(self.latencies_ms)
+        if latencies.size == 0:
+            return {'batches': 0}
+        return {
+            'batches': int(latencies.size),
+            'p50_ms': float(np.percentile(latencies, 50)),
+            'p99_ms': float(np.percentile(latencies, 99)),
+            'max_ms': float(latencies.max()),
+        }
+
+    def get_pod_risk(self) -> Dict[str, Dict]:
+        with self._lock:
+            return dict(self.pod_risk)
+
+
+class MicroBatcher:
+    """Agrupa amostras de várias fontes em micro-lotes para o OnlineScorer"""
+
+    def __init__(self, scorer: OnlineScorer, max_batch_size: int = 1000, max_wait_ms: int = 50):
+        self.scorer = scorer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue: 'queue.Queue[Dict]' = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    def submit(self, samples: List[Dict]):
+        for sample in samples:
+            self.queue.put(sample)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                batch = [self.queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self.scorer.score_batch(batch)
+            except Exception as e:
+                logger.error(f"Erro ao pontuar lote de {len(batch)} amostras: {e}")
+
+
+class PrometheusSamplePoller:
+    """Lê o valor instantâneo de cada métrica de get_metrics_config e gera amostras por container"""
+
+    def __init__(self, connector: PrometheusConnector, pod_filter: Optional[str] = None,
+                 namespace: Optional[str] = None, use_recording_rules: bool = False):
+        self.connector = connector
+        self.extractor = MetricsExtractor(connector, use_recording_rules)
+        self.pod_filter = pod_filter
+        self.namespace = namespace
+
+    def poll(self) -> List[Dict]:
+        samples: Dict[Tuple, Dict] = {}
+        now = datetime.now().timestamp()
+        for metric_name, metric_query in self.extractor.get_metrics_config().items():
+            query = self.extractor.build_query(metric_name, metric_query, self.pod_filter, self.namespace)
+            result = self.connector.query_instant(query)
+            if not result or result.get('status') != 'success':
+                continue
+            for item in result['data']['result']:
+                labels = item['metric']
+                key = (labels.get('pod', ''), labels.get('container', ''),
+                       labels.get('namespace', ''), labels.get('node', ''))
+                sample = samples.setdefault(key, {
+                    'pod': key[0], 'container': key[1], 'namespace': key[2], 'node': key[3],
+                    'timestamp': now, 'metrics': {}
+                })
+                # Primeiro valor por métrica, como no pivot_table(aggfunc='first')
+                value = item['value'][1]
+                sample['metrics'].setdefault(metric_name, float(value) if value != 'NaN' else np.nan)
+        return list(samples.values())
+
+    def run_forever(self, batcher: MicroBatcher, interval_seconds: int = 30):
+        while True:
+            started = time.monotonic()
+            try:
+                samples = self.poll()
+                batcher.submit(samples)
+                logger.info(f"📥 {len(samples)} amostras recebidas do Prometheus")
+            except Exception as e:
+                logger.error(f"Erro no polling do Prometheus: {e}")
+            time.sleep(max(0.0, interval_seconds - (time.monotonic() - started)))
+
+
+def make_handler(batcher: MicroBatcher):
+    """Cria handler HTTP ligado ao micro-batcher"""
+
+    class ScoringHandler(BaseHTTPRequestHandler):
+        def _send_json(self, payload, status: int = 200):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/risk':
+                self._send_json(batcher.scorer.get_pod_risk())
+            elif self.path == '/healthz':
+                self._send_json({'status': 'ok',
+                                 'series': batcher.scorer.state.num_series,
+                                 'queue': batcher.queue.qsize(),
+                                 'latency': batcher.scorer.latency_summary()})
+            else:
+                self._send_json({'error': 'not found'}, 404)
+
+        def do_POST(self):
+            if self.path != '/samples':
+                self._send_json({'error': 'not found'}, 404)
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                samples = json.loads(self.rfile.read(length))
+                if isinstance(samples, dict):
+                    samples = [samples]
+                batcher.submit(samples)
+                self._send_json({'accepted': len(samples)}, 202)
+            except (ValueError, TypeError) as e:
+                self._send_json({'error': str(e)}, 400)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return ScoringHandler
+
+
+def synthetic_feed(num_series: int, steps: int, seed: int = 42):
+    """Gera amostras sintéticas por passo de coleta (todas as séries a cada passo)"""
+    rng = np.random.default_rng(seed)
+    limit = 512 * 1024 * 1024
+    base = rng.uniform(0.2, 0.8, num_series) * limit
+    start = datetime.now().timestamp()
+    for step in range(steps):
+        working_set = np.clip(base * (1 + 0.002 * step) + rng.normal(0, 0.02 * limit, num_series), 0, limit)
+        cpu = rng.gamma(2.0, 0.1, num_series)
+        yield [{
+            'pod': f'pod-{i // 2}', 'container': f'c{i % 2}', 'namespace': 'bench', 'node': 'n1',
+            'timestamp': start + step * 30,
+            'metrics': {
+                'memory_working_set_bytes': float(working_set[i]),
+                'memory_usage_bytes': float(working_set[i] * 1.05),
+                'memory_rss': float(working_set[i] * 0.9),
+                'memory_cache': float(working_set[i] * 0.05),
+                'memory_limit': float(limit),
+                'cpu_usage_total': float(cpu[i]),
+                'cpu_quota': 100000.0, 'cpu_period': 100000.0,
+                'network_rx_bytes': float(rng.exponential(1e5)),
+                'network_tx_bytes': float(rng.exponential(1e5)),
+                'container_restarts': 0.0,
+                'processes': 2.0, 'threads': 8.0,
+            }
+        } for i in range(num_series)]
+
+
+def synthetic_model_bundle(feature_columns: List[str], seed: int = 42) -> Dict:
+    """Modelo treinado em dados aleatórios, só para medir custo de inferência"""
+    from sklearn.linear_model import SGDClassifier, SGDRegressor
+    from sklearn.preprocessing import StandardScaler
+
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(2000, len(feature_columns)))
+    scaler = StandardScaler().fit(X)
+    y = (X[:, 0] > 1).astype(int)
+    return {
+        'models': {
+            'critical_overload': SGDClassifier(loss='log_loss', random_state=seed).fit(X, y),
+            'overload_severity': SGDRegressor(random_state=seed).fit(X, y * 3.0),
+        },
+        'scaler': scaler,
+        'feature_columns': feature_columns,
+    }
+
+
+def run_benchmark(num_series: int = 5000, steps: int = 20, batch_size: int = 500,
+                  scrape_interval: int = 30, model_path: Optional[str] = None) -> Dict:
+    """
+    Mede latência por lote e capacidade de séries por core com feed sintético
+
+    O scorer roda em uma única thread, então amostras/s medidas equivalem a um
+    core; capacidade = amostras/s x intervalo de scrape.
+    """
+    feed = list(synthetic_feed(num_series, steps))
+
+    if model_path:
+        scorer = OnlineScorer.load(model_path)
+    else:
+        probe = OnlineScorer({'models': {}, 'scaler': None, 'feature_columns': []})
+        columns = [c for c in probe.build_features(feed[0][:10]).select_dtypes(include=[np.number]).columns]
+        scorer = OnlineScorer(synthetic_model_bundle(columns))
+
+    total_samples = 0
+    started = time.perf_counter()
+    for step_samples in feed:
+        for i in range(0, len(step_samples), batch_size):
+            batch = step_samples[i:i + batch_size]
+            scorer.score_batch(batch)
+            total_samples += len(batch)
+    elapsed = time.perf_counter() - started
+
+    samples_per_second = total_samples / elapsed
+    summary = scorer.latency_summary()
+    summary.update({
+        'series': num_series,
+        'batch_size': batch_size,
+        'samples': total_samples,
+        'samples_per_second_per_core': samples_per_second,
+        'series_capacity_per_core': int(samples_per_second * scrape_interval),
+        'scrape_interval_seconds': scrape_interval,
+    })
+    return summary
+
+
+def parse_arguments():
+    """Parse argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(description='Serviço de score online de sobrecarga')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve = subparsers.add_parser('serve', help='Executar serviço de score')
+    serve.add_argument('--model', type=str, default='modelos_sobrecarga.joblib',
+                       help='Modelos salvos por sistema_treinamento_ml.py')
+    serve.add_argument('--host', type=str, default='0.0.0.0')
+    serve.add_argument('--port', type=int, default=8090)
+    serve.add_argument('--max-batch-size', type=int, default=1000,
+                       help='Amostras máximas por micro-lote (default: 1000)')
+    serve.add_argument('--max-wait-ms', type=int, default=50,
+                       help='Espera máxima para completar um micro-lote (default: 50ms)')
+    serve.add_argument('--prometheus-url', type=str, default=None,
+                       help='Habilita polling do Prometheus nesta URL')
+    serve.add_argument('--poll-interval', type=int, default=30,
+                       help='Intervalo de polling em segundos (default: 30)')
+    serve.add_argument('--pod-filter', type=str, default=None)
+    serve.add_argument('--namespace', type=str, default=None)
+    serve.add_argument('--use-recording-rules', action='store_true')
+
+    bench = subparsers.add_parser('benchmark', help='Benchmark com feed sintético')
+    bench.add_argument('--series', type=int, default=5000)
+    bench.add_argument('--steps', type=int, default=20)
+    bench.add_argument('--batch-size', type=int, default=500)
+    bench.add_argument('--scrape-interval', type=int, default=30)
+    bench.add_argument('--model', type=str, default=None,
+                       help='Modelo real (default: modelo sintético)')
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    # FeatureEngineer registra cada etapa em INFO; por micro-lote isso vira ruído
+    logging.getLogger('ml_dataset_generator').setLevel(logging.WARNING)
+
+    if args.command == 'benchmark':
+        result = run_benchmark(args.series, args.steps, args.batch_size,
+                               args.scrape_interval, args.model)
+        print("\n📈 Benchmark do score online:")
+        for key, value in result.items():
+            print(f"   • {key}: {value:,.2f}" if isinstance(value, float) else f"   • {key}: {value}")
+        exit(0)
+
+    scorer = OnlineScorer.load(args.model)
+    batcher = MicroBatcher(scorer, args.max_batch_size, args.max_wait_ms)
+    batcher.start()
+
+    if args.prometheus_url:
+        poller = PrometheusSamplePoller(PrometheusConnector(args.prometheus_url),
+                                        args.pod_filter, args.namespace,
+                                        args.use_recording_rules)
+        threading.Thread(target=poller.run_forever, args=(batcher, args.poll_interval),
+                         daemon=True).start()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(batcher))
+    logger.info(f"🚀 Serviço de score em http://{args.host}:{args.port} (GET /risk, POST /samples)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("⏹️  Serviço interrompido pelo usuário")
+    finally:
+        batcher.stop()
+        server.server_close()
@@ -0,0 +1,325 @@
+"""
+Otimizador de Placement (Bin-Packing) sobre Perfis de Uso Observados
+Descrição: Constrói perfis de uso por pod (p50/p95/p99 de CPU e working set)
+          a partir do dataset e calcula uma atribuição pod -> nó que minimiza
+          o número de nós, respeitando capacidade (pelo quantil de uso) e
+          overcommit (pelos requests). Usa first-fit-decreasing e, para
+          instâncias pequenas, um ILP exato (scipy.optimize.milp).
+
+Uso:
+  # Otimizar placement dos pods do dataset em nós de 4 cores / 8 GiB
+  python placement_optimizer.py optimize --dataset kubernetes_ml_dataset.parquet
+
+  # Benchmark de tempo de solução para 100, 1.000 e 10.000 pods
+  python placement_optimizer.py benchmark --sizes 100 1000 10000
+"""
+
+import time
+import logging
+import argparse
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+GIB = 1024 ** 3
+QUANTILES = {'p50': 0.50, 'p95': 0.95, 'p99': 0.99}
+
+
+def build_usage_profiles(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Agrega o dataset em um perfil por pod com quantis de uso e requests
+
+    CPU em cores (cpu_usage_total) e memória em bytes (memory_working_set_bytes),
+    somados entre containers do pod em cada timestamp antes dos quantis.
+    Requests de memória abaixo de 1 MiB são tratados como ausentes (a query de
+    requests sem filtro de resource pode trazer o valor de CPU) e substituídos
+    pelo p50 de uso.
+
+    Returns:
+        DataFrame indexado por (namespace, pod) com cpu_p50..p99, memory_p50..p99,
+        cpu_request, memory_request e node atual
+    """
+    for col in ['cpu_requests', 'memory_requests']:
+        if col not in df.columns:
+            df = df.assign(**{col: np.nan})
+
+    per_ts = df.groupby(['namespace', 'pod', 'timestamp']).agg(
+        cpu=('cpu_usage_total', 'sum'),
+        memory=('memory_working_set_bytes', 'sum'),
+        cpu_request=('cpu_requests', 'sum'),
+        memory_request=('memory_requests', 'sum'),
+        node=('node', 'first'),
+    )
+    grouped = per_ts.groupby(level=['namespace', 'pod'])
+
+    profiles = pd.DataFrame({
+        f'{resource}_{name}': grouped[resource].quantile(q)
+        for resource in ['cpu', 'memory'] for name, q in QUANTILES.items()
+    })
+    profiles['cpu_request'] = grouped['cpu_request'].max()
+    profiles['memory_request'] = grouped['memory_request'].max()
+    profiles['node'] = grouped['node'].last()
+
+    # O pivot do gerador pode trazer bytes em cpu_requests: mesmo limite de
+    # sanidade de cluster_simulator.load_traces (0 < cores < 64)
+    profiles['cpu_request'] = profiles['cpu_request'].where(
+        profiles['cpu_request'].between(0, 64, inclusive='neither'), profiles['cpu_p50'])
+    profiles['memory_request'] = profiles['memory_request'].where(
+        profiles['memory_request'] >= 1024 ** 2, profiles['memory_p50'])
+    return profiles
+
+
+@dataclass
+class PlacementResult:
+    assignment: np.ndarray       # índice do nó por pod (ordem dos perfis)
+    nodes_used: int
+    lower_bound: int
+    method: str
+    optimal: bool
+    solve_seconds: float
+
+    def to_frame(self, profiles: pd.DataFrame) -> pd.DataFrame:
+        out = profiles.copy()
+        out['assigned_node'] = [f'node-{i}' for i in self.assignment]
+        return out
+
+
+class PlacementOptimizer:
+    """Bin-packing vetorial: uso no quantil escolhido + requests com overcommit"""
+
+    def __init__(self, node_cpu: float = 4.0, node_memory: float = 8 * GIB,
+                 quantile: str = 'p95', target_utilization: float = 0.9,
+                 cpu_overcommit: float = 1.5, memory_overcommit: float = 1.0,
+                 exact_max_pods: int = 40, exact_time_limit: float = 10.0):
+        """
+        Args:
+            node_cpu: Cores por nó
+            node_memory: Memória por nó em bytes
+            quantile: Quantil de uso usado no dimensionamento (p50, p95 ou p99)
+            target_utilization: Fração da capacidade que o uso somado pode ocupar
+            cpu_overcommit: Soma de requests de CPU permitida / capacidade
+            memory_overcommit: Soma de requests de memória permitida / capacidade
+            exact_max_pods: Tamanho máximo para tentar o ILP exato
+            exact_time_limit: Tempo máximo do ILP em segundos
+        """
+        if quantile not in QUANTILES:
+            raise ValueError(f"Quantil inválido: {quantile} (use {list(QUANTILES)})")
+        self.quantile = quantile
+        self.capacity = np.array([
+            node_cpu * target_utilization,
+            node_memory * target_utilization,
+            node_cpu * cpu_overcommit,
+            node_memory * memory_overcommit,
+        ])
+        self.exact_max_pods = exact_max_pods
+        self.exact_time_limit = exact_time_limit
+
+    def demands(self, profiles: pd.DataFrame) -> np.ndarray:
+        """Matriz (pods x dimensões) de demanda"""
+        return np.column_stack([
+            profiles[f'cpu_{self.quantile}'].to_numpy(dtype=float),
+            profiles[f'memory_{self.quantile}'].to_numpy(dtype=float),
+            profiles['cpu_request'].to_numpy(dtype=float),
+            profiles['memory_request'].to_numpy(dtype=float),
+        ])
+
+    def lower_bound(self, demand: np.ndarray) -> int:
+        return max(1, int(np.ceil((demand.sum(axis=0) / self.capacity).max() - 1e-9)))
+
+    def _validate(self, demand: np.ndarray):
+        too_big = np.where((demand > self.capacity).any(axis=1))[0]
+        if len(too_big):
+            raise ValueError(f"{len(too_big)} pod(s) não cabem em um nó vazio (ex: índice {too_big[0]})")
+
+    def first_fit_decreasing(self, demand: np.ndarray) -> np.ndarray:
+        """FFD ordenando pela maior dimensão normalizada; checagem vetorizada nos nós abertos"""
+        normalized = demand / self.capacity
+        order = np.argsort(-normalized.max(axis=1), kind='stable')
+
+        remaining = np.tile(self.capacity, (len(demand), 1))
+        assignment = np.empty(len(demand), dtype=int)
+        opened = 0
+
+        for i in order:
+            fits = (remaining[:opened] >= demand[i] - 1e-9).all(axis=1)
+            node = int(fits.argmax()) if fits.any() else opened
+            if node == opened:
+                opened += 1
+            remaining[node] -= demand[i]
+            assignment[i] = node
+        return assignment
+
+    def solve_exact(self, demand: np.ndarray, upper_bound: int) -> Optional[np.ndarray]:
+        """
+        ILP: min sum(y_j) s.a. sum_j x_ij = 1, sum_i d_ik x_ij <= C_k y_j
+
+        Limita o número de nós ao resultado do FFD e quebra simetria com
+        y_j >= y_{j+1}. Retorna None se o solver não provar a otimalidade.
+        """
+        from scipy.optimize import Bounds, LinearConstraint, milp
+        from scipy.sparse import lil_matrix
+
+        n, dims = demand.shape
+        m = upper_bound
+        n_vars = n * m + m                       # x_ij (i*m + j) seguido de y_j
+        cost = np.concatenate([np.zeros(n * m), np.ones(m)])
+
+        rows = n + m * dims + (m - 1)
+        A = lil_matrix((rows, n_vars))
+        lb, ub = np.zeros(rows), np.zeros(rows)
+
+        for i in range(n):                       # cada pod em exatamente um nó
+            A[i, i * m:(i + 1) * m] = 1
+            lb[i] = ub[i] = 1
+        row = n
+        for j in range(m):                       # capacidade por dimensão
+            for k in range(dims):
+                A[row, np.arange(n) * m + j] = demand[:, k] / self.capacity[k]
+                A[row, n * m + j] = -1
+                lb[row], ub[row] = -np.inf, 0
+                row += 1
+        for j in range(m - 1):                   # simetria: nós usados em ordem
+            A[row, n * m + j] = 1
+            A[row, n * m + j + 1] = -1
+            lb[row], ub[row] = 0, np.inf
+            row += 1
+
+        result = milp(cost, constraints=LinearConstraint(A.tocsr(), lb, ub),
+                      integrality=np.ones(n_vars), bounds=Bounds(0, 1),
+                      options={'time_limit': self.exact_time_limit})
+        if result.status != 0 or result.x is None:
+            return None
+        x = result.x[:n * m].reshape(n, m)
+        return x.argmax(axis=1)
+
+    def optimize(self, profiles: pd.DataFrame) -> PlacementResult:
+        """FFD sempre; ILP exato quando a instância é pequena e o FFD não atinge o lower bound"""
+        demand = self.demands(profiles)
+        self._validate(demand)
+        started = time.perf_counter()
+
+        bound = self.lower_bound(demand)
+        assignment = self.first_fit_decreasing(demand)
+        nodes_used = int(assignment.max()) + 1
+        method, optimal = 'ffd', nodes_used == bound
+
+        if not optimal and len(demand) <= self.exact_max_pods:
+            exact = self.solve_exact(demand, nodes_used)
+            if exact is not None:
+                # Renumera nós usados para índices contíguos
+                _, assignment = np.unique(exact, return_inverse=True)
+                nodes_used = int(assignment.max()) + 1
+                method, optimal = 'ilp', True
+
+        return PlacementResult(assignment, nodes_used, bound, method, optimal,
+                               time.perf_counter() - started)
+
+
+def synthetic_profiles(n_pods: int, seed: int = 42) -> pd.DataFrame:
+    """Perfis sintéticos com mistura de pods pequenos, médios e de memória"""
+    rng = np.random.default_rng(seed)
+    cpu_p50 = rng.lognormal(np.log(0.15), 0.8, n_pods).clip(0.005, 1.5)
+    mem_p50 = rng.lognormal(np.log(300 * 1024 ** 2), 0.9, n_pods).clip(16 * 1024 ** 2, 3 * GIB)
+    profiles = pd.DataFrame({
+        'cpu_p50': cpu_p50, 'cpu_p95': cpu_p50 * 1.6, 'cpu_p99': cpu_p50 * 2.0,
+        'memory_p50': mem_p50, 'memory_p95': mem_p50 * 1.2, 'memory_p99': mem_p50 * 1.3,
+        'cpu_request': np.round(cpu_p50 * rng.uniform(1, 2.5, n_pods), 2).clip(0.05),
+        'memory_request': mem_p50 * rng.uniform(1, 1.5, n_pods),
+        'node': [f'x86-{i % 10}' for i in range(n_pods)],
+    })
+    profiles.index = pd.MultiIndex.from_arrays(
+        [['bench'] * n_pods, [f'pod-{i}' for i in range(n_pods)]], names=['namespace', 'pod'])
+    return profiles
+
+
+def run_benchmark(sizes: Sequence[int], optimizer: PlacementOptimizer) -> pd.DataFrame:
+    """Mede tempo de solução e qualidade (nós vs lower bound) por tamanho"""
+    rows = []
+    for n in sizes:
+        profiles = synthetic_profiles(n)
+        result = optimizer.optimize(profiles)
+        rows.append({
+            'pods': n, 'method': result.method, 'nodes_used': result.nodes_used,
+            'lower_bound': result.lower_bound, 'optimal': result.optimal,
+            'gap_pct': 100 * (result.nodes_used - result.lower_bound) / result.lower_bound,
+            'solve_ms': result.solve_seconds * 1000,
+        })
+        logger.info(f"📊 {n} pods: {result.nodes_used} nós (lb={result.lower_bound}, "
+                    f"{result.method}) em {result.solve_seconds * 1000:.1f} ms")
+    return pd.DataFrame(rows)
+
+
+def parse_arguments():
+    """Parse argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(description='Otimizador de placement por bin-packing')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_node_args(p):
+        p.add_argument('--node-cpu', type=float, default=4.0, help='Cores por nó (default: 4)')
+        p.add_argument('--node-memory-gb', type=float, default=8.0, help='Memória por nó em GiB (default: 8)')
+        p.add_argument('--quantile', choices=list(QUANTILES), default='p95',
+                       help='Quantil de uso no dimensionamento (default: p95)')
+        p.add_argument('--target-utilization', type=float, default=0.9,
+                       help='Fração da capacidade para o uso somado (default: 0.9)')
+        p.add_argument('--cpu-overcommit', type=float, default=1.5,
+                       help='Overcommit de requests de CPU (default: 1.5)')
+        p.add_argument('--memory-overcommit', type=float, default=1.0,
+                       help='Overcommit de requests de memória (default: 1.0)')
+        p.add_argument('--exact-max-pods', type=int, default=40,
+                       help='Tamanho máximo para o ILP exato (default: 40)')
+
+    optimize = subparsers.add_parser('optimize', help='Otimizar placement dos pods do dataset')
+    optimize.add_argument('--dataset', type=str, default='kubernetes_ml_dataset.parquet',
+                          help='Dataset gerado por ml_dataset_generator.py (.parquet ou .csv)')
+    optimize.add_argument('--output', type=str, default='placement_plan.csv',
+                          help='CSV com a atribuição pod -> nó (default: placement_plan.csv)')
+    add_node_args(optimize)
+
+    benchmark = subparsers.add_parser('benchmark', help='Benchmark de tempo de solução')
+    benchmark.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                           help='Números de pods (default: 100 1000 10000)')
+    add_node_args(benchmark)
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    optimizer = PlacementOptimizer(
+        node_cpu=args.node_cpu, node_memory=args.node_memory_gb * GIB,
+        quantile=args.quantile, target_utilization=args.target_utilization,
+        cpu_overcommit=args.cpu_overcommit, memory_overcommit=args.memory_overcommit,
+        exact_max_pods=args.exact_max_pods,
+    )
+
+    if args.command == 'benchmark':
+        print(run_benchmark(args.sizes, optimizer).to_string(index=False))
+        exit(0)
+
+    if args.dataset.endswith('.csv'):
+        dataset = pd.read_csv(args.dataset, parse_dates=['timestamp'])
+    else:
+        dataset = pd.read_parquet(args.dataset)
+
+    profiles = build_usage_profiles(dataset)
+    try:
+        result = optimizer.optimize(profiles)
+    except ValueError as e:
+        logger.error(f"❌ {e}")
+        exit(1)
+
+    plan = result.to_frame(profiles)
+    plan.to_csv(args.output)
+    current_nodes = profiles['node'].nunique()
+    logger.info(f"✅ {len(profiles)} pods em {result.nodes_used} nós "
+                f"(atual: {current_nodes}, lower bound: {result.lower_bound}, "
+                f"método: {result.method}, {result.solve_seconds * 1000:.1f} ms)")
+    logger.info(f"💾 Plano salvo em: {args.output}")
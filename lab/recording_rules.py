@@ -0,0 +1,244 @@
+"""
+Recording Rules do Prometheus para o Gerador de Dataset ML
+Descrição: Converte MetricsExtractor.get_metrics_config em um arquivo de
+          recording rules com nomes estáveis, para que o Prometheus avalie as
+          expressões rate(...[5m]) continuamente e a extração do dataset vire
+          leitura direta de séries. Inclui validação recorded vs raw.
+
+Uso:
+  # Gerar arquivo de regras (adicionar em rule_files do prometheus.yml)
+  python recording_rules.py generate --output flex_recording_rules.yaml
+
+  # Validar séries gravadas contra as expressões originais (últimos 15 min)
+  python recording_rules.py validate --prometheus-url http://localhost:9090
+"""
+
+import re
+import argparse
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import yaml
+
+logger = logging.getLogger(__name__)
+
+RULE_GROUP_NAME = 'flex-ml-dataset'
+RECORD_PREFIX = 'flex'
+
+# Filtros base aplicados por MetricsExtractor a todas as queries
+BASE_FILTERS = ['container!="POD"', 'container!=""']
+
+_RATE_PATTERN = re.compile(r'^rate\(([a-zA-Z_:][a-zA-Z0-9_:]*)\[(\w+)\]\)$')
+
+
+def parse_rate_query(metric_query: str) -> Optional[Dict[str, str]]:
+    """Extrai métrica base e intervalo de uma query rate(metrica[intervalo])"""
+    match = _RATE_PATTERN.match(metric_query)
+    if not match:
+        return None
+    return {'metric': match.group(1), 'interval': match.group(2)}
+
+
+def recording_rule_name(metric_query: str) -> Optional[str]:
+    """
+    Nome estável da série gravada para uma expressão de get_metrics_config
+
+    Segue a convenção level:metric:operations do Prometheus, ex:
+    rate(container_cpu_usage_seconds_total[5m]) -> flex:container_cpu_usage_seconds_total:rate5m
+
+    Retorna None para expressões que não compensam gravar (seletores simples).
+    """
+    rate = parse_rate_query(metric_query)
+    if rate is None:
+        return None
+    return f"{RECORD_PREFIX}:{rate['metric']}:rate{rate['interval']}"
+
+
+def build_recording_rules(metrics_config: Dict[str, str],
+                          evaluation_interval: str = '30s') -> Dict:
+    """
+    Gera estrutura de recording rules a partir da configuração de métricas
+
+    Várias métricas do dataset podem compartilhar a mesma expressão
+    (ex: io_service_bytes_read/write); cada expressão gera uma única regra.
+
+    Args:
+        metrics_config: Dicionário metric_name -> query (get_metrics_config)
+        evaluation_interval: Intervalo de avaliação do grupo de regras
+
+    Returns:
+        Dicionário no formato de arquivo de regras do Prometheus
+    """
+    filters_str = ','.join(BASE_FILTERS)
+    rules = {}
+
+    for metric_name, metric_query in metrics_config.items():
+        record = recording_rule_name(metric_query)
+        if record is None or record in rules:
+            continue
+        rate = parse_rate_query(metric_query)
+        rules[record] = {
+            'record': record,
+            'expr': f"rate({rate['metric']}{{{filters_str}}}[{rate['interval']}])",
+        }
+
+    return {
+        'groups': [{
+            'name': RULE_GROUP_NAME,
+            'interval': evaluation_interval,
+            'rules': list(rules.values()),
+        }]
+    }
+
+
+def save_recording_rules(metrics_config: Dict[str, str], filepath: str,
+                         evaluation_interval: str = '30s') -> str:
+    """Salva recording rules em arquivo YAML"""
+    rules = build_recording_rules(metrics_config, evaluation_interval)
+    with open(filepath, 'w') as f:
+        yaml.safe_dump(rules, f, sort_keys=False)
+    logger.info(f"💾 {len(rules['groups'][0]['rules'])} recording rules salvas em: {filepath}")
+    return filepath
+
+
+def _series_frame(result: Optional[Dict]) -> pd.DataFrame:
+    """Converte resposta query_range em DataFrame (pod, container, namespace, timestamp, value)"""
+    records = []
+    if result and result.get('status') == 'success':
+        for item in result['data']['result']:
+            labels = item['metric']
+            for timestamp, value in item['values']:
+                records.append({
+                    'pod': labels.get('pod', ''),
+                    'container': labels.get('container', ''),
+                    'namespace': labels.get('namespace', ''),
+                    'interface': labels.get('interface', ''),
+                    'device': labels.get('device', ''),
+                    'timestamp': timestamp,
+                    'value': float(value) if value != 'NaN' else np.nan,
+                })
+    return pd.DataFrame(records)
+
+
+def validate_recording_rules(connector, metrics_config: Dict[str, str],
+                             sample_minutes: int = 15, step: str = '30s',
+                             tolerance: float = 0.05, min_coverage: float = 0.95) -> pd.DataFrame:
+    """
+    Compara séries gravadas com as expressões originais numa janela de amostra
+
+    As regras são avaliadas no intervalo do grupo, então pequenas diferenças
+    são esperadas; a regra é aprovada quando a mediana do erro relativo fica
+    abaixo de `tolerance` e as séries gravadas cobrem ao menos `min_coverage`
+    dos pontos raw.
+
+    Args:
+        connector: PrometheusConnector
+        metrics_config: Dicionário metric_name -> query (get_metrics_config)
+        sample_minutes: Tamanho da janela de amostra em minutos
+        step: Resolução das queries
+        tolerance: Erro relativo mediano aceito
+        min_coverage: Fração mínima de pontos raw presentes nas séries gravadas
+
+    Returns:
+        DataFrame com uma linha por regra e o resultado da validação
+    """
+    end_ts = int(datetime.now().timestamp())
+    start_ts = int((datetime.now() - timedelta(minutes=sample_minutes)).timestamp())
+    keys = ['pod', 'container', 'namespace', 'interface', 'device', 'timestamp']
+
+    report = []
+    for rule in build_recording_rules(metrics_config)['groups'][0]['rules']:
+        raw = _series_frame(connector.query_range(rule['expr'], start_ts, end_ts, step))
+        recorded = _series_frame(connector.query_range(rule['record'], start_ts, end_ts, step))
+
+        row = {'record': rule['record'], 'raw_points': len(raw), 'recorded_points': len(recorded),
+               'coverage': np.nan, 'median_rel_error': np.nan, 'p95_rel_error': np.nan,
+               'passed': False}
+
+        if not raw.empty and not recorded.empty:
+            joined = raw.merge(recorded, on=keys, suffixes=('_raw', '_rec'))
+            denom = joined['value_raw'].abs().where(joined['value_raw'].abs() > 1e-12, 1.0)
+            rel_error = ((joined['value_rec'] - joined['value_raw']).abs() / denom).dropna()
+
+            row['coverage'] = len(joined) / len(raw)
+            if not rel_error.empty:
+                row['median_rel_error'] = float(rel_error.median())
+                row['p95_rel_error'] = float(rel_error.quantile(0.95))
+            row['passed'] = bool(row['coverage'] >= min_coverage and
+                                 row['median_rel_error'] <= tolerance)
+        elif raw.empty and recorded.empty:
+            # Sem dados em nenhum dos lados: nada a divergir
+            row['passed'] = True
+
+        status = '✅' if row['passed'] else '❌'
+        logger.info(f"{status} {rule['record']}: cobertura={row['coverage']:.2%}, "
+                    f"erro mediano={row['median_rel_error']:.4f}")
+        report.append(row)
+
+    return pd.DataFrame(report)
+
+
+def parse_arguments():
+    """Parse argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(
+        description='Recording rules do Prometheus para o gerador de dataset ML'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate = subparsers.add_parser('generate', help='Gerar arquivo YAML de recording rules')
+    generate.add_argument('--output', type=str, default='flex_recording_rules.yaml',
+                          help='Arquivo de saída (default: flex_recording_rules.yaml)')
+    generate.add_argument('--interval', type=str, default='30s',
+                          help='Intervalo de avaliação das regras (default: 30s)')
+
+    validate = subparsers.add_parser('validate', help='Comparar séries gravadas com as expressões raw')
+    validate.add_argument('--prometheus-url', type=str, default='http://localhost:9090',
+                          help='URL do Prometheus (default: http://localhost:9090)')
+    validate.add_argument('--username', type=str, default=None,
+                          help='Usuário para Basic Authentication')
+    validate.add_argument('--password', type=str, default=None,
+                          help='Senha para Basic Authentication')
+    validate.add_argument('--no-verify-ssl', action='store_true',
+                          help='Desabilitar verificação de certificado SSL')
+    validate.add_argument('--sample-minutes', type=int, default=15,
+                          help='Janela de amostra em minutos (default: 15)')
+    validate.add_argument('--step', type=str, default='30s',
+                          help='Resolução das queries (default: 30s)')
+    validate.add_argument('--tolerance', type=float, default=0.05,
+                          help='Erro relativo mediano aceito (default: 0.05)')
+    validate.add_argument('--report', type=str, default=None,
+                          help='Salvar relatório de validação em CSV')
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    from ml_dataset_generator import MetricsExtractor, PrometheusConnector
+
+    args = parse_arguments()
+    metrics_config = MetricsExtractor(connector=None).get_metrics_config()
+
+    if args.command == 'generate':
+        save_recording_rules(metrics_config, args.output, args.interval)
+        logger.info("Próximo passo: adicionar o arquivo em rule_files do prometheus.yml e recarregar")
+        exit(0)
+
+    connector = PrometheusConnector(args.prometheus_url, username=args.username,
+                                    password=args.password, verify_ssl=not args.no_verify_ssl)
+    if not connector.test_connection():
+        exit(1)
+
+    report = validate_recording_rules(connector, metrics_config, args.sample_minutes,
+                                      args.step, args.tolerance)
+    if args.report:
+        report.to_csv(args.report, index=False)
+        logger.info(f"💾 Relatório salvo em: {args.report}")
+
+    failed = report[~report['passed']]
+    if not failed.empty:
+        logger.error(f"❌ {len(failed)} regra(s) divergentes: {list(failed['record'])}")
+        exit(1)
+    logger.info(f"✅ Todas as {len(report)} regras conferem com as expressões raw")
@@ -0,0 +1,456 @@
+"""
+Recomendador de Right-Sizing Vertical (requests/limits)
+Descrição: Percorre o dataset gerado por ml_dataset_generator.py uma única vez
+          (em lotes) e mantém, por (namespace, workload, container), histogramas
+          exponenciais com decaimento de CPU (cores) e memory_working_set, no
+          estilo do recomendador do VPA (k8s/flex-stressor/test-vpa.yaml).
+          Gera recomendações de requests/limits com margens contra OOM e
+          throttling. O estado é mesclável, então execuções seguintes só
+          processam linhas novas e atualizam as recomendações.
+
+Uso:
+  # Recomendações a partir do dataset (estado salvo para a próxima execução)
+  python rightsizing_recommender.py --dataset kubernetes_ml_dataset.parquet \\
+    --state rightsizing_state.json --output rightsizing_recommendations.csv
+
+  # Atualização incremental com um dataset novo, limitando como o VPA
+  python rightsizing_recommender.py --dataset novo_dataset.parquet \\
+    --state rightsizing_state.json --max-cpu 2 --max-memory-gb 2
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from autoscaling_engine import workload_from_pod
+from sistema_treinamento_ml import DatasetStreamer
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+MIB = 1024 ** 2
+GIB = 1024 ** 3
+
+# Buckets exponenciais: (primeiro bucket, razão de crescimento, valor máximo)
+CPU_BUCKETS = (0.001, 1.05, 1000.0)
+MEMORY_BUCKETS = (1 * MIB, 1.05, 1e12)
+
+COLUMNS = ['timestamp', 'namespace', 'pod', 'container', 'cpu_usage_total',
+           'memory_working_set_bytes', 'cpu_throttled_periods', 'oom_kill_rate']
+
+
+class DecayingHistogram:
+    """
+    Histograma exponencial com pesos que decaem com meia-vida configurável
+
+    Pesos são guardados relativos a `reference` (epoch em segundos): uma
+    amostra em t pesa 2^((t - reference) / half_life). Amostras novas pesam
+    mais; a referência é avançada quando os expoentes crescem, reescalando os
+    pesos, o que mantém a soma numericamente estável.
+    """
+
+    def __init__(self, first_bucket: float, ratio: float, max_value: float,
+                 half_life: float = 86400.0):
+        self.first_bucket = first_bucket
+        self.ratio = ratio
+        self.max_value = max_value
+        self.half_life = half_life
+        self.n_buckets = int(np.log(max_value * (ratio - 1) / first_bucket + 1) / np.log(ratio)) + 1
+        self.weights = np.zeros(self.n_buckets)
+        self.reference: Optional[float] = None
+
+    def _bucket_index(self, values: np.ndarray) -> np.ndarray:
+        scaled = np.maximum(values, 0) * (self.ratio - 1) / self.first_bucket + 1
+        index = np.floor(np.log(scaled) / np.log(self.ratio)).astype(int)
+        return np.minimum(index, self.n_buckets - 1)
+
+    def _bucket_end(self, index: int) -> float:
+        return self.first_bucket * (self.ratio ** (index + 1) - 1) / (self.ratio - 1)
+
+    def _rebase(self, reference: float):
+        if self.reference is not None:
+            self.weights *= 2.0 ** ((self.reference - reference) / self.half_life)
+        self.reference = reference
+
+    def add_many(self, values: np.ndarray, times: np.ndarray):
+        """Adiciona amostras (valores, epoch em segundos) em O(n)"""
+        mask = ~np.isnan(values)
+        values, times = values[mask], times[mask]
+        if not len(values):
+            return
+
+        # Avança a referência para o instante mais recente (expoentes <= 0)
+        newest = float(times.max())
+        if self.reference is None or newest > self.reference:
+            self._rebase(newest)
+
+        decayed = 2.0 ** ((times - self.reference) / self.half_life)
+        self.weights += np.bincount(self._bucket_index(values), weights=decayed,
+                                    minlength=self.n_buckets)
+
+    def merge(self, other: 'DecayingHistogram'):
+        """Soma outro histograma com a mesma configuração de buckets e meia-vida"""
+        if other.half_life != self.half_life:
+            raise ValueError(f"Meias-vidas diferentes: {self.half_life}s e {other.half_life}s")
+        if other.reference is None:
+            return
+        other_weights = other.weights.copy()
+        if self.reference is None or other.reference > self.reference:
+            self._rebase(other.reference)
+        else:
+            other_weights *= 2.0 ** ((other.reference - self.reference) / self.half_life)
+        self.weights += other_weights
+
+    def total_weight(self) -> float:
+        return float(self.weights.sum())
+
+    def percentile(self, q: float) -> float:
+        """Fim do bucket que contém o quantil q (mesma convenção do VPA)"""
+        total = self.weights.sum()
+        if total <= 0:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(self.weights), q * total))
+        return self._bucket_end(min(index, self.n_buckets - 1))
+
+    def to_dict(self) -> Dict:
+        nonzero = np.nonzero(self.weights)[0]
+        return {
+            'config': [self.first_bucket, self.ratio, self.max_value, self.half_life],
+            'reference': self.reference,
+            'buckets': nonzero.tolist(),
+            'weights': self.weights[nonzero].tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict, half_life: Optional[float] = None) -> 'DecayingHistogram':
+        """
+        Reconstrói o histograma; com half_life, passa a decair nessa meia-vida
+
+        Os pesos salvos guardam o decaimento já aplicado com a meia-vida antiga
+        (os tempos das amostras não são mantidos); dali em diante todos os
+        histogramas carregados e novos decaem e se mesclam na mesma taxa.
+        """
+        first_bucket, ratio, max_value, saved_half_life = data['config']
+        histogram = cls(first_bucket, ratio, max_value, half_life or saved_half_life)
+        histogram.reference = data['reference']
+        histogram.weights[data['buckets']] = data['weights']
+        return histogram
+
+
+class ContainerUsage:
+    """Estado agregado de um (namespace, workload, container)"""
+
+    def __init__(self, half_life: float):
+        self.cpu = DecayingHistogram(*CPU_BUCKETS, half_life=half_life)
+        self.memory = DecayingHistogram(*MEMORY_BUCKETS, half_life=half_life)
+        self.throttled = DecayingHistogram(1.0, 2.0, 2.0, half_life=half_life)  # bucket 0: não, 1: sim
+        self.samples = 0
+        self.oom_events = 0
+        self.memory_peak = 0.0
+        self.first_seen: Optional[float] = None
+        self.last_seen: Optional[float] = None
+        # Amostras até aqui já estão nos histogramas (avançado ao fim de cada fit)
+        self.watermark: Optional[float] = None
+
+    def merge(self, other: 'ContainerUsage'):
+        self.cpu.merge(other.cpu)
+        self.memory.merge(other.memory)
+        self.throttled.merge(other.throttled)
+        self.samples += other.samples
+        self.oom_events += other.oom_events
+        self.memory_peak = max(self.memory_peak, other.memory_peak)
+        self.observe_times(other.first_seen, other.last_seen)
+        if other.watermark is not None:
+            self.watermark = max(self.watermark or other.watermark, other.watermark)
+
+    def observe_times(self, first: Optional[float], last: Optional[float]):
+        if first is not None:
+            self.first_seen = first if self.first_seen is None else min(self.first_seen, first)
+        if last is not None:
+            self.last_seen = last if self.last_seen is None else max(self.last_seen, last)
+
+    def to_dict(self) -> Dict:
+        return {
+            'cpu': self.cpu.to_dict(), 'memory': self.memory.to_dict(),
+            'throttled': self.throttled.to_dict(), 'samples': self.samples,
+            'oom_events': self.oom_events, 'memory_peak': self.memory_peak,
+            'first_seen': self.first_seen, 'last_seen': self.last_seen,
+            'watermark': self.watermark,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict, half_life: float) -> 'ContainerUsage':
+        usage = cls(half_life)
+        usage.cpu = DecayingHistogram.from_dict(data['cpu'], half_life)
+        usage.memory = DecayingHistogram.from_dict(data['memory'], half_life)
+        usage.throttled = DecayingHistogram.from_dict(data['throttled'], half_life)
+        for key in ('samples', 'oom_events', 'memory_peak', 'first_seen', 'last_seen'):
+            setattr(usage, key, data[key])
+        # Estados antigos não tinham marcador por série: tudo até last_seen foi visto
+        usage.watermark = data.get('watermark', data['last_seen'])
+        return usage
+
+
+class RightSizingRecommender:
+    """Recomendador de requests/limits por (namespace, workload, container)"""
+
+    def __init__(self, half_life_hours: float = 24.0,
+                 request_percentile: float = 0.90, limit_percentile: float = 0.99,
+                 safety_margin: float = 0.15, oom_margin: float = 0.20,
+                 oom_min_bump: float = 100 * MIB, throttle_tolerance: float = 0.05,
+                 throttle_margin: float = 0.25, min_cpu: float = 0.01,
+                 min_memory: float = 32 * MIB, max_cpu: Optional[float] = None,
+                 max_memory: Optional[float] = None):
+        """
+        Args:
+            half_life_hours: Meia-vida do decaimento dos histogramas
+            request_percentile: Percentil usado para requests (VPA usa p90)
+            limit_percentile: Percentil usado para limits
+            safety_margin: Margem multiplicativa aplicada aos percentis
+            oom_margin: Folga mínima do limit de memória sobre o pico observado
+            oom_min_bump: Acréscimo mínimo (bytes) nas amostras de memória com OOM
+            throttle_tolerance: Fração ponderada de amostras com throttling tolerada
+            throttle_margin: Acréscimo no limit de CPU quando a tolerância é excedida
+            min_cpu / min_memory: Piso das recomendações
+            max_cpu / max_memory: Teto das recomendações (maxAllowed do VPA)
+        """
+        self.half_life = half_life_hours * 3600
+        self.request_percentile = request_percentile
+        self.limit_percentile = limit_percentile
+        self.safety_margin = safety_margin
+        self.oom_margin = oom_margin
+        self.oom_min_bump = oom_min_bump
+        self.throttle_tolerance = throttle_tolerance
+        self.throttle_margin = throttle_margin
+        self.min_cpu, self.min_memory = min_cpu, min_memory
+        self.max_cpu, self.max_memory = max_cpu, max_memory
+        self.containers: Dict[Tuple[str, str, str], ContainerUsage] = {}
+        self.last_timestamp: Optional[float] = None
+        self.newest_seen: Optional[float] = None
+        self.rows_processed = 0
+
+    def _get(self, key: Tuple[str, str, str]) -> ContainerUsage:
+        if key not in self.containers:
+            self.containers[key] = ContainerUsage(self.half_life)
+        return self.containers[key]
+
+    def update(self, batch: pd.DataFrame) -> int:
+        """
+        Atualiza os histogramas com um lote do dataset
+
+        Linhas com timestamp já coberto pelo estado da própria série
+        (namespace, workload, container) são ignoradas, o que torna a
+        atualização incremental idempotente por dataset sem descartar dados
+        de outros clusters/datasets com períodos sobrepostos.
+
+        Returns:
+            Número de linhas efetivamente processadas
+        """
+        epoch = (pd.to_datetime(batch['timestamp']) - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+        batch = batch.assign(_epoch=epoch.to_numpy(dtype=float))
+        if batch.empty:
+            return 0
+
+        workloads = batch['pod'].map({pod: workload_from_pod(pod) for pod in batch['pod'].unique()})
+        oom = batch['oom_kill_rate'].fillna(0).to_numpy() > 0 \
+            if 'oom_kill_rate' in batch.columns else np.zeros(len(batch), dtype=bool)
+        throttled = (batch['cpu_throttled_periods'].fillna(0).to_numpy() > 0).astype(float) \
+            if 'cpu_throttled_periods' in batch.columns else np.zeros(len(batch))
+
+        times = batch['_epoch'].to_numpy()
+        cpu = batch['cpu_usage_total'].to_numpy(dtype=float)
+        memory = batch['memory_working_set_bytes'].to_numpy(dtype=float)
+        # Amostras com OOM entram infladas: o working set real seria maior que o limite
+        memory_sample = np.where(oom, np.maximum(memory * (1 + self.oom_margin),
+                                                 memory + self.oom_min_bump), memory)
+
+        groups = pd.DataFrame({'namespace': batch['namespace'].to_numpy(), 'workload': workloads.to_numpy(),
+                               'container': batch['container'].to_numpy()}).groupby(
+            ['namespace', 'workload', 'container'], sort=False).indices
+
+        processed = 0
+        for key, idx in groups.items():
+            usage = self._get(tuple(str(k) for k in key))
+            if usage.watermark is not None:
+                idx = idx[times[idx] > usage.watermark]
+                if not len(idx):
+                    continue
+            processed += len(idx)
+            t = times[idx]
+            usage.cpu.add_many(cpu[idx], t)
+            usage.memory.add_many(memory_sample[idx], t)
+            usage.throttled.add_many(throttled[idx], t)
+            usage.samples += len(idx)
+            usage.oom_events += int(oom[idx].sum())
+            usage.memory_peak = max(usage.memory_peak, float(np.nanmax(memory[idx], initial=0)))
+            usage.observe_times(float(t.min()), float(t.max()))
+
+            self.newest_seen = max(self.newest_seen or t.max(), t.max())
+
+        self.rows_processed += processed
+        return processed
+
+    def fit(self, streamer: DatasetStreamer) -> Dict:
+        """Uma passada O(linhas) pelo dataset; retorna estatísticas de throughput"""
+        available = set(streamer.numeric_columns()) | {'timestamp', 'namespace', 'pod', 'container'}
+        columns = [c for c in COLUMNS if c in available]
+
+        started = time.perf_counter()
+        rows = sum(self.update(batch) for batch in streamer.iter_batches(columns))
+        # Só avança os marcadores ao final, para lotes fora de ordem no mesmo dataset
+        for usage in self.containers.values():
+            usage.watermark = usage.last_seen
+        if self.newest_seen is not None:
+            self.last_timestamp = float(self.newest_seen)
+
+        elapsed = time.perf_counter() - started
+        return {'rows': rows, 'seconds': elapsed, 'rows_per_second': rows / max(elapsed, 1e-9)}
+
+    def merge(self, other: 'RightSizingRecommender'):
+        """Mescla o estado de outro recomendador (ex: execução em outro cluster/período)"""
+        for key, usage in other.containers.items():
+            self._get(key).merge(usage)
+        if other.last_timestamp is not None:
+            self.last_timestamp = max(self.last_timestamp or other.last_timestamp, other.last_timestamp)
+
+    def _clamp(self, value: float, low: float, high: Optional[float]) -> float:
+        value = max(value, low)
+        return min(value, high) if high else value
+
+    def recommendations(self) -> pd.DataFrame:
+        """Tabela de requests/limits recomendados por (namespace, workload, container)"""
+        margin = 1 + self.safety_margin
+        rows = []
+        for (namespace, workload, container), usage in self.containers.items():
+            throttled_fraction = usage.throttled.weights[1] / max(usage.throttled.total_weight(), 1e-12)
+
+            cpu_request = usage.cpu.percentile(self.request_percentile) * margin
+            cpu_limit = max(usage.cpu.percentile(self.limit_percentile) * margin, cpu_request)
+            if throttled_fraction > self.throttle_tolerance:
+                cpu_limit *= 1 + self.throttle_margin
+
+            memory_request = usage.memory.percentile(self.request_percentile) * margin
+            memory_limit = max(usage.memory.percentile(self.limit_percentile) * margin,
+                               usage.memory_peak * (1 + self.oom_margin), memory_request)
+
+            cpu_request = self._clamp(cpu_request, self.min_cpu, self.max_cpu)
+            memory_request = self._clamp(memory_request, self.min_memory, self.max_memory)
+            rows.append({
+                'namespace': namespace, 'workload': workload, 'container': container,
+                'cpu_request_cores': round(cpu_request, 3),
+                'cpu_limit_cores': round(self._clamp(cpu_limit, cpu_request, self.max_cpu), 3),
+                'memory_request_bytes': int(memory_request),
+                'memory_limit_bytes': int(self._clamp(memory_limit, memory_request, self.max_memory)),
+                'memory_peak_bytes': int(usage.memory_peak),
+                'throttled_fraction': round(float(throttled_fraction), 4),
+                'oom_events': usage.oom_events,
+                'samples': usage.samples,
+                'history_hours': round(((usage.last_seen or 0) - (usage.first_seen or 0)) / 3600, 2),
+            })
+        return pd.DataFrame(rows)
+
+    def save_to_file(self, filepath: str = 'rightsizing_state.json'):
+        """Salva configuração e histogramas em arquivo JSON"""
+        data = {
+            'config': {
+                'half_life_hours': self.half_life / 3600,
+                'request_percentile': self.request_percentile,
+                'limit_percentile': self.limit_percentile,
+                'safety_margin': self.safety_margin, 'oom_margin': self.oom_margin,
+                'oom_min_bump': self.oom_min_bump, 'throttle_tolerance': self.throttle_tolerance,
+                'throttle_margin': self.throttle_margin, 'min_cpu': self.min_cpu,
+                'min_memory': self.min_memory, 'max_cpu': self.max_cpu, 'max_memory': self.max_memory,
+            },
+            'last_timestamp': self.last_timestamp,
+            'containers': [{'key': list(key), 'usage': usage.to_dict()}
+                           for key, usage in self.containers.items()],
+        }
+        with open(filepath, 'w') as f:
+            json.dump(data, f)
+        logger.info(f"💾 Estado de right-sizing salvo em: {filepath} ({len(self.containers)} containers)")
+
+    @classmethod
+    def load_from_file(cls, filepath: str = 'rightsizing_state.json',
+                       **overrides) -> 'RightSizingRecommender':
+        """
+        Carrega estado salvo; `overrides` substituem parâmetros de recomendação
+
+        Uma meia-vida em `overrides` passa a valer também para os histogramas
+        carregados, mantendo uma única taxa de decaimento no estado.
+        """
+        with open(filepath, 'r') as f:
+            data = json.load(f)
+
+        recommender = cls(**{**data['config'], **overrides})
+        recommender.last_timestamp = data['last_timestamp']
+        for entry in data['containers']:
+            recommender.containers[tuple(entry['key'])] = ContainerUsage.from_dict(
+                entry['usage'], recommender.half_life)
+
+        logger.info(f"📂 Estado de right-sizing carregado de: {filepath} "
+                    f"({len(recommender.containers)} containers)")
+        return recommender
+
+
+def parse_arguments():
+    """Parse argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(description='Recomendador de right-sizing vertical')
+    parser.add_argument('--dataset', type=str, required=True,
+                        help='Diretório particionado, arquivo Parquet ou CSV')
+    parser.add_argument('--state', type=str, default=None,
+                        help='Arquivo de estado JSON (carregado se existir, salvo ao final)')
+    parser.add_argument('--output', type=str, default='rightsizing_recommendations.csv',
+                        help='CSV de recomendações (default: rightsizing_recommendations.csv)')
+    parser.add_argument('--batch-size', type=int, default=50_000,
+                        help='Linhas por lote (default: 50000)')
+    parser.add_argument('--half-life-hours', type=float, default=None,
+                        help='Meia-vida do decaimento em horas (default: 24 ou a do --state)')
+    parser.add_argument('--safety-margin', type=float, default=None,
+                        help='Margem sobre os percentis (default: 0.15 ou a do --state)')
+    parser.add_argument('--max-cpu', type=float, default=None,
+                        help='Teto de CPU em cores (ex: 2, como maxAllowed do VPA)')
+    parser.add_argument('--max-memory-gb', type=float, default=None,
+                        help='Teto de memória em GiB (ex: 2, como maxAllowed do VPA)')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    # Só o que foi informado: o resto vem do estado salvo ou dos defaults
+    params = {
+        'half_life_hours': args.half_life_hours,
+        'safety_margin': args.safety_margin,
+        'max_cpu': args.max_cpu,
+        'max_memory': args.max_memory_gb * GIB if args.max_memory_gb else None,
+    }
+    params = {name: value for name, value in params.items() if value is not None}
+    if args.state and os.path.exists(args.state):
+        recommender = RightSizingRecommender.load_from_file(args.state, **params)
+    else:
+        recommender = RightSizingRecommender(**params)
+
+    stats = recommender.fit(DatasetStreamer(args.dataset, args.batch_size))
+    logger.info(f"📊 {stats['rows']:,} linhas novas em {stats['seconds']:.2f}s "
+                f"({stats['rows_per_second']:,.0f} linhas/s)")
+
+    if args.state:
+        recommender.save_to_file(args.state)
+
+    recommendations = recommender.recommendations()
+    if recommendations.empty:
+        logger.error("❌ Nenhum container encontrado no dataset")
+        exit(1)
+
+    recommendations.to_csv(args.output, index=False)
+    logger.info(f"💾 {len(recommendations)} recomendações salvas em: {args.output}")
+    print(recommendations.to_string(index=False))
@@ -0,0 +1,357 @@
+"""
+Sistema de Treinamento ML - Detecção de Sobrecarga em Kubernetes
+Descrição: Treina modelos incrementais (partial_fit) sobre o dataset gerado por
+          ml_dataset_generator.py lendo-o em lotes (row groups do Parquet ou
+          chunks do CSV), de modo que o treinamento escala para datasets maiores
+          que a memória. Usa divisão temporal treino/validação e reporta
+          throughput em linhas/s.
+
+Uso:
+  # Dataset particionado (gerado com --formats partitioned)
+  python sistema_treinamento_ml.py --dataset kubernetes_ml_dataset_partitioned
+
+  # Arquivo único, 3 épocas, 20% final do período para validação
+  python sistema_treinamento_ml.py --dataset kubernetes_ml_dataset.parquet \\
+    --epochs 3 --validation-fraction 0.2
+"""
+
+import os
+import time
+import json
+import logging
+import argparse
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import joblib
+from sklearn.linear_model import SGDClassifier, SGDRegressor
+from sklearn.preprocessing import StandardScaler
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Targets produzidos por FeatureEngineer._create_target_labels
+BINARY_TARGETS = ['memory_overload', 'cpu_overload', 'disk_overload', 'critical_overload']
+REGRESSION_TARGETS = ['overload_severity']
+
+# Colunas que são labels (ou derivadas deles) e não podem virar features
+LABEL_COLUMNS = set(BINARY_TARGETS + REGRESSION_TARGETS + [
+    'memory_warning', 'memory_critical',
+    'cpu_warning', 'cpu_critical',
+    'disk_warning', 'disk_critical',
+    'adaptive_severity',
+])
+LABEL_SUFFIXES = ('_above_p95', '_above_p99', '_adaptive_p95', '_adaptive_p99')
+
+ID_COLUMNS = {'timestamp', 'pod', 'container', 'namespace', 'node', 'period', 'date'}
+
+# Metadados de experimento gravados por experiment_runner.py (não são features)
+ID_COLUMNS |= {'experiment', 'cell_id', 'scenario', 'intensity_mb', 'duration_minutes',
+               'replicas', 'repeat'}
+
+
+class DatasetStreamer:
+    """Lê o dataset em lotes sem carregá-lo inteiro na memória"""
+
+    def __init__(self, path: str, batch_size: int = 50_000):
+        """
+        Args:
+            path: Diretório particionado, arquivo Parquet ou arquivo CSV
+            batch_size: Linhas por lote
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.is_csv = os.path.isfile(path) and path.endswith('.csv')
+        self._dataset = None if self.is_csv else ds.dataset(path, format='parquet',
+                                                            partitioning='hive')
+
+    def numeric_columns(self) -> List[str]:
+        """Colunas numéricas disponíveis (a partir do schema, sem ler dados)"""
+        if self.is_csv:
+            sample = pd.read_csv(self.path, nrows=1000)
+            return list(sample.select_dtypes(include=[np.number]).columns)
+        return [field.name for field in self._dataset.schema
+                if pa.types.is_integer(field.type) or pa.types.is_floating(field.type)
+                or pa.types.is_boolean(field.type)]
+
+    def iter_batches(self, columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+        """Itera o dataset em DataFrames de até batch_size linhas"""
+        if self.is_csv:
+            for chunk in pd.read_csv(self.path, usecols=columns, chunksize=self.batch_size,
+                                     parse_dates=['timestamp'] if columns is None or 'timestamp' in columns else False):
+                yield chunk
+            return
+
+        for batch in self._dataset.to_batches(columns=columns, batch_size=self.batch_size):
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    def time_bounds(self) -> Tuple[pd.Timestamp, pd.Timestamp]:
+        """Menor e maior timestamp lendo apenas a coluna timestamp"""
+        t_min, t_max = None, None
+        for batch in self.iter_batches(columns=['timestamp']):
+            ts = pd.to_datetime(batch['timestamp'])
+            t_min = ts.min() if t_min is None else min(t_min, ts.min())
+            t_max = ts.max() if t_max is None else max(t_max, ts.max())
+        return t_min, t_max
+
+
+class IncrementalTrainer:
+    """Treina classificadores e regressores incrementais sobre lotes do dataset"""
+
+    def __init__(self,
+                 binary_targets: Optional[List[str]] = None,
+                 regression_targets: Optional[List[str]] = None,
+                 random_state: int = 42):
+        """
+        Args:
+            binary_targets: Labels binários a treinar (default: BINARY_TARGETS)
+            regression_targets: Targets contínuos a treinar (default: overload_severity)
+            random_state: Semente dos modelos SGD
+        """
+        self.binary_targets = binary_targets or list(BINARY_TARGETS)
+        self.regression_targets = regression_targets or list(REGRESSION_TARGETS)
+        self.random_state = random_state
+        self.feature_columns: List[str] = []
+        self.scaler = StandardScaler()
+        self.models: Dict[str, object] = {}
+
+    def _select_features(self, numeric_columns: List[str]) -> List[str]:
+        return [col for col in numeric_columns
+                if col not in LABEL_COLUMNS and col not in ID_COLUMNS
+                and not col.endswith(LABEL_SUFFIXES)]
+
+    def _prepare(self, batch: pd.DataFrame) -> np.ndarray:
+        # Cópia explícita: com copy-on-write to_numpy() pode devolver view somente leitura
+        X = batch.reindex(columns=self.feature_columns).to_numpy(dtype=float, copy=True)
+        return np.nan_to_num(X, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+
+    def _build_models(self, available: List[str]):
+        for target in self.binary_targets:
+            if target in available:
+                self.models[target] = SGDClassifier(loss='log_loss', alpha=1e-4,
+                                                    random_state=self.random_state)
+        for target in self.regression_targets:
+            if target in available:
+                self.models[target] = SGDRegressor(alpha=1e-4, random_state=self.random_state)
+
+        missing = [t for t in self.binary_targets + self.regression_targets if t not in available]
+        if missing:
+            logger.warning(f"⚠️  Targets ausentes no dataset (ignorados): {missing}")
+
+    def fit(self, streamer: DatasetStreamer, epochs: int = 1,
+            validation_fraction: float = 0.2) -> Dict:
+        """
+        Treina os modelos em streaming com divisão temporal
+
+        As linhas com timestamp no trecho final do período (validation_fraction)
+        formam a validação; todas as anteriores são usadas no treino.
+
+        Args:
+            streamer: Fonte de lotes do dataset
+            epochs: Passadas completas sobre o conjunto de treino
+            validation_fraction: Fração final do período reservada para validação
+
+        Returns:
+            Relatório com métricas de validação e throughput
+        """
+        if not (0 < validation_fraction < 1):
+            raise ValueError(f"validation_fraction deve estar entre 0 e 1: {validation_fraction}")
+
+        numeric_columns = streamer.numeric_columns()
+        self.feature_columns = self._select_features(numeric_columns)
+        self._build_models(numeric_columns)
+        if not self.models:
+            raise ValueError("Nenhum target disponível no dataset")
+
+        t_min, t_max = streamer.time_bounds()
+        cutoff = t_min + (t_max - t_min) * (1 - validation_fraction)
+        logger.info(f"📅 Período: {t_min} até {t_max} | corte treino/validação: {cutoff}")
+        logger.info(f"🧮 {len(self.feature_columns)} features, modelos: {list(self.models)}")
+
+        columns = ['timestamp'] + self.feature_columns + list(self.models)
+
+        # Scaler ajustado numa passada dedicada, para que a época 1 já use a escala final
+        train_rows = 0
+        start = time.perf_counter()
+        for batch in streamer.iter_batches(columns):
+            train = batch[pd.to_datetime(batch['timestamp']) < cutoff]
+            if len(train):
+                self.scaler.partial_fit(self._prepare(train))
+                train_rows += len(train)
+        if train_rows == 0:
+            raise ValueError("Nenhuma linha no período de treino")
+        scaler_seconds = time.perf_counter() - start
+
+        train_seconds = 0.0
+        for epoch in range(1, epochs + 1):
+            epoch_start = time.perf_counter()
+            for batch in streamer.iter_batches(columns):
+                train = batch[pd.to_datetime(batch['timestamp']) < cutoff]
+                if train.empty:
+                    continue
+                X = self.scaler.transform(self._prepare(train))
+                for target, model in self.models.items():
+                    y = train[target].fillna(0).to_numpy()
+                    if isinstance(model, SGDClassifier):
+                        model.partial_fit(X, y.astype(int), classes=np.array([0, 1]))
+                    else:
+                        model.partial_fit(X, y.astype(float))
+            elapsed = time.perf_counter() - epoch_start
+            train_seconds += elapsed
+            logger.info(f"   Época {epoch}/{epochs}: {train_rows:,} linhas em {elapsed:.2f}s "
+                        f"({train_rows / max(elapsed, 1e-9):,.0f} linhas/s)")
+
+        report = self.evaluate(streamer, cutoff, columns)
+        report['train'] = {
+            'rows': train_rows,
+            'epochs': epochs,
+            'seconds': train_seconds,
+            'rows_per_second': train_rows * epochs / max(train_seconds, 1e-9),
+            'scaler_pass_seconds': scaler_seconds,
+        }
+        report['cutoff'] = str(cutoff)
+        report['features'] = self.feature_columns
+        return report
+
+    def evaluate(self, streamer: DatasetStreamer, cutoff: pd.Timestamp,
+                 columns: List[str]) -> Dict:
+        """Avalia os modelos no período de validação acumulando métricas por lote"""
+        counts = {t: {'tp': 0, 'fp': 0, 'tn': 0, 'fn': 0}
+                  for t, m in self.models.items() if isinstance(m, SGDClassifier)}
+        errors = {t: {'abs': 0.0, 'sq': 0.0}
+                  for t, m in self.models.items() if isinstance(m, SGDRegressor)}
+        rows = 0
+
+        start = time.perf_counter()
+        for batch in streamer.iter_batches(columns):
+            valid = batch[pd.to_datetime(batch['timestamp']) >= cutoff]
+            if valid.empty:
+                continue
+            rows += len(valid)
+            X = self.scaler.transform(self._prepare(valid))
+            for target, model in self.models.items():
+                y = valid[target].fillna(0).to_numpy()
+                pred = model.predict(X)
+                if target in counts:
+                    c = counts[target]
+                    c['tp'] += int(((pred == 1) & (y == 1)).sum())
+                    c['fp'] += int(((pred == 1) & (y == 0)).sum())
+                    c['tn'] += int(((pred == 0) & (y == 0)).sum())
+                    c['fn'] += int(((pred == 0) & (y == 1)).sum())
+                else:
+                    errors[target]['abs'] += float(np.abs(pred - y).sum())
+                    errors[target]['sq'] += float(((pred - y) ** 2).sum())
+        seconds = time.perf_counter() - start
+
+        metrics = {}
+        for target, c in counts.items():
+            precision = c['tp'] / (c['tp'] + c['fp']) if c['tp'] + c['fp'] else 0.0
+            recall = c['tp'] / (c['tp'] + c['fn']) if c['tp'] + c['fn'] else 0.0
+            metrics[target] = {
+                'accuracy': (c['tp'] + c['tn']) / rows if rows else 0.0,
+                'precision': precision,
+                'recall': recall,
+                'f1': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+                'positives': c['tp'] + c['fn'],
+            }
+        for target, e in errors.items():
+            metrics[target] = {
+                'mae': e['abs'] / rows if rows else 0.0,
+                'rmse': float(np.sqrt(e['sq'] / rows)) if rows else 0.0,
+            }
+
+        return {
+            'validation': {
+                'rows': rows,
+                'seconds': seconds,
+                'rows_per_second': rows / max(seconds, 1e-9),
+            },
+            'metrics': metrics,
+        }
+
+    def save_models(self, output_path: str = 'modelos_sobrecarga.joblib'):
+        """Salva modelos, scaler e lista de features"""
+        joblib.dump({
+            'models': self.models,
+            'scaler': self.scaler,
+            'feature_columns': self.feature_columns,
+            'trained_at': datetime.now().isoformat(),
+        }, output_path)
+        logger.info(f"💾 Modelos salvos em: {output_path}")
+
+
+def print_report(report: Dict):
+    """Imprime resumo do treinamento"""
+    print("\n" + "="*70)
+    print("RESUMO DO TREINAMENTO")
+    print("="*70)
+
+    train, valid = report['train'], report['validation']
+    print(f"\n⚡ Throughput:")
+    print(f"   • Treino: {train['rows']:,} linhas x {train['epochs']} época(s) "
+          f"-> {train['rows_per_second']:,.0f} linhas/s")
+    print(f"   • Validação: {valid['rows']:,} linhas -> {valid['rows_per_second']:,.0f} linhas/s")
+    print(f"   • Corte temporal: {report['cutoff']}")
+
+    print(f"\n🎯 Métricas de Validação:")
+    for target, metrics in report['metrics'].items():
+        values = ', '.join(f"{k}={v:.4f}" if isinstance(v, float) else f"{k}={v}"
+                           for k, v in metrics.items())
+        print(f"   • {target}: {values}")
+
+
+def parse_arguments():
+    """Parse argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(
+        description='Treinamento incremental (out-of-core) para detecção de sobrecarga'
+    )
+    parser.add_argument('--dataset', type=str, default='kubernetes_ml_dataset_partitioned',
+                        help='Diretório particionado, arquivo .parquet ou .csv '
+                             '(default: kubernetes_ml_dataset_partitioned)')
+    parser.add_argument('--batch-size', type=int, default=50_000,
+                        help='Linhas por lote (default: 50000)')
+    parser.add_argument('--epochs', type=int, default=1,
+                        help='Passadas sobre o conjunto de treino (default: 1)')
+    parser.add_argument('--validation-fraction', type=float, default=0.2,
+                        help='Fração final do período usada para validação (default: 0.2)')
+    parser.add_argument('--output', type=str, default='modelos_sobrecarga.joblib',
+                        help='Arquivo de saída dos modelos (default: modelos_sobrecarga.joblib)')
+    parser.add_argument('--report', type=str, default=None,
+                        help='Salvar relatório em JSON')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    try:
+        if not os.path.exists(args.dataset):
+            logger.error(f"❌ Dataset não encontrado: {args.dataset}")
+            exit(1)
+
+        streamer = DatasetStreamer(args.dataset, batch_size=args.batch_size)
+        trainer = IncrementalTrainer()
+        report = trainer.fit(streamer, epochs=args.epochs,
+                             validation_fraction=args.validation_fraction)
+
+        print_report(report)
+        trainer.save_models(args.output)
+
+        if args.report:
+            with open(args.report, 'w') as f:
+                json.dump(report, f, indent=2)
+            logger.info(f"💾 Relatório salvo em: {args.report}")
+
+    except Exception as e:
+        logger.error(f"\n❌ Erro durante treinamento: {e}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
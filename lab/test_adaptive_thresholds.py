@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Testes do estado persistido dos thresholds adaptativos
+"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from adaptive_thresholds import AdaptiveThresholdLabeler
+
+
+def make_frame(start, hours=6, seed=0):
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range(start, periods=hours * 60, freq='1min')
+    return pd.DataFrame({'timestamp': timestamps, 'pod': 'api-0', 'container': 'app',
+                         'cpu_usage_percent': rng.normal(50, 5, len(timestamps))})
+
+
+class TestLabelerState(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'sketches.json')
+
+    def test_round_trip_gives_same_labels(self):
+        labeler = AdaptiveThresholdLabeler(metrics=['cpu_usage_percent'])
+        labeler.label(make_frame('2024-01-01'))
+        labeler.save_to_file(self.path)
+        loaded = AdaptiveThresholdLabeler.load_from_file(self.path)
+
+        self.assertEqual(loaded.to_dict(), labeler.to_dict())
+        later = make_frame('2024-01-01 06:00', seed=1)
+        pd.testing.assert_frame_equal(labeler.label(later.copy()), loaded.label(later.copy()))
+
+    def test_overrides_replace_saved_window(self):
+        labeler = AdaptiveThresholdLabeler(metrics=['cpu_usage_percent'], window_buckets=24)
+        labeler.label(make_frame('2024-01-01'))
+        labeler.save_to_file(self.path)
+
+        loaded = AdaptiveThresholdLabeler.load_from_file(self.path, window_buckets=2, min_samples=10)
+        self.assertEqual((loaded.window_buckets, loaded.min_samples), (2, 10))
+        # Buckets fora da nova janela são descartados na carga
+        series = next(iter(loaded.series.values()))
+        self.assertEqual(len(series.buckets), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
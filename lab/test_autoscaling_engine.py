@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Testes da política de scaling contra a API Kubernetes em memória
+"""
+
+import unittest
+
+import pandas as pd
+
+from autoscaling_engine import FakeKubernetesAPI, PredictiveScalingEngine
+
+KEY = ('ns', 'api')
+START = pd.Timestamp('2024-01-01 00:00:00')
+
+
+def sample(seconds, cpu, pods=('api-7d9f8b6c5d-abcde', 'api-7d9f8b6c5d-fghij')):
+    return pd.DataFrame({'timestamp': START + pd.Timedelta(seconds=seconds), 'namespace': 'ns',
+                         'pod': list(pods), 'cpu_usage_percent': cpu})
+
+
+class TestScalingAgainstFakeAPI(unittest.TestCase):
+    def setUp(self):
+        self.api = FakeKubernetesAPI({KEY: 2})
+        self.engine = PredictiveScalingEngine(actuator=self.api, targets={'cpu_usage_percent': 70.0},
+                                              scale_up_cooldown=60, scale_down_cooldown=300)
+
+    def scale_calls(self):
+        return [call for call in self.api.calls if call[0] == 'scale']
+
+    def test_within_tolerance_does_not_scale(self):
+        # 75% com alvo de 70% está dentro da banda de ±10%
+        for t in range(0, 600, 30):
+            self.engine.observe(sample(t, 75.0))
+        self.assertEqual(self.scale_calls(), [])
+        self.assertEqual(self.api.replicas[KEY], 2)
+
+    def test_scale_up_respects_cooldown(self):
+        self.engine.observe(sample(0, 140.0))
+        self.assertEqual(self.scale_calls(), [('scale', 'ns', 'api', 4)])
+
+        # Ainda sobrecarregado, mas dentro do cooldown de scale-up
+        self.engine.observe(sample(30, 140.0))
+        self.assertEqual(len(self.scale_calls()), 1)
+
+        self.engine.observe(sample(60, 140.0))
+        self.assertEqual(self.scale_calls()[-1], ('scale', 'ns', 'api', 8))
+        self.assertEqual(self.api.replicas[KEY], 8)
+
+    def test_scale_down_waits_for_stabilization_window(self):
+        self.engine.observe(sample(0, 140.0))
+        self.assertEqual(self.api.replicas[KEY], 4)
+
+        # Carga cai: o maior desejado da janela (4) segura o scale-down
+        for t in range(30, 300, 30):
+            self.engine.observe(sample(t, 10.0))
+        self.assertEqual(self.api.replicas[KEY], 4)
+
+        for t in range(300, 420, 30):
+            self.engine.observe(sample(t, 10.0))
+        self.assertLess(self.api.replicas[KEY], 4)
+        self.assertEqual(len(self.scale_calls()), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Testes do simulador de cluster por eventos discretos
+"""
+
+import heapq
+import unittest
+
+import numpy as np
+
+import cluster_simulator
+from cluster_simulator import GIB, ClusterSimulator, PodTrace, SimNode
+
+class TestEventOrder(unittest.TestCase):
+    def _trace(self, name, n, cpu_request=1.0, memory=1e8, step=10.0):
+        times = np.arange(n) * step
+        return PodTrace(name, 'ns', times, np.full(n, 0.5), np.full(n, memory),
+                        cpu_request=cpu_request, memory_request=1e8)
+    
+    def _run(self, sim):
+        popped = []
+        original = heapq.heappop
+        
+        def record(events):
+            event = original(events)
+            popped.append(event[0])
+            return event
+        
+        cluster_simulator.heapq.heappop = record
+        try:
+            report = sim.run()
+        finally:
+            cluster_simulator.heapq.heappop = original
+        return report, popped
+    
+    def test_pending_pod_never_moves_clock_backwards(self):
+        # Um nó de 1 core e dois pods de 1 core: o segundo espera o primeiro terminar
+        sim = ClusterSimulator([SimNode('n0', 1.0, 8 * GIB)])
+        sim.add_trace(self._trace('a', 11))
+        sim.add_trace(self._trace('b', 20))
+        
+        report, popped = self._run(sim)
+        
+        self.assertEqual(popped, sorted(popped))
+        self.assertEqual(report['unschedulable'], 1)
+        self.assertEqual(report['pending_pods'], 0)
+    
+    def test_kill_does_not_duplicate_sample_chain(self):
+        # O pod b estoura a memória do nó e mata a (mais acima do request)
+        memory_b = np.full(40, 1 * GIB)
+        memory_b[20:] = 3.5 * GIB
+        a = self._trace('a', 40, cpu_request=0.1, memory=1 * GIB, step=30.0)
+        b = PodTrace('b', 'ns', np.arange(40) * 30.0 + 5, np.full(40, 0.1), memory_b,
+                     cpu_request=0.1, memory_request=1 * GIB)
+        sim = ClusterSimulator([SimNode('n0', 4.0, 4 * GIB)], restart_backoff=60)
+        applied = []
+        apply_sample = sim._apply_sample
+        
+        def record(pod):
+            applied.append((sim.now, float(pod.trace.times[pod.sample_index])))
+            return apply_sample(pod)
+        
+        sim._apply_sample = record
+        sim.add_trace(a)
+        sim.add_trace(b)
+        report, popped = self._run(sim)
+        
+        self.assertGreater(report['node_pressure_kills'], 0)
+        self.assertEqual(popped, sorted(popped))
+        # Toda amostra é aplicada no próprio instante do trace
+        self.assertTrue(all(now == sample_time for now, sample_time in applied))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Testes do Repeated Median incremental do estimador de vazamento
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from leak_estimator import LeakEstimator
+
+
+def repeated_median(times, values):
+    """Repeated Median recalculado do zero sobre a janela"""
+    medians = []
+    for i in range(len(times)):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slopes = (values[i] - np.delete(values, i)) / (times[i] - np.delete(times, i))
+        slopes = slopes[np.isfinite(slopes)]
+        if len(slopes):
+            medians.append(np.median(slopes))
+    return np.median(medians) if medians else np.nan
+
+
+class TestIncrementalRepeatedMedian(unittest.TestCase):
+    def test_matches_recomputation_from_scratch(self):
+        rng = np.random.default_rng(7)
+        window, n_series = 6, 30
+        estimator = LeakEstimator(window=window, initial_capacity=4)
+        sid = np.arange(n_series)
+        estimator.series.grow(n_series)
+
+        for k in range(40):
+            t = np.full(n_series, k * 30.0)
+            t[:3] -= 30.0 * (k % 4 == 1)     # timestamps repetidos: pares sem inclinação
+            y = rng.normal(0, 1, n_series) + k * rng.integers(0, 3, n_series)
+            y[rng.random(n_series) < 0.3] = y[0]  # empates entre inclinações
+            if k == 20:
+                estimator.series.reset(sid[:5])
+            slope, _, _ = estimator._step(sid, t, y)
+
+            for s in range(n_series):
+                valid = ~np.isnan(estimator.series.times[s])
+                expected = repeated_median(estimator.series.times[s][valid], estimator.series.values[s][valid])
+                np.testing.assert_allclose(slope[s], expected, equal_nan=True)
+                ranked = estimator.series.ranked[s]
+                self.assertTrue(np.all(ranked[1:] >= ranked[:-1]))
+
+    def test_linear_leak_gives_exact_slope_despite_spikes(self):
+        estimator = LeakEstimator(window=20, min_samples=8)
+        times = pd.date_range('2024-01-01', periods=40, freq='30s')
+        working_set = 1e8 + 1000.0 * np.arange(40) * 30
+        working_set[[5, 17, 29]] *= 3      # picos isolados não movem a mediana
+        df = pd.DataFrame({'timestamp': times, 'pod': 'api-0', 'container': 'app',
+                           'memory_working_set_bytes': working_set, 'memory_limit': 1e9})
+        result = estimator.update(df)
+        self.assertAlmostEqual(result['leak_slope_bytes_per_s'].iloc[-1], 1000.0)
+        self.assertEqual(result['leak_alert'].iloc[-1], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
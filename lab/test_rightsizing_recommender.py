@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Testes do estado incremental do recomendador de right-sizing
+"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from rightsizing_recommender import RightSizingRecommender
+from sistema_treinamento_ml import DatasetStreamer
+
+
+def make_dataset(path, pod, start, n=50, cpu=0.5):
+    timestamps = pd.date_range(start, periods=n, freq='30s')
+    pd.DataFrame({
+        'timestamp': timestamps, 'namespace': 'ns', 'pod': pod, 'container': 'app',
+        'cpu_usage_total': np.full(n, cpu), 'memory_working_set_bytes': np.full(n, 2e8),
+    }).to_csv(path, index=False)
+    return path
+
+
+class TestRecommenderState(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_save_load_round_trip(self):
+        recommender = RightSizingRecommender()
+        recommender.fit(DatasetStreamer(make_dataset(self._path('a.csv'), 'api-7d9f8b6c5d-x1y2z', '2024-01-01')))
+        recommender.save_to_file(self._path('state.json'))
+
+        loaded = RightSizingRecommender.load_from_file(self._path('state.json'))
+        pd.testing.assert_frame_equal(recommender.recommendations(), loaded.recommendations())
+
+        # Reprocessar o mesmo dataset não conta amostras duas vezes
+        stats = loaded.fit(DatasetStreamer(self._path('a.csv')))
+        self.assertEqual(stats['rows'], 0)
+
+    def test_overlapping_dataset_of_other_workload_is_kept(self):
+        recommender = RightSizingRecommender()
+        recommender.fit(DatasetStreamer(make_dataset(self._path('a.csv'), 'api-7d9f8b6c5d-x1y2z', '2024-01-01')))
+        stats = recommender.fit(DatasetStreamer(make_dataset(self._path('b.csv'), 'web-5c6d7e8f9a-a1b2c',
+                                                             '2024-01-01')))
+        self.assertEqual(stats['rows'], 50)
+        self.assertEqual(len(recommender.containers), 2)
+
+    def test_half_life_override_applies_to_loaded_histograms(self):
+        recommender = RightSizingRecommender(half_life_hours=24)
+        recommender.fit(DatasetStreamer(make_dataset(self._path('a.csv'), 'api-7d9f8b6c5d-x1y2z', '2024-01-01')))
+        recommender.save_to_file(self._path('state.json'))
+
+        loaded = RightSizingRecommender.load_from_file(self._path('state.json'), half_life_hours=6)
+        usage = next(iter(loaded.containers.values()))
+        self.assertEqual(usage.cpu.half_life, 6 * 3600)
+        self.assertEqual(usage.memory.half_life, 6 * 3600)
+
+        # Containers novos e carregados decaem na mesma taxa e podem ser mesclados
+        loaded.fit(DatasetStreamer(make_dataset(self._path('b.csv'), 'api-7d9f8b6c5d-x1y2z', '2024-01-02')))
+        other = RightSizingRecommender(half_life_hours=6)
+        other.fit(DatasetStreamer(self._path('a.csv')))
+        loaded.merge(other)
+
+
+if __name__ == '__main__':
+    unittest.main()